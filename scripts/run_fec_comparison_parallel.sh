@@ -44,6 +44,9 @@ FEC_INTERLEAVING_DEPTH="8"
 PFC_ENABLED="0"
 IRN_ENABLED="1"
 
+# 内存预算（MB）：>0 时每个仿真配一个看门狗，按 FEC 状态监控外推的 RSS 超出预算就提前终止
+MEM_BUDGET_MB="0"
+
 while [[ $# -gt 0 ]]; do
   case $1 in
     --pfc)
@@ -54,11 +57,16 @@ while [[ $# -gt 0 ]]; do
       IRN_ENABLED="$2"
       shift 2
       ;;
+    --mem-budget-mb)
+      MEM_BUDGET_MB="$2"
+      shift 2
+      ;;
     -h|--help)
       echo "Usage: $0 [OPTIONS]"
       echo "Options:"
       echo "  --pfc 0|1   Enable PFC (default: 0)"
       echo "  --irn 0|1   Enable IRN (default: 1)"
+      echo "  --mem-budget-mb N  Kill runs whose projected RSS exceeds N MB (default: 0, disabled)"
       echo "  -h, --help  Show this help message"
       exit 0
       ;;
@@ -104,6 +112,7 @@ echo "  · 带宽: intra=${INTRA_BW}Gbps, inter=${INTER_BW}Gbps"
 echo "  · 延迟: intra=${INTRA_LATENCY}ns, inter=${INTER_LATENCY}ns"
 echo "  · 开关: PFC=${PFC_ENABLED}, IRN=${IRN_ENABLED}"
 echo "  · FEC参数: block_size=${FEC_BLOCK_SIZE}, depth=${FEC_INTERLEAVING_DEPTH}"
+echo "  · 内存预算: ${MEM_BUDGET_MB}MB (0=不限制)"
 echo ""
 cecho "YELLOW" "测试场景 (共6个):"
 for i in "${!ERROR_RATES[@]}"; do
@@ -144,6 +153,7 @@ FEC interleaving depth: ${FEC_INTERLEAVING_DEPTH}
 FEC log enabled: ${FEC_LOG_ENABLED}
 FEC state monitor enabled: ${FEC_STATE_MON_ENABLED}
 FEC state monitor interval: ${FEC_STATE_MON_INTERVAL_NS} ns
+Memory budget: ${MEM_BUDGET_MB} MB
 
 测试场景:
 ---------
@@ -187,7 +197,8 @@ for i in "${!ERROR_RATES[@]}"; do
             echo '=========================================' | tee -a '${task_dir}/simulation.log'
             echo '' | tee -a '${task_dir}/simulation.log'
 
-            # 运行仿真
+            # 运行仿真（放到独立进程组，便于看门狗连同 waf/ns-3 子进程一起终止）
+            set -m
             python3 run_cross_dc.py \\
                 --pfc '${PFC_ENABLED}' \\
                 --irn '${IRN_ENABLED}' \\
@@ -209,9 +220,24 @@ for i in "${!ERROR_RATES[@]}"; do
                 --fec-log-enabled '${FEC_LOG_ENABLED}' \\
                 --fec-state-mon-enabled '${FEC_STATE_MON_ENABLED}' \\
                 --fec-state-mon-interval-ns '${FEC_STATE_MON_INTERVAL_NS}' \\
-                2>&1 | tee -a '${task_dir}/simulation.log'
+                > >(tee -a '${task_dir}/simulation.log') 2>&1 &
+            sim_pid=\$!
+            set +m
+
+            if [ '${MEM_BUDGET_MB}' != '0' ] && [ '${FEC_STATE_MON_ENABLED}' = '1' ]; then
+                python3 analysis/fec/fec_state_monitor.py watch \\
+                    --sim-log '${task_dir}/simulation.log' \\
+                    --pid \$sim_pid --kill-group \\
+                    --budget-mb '${MEM_BUDGET_MB}' \\
+                    --kill-marker '${task_dir}/.mem_killed' \\
+                    >> '${task_dir}/memory_watch.log' 2>&1 &
+            fi
 
+            wait \$sim_pid
             exit_code=\$?
+            if [ -f '${task_dir}/.mem_killed' ]; then
+                echo \"✗ 内存看门狗终止了仿真: \$(cat '${task_dir}/.mem_killed')\" | tee -a '${task_dir}/simulation.log'
+            fi
 
             # 移动输出结果（必须精确匹配本次运行的 output_id，避免并发场景互相误搬运）
             out_id=\$(grep -E \"^Config filename: .*mix/output/[0-9]+/config\\.txt\" -a '${task_dir}/simulation.log' \\\n+                | tail -n 1 \\\n+                | sed -n 's@.*mix/output/\\([0-9][0-9]*\\)/config\\.txt.*@\\1@p')\n+\n+            if [ -z \"\$out_id\" ]; then\n+                echo \"✗ 未能从日志解析 output_id（Config filename），跳过自动搬运（请手动检查 mix/output）\" | tee -a '${task_dir}/simulation.log'\n+            else\n+                if [ -d \"mix/output/\${out_id}\" ]; then\n+                    mv \"mix/output/\${out_id}\" '${task_dir}/' 2>/dev/null || cp -r \"mix/output/\${out_id}\" '${task_dir}/'\n+                    echo \"输出已移动到: ${task_dir}/\${out_id}\" | tee -a '${task_dir}/simulation.log'\n+                else\n+                    echo \"✗ 解析到 output_id=\${out_id} 但目录不存在：mix/output/\${out_id}\" | tee -a '${task_dir}/simulation.log'\n+                fi\n+            fi
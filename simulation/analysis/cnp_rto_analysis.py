@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+CNP 与 RTO 时间序列分析
+
+- _out_cnp.txt: cnp_freq_monitoring 按桶输出的每节点 CNP 计数 (ECN / OoO / 合计)
+- _out_rto.txt: on_rto_timeout 的采样记录（默认每 256 次记录 1 次），按采样率放大还原
+- DCI 排队压力: 仿真没有单独的 DCI 队列日志，用 DCI 交换机上的 PFC PAUSE 与拥塞丢包
+  (_out_pfc.txt / _out_drop.txt) 作为队列堆积的代理指标
+
+把三者按固定时间桶聚合成每节点 / 每数据中心的时间序列，计算 CNP 与 RTO、DCI 压力之间的
+(滞后)相关性和突发对应关系，并输出一份紧凑的 JSON 摘要，便于按 run 收集入库。
+
+使用方法:
+python3 cnp_rto_analysis.py <run_dir|config_id>... [--bin-us 100] [--timeseries]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from log_parser import find_log, parse_log, parse_rate, read_log_meta
+
+# RTO_LOG_SAMPLE_RATE 的默认值；旧日志没有头部时也按此采样率还原
+DEFAULT_RTO_SAMPLE_RATE = 1.0 / 256
+SUMMARY_SUFFIX = '_out_cnp_rto_summary.json'
+# 突发：超过 mean + BURST_SIGMA * std 的时间桶
+BURST_SIGMA = 3.0
+PERCENTILES = [50, 99]
+
+
+def read_log_header(log_file):
+    """读取日志头部的 key=value（文本日志首行 '# key=value ...' 或二进制日志头部），没有头部时返回 {}"""
+    return read_log_meta(log_file)
+
+
+def read_sample_rate(log_file, default):
+    """日志头部记录的 sample_rate（小数或 1/N 形式），否则使用默认值"""
+    value = read_log_header(log_file).get('sample_rate')
+    if value is None:
+        return default
+    rate = parse_rate(value)
+    return rate if rate > 0 else default
+
+
+def read_run_config(config_file):
+    """从 config.txt 读取 DCI 交换机 ID 与流量起止时间"""
+    info = {'dci_ids': [], 'flowgen_start_ns': None, 'flowgen_stop_ns': None}
+    try:
+        with open(config_file, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 2:
+                    continue
+                if parts[0] == 'DCI_SWITCH_IDS':
+                    info['dci_ids'] = [int(x) for x in parts[2:2 + int(parts[1])]]
+                elif parts[0] == 'FLOWGEN_START_TIME':
+                    info['flowgen_start_ns'] = int(float(parts[1]) * 1e9)
+                elif parts[0] == 'FLOWGEN_STOP_TIME':
+                    info['flowgen_stop_ns'] = int(float(parts[1]) * 1e9)
+    except OSError:
+        pass
+    return info
+
+
+def run_files(target, output_dir):
+    """run 目录或 config id -> (run_id, 路径前缀, config.txt)"""
+    run_dir = target if os.path.isdir(target) else os.path.join(output_dir, target)
+    run_id = os.path.basename(os.path.normpath(run_dir))
+    return run_id, os.path.join(run_dir, run_id), os.path.join(run_dir, 'config.txt')
+
+
+def bin_series(time_ns, t0, bin_ns, n_bins, weights=None, group=None, n_groups=1):
+    """按时间桶（可选再按分组）累加，返回 (n_groups, n_bins)"""
+    b = (time_ns - t0) // bin_ns
+    ok = (b >= 0) & (b < n_bins)
+    idx = b[ok] if group is None else group[ok] * n_bins + b[ok]
+    w = None if weights is None else weights[ok].astype(np.float64)
+    return np.bincount(idx, weights=w, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+
+def pearson(x, y):
+    if x.size < 2 or np.std(x) == 0 or np.std(y) == 0:
+        return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+
+def lagged_correlation(x, y, max_lag):
+    """y 相对 x 滞后 0..max_lag 个桶的相关系数中最大者，返回 (lag, r)"""
+    best = (None, None)
+    for lag in range(0, max_lag + 1):
+        r = pearson(x[:x.size - lag], y[lag:]) if lag < x.size else None
+        if r is not None and (best[1] is None or r > best[1]):
+            best = (lag, r)
+    return best
+
+
+def burst_bins(x):
+    if x.size == 0 or x.max() <= 0:
+        return np.zeros(x.size, dtype=bool)
+    return x > x.mean() + BURST_SIGMA * x.std()
+
+
+def followed_fraction(src, dst, max_lag):
+    """src 的突发桶中，在 0..max_lag 个桶内出现 dst 突发的比例"""
+    src_idx = np.flatnonzero(src)
+    if src_idx.size == 0:
+        return None
+    # dst 突发桶的前缀和，便于按窗口计数
+    csum = np.concatenate(([0], np.cumsum(dst)))
+    hi = np.minimum(src_idx + max_lag + 1, dst.size)
+    return float(np.mean(csum[hi] - csum[src_idx] > 0))
+
+
+def _pct(values):
+    if values.size == 0:
+        return None
+    return {f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def analyze_run(prefix, config_file, bin_ns, max_lag_bins, default_rto_rate, nodes_per_dc=None):
+    """返回 (摘要 dict, 时间序列 dict)；所需日志都不存在时返回 (None, None)"""
+    cfg = read_run_config(config_file)
+    dci_ids = np.array(cfg['dci_ids'], dtype=np.int64)
+    if nodes_per_dc is None:
+        nodes_per_dc = int(dci_ids[0]) + 1 if dci_ids.size else 53
+    n_dc = max(int(dci_ids.size), 1)
+
+    paths = {k: f'{prefix}_out_{k}.txt' for k in ('cnp', 'rto', 'pfc', 'drop')}
+    cols = {k: parse_log(p, k) for k, p in paths.items() if find_log(p)}
+    if 'cnp' not in cols and 'rto' not in cols:
+        return None, None
+
+    times = [c['time_ns'] for c in cols.values() if c['time_ns'].size]
+    if not times:
+        return None, None
+    t0 = cfg['flowgen_start_ns'] if cfg['flowgen_start_ns'] is not None else min(int(t.min()) for t in times)
+    t_end = max(int(t.max()) for t in times)
+    n_bins = max(int((t_end - t0) // bin_ns) + 1, 1)
+
+    summary = {'bin_us': bin_ns / 1000, 'n_bins': n_bins, 't0_ns': t0, 'nodes_per_dc': nodes_per_dc,
+               'dci_ids': dci_ids.tolist()}
+    series = {'time_us': (t0 + np.arange(n_bins) * bin_ns) / 1000}
+
+    # CNP: 每个数据中心的时间序列 + 每节点总量
+    cnp_total = np.zeros(n_bins)
+    if 'cnp' in cols:
+        c = cols['cnp']
+        dc = np.minimum(c['node'].astype(np.int64) // nodes_per_dc, n_dc - 1)
+        per_dc = bin_series(c['time_ns'], t0, bin_ns, n_bins, c['cnp_total'], dc, n_dc)
+        cnp_total = per_dc.sum(axis=0)
+        nodes, inv = np.unique(c['node'], return_inverse=True)
+        per_node = np.bincount(inv, weights=c['cnp_total'].astype(np.float64))
+        top = np.argsort(-per_node, kind='stable')[:10]
+        summary['cnp'] = {
+            'total': int(c['cnp_total'].sum()), 'ecn': int(c['cnp_ecn'].sum()), 'ooo': int(c['cnp_ooo'].sum()),
+            'per_dc': per_dc.sum(axis=1).astype(np.int64).tolist(),
+            'nodes': int(nodes.size),
+            'top_nodes': {int(nodes[i]): int(per_node[i]) for i in top},
+            'peak_per_bin': int(cnp_total.max()),
+            'burst_bins': int(burst_bins(cnp_total).sum()),
+        }
+        for d in range(n_dc):
+            series[f'cnp_dc{d}'] = per_dc[d]
+
+    # RTO: 按采样率放大
+    rto_est = np.zeros(n_bins)
+    if 'rto' in cols:
+        r = cols['rto']
+        rate = read_sample_rate(paths['rto'], default_rto_rate)
+        scale = 1.0 / rate
+        dc = np.minimum(r['node'].astype(np.int64) // nodes_per_dc, n_dc - 1)
+        per_dc = bin_series(r['time_ns'], t0, bin_ns, n_bins, None, dc, n_dc) * scale
+        rto_est = per_dc.sum(axis=0)
+        inter = (r['src_id'].astype(np.int64) // nodes_per_dc) != (r['dst_id'].astype(np.int64) // nodes_per_dc)
+        summary['rto'] = {
+            'sample_rate': rate,
+            'sampled': int(r['time_ns'].size),
+            'estimated_total': float(r['time_ns'].size * scale),
+            'estimated_per_dc': per_dc.sum(axis=1).tolist(),
+            'estimated_inter_dc': float(np.count_nonzero(inter) * scale),
+            'estimated_intra_dc': float(np.count_nonzero(~inter) * scale),
+            'sampled_flows': int(np.unique(r['flow_id']).size),
+            'rto_ns': _pct(r['rto_ns']),
+            'max_timeout_count': int(r['timeout_count'].max()) if r['timeout_count'].size else 0,
+            'burst_bins': int(burst_bins(rto_est).sum()),
+        }
+        for d in range(n_dc):
+            series[f'rto_est_dc{d}'] = per_dc[d]
+
+    # DCI 排队压力代理: DCI 上的 PFC PAUSE + 拥塞丢包
+    dci_pressure = None
+    if dci_ids.size and ('pfc' in cols or 'drop' in cols):
+        dci_pressure = np.zeros(n_bins)
+        dci_summary = {}
+        if 'pfc' in cols:
+            p = cols['pfc']
+            m = np.isin(p['node'], dci_ids) & (p['pfc_type'] == 1)
+            s = bin_series(p['time_ns'][m], t0, bin_ns, n_bins)[0]
+            dci_pressure += s
+            dci_summary['pfc_pauses'] = int(m.sum())
+            series['dci_pfc_pause'] = s
+        if 'drop' in cols:
+            d = cols['drop']
+            m = np.isin(d['node'], dci_ids) & (d['type'] > 0)
+            s = bin_series(d['time_ns'][m], t0, bin_ns, n_bins)[0]
+            dci_pressure += s
+            dci_summary['congestion_drops'] = int(m.sum())
+            series['dci_congestion_drop'] = s
+        dci_summary['burst_bins'] = int(burst_bins(dci_pressure).sum())
+        summary['dci'] = dci_summary
+
+    # 相关性
+    corr = {}
+    if 'cnp' in cols and 'rto' in cols:
+        lag, r = lagged_correlation(cnp_total, rto_est, max_lag_bins)
+        corr['cnp_rto'] = pearson(cnp_total, rto_est)
+        corr['cnp_to_rto_best_lag_bins'] = lag
+        corr['cnp_to_rto_best_lag_r'] = r
+        corr['cnp_bursts_followed_by_rto_burst'] = followed_fraction(
+            burst_bins(cnp_total), burst_bins(rto_est), max_lag_bins)
+    if dci_pressure is not None:
+        if 'cnp' in cols:
+            lag, r = lagged_correlation(dci_pressure, cnp_total, max_lag_bins)
+            corr['dci_cnp'] = pearson(dci_pressure, cnp_total)
+            corr['dci_to_cnp_best_lag_bins'] = lag
+            corr['dci_to_cnp_best_lag_r'] = r
+            corr['cnp_bursts_preceded_by_dci_burst'] = followed_fraction(
+                burst_bins(dci_pressure), burst_bins(cnp_total), max_lag_bins)
+        if 'rto' in cols:
+            corr['dci_rto'] = pearson(dci_pressure, rto_est)
+    summary['correlation'] = corr
+    return summary, series
+
+
+def save_timeseries(path, series):
+    keys = list(series)
+    fmt = ['%.1f'] + ['%.6g'] * (len(keys) - 1)
+    np.savetxt(path, np.column_stack([series[k] for k in keys]), fmt=fmt, delimiter=',',
+               header=','.join(keys), comments='')
+
+
+def _fmt(v, spec='.3f'):
+    return 'N/A' if v is None else format(v, spec)
+
+
+def print_summary(run_id, s):
+    print("=" * 70)
+    print(f"CNP / RTO 分析: {run_id}  (时间桶 {s['bin_us']:.0f}us x {s['n_bins']})")
+    print("=" * 70)
+    if 'cnp' in s:
+        c = s['cnp']
+        print(f"CNP: 总计 {c['total']:,} (ECN {c['ecn']:,}, OoO {c['ooo']:,})  各 DC: {c['per_dc']}  "
+              f"单桶峰值 {c['peak_per_bin']:,}  突发桶 {c['burst_bins']}")
+    if 'rto' in s:
+        r = s['rto']
+        print(f"RTO: 采样 {r['sampled']:,} 条 (采样率 {r['sample_rate']:.6g}) → 估计 {r['estimated_total']:,.0f} 次  "
+              f"intra {r['estimated_intra_dc']:,.0f} / inter {r['estimated_inter_dc']:,.0f}  突发桶 {r['burst_bins']}")
+        if r['rto_ns']:
+            print(f"     RTO 时长 p50 {r['rto_ns']['p50'] / 1000:.1f}us  p99 {r['rto_ns']['p99'] / 1000:.1f}us  "
+                  f"最大超时次数 {r['max_timeout_count']}")
+    if 'dci' in s:
+        d = s['dci']
+        print(f"DCI 压力: PFC PAUSE {d.get('pfc_pauses', 'N/A')}  拥塞丢包 {d.get('congestion_drops', 'N/A')}  "
+              f"突发桶 {d['burst_bins']}")
+    corr = s['correlation']
+    if corr:
+        print("相关性:")
+        for k, v in corr.items():
+            print(f"  {k:<36} {_fmt(v) if not isinstance(v, int) else v}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CNP / RTO 时间序列分析（RTO 按采样率还原）')
+    parser.add_argument('targets', nargs='+', help='run 目录或 config id（在 mix/output 下查找）')
+    parser.add_argument('--bin-us', type=float, default=100, help='时间桶宽度（us，默认: 100）')
+    parser.add_argument('--max-lag-us', type=float, default=1000, help='滞后相关的最大滞后（us，默认: 1000）')
+    parser.add_argument('--rto-sample-rate', type=float, default=DEFAULT_RTO_SAMPLE_RATE,
+                        help='RTO 日志没有记录采样率时使用的采样率（默认: 1/256）')
+    parser.add_argument('--nodes-per-dc', type=int, default=None,
+                        help='每个数据中心的节点数（默认: 由 DCI_SWITCH_IDS 推出）')
+    parser.add_argument('--timeseries', action='store_true', help='同时输出时间序列 CSV')
+    parser.add_argument('-o', '--output-dir', default=None, help='输出目录（默认: 各 run 目录）')
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'mix', 'output')
+    bin_ns = int(args.bin_us * 1000)
+    max_lag_bins = max(int(args.max_lag_us * 1000 // bin_ns), 0)
+    ret = 0
+    for target in args.targets:
+        run_id, prefix, config_file = run_files(target, output_dir)
+        summary, series = analyze_run(prefix, config_file, bin_ns, max_lag_bins, args.rto_sample_rate,
+                                      args.nodes_per_dc)
+        if summary is None:
+            print(f"跳过 {target}: 没有找到 CNP/RTO 日志")
+            ret = 1
+            continue
+        summary['run_id'] = run_id
+        print_summary(run_id, summary)
+
+        out_dir = args.output_dir or os.path.dirname(prefix)
+        os.makedirs(out_dir, exist_ok=True)
+        summary_file = os.path.join(out_dir, run_id + SUMMARY_SUFFIX)
+        with open(summary_file, 'w') as f:
+            json.dump(summary, f, separators=(',', ':'))
+        print(f"摘要已保存到: {summary_file}")
+        if args.timeseries:
+            ts_file = os.path.join(out_dir, f'{run_id}_cnp_rto_timeseries.csv')
+            save_timeseries(ts_file, series)
+            print(f"时间序列已保存到: {ts_file}")
+        print()
+    return ret
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,5 @@
 #!/usr/bin/python3
 
-import subprocess
 import os
 import sys
 import argparse
@@ -9,6 +8,8 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as tick
 import math
 from cycler import cycler
+from fct_query import load_file, nodes_per_dc_from_k
+from log_parser import find_log
 
 # color configuration
 C = [
@@ -68,10 +69,6 @@ def getFilePath():
     print("script path: {}".format(dir_path))
     return dir_path
 
-def get_pctl(a, p):
-    i = int(len(a) * p)
-    return a[i]
-
 def size2str(steps):
     result = []
     for step in steps:
@@ -84,105 +81,6 @@ def size2str(steps):
 
     return result
 
-def is_intra_dc_flow(src, dst, n_server_per_dc, n_switch_per_dc, n_dci_per_dc):
-    """judge if the flow is intra-dc"""
-    nodes_per_dc = n_server_per_dc + n_switch_per_dc + n_dci_per_dc
-    
-    dc_src = src // nodes_per_dc
-    dc_dst = dst // nodes_per_dc
-    
-    return dc_src == dc_dst
-
-def get_steps_from_raw(filename, time_start, time_end, step=5, n_server_per_dc=None, n_switch_per_dc=None, n_dci_per_dc=None, filter_inter_dc=False):
-    if filter_inter_dc and (n_server_per_dc is None or n_switch_per_dc is None or n_dci_per_dc is None):
-        print("error: when filtering inter-dc flows, the number of servers, switches, and DCI switches must be provided")
-        return None
-    
-    if not filter_inter_dc:
-        cmd_slowdown = "cat %s"%(filename)+" | awk '{ if ($6>"+"%d"%time_start+" && $6+$7<"+"%d"%(time_end)+") { slow=$7/$8; print slow<1?1:slow, $5, $1, $2} }' | sort -n -k 2"
-    else:
-        cmd_slowdown = "cat %s"%(filename)+" | awk '{ if ($6>"+"%d"%time_start+" && $6+$7<"+"%d"%(time_end)+") { slow=$7/$8; print slow<1?1:slow, $5, $1, $2} }'"
-    
-    output_slowdown = subprocess.check_output(cmd_slowdown, shell=True)
-    aa_raw = output_slowdown.decode("utf-8").split('\n')[:-1]
-    
-    total_flows_before_filter = len(aa_raw)
-    
-    if filter_inter_dc:
-        aa = []
-        intra_dc_flows = 0
-        inter_dc_flows = 0
-        
-        for line in aa_raw:
-            parts = line.split()
-            if len(parts) >= 4:
-                slow, size, src, dst = float(parts[0]), int(parts[1]), int(parts[2]), int(parts[3])
-                if is_intra_dc_flow(src, dst, n_server_per_dc, n_switch_per_dc, n_dci_per_dc):
-                    aa.append(f"{slow} {size}")
-                    intra_dc_flows += 1
-                else:
-                    inter_dc_flows += 1
-        
-        # print flow stats
-        print(f"flow stats ({os.path.basename(filename)}):")
-        print(f"total flows: {total_flows_before_filter}")
-        print(f"intra-dc flows: {intra_dc_flows} ({intra_dc_flows/total_flows_before_filter*100:.2f}%)")
-        print(f"inter-dc flows: {inter_dc_flows} ({inter_dc_flows/total_flows_before_filter*100:.2f}%)")
-        
-        # sort by flow size
-        aa.sort(key=lambda x: int(x.split()[1]))
-    else:
-        aa = [' '.join(line.split()[:2]) for line in aa_raw if len(line.split()) >= 2]
-        aa.sort(key=lambda x: int(x.split()[1]))
-        print(f"flow stats ({os.path.basename(filename)}):")
-        print(f"total flows: {total_flows_before_filter}")
-    
-    nn = len(aa)
-    
-    if nn == 0:
-        print(f"warning: no data in the specified time range for {filename}")
-        return None
-
-    # CDF of FCT
-    res = [[i/100.] for i in range(0, 100, step)]
-    for i in range(0,100,step):
-        l = int(i * nn / 100)
-        r = int((i+step) * nn / 100)
-        fct_size = aa[l:r]
-        fct_size = [[float(x.split(" ")[0]), int(x.split(" ")[1])] for x in fct_size]
-        fct = sorted(map(lambda x: x[0], fct_size))
-        
-        if not fct:  # check if it is empty
-            res[int(i/step)].append(0)  # flow size
-            res[int(i/step)].append(0)  # average FCT
-            res[int(i/step)].append(0)  # median FCT
-            res[int(i/step)].append(0)  # 95%FCT
-            res[int(i/step)].append(0)  # 99%FCT
-            res[int(i/step)].append(0)  # 99.9%FCT
-            continue
-            
-        res[int(i/step)].append(fct_size[-1][1]) # flow size
-        
-        res[int(i/step)].append(sum(fct) / len(fct)) # average FCT
-        res[int(i/step)].append(get_pctl(fct, 0.5)) # median FCT
-        res[int(i/step)].append(get_pctl(fct, 0.95)) # 95%FCT
-        res[int(i/step)].append(get_pctl(fct, 0.99)) # 99%FCT
-        res[int(i/step)].append(get_pctl(fct, 0.999)) # 99.9%FCT
-    
-    result = {"avg": [], "p50": [], "p95": [], "p99": [], "size": [], "total_flows": total_flows_before_filter}
-    if filter_inter_dc:
-        result["intra_dc_flows"] = intra_dc_flows
-        result["inter_dc_flows"] = inter_dc_flows
-        
-    for item in res:
-        result["avg"].append(item[2])
-        result["p50"].append(item[3])
-        result["p95"].append(item[4])
-        result["p99"].append(item[5])
-        result["size"].append(item[1])
-
-    return result
-
 def main():
     parser = argparse.ArgumentParser(description='compare the FCT results of intra-dc flows and mixed flows (filter inter-dc flows)')
     parser.add_argument('-intra', dest='intra_id', action='store', required=True, help="intra-dc flow simulation ID")
@@ -203,21 +101,7 @@ def main():
     k_fat = args.k_fat
     num_dc = args.num_dc
 
-    n_core = int(k_fat / 2 * k_fat / 2)
-    n_pod = k_fat
-    n_agg_per_pod = int(k_fat / 2)
-    n_tor_per_pod = int(k_fat / 2)
-    n_server_per_tor = int(k_fat / 2 * 2)
-    n_server_per_pod = n_server_per_tor * n_tor_per_pod
-    n_server_per_dc = n_server_per_pod * n_pod
-
-    n_tor_per_dc = n_tor_per_pod * n_pod
-    n_agg_per_dc = n_agg_per_pod * n_pod
-    n_core_per_dc = n_core
-    n_switch_per_dc = n_tor_per_dc + n_agg_per_dc + n_core_per_dc
-    n_dci_per_dc = 1
-    
-    nodes_per_dc = n_server_per_dc + n_switch_per_dc + n_dci_per_dc
+    nodes_per_dc = nodes_per_dc_from_k(k_fat)
     
     file_dir = getFilePath()
     if args.output_dir:
@@ -232,22 +116,31 @@ def main():
     intra_fct_file = f"{output_dir}/{intra_id}/{intra_id}_out_fct.txt"
     mixed_fct_file = f"{output_dir}/{mixed_id}/{mixed_id}_out_fct.txt"
     
-    if not os.path.exists(intra_fct_file):
+    if find_log(intra_fct_file) is None:
         print(f"error: no intra-dc flow FCT file found: {intra_fct_file}")
         return
     
-    if not os.path.exists(mixed_fct_file):
+    if find_log(mixed_fct_file) is None:
         print(f"error: no mixed flow FCT file found: {mixed_fct_file}")
         return
     
-    intra_result = get_steps_from_raw(intra_fct_file, time_start, time_end, STEP)
+    intra_table = load_file(intra_fct_file, nodes_per_dc).select(time_start=time_start, time_end=time_end)
+    mixed_table = load_file(mixed_fct_file, nodes_per_dc).select(time_start=time_start, time_end=time_end)
+    mixed_intra_table = mixed_table.select(scope="intra")
     
-    mixed_result = get_steps_from_raw(mixed_fct_file, time_start, time_end, STEP, n_server_per_dc, n_switch_per_dc, n_dci_per_dc, True)
-    
-    if not intra_result or not mixed_result:
+    if len(intra_table) == 0 or len(mixed_intra_table) == 0:
         print("error: no valid data found in FCT files")
         return
     
+    intra_result = intra_table.size_steps(STEP)[intra_fct_file]
+    intra_result["total_flows"] = len(intra_table)
+    
+    mixed_result = mixed_intra_table.size_steps(STEP)[mixed_fct_file]
+    mixed_counts = mixed_table.counts()[mixed_fct_file]
+    mixed_result["total_flows"] = mixed_counts["total"]
+    mixed_result["intra_dc_flows"] = mixed_counts["intra"]
+    mixed_result["inter_dc_flows"] = mixed_counts["inter"]
+    
     # flow stats summary
     print("\nflow stats summary:")
     print(f"intra-dc flow file: {os.path.basename(intra_fct_file)}")
@@ -12,13 +12,14 @@ python3 drop_analysis_simple.py <drop_file_path> [options]
 import argparse
 import os
 import sys
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 from collections import Counter
-import gc
+from concurrent.futures import ProcessPoolExecutor
 import time
 
+from log_parser import find_log, split_byte_ranges, iter_byte_range
+
 def is_same_datacenter(src_id, dst_id, nodes_per_dc=53):
     """
     判断两个节点是否属于同一数据中心
@@ -56,140 +57,140 @@ def get_switch_type(node_id, nodes_per_dc=53):
     else:  # 服务器节点ID范围: 0-31
         return "Server"
 
-def parse_drop_file_simple(file_path, chunk_size=100000, sample_rate=1.0):
+# 每个进程任务负责的字节数；任务内部再按 log_parser 的小块解析
+DEFAULT_TASK_BYTES = 64 * 1024 * 1024
+
+LINK_TYPES = ("Intra-DC Link", "Inter-DC Link")
+
+# 热力图绘图时最多的时间片列数；更细的时间片按整数倍合并后再画（统计与 CSV 始终保持原始分辨率）
+HEATMAP_MAX_PLOT_BINS = 2000
+
+
+def _count_keys(keys):
+    """对 int64 组合键计数，返回 (唯一键, 计数)"""
+    if keys.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    uniq, counts = np.unique(keys, return_counts=True)
+    return uniq, counts.astype(np.int64)
+
+
+def _merge_counts(parts):
+    """合并多个 (唯一键, 计数) 部分聚合"""
+    parts = [p for p in parts if p[0].size]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    keys = np.concatenate([p[0] for p in parts])
+    counts = np.concatenate([p[1] for p in parts])
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    return uniq, np.bincount(inverse, weights=counts, minlength=uniq.size).astype(np.int64)
+
+
+def _aggregate_drop_range(file_path, start, end, sample_rate, nodes_per_dc, bin_ns, seed):
     """
-    简化版流式解析丢包文件
+    进程池任务：解析 [start, end) 字节区间并返回部分聚合结果
+
+    - detail: (node, type, link) 组合键计数，链路类型/丢包原因/交换机类型/节点分布都由它推导
+    - heatmap: (时间片, node) 组合键计数
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"丢包文件不存在: {file_path}")
-    
-    print(f"开始解析文件: {file_path}")
-    print(f"分块大小: {chunk_size}, 采样率: {sample_rate}")
-    
-    chunk_data = []
-    line_count = 0
-    processed_count = 0
-    
-    with open(file_path, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            # 采样处理
-            if sample_rate < 1.0 and np.random.random() > sample_rate:
-                continue
-            
-            parts = line.split()
-            if len(parts) != 8:
-                continue
-            
-            try:
-                time_ns = int(parts[0])
-                drop_type = int(parts[1])
-                node = int(parts[2])
-                interface = int(parts[3])
-                src_id = int(parts[4])
-                dst_id = int(parts[5])
-                sport = int(parts[6])
-                dport = int(parts[7])
-                
-                # 判断是否属于同一数据中心
-                same_dc = is_same_datacenter(src_id, dst_id)
-                link_type = "Intra-DC Link" if same_dc else "Inter-DC Link"
-                
-                # 获取丢包原因类型
-                drop_cause = get_drop_cause_type(drop_type)
-                
-                # 获取交换机类型
-                switch_type = get_switch_type(node)
-                
-                chunk_data.append({
-                    'time_ns': time_ns,
-                    'type': drop_type,
-                    'node': node,
-                    'interface': interface,
-                    'src_id': src_id,
-                    'dst_id': dst_id,
-                    'sport': sport,
-                    'dport': dport,
-                    'link_type': link_type,
-                    'drop_cause': drop_cause,
-                    'switch_type': switch_type
-                })
-                
-                processed_count += 1
-                
-                # 当达到分块大小时，返回数据并清空
-                if len(chunk_data) >= chunk_size:
-                    yield pd.DataFrame(chunk_data)
-                    chunk_data = []
-                    gc.collect()
-                    
-            except ValueError:
-                continue
-    
-    # 处理剩余数据
-    if chunk_data:
-        yield pd.DataFrame(chunk_data)
-    
-    print(f"处理完成，共处理 {processed_count} 条记录")
+    rng = np.random.default_rng(seed) if sample_rate < 1.0 else None
+    detail_parts = []
+    heat_parts = []
+    total = 0
+    skipped = 0
+    min_time = None
+    max_time = None
+
+    for cols, n_skipped in iter_byte_range(file_path, 'drop', start, end):
+        skipped += n_skipped
+        if rng is not None:
+            keep = rng.random(cols['time_ns'].size) < sample_rate
+            cols = {k: v[keep] for k, v in cols.items()}
+        n = cols['time_ns'].size
+        if n == 0:
+            continue
+        total += n
+        t = cols['time_ns']
+        min_time = t.min() if min_time is None else min(min_time, t.min())
+        max_time = t.max() if max_time is None else max(max_time, t.max())
+
+        node = cols['node'].astype(np.int64)
+        drop_type = cols['type'].astype(np.int64)
+        inter = (cols['src_id'] // nodes_per_dc != cols['dst_id'] // nodes_per_dc).astype(np.int64)
+        # key = node | (type + 128) | link，type 为 int8 故偏移 128 后落在 8 bit 内
+        detail_parts.append(_count_keys((node << 9) | ((drop_type + 128) << 1) | inter))
+        heat_parts.append(_count_keys(((t // bin_ns) << 32) | node))
+
+    return {
+        'total': total,
+        'skipped': skipped,
+        'min_time': min_time,
+        'max_time': max_time,
+        'detail': _merge_counts(detail_parts),
+        'heatmap': _merge_counts(heat_parts),
+    }
+
 
-def analyze_drop_statistics_simple(file_path, chunk_size=100000, sample_rate=1.0):
+def analyze_drop_statistics_simple(file_path, sample_rate=1.0, jobs=None,
+                                   task_bytes=DEFAULT_TASK_BYTES, nodes_per_dc=53, bin_ns=100000):
     """
-    简化版流式分析丢包统计信息
+    向量化 + 多进程分析丢包统计信息
+
+    文件按换行对齐切成若干字节区间，由进程池并行解析并返回部分聚合，最后在主进程合并。
     """
-    print("开始分析丢包统计...")
-    
-    # 初始化统计变量
-    total_drops = 0
-    min_time = float('inf')
-    max_time = 0
-    
-    # 按链路类型统计
+    if find_log(file_path) is None:
+        raise FileNotFoundError(f"丢包文件不存在: {file_path}")
+
+    ranges = split_byte_ranges(file_path, task_bytes)
+    jobs = jobs or os.cpu_count() or 1
+    print(f"开始分析丢包统计: {len(ranges)} 个区间, {jobs} 个进程, 采样率: {sample_rate}")
+
+    partials = []
+    if ranges:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(ranges))) as pool:
+            futures = [pool.submit(_aggregate_drop_range, file_path, s, e, sample_rate,
+                                   nodes_per_dc, bin_ns, i)
+                       for i, (s, e) in enumerate(ranges)]
+            for i, fut in enumerate(futures, 1):
+                partials.append(fut.result())
+                print(f"处理第 {i}/{len(futures)} 个区间，记录数: {partials[-1]['total']}")
+
+    total_drops = sum(p['total'] for p in partials)
+    skipped = sum(p['skipped'] for p in partials)
+    times = [p['min_time'] for p in partials if p['min_time'] is not None]
+    min_time = min(times) if times else 0
+    max_time = max(p['max_time'] for p in partials if p['max_time'] is not None) if times else 0
+    print(f"处理完成，共处理 {total_drops} 条记录，跳过 {skipped} 行")
+
+    # 由 (node, type, link) 计数推导各类分布
+    keys, counts = _merge_counts([p['detail'] for p in partials])
+    nodes = keys >> 9
+    types = ((keys >> 1) & 0xFF) - 128
+    links = keys & 1
+
     link_type_counts = Counter()
     drop_cause_counts = Counter()
     switch_type_counts = Counter()
-    type_by_link = {"Intra-DC Link": Counter(), "Inter-DC Link": Counter()}
-    drop_cause_by_link = {"Intra-DC Link": Counter(), "Inter-DC Link": Counter()}
-    switch_type_by_link = {"Intra-DC Link": Counter(), "Inter-DC Link": Counter()}
-    node_by_link = {"Intra-DC Link": Counter(), "Inter-DC Link": Counter()}
-    
-    chunk_num = 0
-    for chunk_df in parse_drop_file_simple(file_path, chunk_size, sample_rate):
-        chunk_num += 1
-        print(f"处理第 {chunk_num} 个数据块，大小: {len(chunk_df)}")
-        
-        if chunk_df.empty:
-            continue
-        
-        # 更新基本统计
-        total_drops += len(chunk_df)
-        min_time = min(min_time, chunk_df['time_ns'].min())
-        max_time = max(max_time, chunk_df['time_ns'].max())
-        
-        # 按链路类型统计
-        link_type_counts.update(chunk_df['link_type'].value_counts().to_dict())
-        drop_cause_counts.update(chunk_df['drop_cause'].value_counts().to_dict())
-        switch_type_counts.update(chunk_df['switch_type'].value_counts().to_dict())
-        
-        # 按链路类型和丢包类型统计
-        for _, row in chunk_df.iterrows():
-            link_type = row['link_type']
-            drop_type = row['type']
-            drop_cause = row['drop_cause']
-            switch_type = row['switch_type']
-            node = row['node']
-            
-            type_by_link[link_type][drop_type] += 1
-            drop_cause_by_link[link_type][drop_cause] += 1
-            switch_type_by_link[link_type][switch_type] += 1
-            node_by_link[link_type][node] += 1
-        
-        # 释放内存
-        del chunk_df
-        gc.collect()
-    
+    type_by_link = {lt: Counter() for lt in LINK_TYPES}
+    drop_cause_by_link = {lt: Counter() for lt in LINK_TYPES}
+    switch_type_by_link = {lt: Counter() for lt in LINK_TYPES}
+    node_by_link = {lt: Counter() for lt in LINK_TYPES}
+    for node, drop_type, link, count in zip(nodes.tolist(), types.tolist(), links.tolist(), counts.tolist()):
+        link_type = LINK_TYPES[link]
+        drop_cause = get_drop_cause_type(drop_type)
+        switch_type = get_switch_type(node, nodes_per_dc)
+        link_type_counts[link_type] += count
+        drop_cause_counts[drop_cause] += count
+        switch_type_counts[switch_type] += count
+        type_by_link[link_type][drop_type] += count
+        drop_cause_by_link[link_type][drop_cause] += count
+        switch_type_by_link[link_type][switch_type] += count
+        node_by_link[link_type][node] += count
+
+    # 节点 × 时间片 丢包率热力图（drops/sec），只保存有丢包的 (时间片, node) 三元组；
+    # 时间片很细、运行很长时稠密矩阵会达到 GB 级，只在绘图时按 HEATMAP_MAX_PLOT_BINS 合并后展开。
+    # 采样时每条记录代表 1/sample_rate 次丢包，丢包率按采样率还原
+    heat_keys, heat_counts = _merge_counts([p['heatmap'] for p in partials])
+
     # 计算最终统计
     stats = {
         'total_drops': total_drops,
@@ -201,11 +202,46 @@ def analyze_drop_statistics_simple(file_path, chunk_size=100000, sample_rate=1.0
         'type_by_link': {k: dict(v) for k, v in type_by_link.items()},
         'drop_cause_by_link': {k: dict(v) for k, v in drop_cause_by_link.items()},
         'switch_type_by_link': {k: dict(v) for k, v in switch_type_by_link.items()},
-        'node_by_link': {k: dict(v) for k, v in node_by_link.items()}
+        'node_by_link': {k: dict(v) for k, v in node_by_link.items()},
+        'drop_rate_heatmap': {
+            'bin_ns': bin_ns,
+            'bin_start_ns': (heat_keys >> 32) * bin_ns,
+            'nodes': heat_keys & 0xFFFFFFFF,
+            'drops_per_sec': heat_counts / sample_rate / (bin_ns / 1e9),
+        },
     }
-    
+
     return stats
 
+def heatmap_matrix(heatmap, max_bins=HEATMAP_MAX_PLOT_BINS):
+    """
+    将稀疏热力图展开为 (nodes, bin_start_ns, bin_ns, 矩阵)，供绘图使用
+
+    时间片数超过 max_bins 时，相邻时间片按整数倍合并（丢包率取合并区间内的平均值），
+    矩阵大小因此不超过 有丢包的节点数 × max_bins。
+    """
+    bins = heatmap['bin_start_ns'] // heatmap['bin_ns']
+    node_ids, node_idx = np.unique(heatmap['nodes'], return_inverse=True)
+    first_bin = int(bins.min())
+    factor = max(1, -(-(int(bins.max()) - first_bin + 1) // max_bins))
+    col = (bins - first_bin) // factor
+    n_cols = int(col.max()) + 1
+    matrix = np.zeros((node_ids.size, n_cols), dtype=np.float64)
+    np.add.at(matrix, (node_idx, col), heatmap['drops_per_sec'] / factor)
+    bin_ns = heatmap['bin_ns'] * factor
+    return node_ids, first_bin * heatmap['bin_ns'] + np.arange(n_cols) * bin_ns, bin_ns, matrix
+
+def save_drop_rate_heatmap(stats, output_dir):
+    """保存丢包率热力图（CSV，每个有丢包的 (时间片起点 ns, node) 一行）"""
+    heatmap = stats['drop_rate_heatmap']
+    csv_path = os.path.join(output_dir, 'drop_rate_heatmap.csv')
+    with open(csv_path, 'w') as f:
+        f.write("bin_start_ns,node,drops_per_sec\n")
+        for t, node, v in zip(heatmap['bin_start_ns'].tolist(), heatmap['nodes'].tolist(),
+                              heatmap['drops_per_sec'].tolist()):
+            f.write(f"{t},{node},{v:.0f}\n")
+    print(f"Drop rate heatmap saved to: {csv_path}")
+
 def create_simple_visualizations(stats, output_dir):
     """创建可视化图表"""
     print("生成可视化图表...")
@@ -303,6 +339,25 @@ def create_simple_visualizations(stats, output_dir):
             plt.savefig(os.path.join(output_dir, 'switch_comparison.png'), dpi=300, bbox_inches='tight')
             plt.close()
 
+    # 6. 节点 × 时间片 丢包率热力图
+    heatmap = stats['drop_rate_heatmap']
+    if heatmap['drops_per_sec'].size:
+        nodes, bin_start_ns, bin_ns, matrix = heatmap_matrix(heatmap)
+        bin_ms = bin_start_ns / 1e6
+        width_ms = bin_ns / 1e6
+        plt.figure(figsize=(15, max(4, 0.15 * nodes.size)))
+        plt.imshow(matrix, aspect='auto', interpolation='nearest', cmap='hot_r',
+                   extent=[bin_ms[0], bin_ms[-1] + width_ms, nodes.size, 0])
+        plt.colorbar(label='Drops/sec')
+        step = max(1, nodes.size // 40)
+        plt.yticks(np.arange(0, nodes.size, step) + 0.5, nodes[::step])
+        plt.xlabel('Time (ms)')
+        plt.ylabel('Node')
+        plt.title(f'Drop Rate Heatmap (bin = {bin_ns / 1e3:g} us)')
+        plt.tight_layout()
+        plt.savefig(os.path.join(output_dir, 'drop_rate_heatmap.png'), dpi=300, bbox_inches='tight')
+        plt.close()
+
 def generate_simple_report(stats, output_dir):
     """生成分析报告"""
     report_path = os.path.join(output_dir, 'drop_analysis_report.txt')
@@ -384,6 +439,18 @@ def generate_simple_report(stats, output_dir):
                     f.write(f"  Node {node}: {count:,} ({percentage:.1f}%)\n")
                 
                 f.write("\n")
+
+        # 丢包率热力图中峰值最高的时间片
+        heatmap = stats['drop_rate_heatmap']
+        if heatmap['drops_per_sec'].size:
+            f.write(f"Top 5 Drop Rate Hotspots (bin = {heatmap['bin_ns'] / 1e3:g} us):\n")
+            f.write("-" * 30 + "\n")
+            rate = heatmap['drops_per_sec']
+            for idx in np.argsort(rate, kind='stable')[::-1][:5]:
+                node = heatmap['nodes'][idx]
+                t_ms = heatmap['bin_start_ns'][idx] / 1e6
+                f.write(f"  Node {node} @ {t_ms:.3f} ms: {rate[idx]:,.0f} drops/sec\n")
+            f.write("\n")
     
     print(f"Analysis report saved to: {report_path}")
 
@@ -392,8 +459,14 @@ def main():
     parser.add_argument('drop_file', help='丢包文件路径')
     parser.add_argument('-o', '--output', default='drop_analysis_output', 
                        help='输出目录 (默认: drop_analysis_output)')
-    parser.add_argument('-c', '--chunk-size', type=int, default=1000000,
-                       help='分块大小 (默认: 1000000)')
+    parser.add_argument('-c', '--chunk-mb', type=int, default=DEFAULT_TASK_BYTES // (1024 * 1024),
+                       help='每个进程任务的字节区间大小 MB (默认: 64)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                       help='并行进程数 (默认: CPU 核数)')
+    parser.add_argument('--bin-us', type=float, default=100.0,
+                       help='丢包率热力图时间片宽度 us (默认: 100)')
+    parser.add_argument('--nodes-per-dc', type=int, default=53,
+                       help='每个数据中心的节点数 (默认: 53，即 k=4 胖树)')
     parser.add_argument('-s', '--sample-rate', type=float, default=1.0,
                        help='采样率 0.0-1.0 (默认: 1.0，即不采样)')
     parser.add_argument('--no-plots', action='store_true',
@@ -402,7 +475,7 @@ def main():
     args = parser.parse_args()
     
     # 检查输入文件
-    if not os.path.exists(args.drop_file):
+    if find_log(args.drop_file) is None:
         print(f"错误: 文件不存在 {args.drop_file}")
         return 1
     
@@ -422,12 +495,16 @@ def main():
     try:
         stats = analyze_drop_statistics_simple(
             args.drop_file, 
-            chunk_size=args.chunk_size,
-            sample_rate=args.sample_rate
+            sample_rate=args.sample_rate,
+            jobs=args.jobs,
+            task_bytes=args.chunk_mb * 1024 * 1024,
+            nodes_per_dc=args.nodes_per_dc,
+            bin_ns=max(1, int(args.bin_us * 1000))
         )
         
         # 生成报告
         generate_simple_report(stats, args.output)
+        save_drop_rate_heatmap(stats, args.output)
         
         # 生成图表
         if not args.no_plots:
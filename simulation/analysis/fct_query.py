@@ -0,0 +1,333 @@
+#!/usr/bin/python3
+"""
+FCT query engine over the columnar run cache.
+
+Loads the _out_fct.txt of any number of runs through run_cache.py into one
+table (a run index column plus the fct schema columns), derives slowdown and
+the source/destination DC of every flow from a per-run topology index, and
+answers the questions the plot/compare scripts ask with vectorized group-bys:
+
+  size_steps    slowdown per 5% flow-size step (the old get_steps_from_raw)
+  size_buckets  slowdown percentiles per fixed flow-size range
+  cdf           slowdown quantiles per run
+  counts        total / intra-DC / inter-DC flow counts per run
+
+Filters (time window, intra/inter-DC, size range, src/dst DC) return a new
+table, so queries compose:
+
+    table = load_runs(["123", "456"])
+    steps = table.select(time_start=2005000000, time_end=2100000000, scope="intra").size_steps()
+
+Usage:
+    python3 fct_query.py 123 456 --scope inter --size-max 100000
+    python3 fct_query.py 123 456 --buckets 0 10000 100000 1000000 --pct 50 99
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, _CUR_DIR)
+from log_parser import find_log
+from run_cache import load_columns
+
+STEP = 5
+PERCENTILES = [50, 95, 99]
+# fat-tree k=4 DC: 32 servers + 20 switches + DCI (see compare_fct_intra_only.py)
+DEFAULT_NODES_PER_DC = 53
+SCOPES = ("all", "intra", "inter")
+
+
+def nodes_per_dc_from_k(k_fat, n_dci_per_dc=1):
+    """Nodes per DC of the k-ary fat-tree DC: servers (k per ToR) + ToR/Agg/Core switches + DCI"""
+    n_server = k_fat * k_fat * k_fat // 2
+    n_switch = k_fat * k_fat + k_fat * k_fat // 4
+    return n_server + n_switch + n_dci_per_dc
+
+
+def run_nodes_per_dc(config_id, output_dir, default=DEFAULT_NODES_PER_DC):
+    """
+    Nodes per DC of a run. Node ids are laid out DC by DC with the DCI switch
+    last, so the first DCI id in config.txt (DCI_SWITCH_IDS <n> <id>...) + 1
+    is the DC size
+    """
+    config_file = "{}/{}/config.txt".format(output_dir, config_id)
+    if os.path.exists(config_file):
+        with open(config_file, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[0] == "DCI_SWITCH_IDS" and int(parts[1]) > 0:
+                    return int(parts[2]) + 1
+    return default
+
+
+def _sort_within(keys, values):
+    """
+    Order sorting rows by the non-negative integer keys, ties by values: one
+    float argsort plus a stable integer argsort, which NumPy radix-sorts when
+    the keys fit in 16 bits. Several times faster than np.lexsort on 10M rows
+    """
+    perm = np.argsort(values)
+    keys = keys[perm]
+    if keys.size and keys.max() < 1 << 16:
+        keys = keys.astype(np.uint16)
+    return perm[np.argsort(keys, kind="stable")]
+
+
+def _pctl_at(values, starts, counts, p):
+    """values[start + int(n * p)] per group (get_pctl on each sorted group), 0 for empty groups"""
+    idx = starts + (counts * (p / 100.0)).astype(np.int64)
+    out = np.zeros(counts.size)
+    nz = counts > 0
+    out[nz] = values[np.minimum(idx[nz], starts[nz] + counts[nz] - 1)]
+    return out
+
+
+class FctTable:
+    """Completed flows of one or more runs, one row per flow"""
+
+    def __init__(self, run_ids, cols):
+        self.run_ids = list(run_ids)
+        self.cols = cols
+
+    def __len__(self):
+        return int(self.cols["run"].size)
+
+    def __getitem__(self, name):
+        return self.cols[name]
+
+    def select(self, time_start=None, time_end=None, scope="all", size_min=None, size_max=None,
+               src_dc=None, dst_dc=None):
+        """
+        Rows matching every given filter. The time window keeps flows started
+        after time_start and completed before time_end (both exclusive, like the
+        awk filter of the plot scripts); size_min/size_max are inclusive
+        """
+        c = self.cols
+        mask = np.ones(len(self), dtype=bool)
+        if time_start is not None:
+            mask &= c["start_ns"] > time_start
+        if time_end is not None:
+            mask &= c["start_ns"] + c["fct_ns"] < time_end
+        if scope == "intra":
+            mask &= c["src_dc"] == c["dst_dc"]
+        elif scope == "inter":
+            mask &= c["src_dc"] != c["dst_dc"]
+        elif scope not in (None, "all"):
+            raise ValueError("unknown scope: {}".format(scope))
+        if size_min is not None:
+            mask &= c["size"] >= size_min
+        if size_max is not None:
+            mask &= c["size"] <= size_max
+        if src_dc is not None:
+            mask &= np.isin(c["src_dc"], np.atleast_1d(src_dc))
+        if dst_dc is not None:
+            mask &= np.isin(c["dst_dc"], np.atleast_1d(dst_dc))
+        return FctTable(self.run_ids, {k: v[mask] for k, v in self.cols.items()})
+
+    def _per_run(self, values):
+        return {rid: values[i] for i, rid in enumerate(self.run_ids)}
+
+    def counts(self):
+        """{run_id: {"total", "intra", "inter"}}"""
+        n = len(self.run_ids)
+        run = self.cols["run"]
+        total = np.bincount(run, minlength=n)
+        intra = np.bincount(run[self.cols["src_dc"] == self.cols["dst_dc"]], minlength=n)
+        return self._per_run([{"total": int(t), "intra": int(i), "inter": int(t - i)}
+                              for t, i in zip(total, intra)])
+
+    def size_steps(self, step=STEP, percentiles=PERCENTILES, drop_largest=False):
+        """
+        {run_id: {"size", "avg", "p50", ...}}: flows of each run sorted by size
+        and split into 100/step equal-count groups, as get_steps_from_raw did.
+        "size" is the largest flow size of the group; empty groups are all 0.
+        drop_largest leaves out the largest flow of each run, like the
+        split('\\n')[:-2] of the plot_fct / compare_fct / plot_single_fct copies
+        """
+        run, size, slow = self.cols["run"], self.cols["size"], self.cols["slowdown"]
+        n_runs = len(self.run_ids)
+        perm = np.argsort(slow)
+        order = perm[np.argsort((run * (int(size.max(initial=0)) + 1) + size)[perm], kind="stable")]
+        size, slow = size[order], slow[order]
+        # slowdown rank of every sorted row, to re-sort inside the step groups with one integer key
+        rank = np.empty(perm.size, dtype=np.int64)
+        rank[perm] = np.arange(perm.size)
+        rank = rank[order]
+        rank_width = max(rank.size, 1)
+
+        nn = np.bincount(run, minlength=n_runs)
+        if drop_largest:
+            keep = np.ones(size.size, dtype=bool)
+            keep[(np.cumsum(nn) - 1)[nn > 0]] = False
+            size, slow, rank = size[keep], slow[keep], rank[keep]
+            nn = np.maximum(nn - 1, 0)
+        run_start = np.cumsum(nn) - nn
+        steps = np.arange(0, 100, step)
+        # group [l, r) of run j / step i: l = int(i * nn / 100), r = int((i + step) * nn / 100)
+        lo = run_start[:, None] + steps[None, :] * nn[:, None] // 100
+        hi = run_start[:, None] + np.minimum((steps[None, :] + step) * nn[:, None] // 100, nn[:, None])
+        lo, hi = lo.ravel(), hi.ravel()
+        n = hi - lo
+
+        group = np.searchsorted(lo, np.arange(size.size), side="right") - 1
+        slow = slow[np.argsort(group * rank_width + rank)]
+
+        avg = np.zeros(n.size)
+        nz = n > 0
+        avg[nz] = np.bincount(group, weights=slow, minlength=n.size)[nz] / n[nz]
+        max_size = np.zeros(n.size, dtype=np.int64)
+        max_size[nz] = size[hi[nz] - 1]
+
+        shape = (n_runs, steps.size)
+        table = {"size": max_size.reshape(shape), "avg": avg.reshape(shape)}
+        for p in percentiles:
+            table["p{:g}".format(p)] = _pctl_at(slow, lo, n, p).reshape(shape)
+        return self._per_run([{k: v[i].tolist() for k, v in table.items()} for i in range(n_runs)])
+
+    def size_buckets(self, edges, percentiles=PERCENTILES):
+        """
+        {run_id: {"edges", "count", "avg", "p50", ...}} per flow-size range
+        [edges[i], edges[i+1]); sizes beyond the last edge go to the last range
+        """
+        edges = np.asarray(edges)
+        n_bins = edges.size - 1
+        n_runs = len(self.run_ids)
+        b = np.clip(np.searchsorted(edges, self.cols["size"], side="right") - 1, 0, n_bins - 1)
+        group = self.cols["run"] * n_bins + b
+        slow = self.cols["slowdown"][_sort_within(group, self.cols["slowdown"])]
+        n = np.bincount(group, minlength=n_runs * n_bins)
+        starts = np.cumsum(n) - n
+
+        avg = np.zeros(n.size)
+        nz = n > 0
+        avg[nz] = np.bincount(group, weights=self.cols["slowdown"], minlength=n.size)[nz] / n[nz]
+        shape = (n_runs, n_bins)
+        table = {"count": n.reshape(shape), "avg": avg.reshape(shape)}
+        for p in percentiles:
+            table["p{:g}".format(p)] = _pctl_at(slow, starts, n, p).reshape(shape)
+        return self._per_run([dict({k: v[i].tolist() for k, v in table.items()}, edges=edges.tolist())
+                              for i in range(n_runs)])
+
+    def cdf(self, points=100):
+        """{run_id: (slowdown[], p[])}: slowdown at p = 0, 1/points, ..., 1 of each run"""
+        n_runs = len(self.run_ids)
+        slow = self.cols["slowdown"][_sort_within(self.cols["run"], self.cols["slowdown"])]
+        n = np.bincount(self.cols["run"], minlength=n_runs)
+        starts = np.cumsum(n) - n
+        p = np.linspace(0.0, 1.0, points + 1)
+        idx = starts[:, None] + np.floor(p[None, :] * np.maximum(n[:, None] - 1, 0)).astype(np.int64)
+        res = {}
+        for i, rid in enumerate(self.run_ids):
+            res[rid] = (slow[idx[i]].tolist(), p.tolist()) if n[i] else ([], [])
+        return res
+
+
+def load_runs(config_ids, output_dir=None, nodes_per_dc=None):
+    """
+    FctTable of the given runs (missing FCT files are skipped with a warning).
+    nodes_per_dc overrides the per-run topology index from config.txt
+    """
+    output_dir = output_dir or _CUR_DIR + "/../mix/output"
+    run_ids, parts = [], []
+    for config_id in config_ids:
+        fct_file = "{0}/{1}/{1}_out_fct.txt".format(output_dir, config_id)
+        if find_log(fct_file) is None:
+            print("warning: no FCT file for {}: {}".format(config_id, fct_file))
+            continue
+        cols = load_columns(fct_file, "fct")
+        npd = nodes_per_dc or run_nodes_per_dc(config_id, output_dir)
+        part = dict(cols)
+        part["run"] = np.full(cols["size"].size, len(run_ids), dtype=np.int64)
+        part["src_dc"] = cols["src_id"] // npd
+        part["dst_dc"] = cols["dst_id"] // npd
+        run_ids.append(str(config_id))
+        parts.append(part)
+    if not parts:
+        return FctTable([], {k: np.empty(0, dtype=np.int64) for k in
+                             ("run", "src_id", "dst_id", "sport", "dport", "size", "start_ns", "fct_ns",
+                              "standalone_fct_ns", "src_dc", "dst_dc", "slowdown")})
+    cols = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    cols["slowdown"] = np.maximum(cols["fct_ns"] / np.maximum(cols["standalone_fct_ns"], 1), 1.0)
+    return FctTable(run_ids, cols)
+
+
+def load_file(fct_file, nodes_per_dc=DEFAULT_NODES_PER_DC):
+    """FctTable of a single _out_fct.txt outside the mix/output layout"""
+    cols = dict(load_columns(fct_file, "fct"))
+    cols["run"] = np.zeros(cols["size"].size, dtype=np.int64)
+    cols["src_dc"] = cols["src_id"] // nodes_per_dc
+    cols["dst_dc"] = cols["dst_id"] // nodes_per_dc
+    cols["slowdown"] = np.maximum(cols["fct_ns"] / np.maximum(cols["standalone_fct_ns"], 1), 1.0)
+    return FctTable([fct_file], cols)
+
+
+def fct_steps(fct_file, time_start, time_end, step=STEP, scope="all", nodes_per_dc=DEFAULT_NODES_PER_DC,
+              drop_largest=True):
+    """
+    Drop-in replacement of get_steps_from_raw: {"size", "avg", "p50", "p95",
+    "p99"} per flow-size step, or None when no flow falls in the time window.
+    Like that function, leaves out the largest flow unless drop_largest is False
+    """
+    table = load_file(fct_file, nodes_per_dc).select(time_start=time_start, time_end=time_end, scope=scope)
+    if len(table) == 0:
+        print("warning: file {} has no data in the time range".format(fct_file))
+        return None
+    return table.size_steps(step, drop_largest=drop_largest)[fct_file]
+
+
+def _print_table(title, run_ids, results, label_key, labels, keys):
+    print("\n=== {} ===".format(title))
+    for rid in run_ids:
+        r = results[rid]
+        print("run {}".format(rid))
+        print("  {:>12} ".format(label_key) + " ".join("{:>9}".format(k) for k in keys))
+        for i, label in enumerate(labels(r)):
+            print("  {:>12} ".format(label) + " ".join(
+                "{:>9}".format(r[k][i]) if isinstance(r[k][i], int) else "{:>9.3f}".format(r[k][i]) for k in keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query FCT slowdown of many runs at once')
+    parser.add_argument('ids', nargs='+', help="simulation IDs")
+    parser.add_argument('-sT', dest='time_limit_begin', action='store', type=int, default=2005000000, help="only consider flows started after T, default=2005000000 ns")
+    parser.add_argument('-fT', dest='time_limit_end', action='store', type=int, default=10000000000, help="only consider flows completed before T, default=10000000000 ns")
+    parser.add_argument('--scope', choices=SCOPES, default="all", help="intra-DC / inter-DC / all flows, default=all")
+    parser.add_argument('--size-min', type=int, default=None, help="minimum flow size (bytes)")
+    parser.add_argument('--size-max', type=int, default=None, help="maximum flow size (bytes)")
+    parser.add_argument('--src-dc', type=int, nargs='+', default=None, help="source DC index")
+    parser.add_argument('--dst-dc', type=int, nargs='+', default=None, help="destination DC index")
+    parser.add_argument('--nodes-per-dc', type=int, default=None, help="override the per-run topology index")
+    parser.add_argument('--step', type=int, default=STEP, help="flow-size step in percent, default=5")
+    parser.add_argument('--buckets', type=int, nargs='+', default=None, help="fixed flow-size bucket edges instead of steps")
+    parser.add_argument('--pct', type=float, nargs='+', default=PERCENTILES, help="percentiles, default=50 95 99")
+    args = parser.parse_args()
+
+    table = load_runs(args.ids, nodes_per_dc=args.nodes_per_dc).select(
+        time_start=args.time_limit_begin, time_end=args.time_limit_end, scope=args.scope,
+        size_min=args.size_min, size_max=args.size_max, src_dc=args.src_dc, dst_dc=args.dst_dc)
+    if not table.run_ids:
+        print("No runs found")
+        return 1
+
+    counts = table.counts()
+    for rid in table.run_ids:
+        c = counts[rid]
+        print("run {}: {} flows (intra-DC {}, inter-DC {})".format(rid, c["total"], c["intra"], c["inter"]))
+    keys = ["avg"] + ["p{:g}".format(p) for p in args.pct]
+    if args.buckets:
+        results = table.size_buckets(args.buckets, args.pct)
+        _print_table("slowdown per flow-size bucket", table.run_ids, results, "size <",
+                     lambda r: r["edges"][1:], ["count"] + keys)
+    else:
+        results = table.size_steps(args.step, args.pct)
+        _print_table("slowdown per {}% flow-size step".format(args.step), table.run_ids, results, "size <=",
+                     lambda r: r["size"], keys)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+"""
+FCT regression detector between two run sets.
+
+Compares a baseline set of runs against a candidate set (each possibly several
+seeds of the same configuration) per flow-size bucket. For every bucket and
+metric (mean / pXX slowdown) the relative difference candidate/baseline - 1
+gets a bootstrap confidence interval:
+
+  - flows are resampled with replacement within each run, so every seed keeps
+    its flow count and per-seed differences are not averaged away
+  - resampling is vectorized (a batch of bootstrap replicates is one
+    index matrix, shared by all metrics) and chunks of replicates of every
+    bucket are processed in parallel worker processes
+  - the confidence level is Bonferroni-adjusted over all bucket x metric tests
+    unless --no-bonferroni is given
+
+A bucket/metric is flagged as a regression when the whole interval lies above
+zero and the point estimate exceeds --min-effect; the script then exits with
+status 3 so it can gate simulator changes.
+
+Usage:
+    python3 fct_regression.py --base 101 102 103 --cand 201 202 203
+    python3 fct_regression.py --base 101 --cand 201 --scope inter --metrics mean p99 p999 -o report.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, _CUR_DIR)
+from fct_query import SCOPES, load_runs
+
+DEFAULT_BUCKETS = [0, 10000, 100000, 1000000]
+DEFAULT_METRICS = ["mean", "p99"]
+# exit status when a regression is flagged
+EXIT_REGRESSION = 3
+# bootstrap replicates x flows materialized at once
+MAX_BATCH_ELEMENTS = 20000000
+# bootstrap replicates per worker task
+BOOT_CHUNK = 250
+
+
+def metric_value(values, metric, axis=-1):
+    """mean, or pXX / pXXX (p999 = 99.9th) with the get_pctl index convention values[int(n * p)]"""
+    if metric == "mean":
+        return values.mean(axis=axis)
+    p = float(metric[1:]) / (10 ** (len(metric) - 3) if len(metric) > 3 else 1)
+    n = values.shape[axis]
+    k = min(int(n * p / 100.0), n - 1)
+    return np.take(np.partition(values, k, axis=axis), k, axis=axis)
+
+
+def bootstrap_metrics(values, counts, metrics, n_boot, rng):
+    """
+    {metric: n_boot replicates}; values are grouped by run (counts flows per
+    run) and resampled within each run. All metrics share the same resamples
+    """
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    sizes = np.repeat(counts, counts)
+    # float32 uniforms are exact enough to index runs of up to 2^24 flows
+    dtype = np.float32 if counts.max() < 1 << 24 else np.float64
+    batch = max(MAX_BATCH_ELEMENTS // max(values.size, 1), 1)
+    out = {m: np.empty(n_boot) for m in metrics}
+    for b0 in range(0, n_boot, batch):
+        nb = min(batch, n_boot - b0)
+        idx = starts + (rng.random((nb, values.size), dtype=dtype) * sizes).astype(np.int64)
+        sample = values[idx]
+        for m in metrics:
+            out[m][b0:b0 + nb] = metric_value(sample, m, axis=1)
+    return out
+
+
+def bucket_samples(table, edges):
+    """[(slowdown grouped by run, flows per run)] per size bucket [edges[i], edges[i+1])"""
+    n_bins = len(edges) - 1
+    b = np.clip(np.searchsorted(edges, table["size"], side="right") - 1, 0, n_bins - 1)
+    order = np.lexsort((table["run"], b))
+    slow, b, run = table["slowdown"][order], b[order], table["run"][order]
+    bounds = np.searchsorted(b, np.arange(n_bins + 1))
+    res = []
+    for i in range(n_bins):
+        r = run[bounds[i]:bounds[i + 1]]
+        counts = np.bincount(r, minlength=len(table.run_ids))
+        res.append((slow[bounds[i]:bounds[i + 1]], counts[counts > 0]))
+    return res
+
+
+def _bootstrap_job(job):
+    """One chunk of bootstrap replicates of one bucket, for both run sets"""
+    bucket, chunk, base, cand, metrics, n_boot, seed = job
+    rng = np.random.default_rng([seed, bucket, chunk])
+    return bucket, bootstrap_metrics(*base, metrics, n_boot, rng), bootstrap_metrics(*cand, metrics, n_boot, rng)
+
+
+def classify(r, min_effect):
+    lo, hi = r["ci"]
+    if lo > 0 and r["rel"] >= min_effect:
+        return "regression"
+    if hi < 0 and r["rel"] <= -min_effect:
+        return "improvement"
+    return ""
+
+
+def compare_sets(base_table, cand_table, edges, metrics, n_boot=1000, alpha=0.05, bonferroni=True,
+                 min_flows=100, min_effect=0.05, seed=0, jobs=None):
+    """Per-bucket comparison rows (one per bucket) and the confidence level used"""
+    base_b = bucket_samples(base_table, edges)
+    cand_b = bucket_samples(cand_table, edges)
+    tested = [i for i in range(len(edges) - 1) if base_b[i][0].size >= min_flows and cand_b[i][0].size >= min_flows]
+    n_tests = max(len(tested) * len(metrics), 1)
+    conf = 1 - (alpha / n_tests if bonferroni else alpha)
+
+    # buckets are split into chunks of replicates so a few large buckets still spread over all workers
+    job_list = [(i, c, base_b[i], cand_b[i], metrics, min(BOOT_CHUNK, n_boot - c * BOOT_CHUNK), seed)
+                for i in tested for c in range((n_boot + BOOT_CHUNK - 1) // BOOT_CHUNK)]
+    boots = {i: ([], []) for i in tested}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for i, b_boot, c_boot in pool.map(_bootstrap_job, job_list):
+            boots[i][0].append(b_boot)
+            boots[i][1].append(c_boot)
+
+    lo_q, hi_q = (1 - conf) / 2 * 100, (1 + conf) / 2 * 100
+    results = {}
+    for i in tested:
+        results[i] = {}
+        for m in metrics:
+            b_val = float(metric_value(base_b[i][0], m))
+            c_val = float(metric_value(cand_b[i][0], m))
+            rel = np.concatenate([c[m] for c in boots[i][1]]) / np.concatenate([b[m] for b in boots[i][0]]) - 1
+            lo, hi = np.percentile(rel, [lo_q, hi_q])
+            results[i][m] = {"base": b_val, "cand": c_val, "rel": c_val / b_val - 1, "ci": [float(lo), float(hi)]}
+
+    rows = []
+    for i in range(len(edges) - 1):
+        row = {"size_lo": int(edges[i]), "size_hi": int(edges[i + 1]) if i + 2 < len(edges) else None,
+               "n_base": int(base_b[i][0].size), "n_cand": int(cand_b[i][0].size), "metrics": results.get(i)}
+        if row["metrics"]:
+            for r in row["metrics"].values():
+                r["flag"] = classify(r, min_effect)
+        rows.append(row)
+    return rows, conf
+
+
+def _size_label(v):
+    if v is None:
+        return "inf"
+    if v >= 1000000:
+        return "{:g}M".format(v / 1000000)
+    if v >= 1000:
+        return "{:g}K".format(v / 1000)
+    return str(v)
+
+
+def print_report(rows, metrics, conf):
+    print("\nbootstrap CI level {:.4f}; delta = cand / base - 1".format(conf))
+    header = "{:<14} {:>8} {:>8}".format("size", "n_base", "n_cand")
+    for m in metrics:
+        header += " | {:>21} {:>24}".format(m + " base->cand", "delta [CI]")
+    print(header)
+    for row in rows:
+        line = "{:<14} {:>8} {:>8}".format("[{}, {})".format(_size_label(row["size_lo"]), _size_label(row["size_hi"])),
+                                           row["n_base"], row["n_cand"])
+        for m in metrics:
+            r = (row["metrics"] or {}).get(m)
+            if r is None:
+                line += " | {:>21} {:>24}".format("too few flows", "")
+                continue
+            line += " | {:>9.3f} -> {:<8.3f} {:>+6.1f}% [{:+.1f}, {:+.1f}] {}".format(
+                r["base"], r["cand"], r["rel"] * 100, r["ci"][0] * 100, r["ci"][1] * 100,
+                {"regression": "REGRESSION", "improvement": "improved"}.get(r["flag"], ""))
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flag statistically significant FCT slowdown regressions between two run sets')
+    parser.add_argument('--base', nargs='+', required=True, help="baseline simulation IDs (seeds are pooled per run)")
+    parser.add_argument('--cand', nargs='+', required=True, help="candidate simulation IDs")
+    parser.add_argument('-sT', dest='time_limit_begin', action='store', type=int, default=2005000000, help="only consider flows started after T, default=2005000000 ns")
+    parser.add_argument('-fT', dest='time_limit_end', action='store', type=int, default=10000000000, help="only consider flows completed before T, default=10000000000 ns")
+    parser.add_argument('--scope', choices=SCOPES, default="all", help="intra-DC / inter-DC / all flows, default=all")
+    parser.add_argument('--buckets', type=int, nargs='+', default=DEFAULT_BUCKETS, help="flow-size bucket edges, the last bucket is open-ended, default=0 10000 100000 1000000")
+    parser.add_argument('--metrics', nargs='+', default=DEFAULT_METRICS, help="mean and/or percentiles like p50 p99 p999, default=mean p99")
+    parser.add_argument('-B', '--n-boot', type=int, default=1000, help="bootstrap replicates, default=1000")
+    parser.add_argument('--alpha', type=float, default=0.05, help="family-wise significance level, default=0.05")
+    parser.add_argument('--no-bonferroni', action='store_true', help="use alpha per test instead of alpha / number of tests")
+    parser.add_argument('--min-effect', type=float, default=0.05, help="minimum relative change to flag, default=0.05")
+    parser.add_argument('--min-flows', type=int, default=100, help="skip buckets with fewer flows in either set, default=100")
+    parser.add_argument('--seed', type=int, default=0, help="bootstrap RNG seed, default=0")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes, default=CPU count")
+    parser.add_argument('-o', dest='report', default=None, help="write the comparison as JSON")
+    args = parser.parse_args()
+
+    for m in args.metrics:
+        if m != "mean" and not (m[0] == "p" and m[1:].isdigit()):
+            parser.error("unknown metric: {}".format(m))
+
+    window = dict(time_start=args.time_limit_begin, time_end=args.time_limit_end, scope=args.scope)
+    base = load_runs(args.base).select(**window)
+    cand = load_runs(args.cand).select(**window)
+    if len(base) == 0 or len(cand) == 0:
+        print("error: no flows in the baseline or candidate set")
+        return 1
+    print("baseline {} runs, {} flows; candidate {} runs, {} flows".format(
+        len(base.run_ids), len(base), len(cand.run_ids), len(cand)))
+
+    rows, conf = compare_sets(base, cand, args.buckets, args.metrics, args.n_boot, args.alpha,
+                              not args.no_bonferroni, args.min_flows, args.min_effect, args.seed, args.jobs)
+    print_report(rows, args.metrics, conf)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"base": base.run_ids, "cand": cand.run_ids, "scope": args.scope, "confidence": conf,
+                       "min_effect": args.min_effect, "buckets": rows}, f, indent=1)
+        print("report saved to: {}".format(args.report))
+
+    flagged = [(row["size_lo"], m) for row in rows for m, r in (row["metrics"] or {}).items() if r["flag"] == "regression"]
+    if flagged:
+        print("\n{} significant regression(s)".format(len(flagged)))
+        return EXIT_REGRESSION
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
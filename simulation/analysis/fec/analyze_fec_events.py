@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+FEC 事件日志 (_out_fec.txt) 分析
+
+按 on_fec_debug 的格式把事件读成列数组，按事件类型取出各自的 flowHash，并向量化地
+解码 pack(r,c) 参数，一次 np.unique 分组后用 bincount 汇总:
+- 每个 flow / 每个节点的恢复效率（恢复包数 / 收到的 repair 数）
+- repair 字节数 / 恢复包数
+- 尾块 flush 开销（尾块 repair 数 / 尾块数据包数，以及跳过 flush 的比例）
+- 参数协商时间线（negotiate_req/recv/apply、param_switch_rx）与 req→apply 时延
+- 日志头部记录了各事件类型的采样率（FEC_LOG_SAMPLE_RATE）时，给出按采样率还原的全量事件数
+
+使用方法:
+python3 analyze_fec_events.py <xxx_out_fec.txt> [-o 输出目录] [--payload-bytes 1000] [-t 线程数]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(_CUR_DIR))
+from log_parser import find_log, parse_log, read_sample_rates
+
+# on_fec_debug 的事件类型
+FEC_EVENT_NAMES = {
+    0: 'data_recv',
+    1: 'repair_recv',
+    2: 'recovery_attempt',
+    3: 'recovery_result',
+    4: 'tail_flush',
+    20: 'negotiate_req',
+    21: 'negotiate_recv',
+    22: 'negotiate_apply',
+    23: 'param_switch_rx',
+    24: 'idle_gc',
+}
+EV_REPAIR_RECV = 1
+EV_RECOVERY_ATTEMPT = 2
+EV_RECOVERY_RESULT = 3
+EV_TAIL_FLUSH = 4
+EV_NEGOTIATE_REQ = 20
+EV_NEGOTIATE_RECV = 21
+EV_NEGOTIATE_APPLY = 22
+EV_PARAM_SWITCH_RX = 23
+EV_IDLE_GC = 24
+NEGOTIATION_EVENTS = (EV_NEGOTIATE_REQ, EV_NEGOTIATE_RECV, EV_NEGOTIATE_APPLY, EV_PARAM_SWITCH_RX)
+
+# 各事件类型中 flowHash 所在的参数列
+_FLOW_HASH_PARAM = {0: 2, 1: 3, 2: 2, 3: 2, 4: 0, 20: 0, 21: 0, 22: 0, 23: 0, 24: 0}
+
+# FecHeader::GetSerializedSize: base(8) + ISN(2) + edgeFlags(1) + lastRel(2) + lastLen(2) + recipeLen(2)
+FEC_REPAIR_HEADER_BYTES = 17
+FEC_RECIPE_ENTRY_BYTES = 4
+
+PERCENTILES = [50, 90, 99]
+
+
+def unpack_rc(packed):
+    """pack(r,c) := (r & 0xFFFF) | ((c & 0xFFFF) << 16)，对数组逐元素解码"""
+    packed = np.asarray(packed, dtype=np.int64)
+    return packed & 0xFFFF, (packed >> 16) & 0xFFFF
+
+
+def event_flow_hash(cols):
+    """每条事件的 flowHash（按事件类型选取所在参数，未知类型为 0）"""
+    log_type = cols['log_type']
+    params = [cols[f'param{i}'] for i in range(4)]
+    flow = np.zeros(log_type.size, dtype=np.int64)
+    for t, p in _FLOW_HASH_PARAM.items():
+        mask = log_type == t
+        flow[mask] = params[p][mask]
+    return flow
+
+
+def load_fec_events(fec_file, n_threads=None):
+    """读取事件日志，额外添加 flow 列（按事件类型选取 flowHash 所在参数）"""
+    cols = parse_log(fec_file, 'fec', n_threads=n_threads)
+    cols['flow'] = event_flow_hash(cols)
+    return cols
+
+
+def _group_sums(key, metrics):
+    """
+    key: 每行的分组键；metrics: {名称: (行掩码, 权重或 None)}
+    返回 (唯一键, {名称: 每组求和})
+    """
+    uniq, inv = np.unique(key, return_inverse=True)
+    out = {}
+    for name, (mask, weights) in metrics.items():
+        w = None if weights is None else weights[mask].astype(np.float64)
+        out[name] = np.bincount(inv[mask], weights=w, minlength=uniq.size)
+    return uniq, out
+
+
+def _ratio(num, den):
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.full(num.shape, np.nan), where=den > 0)
+
+
+def _event_metrics(cols, payload_bytes):
+    log_type = cols['log_type']
+    is_repair = log_type == EV_REPAIR_RECV
+    is_tail = log_type == EV_TAIL_FLUSH
+    # repair_recv: param2 = recipe_size；repair 字节 = payload + FEC 头（含 recipe）
+    repair_bytes = payload_bytes + FEC_REPAIR_HEADER_BYTES + FEC_RECIPE_ENTRY_BYTES * cols['param2']
+    return {
+        'repairs': (is_repair, None),
+        'repair_bytes': (is_repair, repair_bytes),
+        'attempts': (log_type == EV_RECOVERY_ATTEMPT, None),
+        'recovered': (log_type == EV_RECOVERY_RESULT, cols['param1']),
+        'tail_flushes': (is_tail, None),
+        'tail_skipped': (is_tail & (cols['param3'] == 0), None),
+        'tail_data': (is_tail, cols['param2']),
+        'tail_repairs': (is_tail, cols['param3']),
+        'negotiate_reqs': (log_type == EV_NEGOTIATE_REQ, None),
+        'param_applies': (log_type == EV_NEGOTIATE_APPLY, None),
+        'idle_gc': (log_type == EV_IDLE_GC, None),
+    }
+
+
+def _finish_table(uniq, sums):
+    table = {k: (v.astype(np.int64) if k != 'repair_bytes' else v) for k, v in sums.items()}
+    table['recovery_efficiency'] = _ratio(sums['recovered'], sums['repairs'])
+    table['repair_bytes_per_recovered'] = _ratio(sums['repair_bytes'], sums['recovered'])
+    table['tail_overhead'] = _ratio(sums['tail_repairs'], sums['tail_data'])
+    return table
+
+
+def per_flow_stats(cols, payload_bytes):
+    """按 flowHash 汇总（跨节点）"""
+    uniq, sums = _group_sums(cols['flow'], _event_metrics(cols, payload_bytes))
+    table = _finish_table(uniq, sums)
+    table['flow'] = uniq
+    return table
+
+
+def per_node_stats(cols, payload_bytes):
+    """按节点汇总（repair/recovery 记在接收节点，tail_flush/negotiate_req 记在发送节点）"""
+    uniq, sums = _group_sums(cols['node'], _event_metrics(cols, payload_bytes))
+    table = _finish_table(uniq, sums)
+    table['node'] = uniq
+    return table
+
+
+def negotiation_timeline(cols):
+    """
+    协商相关事件按 (flow, time) 排序后的时间线，参数已解码:
+    time_ns node flow event old_r old_c new_r new_c arg
+    negotiate_recv 没有旧参数（old_r/old_c 为 -1），arg 为 neg_op；
+    negotiate_req 的 arg 为 missing_cnt；param_switch_rx 的 arg 为 0(data)/1(repair)
+    """
+    log_type = cols['log_type']
+    mask = np.isin(log_type, NEGOTIATION_EVENTS)
+    t = cols['time_ns'][mask]
+    ev = log_type[mask]
+    flow = cols['flow'][mask]
+    p1, p2, p3 = cols['param1'][mask], cols['param2'][mask], cols['param3'][mask]
+    is_recv = ev == EV_NEGOTIATE_RECV
+
+    old_r, old_c = unpack_rc(p1)
+    new_r, new_c = unpack_rc(np.where(is_recv, p1, p2))
+    old_r = np.where(is_recv, -1, old_r)
+    old_c = np.where(is_recv, -1, old_c)
+    arg = np.where(is_recv, p2, p3)
+
+    order = np.lexsort((t, flow))
+    return {'time_ns': t[order], 'node': cols['node'][mask][order], 'flow': flow[order], 'event': ev[order],
+            'old_r': old_r[order], 'old_c': old_c[order], 'new_r': new_r[order], 'new_c': new_c[order],
+            'arg': arg[order]}
+
+
+def negotiation_latency(timeline):
+    """每个 negotiate_apply 与同一 flow 上最近一次（不晚于它的）negotiate_req 之间的时延 (ns)"""
+    ev = timeline['event']
+    req = ev == EV_NEGOTIATE_REQ
+    app = ev == EV_NEGOTIATE_APPLY
+    if not req.any() or not app.any():
+        return np.empty(0, dtype=np.int64)
+    _, fid = np.unique(timeline['flow'], return_inverse=True)
+    t = timeline['time_ns']
+    span = int(t.max()) + 1
+    # (flow, time) 编码为单个有序键，用 searchsorted 找前驱
+    req_key = fid[req].astype(np.int64) * span + t[req]
+    app_key = fid[app].astype(np.int64) * span + t[app]
+    order = np.argsort(req_key, kind='stable')
+    req_key = req_key[order]
+    pos = np.searchsorted(req_key, app_key, side='right') - 1
+    ok = pos >= 0
+    ok[ok] &= (req_key[pos[ok]] // span) == fid[app][ok]
+    return (app_key[ok] - req_key[pos[ok]]).astype(np.int64)
+
+
+def estimate_event_counts(event_types, counts, sample_rates):
+    """
+    按采样率还原的全量事件数 {事件名: 估计数}；sample_rates 为 read_sample_rates 的返回值，
+    没有记录采样率时返回 None。采样率为 0 的类型无法还原，记为 None
+    """
+    default, per_type = sample_rates
+    if default is None and not per_type:
+        return None
+    est = {}
+    for t, c in zip(event_types, counts):
+        rate = per_type.get(int(t), 1.0 if default is None else default)
+        est[FEC_EVENT_NAMES.get(int(t), f'type_{int(t)}')] = c / rate if rate > 0 else None
+    return est
+
+
+def summarize(cols, flow_table, node_table, timeline, latency, sample_rates=(None, {})):
+    log_type = cols['log_type']
+    types, counts = np.unique(log_type, return_counts=True)
+    event_counts = {FEC_EVENT_NAMES.get(int(t), f'type_{int(t)}'): int(c) for t, c in zip(types, counts)}
+
+    total = {k: float(flow_table[k].sum()) for k in ('repairs', 'repair_bytes', 'attempts', 'recovered',
+                                                      'tail_flushes', 'tail_skipped', 'tail_data',
+                                                      'tail_repairs')}
+    summary = {
+        'events': int(log_type.size),
+        'event_counts': event_counts,
+        'sample_rates': ({'default': sample_rates[0],
+                          **{FEC_EVENT_NAMES.get(t, f'type_{t}'): r for t, r in sorted(sample_rates[1].items())}}
+                         if sample_rates[0] is not None or sample_rates[1] else None),
+        'estimated_event_counts': estimate_event_counts(types.tolist(), counts.tolist(), sample_rates),
+        'flows': int(flow_table['flow'].size),
+        'nodes': int(node_table['node'].size),
+        'time_span_ns': [int(cols['time_ns'].min()), int(cols['time_ns'].max())] if log_type.size else None,
+        'repairs_received': int(total['repairs']),
+        'recovery_attempts': int(total['attempts']),
+        'recovered_packets': int(total['recovered']),
+        'recovery_efficiency': total['recovered'] / total['repairs'] if total['repairs'] else None,
+        'repair_bytes_per_recovered': total['repair_bytes'] / total['recovered'] if total['recovered'] else None,
+        'tail_flushes': int(total['tail_flushes']),
+        'tail_flush_skipped': int(total['tail_skipped']),
+        'tail_overhead': total['tail_repairs'] / total['tail_data'] if total['tail_data'] else None,
+        'tail_repair_share': total['tail_repairs'] / total['repairs'] if total['repairs'] else None,
+    }
+
+    eff = flow_table['recovery_efficiency']
+    eff = eff[~np.isnan(eff)]
+    summary['flow_recovery_efficiency_pct'] = (
+        dict(zip(map(str, PERCENTILES), np.percentile(eff, PERCENTILES).tolist())) if eff.size else None)
+
+    applies = timeline['event'] == EV_NEGOTIATE_APPLY
+    if applies.any():
+        rc, n = np.unique(np.stack((timeline['new_r'][applies], timeline['new_c'][applies]), axis=1),
+                          axis=0, return_counts=True)
+        summary['applied_params'] = {f'r={r},c={c}': int(k) for (r, c), k in zip(rc.tolist(), n.tolist())}
+        summary['flows_with_param_switch'] = int(np.unique(timeline['flow'][applies]).size)
+    summary['negotiate_latency_ns_pct'] = (
+        dict(zip(map(str, PERCENTILES), np.percentile(latency, PERCENTILES).tolist())) if latency.size else None)
+    return summary
+
+
+def save_table(path, table, columns, fmt):
+    data = np.column_stack([np.asarray(table[c], dtype=np.float64) for c in columns]) \
+        if table[columns[0]].size else np.empty((0, len(columns)))
+    np.savetxt(path, data, fmt=fmt, delimiter=',', header=','.join(columns), comments='')
+
+
+FLOW_COLUMNS = ['repairs', 'attempts', 'recovered', 'recovery_efficiency', 'repair_bytes',
+                'repair_bytes_per_recovered', 'tail_flushes', 'tail_skipped', 'tail_data', 'tail_repairs',
+                'tail_overhead', 'negotiate_reqs', 'param_applies', 'idle_gc']
+_FLOW_FMT = ['%d', '%d', '%d', '%.4f', '%d', '%.1f', '%d', '%d', '%d', '%d', '%.4f', '%d', '%d', '%d']
+TIMELINE_COLUMNS = ['time_ns', 'node', 'flow', 'event', 'old_r', 'old_c', 'new_r', 'new_c', 'arg']
+
+
+def save_results(output_dir, prefix, flow_table, node_table, timeline, summary):
+    os.makedirs(output_dir, exist_ok=True)
+    save_table(os.path.join(output_dir, f'{prefix}fec_flow_stats.csv'), flow_table,
+               ['flow'] + FLOW_COLUMNS, ['%d'] + _FLOW_FMT)
+    save_table(os.path.join(output_dir, f'{prefix}fec_node_stats.csv'), node_table,
+               ['node'] + FLOW_COLUMNS, ['%d'] + _FLOW_FMT)
+    save_table(os.path.join(output_dir, f'{prefix}fec_negotiation_timeline.csv'), timeline,
+               TIMELINE_COLUMNS, '%d')
+    with open(os.path.join(output_dir, f'{prefix}fec_summary.json'), 'w') as f:
+        json.dump(summary, f, indent=1)
+
+
+def _fmt(v, spec='.4f'):
+    return 'N/A' if v is None else format(v, spec)
+
+
+def print_summary(summary, node_table, top=10):
+    print("=" * 70)
+    print("FEC 事件分析")
+    print("=" * 70)
+    print(f"事件数: {summary['events']:,}  flow 数: {summary['flows']:,}  节点数: {summary['nodes']:,}")
+    est = summary.get('estimated_event_counts')
+    for name, cnt in summary['event_counts'].items():
+        if est is None:
+            print(f"  {name:<18} {cnt:>12,}")
+        else:
+            print(f"  {name:<18} {cnt:>12,}  全量估计 {_fmt(est[name], ',.0f'):>14}")
+    if summary.get('sample_rates'):
+        print("采样率: " + ", ".join(f"{k}={v:.6g}" for k, v in summary['sample_rates'].items()))
+    print(f"\n收到 repair: {summary['repairs_received']:,}  恢复尝试: {summary['recovery_attempts']:,}  "
+          f"恢复包数: {summary['recovered_packets']:,}")
+    print(f"恢复效率 (恢复包数/repair): {_fmt(summary['recovery_efficiency'])}")
+    print(f"repair 字节/恢复包: {_fmt(summary['repair_bytes_per_recovered'], '.1f')}")
+    if summary['flow_recovery_efficiency_pct']:
+        print("flow 恢复效率分位数: " + ", ".join(
+            f"p{p}={v:.4f}" for p, v in summary['flow_recovery_efficiency_pct'].items()))
+    print(f"\n尾块 flush: {summary['tail_flushes']:,} (跳过 {summary['tail_flush_skipped']:,})  "
+          f"尾块 repair/数据包: {_fmt(summary['tail_overhead'])}  "
+          f"尾块 repair 占比: {_fmt(summary['tail_repair_share'])}")
+    if summary.get('applied_params'):
+        common = sorted(summary['applied_params'].items(), key=lambda kv: -kv[1])[:top]
+        print(f"\n参数切换 flow 数: {summary['flows_with_param_switch']:,}  "
+              f"最常生效的参数 ({len(common)}/{len(summary['applied_params'])}): "
+              + ", ".join(f"{k} x{v}" for k, v in common))
+    if summary['negotiate_latency_ns_pct']:
+        print("req→apply 时延: " + ", ".join(
+            f"p{p}={v / 1000:.2f}us" for p, v in summary['negotiate_latency_ns_pct'].items()))
+
+    order = np.argsort(-node_table['recovered'], kind='stable')[:top]
+    if order.size:
+        print(f"\n恢复包数最多的 {order.size} 个节点:")
+        print(f"  {'node':>6} {'repairs':>10} {'recovered':>10} {'效率':>8} {'tail_flush':>10}")
+        for i in order:
+            eff = node_table['recovery_efficiency'][i]
+            print(f"  {node_table['node'][i]:>6} {node_table['repairs'][i]:>10,} {node_table['recovered'][i]:>10,} "
+                  f"{'N/A' if np.isnan(eff) else format(eff, '.4f'):>8} {node_table['tail_flushes'][i]:>10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FEC 事件日志分析')
+    parser.add_argument('fec_file', help='FEC 事件日志路径 (xxx_out_fec.txt)')
+    parser.add_argument('-o', '--output-dir', default=None, help='结果输出目录 (默认: 日志所在目录)')
+    parser.add_argument('--payload-bytes', type=int, default=1000,
+                        help='repair 包的载荷字节数，即 PACKET_PAYLOAD_SIZE (默认: 1000)')
+    parser.add_argument('--top', type=int, default=10, help='打印恢复包数最多的前 N 个节点 (默认: 10)')
+    parser.add_argument('-t', '--threads', type=int, default=None, help='解析线程数')
+    args = parser.parse_args()
+
+    if find_log(args.fec_file) is None:
+        print(f"错误: 文件不存在: {args.fec_file}")
+        return 1
+
+    cols = load_fec_events(args.fec_file, args.threads)
+    if cols['log_type'].size == 0:
+        print("错误: 日志中没有有效事件")
+        return 1
+
+    flow_table = per_flow_stats(cols, args.payload_bytes)
+    node_table = per_node_stats(cols, args.payload_bytes)
+    timeline = negotiation_timeline(cols)
+    latency = negotiation_latency(timeline)
+    summary = summarize(cols, flow_table, node_table, timeline, latency, read_sample_rates(args.fec_file))
+
+    print_summary(summary, node_table, args.top)
+
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.fec_file))
+    base = os.path.basename(args.fec_file)
+    prefix = base[:-len('out_fec.txt')] if base.endswith('_out_fec.txt') else ''
+    save_results(output_dir, prefix, flow_table, node_table, timeline, summary)
+    print(f"\n结果已保存到: {output_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+FEC 状态监控文件 (_out_fec_state.txt) 分析与内存看门狗
+
+fec_state_monitoring 每隔 FEC_STATE_MON_INTERVAL_NS 写一行:
+    time_ns rss_kb=.. flows=.. headers=.. blocks=.. block_slots=.. repairs=.. xor_bytes=.. ackq_pkts=.. ...
+blocks 为存活的块状态数，block_slots 为解码器块状态环的槽位数（只增不减，决定其内存占用）
+本脚本把它解析成时间序列表，并:
+- 对每个分量做线性拟合，给出增长斜率（每秒仿真时间）
+- 把 RSS 增长归因到 FEC 块/repair/队列：字节类分量直接计入，计数类分量用非负最小二乘
+  估计每个对象的字节数
+- 标记近似单调增长（疑似泄漏）的分量
+- watch 模式: 仿真运行中跟踪状态文件，若 RSS 按当前斜率外推到仿真结束会超过内存预算，
+  则终止该仿真（供扫参脚本使用）
+
+使用方法:
+python3 fec_state_monitor.py report <xxx_out_fec_state.txt> [--csv table.csv] [--config config.txt]
+python3 fec_state_monitor.py watch --sim-log simulation.log --pid <PID> --budget-mb 16000 [--kill-group]
+"""
+
+import argparse
+import os
+import re
+import signal
+import sys
+import time
+
+import numpy as np
+
+# 以字节计的分量：直接计入 RSS 归因
+BYTE_COMPONENTS = ['xor_bytes', 'pending_repair_bytes', 'ackq_bytes', 'beq_bytes']
+# 以对象个数计的分量：需要估计每个对象的字节数
+COUNT_COMPONENTS = ['flows', 'headers', 'blocks', 'block_slots', 'repairs']
+# 泄漏判定只看这些分量（队列类分量随负载上下波动属正常）
+LEAK_COMPONENTS = ['rss_kb', 'flows', 'headers', 'blocks', 'repairs', 'xor_bytes',
+                   'pending_repair_bytes', 'ackq_bytes', 'beq_bytes']
+
+# 疑似泄漏：非递减区间占比下限、运行期间增长占最终值的比例下限、最大回撤上限
+LEAK_MIN_NONDECREASING = 0.9
+LEAK_MIN_GROWTH = 0.5
+LEAK_MAX_DRAWDOWN = 0.05
+
+# 外推 RSS 时只用最近这部分样本拟合
+PROJECTION_TAIL_FRACTION = 0.3
+PROJECTION_MIN_SAMPLES = 5
+
+# cross_dc.cc: 流量停止后再运行 simulator_extra_time 秒
+SIMULATOR_EXTRA_TIME_S = 0.1
+
+_CONFIG_LINE_RE = re.compile(r'Config filename:\s*(\S+/config\.txt)')
+
+
+def parse_state_lines(lines):
+    """key=value 行 -> {列名: NumPy 数组}，缺失的键记为 0，坏行跳过"""
+    rows = []
+    keys = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 2 or not parts[0].isdigit():
+            continue
+        row = {'time_ns': int(parts[0])}
+        try:
+            for kv in parts[1:]:
+                k, _, v = kv.partition('=')
+                row[k] = int(v)
+        except ValueError:
+            continue
+        for k in row:
+            if k not in keys:
+                keys.append(k)
+        rows.append(row)
+    return {k: np.array([r.get(k, 0) for r in rows], dtype=np.int64) for k in keys}
+
+
+def parse_state_file(state_file):
+    with open(state_file, 'r', errors='replace') as f:
+        lines = f.readlines()
+    # 运行中的文件最后一行可能还没写完
+    if lines and not lines[-1].endswith('\n'):
+        lines = lines[:-1]
+    return parse_state_lines(lines)
+
+
+def linear_slope(t_s, values):
+    """最小二乘斜率（每秒）；样本不足或时间跨度为 0 时返回 0"""
+    if t_s.size < 2 or np.ptp(t_s) == 0:
+        return 0.0
+    return float(np.polyfit(t_s, values.astype(np.float64), 1)[0])
+
+
+def growth_slopes(table):
+    """每个分量的全程斜率与后半段斜率（每秒仿真时间）"""
+    t_s = table['time_ns'] / 1e9
+    half = t_s.size // 2
+    slopes = {}
+    for k, v in table.items():
+        if k == 'time_ns':
+            continue
+        slopes[k] = {'slope': linear_slope(t_s, v), 'slope_second_half': linear_slope(t_s[half:], v[half:]),
+                     'start': int(v[0]), 'end': int(v[-1]), 'max': int(v.max())}
+    return slopes
+
+
+def _nnls(A, b):
+    """小规模非负最小二乘：反复剔除负系数的列后重新拟合"""
+    active = list(range(A.shape[1]))
+    coef = np.zeros(A.shape[1])
+    while active:
+        x, *_ = np.linalg.lstsq(A[:, active], b, rcond=None)
+        if (x >= 0).all():
+            coef[active] = x
+            break
+        active = [a for a, xi in zip(active, x) if xi >= 0]
+    return coef
+
+
+def attribute_rss(table):
+    """
+    把 RSS 相对首个样本的增长归因到各分量
+
+    字节类分量系数固定为 1；剩余部分对计数类分量做非负最小二乘，得到每个对象的估计字节数。
+    返回 {'rss_growth_bytes', 'components': {名称: {'bytes', 'share', 'bytes_per_object'}}, 'unexplained_bytes'}
+    """
+    rss = table['rss_kb'].astype(np.float64) * 1024
+    d_rss = rss - rss[0]
+    total_growth = float(d_rss[-1])
+
+    components = {}
+    explained = np.zeros_like(d_rss)
+    for k in BYTE_COMPONENTS:
+        if k in table:
+            d = (table[k] - table[k][0]).astype(np.float64)
+            explained += d
+            components[k] = {'bytes': float(d[-1]), 'bytes_per_object': 1.0}
+
+    counts = [k for k in COUNT_COMPONENTS if k in table and np.ptp(table[k]) > 0]
+    if counts:
+        A = np.column_stack([(table[k] - table[k][0]).astype(np.float64) for k in counts])
+        coef = _nnls(A, d_rss - explained)
+        for k, c, col in zip(counts, coef, A.T):
+            components[k] = {'bytes': float(c * col[-1]), 'bytes_per_object': float(c)}
+
+    for v in components.values():
+        v['share'] = v['bytes'] / total_growth if total_growth > 0 else None
+    return {'rss_growth_bytes': total_growth, 'components': components,
+            'unexplained_bytes': total_growth - sum(v['bytes'] for v in components.values())}
+
+
+def leak_flags(table):
+    """近似单调增长的分量: 非递减区间占比高、整体增长明显、几乎没有回落"""
+    flags = {}
+    for k in LEAK_COMPONENTS:
+        v = table.get(k)
+        if v is None or v.size < PROJECTION_MIN_SAMPLES or v.max() <= 0:
+            continue
+        v = v.astype(np.float64)
+        nondecreasing = float(np.mean(np.diff(v) >= 0))
+        growth = (v[-1] - v[0]) / v[-1] if v[-1] > 0 else 0.0
+        drawdown = float(np.max(np.maximum.accumulate(v) - v)) / v.max()
+        if nondecreasing >= LEAK_MIN_NONDECREASING and growth >= LEAK_MIN_GROWTH and drawdown <= LEAK_MAX_DRAWDOWN:
+            flags[k] = {'nondecreasing': nondecreasing, 'growth': growth, 'drawdown': drawdown}
+    return flags
+
+
+def project_rss_kb(table, horizon_ns):
+    """用最近一段样本的 RSS 斜率外推到 horizon_ns；样本不足时返回 None"""
+    t = table.get('time_ns')
+    if t is None or t.size < PROJECTION_MIN_SAMPLES:
+        return None
+    n_tail = max(PROJECTION_MIN_SAMPLES, int(t.size * PROJECTION_TAIL_FRACTION))
+    t_s = t[-n_tail:] / 1e9
+    rss = table['rss_kb'][-n_tail:]
+    slope = max(linear_slope(t_s, rss), 0.0)
+    return float(rss[-1] + slope * max(horizon_ns / 1e9 - t_s[-1], 0.0))
+
+
+def read_sim_horizon_ns(config_file):
+    """从 config.txt 读取 FLOWGEN_STOP_TIME，加上 simulator_extra_time 作为外推终点"""
+    try:
+        with open(config_file, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'FLOWGEN_STOP_TIME':
+                    return int((float(parts[1]) + SIMULATOR_EXTRA_TIME_S) * 1e9)
+    except OSError:
+        pass
+    return None
+
+
+def save_table_csv(path, table):
+    keys = list(table)
+    np.savetxt(path, np.column_stack([table[k] for k in keys]), fmt='%d', delimiter=',',
+               header=','.join(keys), comments='')
+
+
+def _fmt_bytes(b):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(b) < 1024 or unit == 'GB':
+            return f"{b:.1f}{unit}"
+        b /= 1024
+
+
+def print_report(table, slopes, attribution, flags, horizon_ns=None):
+    t = table['time_ns']
+    print("=" * 70)
+    print("FEC 状态监控分析")
+    print("=" * 70)
+    print(f"样本数: {t.size}  仿真时间: {t[0] / 1e9:.4f}s ~ {t[-1] / 1e9:.4f}s")
+    print(f"RSS: {table['rss_kb'][0] / 1024:.1f}MB -> {table['rss_kb'][-1] / 1024:.1f}MB "
+          f"(峰值 {table['rss_kb'].max() / 1024:.1f}MB)")
+    if horizon_ns:
+        proj = project_rss_kb(table, horizon_ns)
+        if proj is not None:
+            print(f"按最近斜率外推到 {horizon_ns / 1e9:.4f}s: {proj / 1024:.1f}MB")
+
+    print(f"\n{'分量':<22} {'起始':>14} {'结束':>14} {'斜率/s':>14} {'后半段斜率/s':>14}")
+    for k, s in slopes.items():
+        print(f"{k:<22} {s['start']:>14,} {s['end']:>14,} {s['slope']:>14,.0f} {s['slope_second_half']:>14,.0f}")
+
+    print(f"\nRSS 增长归因 (总增长 {_fmt_bytes(attribution['rss_growth_bytes'])}):")
+    for k, v in sorted(attribution['components'].items(), key=lambda kv: -kv[1]['bytes']):
+        share = '-' if v['share'] is None else f"{v['share'] * 100:.1f}%"
+        per_obj = '' if k in BYTE_COMPONENTS else f"  (~{v['bytes_per_object']:.0f}B/个)"
+        print(f"  {k:<22} {_fmt_bytes(v['bytes']):>10} {share:>7}{per_obj}")
+    print(f"  {'未解释':<22} {_fmt_bytes(attribution['unexplained_bytes']):>10}")
+
+    if flags:
+        print("\n⚠ 疑似泄漏（近似单调增长）:")
+        for k, f in flags.items():
+            print(f"  {k:<22} 非递减 {f['nondecreasing'] * 100:.0f}%  期间增长占比 {f['growth'] * 100:.0f}%  "
+                  f"最大回撤 {f['drawdown'] * 100:.1f}%")
+    else:
+        print("\n未发现单调增长的分量")
+
+
+def cmd_report(args):
+    if not os.path.exists(args.state_file):
+        print(f"错误: 文件不存在: {args.state_file}")
+        return 1
+    table = parse_state_file(args.state_file)
+    if 'rss_kb' not in table or table['time_ns'].size < 2:
+        print("错误: 状态文件中没有足够的样本")
+        return 1
+    config = args.config or os.path.join(os.path.dirname(os.path.abspath(args.state_file)), 'config.txt')
+    horizon_ns = args.horizon_ns or read_sim_horizon_ns(config)
+    print_report(table, growth_slopes(table), attribute_rss(table), leak_flags(table), horizon_ns)
+    if args.csv:
+        save_table_csv(args.csv, table)
+        print(f"\n时间序列表已保存到: {args.csv}")
+    return 0
+
+
+def _resolve_from_sim_log(sim_log):
+    """从 run_cross_dc.py 的输出中找到 Config filename，推出状态文件和 config.txt 路径"""
+    try:
+        with open(sim_log, 'r', errors='replace') as f:
+            matches = _CONFIG_LINE_RE.findall(f.read())
+    except OSError:
+        return None, None
+    if not matches:
+        return None, None
+    config = matches[-1]
+    run_dir = os.path.dirname(config)
+    run_id = os.path.basename(run_dir)
+    return os.path.join(run_dir, f'{run_id}_out_fec_state.txt'), config
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _terminate(pid, kill_group, grace_s=10):
+    send = (lambda sig: os.killpg(pid, sig)) if kill_group else (lambda sig: os.kill(pid, sig))
+    try:
+        send(signal.SIGTERM)
+        deadline = time.time() + grace_s
+        while time.time() < deadline and _alive(pid):
+            time.sleep(0.5)
+        if _alive(pid):
+            send(signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def cmd_watch(args):
+    budget_kb = args.budget_mb * 1024
+    state_file, config = args.state_file, args.config
+    print(f"[watch] pid={args.pid} 内存预算 {args.budget_mb}MB", flush=True)
+    while _alive(args.pid):
+        if state_file is None and args.sim_log:
+            state_file, found_config = _resolve_from_sim_log(args.sim_log)
+            config = config or found_config
+        if state_file and os.path.exists(state_file):
+            table = parse_state_file(state_file)
+            if table.get('rss_kb') is not None and table['rss_kb'].size:
+                horizon_ns = args.horizon_ns or (read_sim_horizon_ns(config) if config else None)
+                cur = float(table['rss_kb'][-1])
+                proj = project_rss_kb(table, horizon_ns) if horizon_ns else None
+                reason = None
+                if cur > budget_kb:
+                    reason = f"当前 RSS {cur / 1024:.0f}MB 超过预算 {args.budget_mb}MB"
+                elif proj is not None and proj > budget_kb:
+                    reason = (f"RSS 外推到 {horizon_ns / 1e9:.3f}s 为 {proj / 1024:.0f}MB，"
+                              f"超过预算 {args.budget_mb}MB（当前 {cur / 1024:.0f}MB，"
+                              f"仿真时间 {table['time_ns'][-1] / 1e9:.4f}s）")
+                if reason:
+                    flags = leak_flags(table)
+                    if flags:
+                        reason += "；疑似泄漏分量: " + ", ".join(flags)
+                    print(f"[watch] 终止仿真: {reason}", flush=True)
+                    if args.kill_marker:
+                        with open(args.kill_marker, 'w') as f:
+                            f.write(reason + '\n')
+                    _terminate(args.pid, args.kill_group)
+                    return 2
+        time.sleep(args.interval)
+    print("[watch] 仿真进程已结束", flush=True)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FEC 状态监控文件分析与内存看门狗')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_report = sub.add_parser('report', help='时间序列、增长斜率、RSS 归因与泄漏标记')
+    p_report.add_argument('state_file', help='状态监控文件 (xxx_out_fec_state.txt)')
+    p_report.add_argument('--csv', default=None, help='将时间序列表保存为 CSV')
+    p_report.add_argument('--config', default=None, help='config.txt 路径（默认: 状态文件所在目录）')
+    p_report.add_argument('--horizon-ns', type=int, default=None,
+                          help='RSS 外推终点（默认: FLOWGEN_STOP_TIME + 0.1s）')
+
+    p_watch = sub.add_parser('watch', help='运行中监控，外推 RSS 超出预算时终止仿真')
+    src = p_watch.add_mutually_exclusive_group(required=True)
+    src.add_argument('--state-file', default=None, help='状态监控文件路径（可以尚未创建）')
+    src.add_argument('--sim-log', default=None, help='run_cross_dc.py 的输出日志，从中解析 output 目录')
+    p_watch.add_argument('--pid', type=int, required=True, help='仿真进程 PID（进程结束时看门狗退出）')
+    p_watch.add_argument('--budget-mb', type=float, required=True, help='内存预算 (MB)')
+    p_watch.add_argument('--kill-group', action='store_true', help='终止 PID 所在的整个进程组')
+    p_watch.add_argument('--config', default=None, help='config.txt 路径（用于外推终点）')
+    p_watch.add_argument('--horizon-ns', type=int, default=None, help='RSS 外推终点（默认: 从 config.txt 推出）')
+    p_watch.add_argument('--interval', type=float, default=30.0, help='检查间隔（秒，默认: 30）')
+    p_watch.add_argument('--kill-marker', default=None, help='终止时把原因写入该文件')
+
+    args = parser.parse_args()
+    return cmd_report(args) if args.cmd == 'report' else cmd_watch(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+单条流的事件时间线（FCT / 丢包 / RTO / FEC / 流输入日志联合查询）
+
+为一次运行的 _out_fct.txt、_in.txt、_out_drop.txt、_out_rto.txt、_out_fec.txt 建立按
+流分区的磁盘索引：
+- 流键为 (src, dst, sport, dport)，FEC 事件只记录 flowHash，因此分区号统一取
+  FecFlowKeyHash（qbb-net-device.h）的低 32 位对分区数取模，同一条流在各日志中的
+  记录都落在同号分区
+- 建索引时逐块解析日志并按分区追加到临时文件，再逐个分区排序写成 .npy，内存占用
+  只与单个分区大小有关
+- 查询时以 mmap 打开对应分区，对排好序的键二分查找，代价与该流的事件数成正比
+
+索引位于 run 目录的 .cache/flow_index 下，源日志大小或修改时间变化时自动重建。
+
+使用方法:
+python3 flow_forensics.py <run_dir|config_id> build [--partitions 64] [--force]
+python3 flow_forensics.py <run_dir|config_id> flow <src> <dst> <sport> <dport> [-o 输出目录]
+python3 flow_forensics.py <run_dir|config_id> top [-n 10] [--scope inter] [-o 输出目录]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, _CUR_DIR)
+sys.path.insert(0, os.path.join(_CUR_DIR, 'fec'))
+from analyze_fec_events import FEC_EVENT_NAMES, event_flow_hash, unpack_rc
+from fct_query import SCOPES, load_file, run_nodes_per_dc
+from log_parser import find_log, get_schema, iter_log_chunks
+from run_cache import CACHE_DIR_NAME, file_signature
+
+INDEX_DIR_NAME = 'flow_index'
+# 索引格式变化时递增，使旧索引失效
+INDEX_VERSION = 1
+DEFAULT_PARTITIONS = 64
+# 参与索引的日志及其时间列
+INDEXED_LOGS = {'fct': 'start_ns', 'in': 'start_ns', 'drop': 'time_ns', 'rto': 'time_ns', 'fec': 'time_ns'}
+
+DROP_TYPE_NAMES = {0: 'random', 1: 'ingress', 2: 'egress'}
+# 参数为 pack(r,c) 的 FEC 事件: {log_type: (参数下标, ...)}
+_FEC_PACKED_PARAMS = {20: (1, 2), 21: (1,), 22: (1, 2), 23: (1, 2)}
+
+_FNV_OFFSET = np.uint64(1469598103934665603)
+_FNV_PRIME = np.uint64(1099511628211)
+
+
+def node_ip(node):
+    """Settings::node_id_to_ip"""
+    node = np.asarray(node, dtype=np.uint64)
+    return np.uint64(0x0b000001) + (node // np.uint64(256)) * np.uint64(0x10000) + (node % np.uint64(256)) * np.uint64(0x100)
+
+
+def flow_hash(src, dst, sport, dport):
+    """on_fec_debug 记录的 flowHash: FecFlowKeyHash{sip, dip, sport, dport} 的低 32 位"""
+    h = np.full(np.shape(src), _FNV_OFFSET, dtype=np.uint64)
+    ports = (np.asarray(sport, dtype=np.uint64) << np.uint64(16)) | np.asarray(dport, dtype=np.uint64)
+    for v in (node_ip(src), node_ip(dst), ports):
+        h ^= v
+        h *= _FNV_PRIME
+    return (h & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def flow_key(src, dst, sport, dport):
+    """(src, dst, sport, dport) 打包为 64 位键（节点 ID 最多 16 位，见 Settings::ip_to_node_id）"""
+    return ((np.asarray(src, dtype=np.uint64) << np.uint64(48)) | (np.asarray(dst, dtype=np.uint64) << np.uint64(32))
+            | (np.asarray(sport, dtype=np.uint64) << np.uint64(16)) | np.asarray(dport, dtype=np.uint64))
+
+
+def record_dtype(log):
+    return np.dtype([('key', np.uint64)] + [(name, dtype) for name, dtype in get_schema(log).columns])
+
+
+def _chunk_records(log, cols):
+    """块内每行的 (索引记录, 分区哈希)；FEC 事件的键就是 flowHash"""
+    if log == 'fec':
+        h = event_flow_hash(cols).astype(np.uint32)
+        key = h.astype(np.uint64)
+    else:
+        tup = (cols['src_id'], cols['dst_id'], cols['sport'], cols['dport'])
+        h = flow_hash(*tup)
+        key = flow_key(*tup)
+    recs = np.empty(key.size, dtype=record_dtype(log))
+    recs['key'] = key
+    for name in cols:
+        recs[name] = cols[name]
+    return recs, h
+
+
+def resolve_run(target, output_dir):
+    """run 目录或 config id -> (run 目录, 日志路径前缀)"""
+    run_dir = os.path.abspath(target if os.path.isdir(target) else os.path.join(output_dir, target))
+    run_id = os.path.basename(run_dir)
+    return run_dir, os.path.join(run_dir, run_id)
+
+
+def log_path(prefix, log):
+    path = prefix + get_schema(log).suffix
+    return find_log(path) or path
+
+
+def index_dir_for(run_dir):
+    return os.path.join(run_dir, CACHE_DIR_NAME, INDEX_DIR_NAME)
+
+
+def _read_manifest(index_dir):
+    try:
+        with open(os.path.join(index_dir, 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == INDEX_VERSION else None
+
+
+def _build_log_index(src_path, out_dir, log, n_partitions):
+    """把一个日志按分区写成排好序的 .npy，返回 (行数, 跳过行数)"""
+    tmp_dir = out_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    dtype = record_dtype(log)
+    spill = [os.path.join(tmp_dir, f'p{p:03d}.bin') for p in range(n_partitions)]
+    n_rows = n_skipped = 0
+    files = [open(path, 'wb') for path in spill]
+    try:
+        for cols, skipped in iter_log_chunks(src_path, log):
+            n_skipped += skipped
+            recs, h = _chunk_records(log, cols)
+            if not recs.size:
+                continue
+            n_rows += recs.size
+            part = (h % n_partitions).astype(np.int64)
+            order = np.argsort(part, kind='stable')
+            bounds = np.concatenate(([0], np.cumsum(np.bincount(part, minlength=n_partitions))))
+            recs = recs[order]
+            for p in np.flatnonzero(np.diff(bounds)):
+                files[p].write(recs[bounds[p]:bounds[p + 1]].tobytes())
+    finally:
+        for f in files:
+            f.close()
+
+    time_col = INDEXED_LOGS[log]
+    for p, path in enumerate(spill):
+        recs = np.fromfile(path, dtype=dtype)
+        recs = recs[np.lexsort((recs[time_col], recs['key']))]
+        np.save(os.path.join(tmp_dir, f'p{p:03d}.npy'), recs)
+        os.remove(path)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.rename(tmp_dir, out_dir)
+    return n_rows, n_skipped
+
+
+def build_index(run_dir, prefix, n_partitions=DEFAULT_PARTITIONS, force=False, verbose=True):
+    """
+    建立或更新 run 的流索引，只重建签名变化的日志，返回 manifest。
+    分区数变化时全部重建
+    """
+    index_dir = index_dir_for(run_dir)
+    manifest = _read_manifest(index_dir)
+    if force or manifest is None or manifest['n_partitions'] != n_partitions:
+        manifest = {'version': INDEX_VERSION, 'n_partitions': n_partitions, 'logs': {}}
+    os.makedirs(index_dir, exist_ok=True)
+
+    changed = False
+    for log in INDEXED_LOGS:
+        src_path = log_path(prefix, log)
+        sig = file_signature(src_path)
+        entry = manifest['logs'].get(log)
+        if sig is None:
+            if entry is not None:
+                del manifest['logs'][log]
+                shutil.rmtree(os.path.join(index_dir, log), ignore_errors=True)
+                changed = True
+            continue
+        if entry is not None and entry['signature'] == list(sig):
+            continue
+        if verbose:
+            print(f"建立索引: {os.path.basename(src_path)} ({sig[0] / 1e6:.1f} MB)")
+        n_rows, n_skipped = _build_log_index(src_path, os.path.join(index_dir, log), log, n_partitions)
+        manifest['logs'][log] = {'signature': list(sig), 'rows': n_rows, 'skipped': n_skipped}
+        changed = True
+
+    if changed:
+        tmp = os.path.join(index_dir, 'manifest.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, os.path.join(index_dir, 'manifest.json'))
+    return manifest
+
+
+class FlowIndex:
+    """按流查询一次运行的各日志记录"""
+
+    def __init__(self, run_dir, prefix, n_partitions=DEFAULT_PARTITIONS, force=False, verbose=True):
+        self.run_dir = run_dir
+        self.prefix = prefix
+        self.index_dir = index_dir_for(run_dir)
+        self.manifest = build_index(run_dir, prefix, n_partitions, force, verbose)
+        self.n_partitions = self.manifest['n_partitions']
+        self._parts = {}
+
+    def _partition(self, log, p):
+        if (log, p) not in self._parts:
+            path = os.path.join(self.index_dir, log, f'p{p:03d}.npy')
+            self._parts[(log, p)] = np.load(path, mmap_mode='r')
+        return self._parts[(log, p)]
+
+    def lookup(self, log, key, h):
+        """log 中键为 key 的记录（按时间排序）；log 未建索引时返回 None"""
+        if log not in self.manifest['logs']:
+            return None
+        part = self._partition(log, int(h) % self.n_partitions)
+        keys = part['key']
+        lo = int(np.searchsorted(keys, np.uint64(key), side='left'))
+        hi = int(np.searchsorted(keys, np.uint64(key), side='right'))
+        return np.array(part[lo:hi])
+
+    def flow_events(self, src, dst, sport, dport):
+        """
+        一条流在各日志中的记录。drop_ack 为反向 (ACK/NACK/CNP) 包的丢包；
+        FEC 事件按 32 位 flowHash 匹配，极少数情况下可能混入哈希冲突的其他流
+        """
+        key = int(flow_key(src, dst, sport, dport))
+        h = int(flow_hash(src, dst, sport, dport))
+        rkey = int(flow_key(dst, src, dport, sport))
+        rh = int(flow_hash(dst, src, dport, sport))
+        events = {log: self.lookup(log, key, h) for log in ('fct', 'in', 'drop', 'rto')}
+        events['drop_ack'] = self.lookup('drop', rkey, rh)
+        events['fec'] = self.lookup('fec', h, h)
+        return {k: v for k, v in events.items() if v is not None}
+
+
+def _fec_text(r):
+    t = int(r['log_type'])
+    params = [int(r[f'param{i}']) for i in range(4)]
+    text = FEC_EVENT_NAMES.get(t, f'type{t}')
+    parts = []
+    for i, v in enumerate(params):
+        if i in _FEC_PACKED_PARAMS.get(t, ()):
+            rr, cc = unpack_rc(v)
+            parts.append(f'(r={int(rr)},c={int(cc)})')
+        else:
+            parts.append(str(v))
+    return f"{text} {' '.join(parts)}"
+
+
+def flow_timeline(events):
+    """[(time_ns, 来源, 节点, 描述)]，按时间排序"""
+    rows = []
+    for r in events.get('in', ()):
+        rows.append((int(r['start_ns']), 'in', int(r['src_id']), f"流输入 size={int(r['size'])}"))
+    for r in events.get('fct', ()):
+        start, fct = int(r['start_ns']), int(r['fct_ns'])
+        slow = max(fct / max(int(r['standalone_fct_ns']), 1), 1.0)
+        rows.append((start, 'fct', int(r['src_id']), f"流开始 size={int(r['size'])}"))
+        rows.append((start + fct, 'fct', int(r['dst_id']),
+                     f"流完成 fct={fct / 1000:.1f}us standalone={int(r['standalone_fct_ns']) / 1000:.1f}us "
+                     f"slowdown={slow:.2f}"))
+    for log, what in (('drop', '数据包丢弃'), ('drop_ack', '反向包丢弃')):
+        for r in events.get(log, ()):
+            rows.append((int(r['time_ns']), log, int(r['node']),
+                         f"{what} {DROP_TYPE_NAMES.get(int(r['type']), r['type'])} if={int(r['interface'])}"))
+    for r in events.get('rto', ()):
+        rows.append((int(r['time_ns']), 'rto', int(r['node']),
+                     f"RTO 超时 #{int(r['timeout_count'])} rto={int(r['rto_ns']) / 1000:.1f}us "
+                     f"snd_una={int(r['snd_una'])} snd_nxt={int(r['snd_nxt'])}"))
+    for r in events.get('fec', ()):
+        rows.append((int(r['time_ns']), 'fec', int(r['node']), _fec_text(r)))
+    rows.sort(key=lambda x: x[0])
+    return rows
+
+
+def slowest_flows(run_dir, prefix, n=10, scope='all'):
+    """FCT 日志中 slowdown 最大的 n 条流: [(src, dst, sport, dport, slowdown)]"""
+    fct_file = log_path(prefix, 'fct')
+    npd = run_nodes_per_dc(os.path.basename(run_dir), os.path.dirname(run_dir))
+    table = load_file(fct_file, npd).select(scope=scope)
+    top = np.argsort(-table['slowdown'], kind='stable')[:n]
+    return [(int(table['src_id'][i]), int(table['dst_id'][i]), int(table['sport'][i]), int(table['dport'][i]),
+             float(table['slowdown'][i])) for i in top]
+
+
+def print_timeline(flow, rows):
+    src, dst, sport, dport = flow
+    print(f"\n流 {src}->{dst} sport={sport} dport={dport}: {len(rows)} 条事件")
+    if not rows:
+        return
+    t0 = rows[0][0]
+    for t, source, node, text in rows:
+        print(f"  {t:>14} (+{(t - t0) / 1000:>10.1f}us) {source:<8} node {node:<5} {text}")
+
+
+def save_timeline(output_dir, run_id, flow, rows):
+    path = os.path.join(output_dir, '{}_flow_{}_{}_{}_{}.csv'.format(run_id, *flow))
+    with open(path, 'w') as f:
+        f.write('time_ns,source,node,event\n')
+        for t, source, node, text in rows:
+            f.write(f'{t},{source},{node},"{text}"\n')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按流联合查询 FCT/丢包/RTO/FEC 日志')
+    parser.add_argument('target', help='run 目录或 config id（在 mix/output 下查找）')
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help=f'索引分区数（默认: {DEFAULT_PARTITIONS}）')
+    parser.add_argument('--force', action='store_true', help='重建索引')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='建立/更新索引')
+    p_flow = sub.add_parser('flow', help='单条流的事件时间线')
+    for name in ('src', 'dst', 'sport', 'dport'):
+        p_flow.add_argument(name, type=int)
+    p_top = sub.add_parser('top', help='slowdown 最大的若干条流的事件时间线')
+    p_top.add_argument('-n', type=int, default=10, help='流数（默认: 10）')
+    p_top.add_argument('--scope', choices=SCOPES, default='all', help='intra/inter-DC 流（默认: all）')
+    for p in (p_flow, p_top):
+        p.add_argument('-o', '--output-dir', default=None, help='把时间线另存为 CSV')
+    args = parser.parse_args()
+
+    output_dir = os.path.join(_CUR_DIR, '..', 'mix', 'output')
+    run_dir, prefix = resolve_run(args.target, output_dir)
+    if not os.path.isdir(run_dir):
+        print(f"run 目录不存在: {run_dir}")
+        return 1
+    index = FlowIndex(run_dir, prefix, args.partitions, args.force)
+    if not index.manifest['logs']:
+        print(f"没有可索引的日志: {prefix}_*")
+        return 1
+    if args.command == 'build':
+        for log, entry in index.manifest['logs'].items():
+            print(f"{log:<5} {entry['rows']:>12,} 行  (跳过 {entry['skipped']})")
+        return 0
+
+    if args.command == 'flow':
+        flows = [(args.src, args.dst, args.sport, args.dport)]
+    else:
+        if 'fct' not in index.manifest['logs']:
+            print("没有 FCT 日志，无法选出最慢的流")
+            return 1
+        top = slowest_flows(run_dir, prefix, args.n, args.scope)
+        flows = [f[:4] for f in top]
+        print(f"slowdown 最大的 {len(top)} 条流: " + ', '.join(f"{s}->{d}:{sp}/{dp} ({x:.1f})" for s, d, sp, dp, x in top))
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    run_id = os.path.basename(run_dir)
+    for flow in flows:
+        rows = flow_timeline(index.flow_events(*flow))
+        print_timeline(flow, rows)
+        if args.output_dir:
+            print(f"  已保存到: {save_timeline(args.output_dir, run_id, flow, rows)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+仿真运行期间的增量分析（tail -f 方式）
+
+记录 _out_fct.txt / _out_drop.txt / _out_fec.txt 的已读偏移，每次只解析新追加的
+完整行，用 DDSketch 维护 intra/inter-DC slowdown 分位数，并累计丢包与 FEC 恢复计数。
+每隔一段时间打印一行状态（可选写入 JSON 文件），便于在扫参时及早终止异常配置。
+
+使用方法:
+python3 live_monitor.py <run_dir|config_id> [-i 10] [--status-file status.json] [--once]
+python3 live_monitor.py 123 --max-p99 50      # p99 slowdown 超过 50 时以退出码 3 结束
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from log_parser import (BINARY_MAGIC, binary_to_columns, find_log, get_schema, parse_binary_header,
+                        records_to_columns, tokenize_int_records)
+from quantile_sketch import DDSketch, DEFAULT_ALPHA
+
+# 单次读取的字节上限，避免启动时一次性读入已很大的日志
+DEFAULT_READ_BYTES = 64 * 1024 * 1024
+# 超过 p99 阈值时的退出码
+EXIT_P99_EXCEEDED = 3
+
+DROP_TYPE_NAMES = {0: 'random', 1: 'ingress', 2: 'egress'}
+# on_fec_debug 的事件类型
+FEC_REPAIR_RECV = 1
+FEC_RECOVERY_ATTEMPT = 2
+FEC_RECOVERY_RESULT = 3
+FEC_TAIL_FLUSH = 4
+
+
+class TailReader:
+    """记录文件偏移，每次只返回新追加的完整行（二进制日志为完整记录）解析出的列"""
+
+    def __init__(self, path, schema, read_bytes=DEFAULT_READ_BYTES):
+        self.path = path
+        self.schema = get_schema(schema)
+        self.read_bytes = read_bytes
+        self.offset = 0
+        self.n_rows = 0
+        self.n_skipped = 0
+        # 二进制日志的头部，读到文件开头时识别
+        self.header = None
+
+    def poll(self):
+        """返回新行的列字典；没有新的完整行时返回 None"""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+        if size < self.offset:
+            # 文件被截断或重新创建（同一 id 重新运行），从头读
+            self.offset = 0
+            self.header = None
+        if size == self.offset:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            buf = f.read(min(size - self.offset, self.read_bytes))
+        if self.offset == 0 and buf.startswith(BINARY_MAGIC[:len(buf)]):
+            end = buf.find(b'\n')
+            if end < 0:
+                return None
+            self.header = parse_binary_header(buf[:end + 1])
+            self.offset = end + 1
+            buf = buf[end + 1:]
+        if self.header is not None:
+            # 最后一条记录可能还没写完，留到下次
+            n = len(buf) // self.header.dtype.itemsize
+            if n == 0:
+                return None
+            self.offset += n * self.header.dtype.itemsize
+            self.n_rows += n
+            return binary_to_columns(np.frombuffer(buf, dtype=self.header.dtype, count=n), self.schema)
+        # 最后一行可能还没写完，留到下次
+        end = buf.rfind(b'\n')
+        if end < 0:
+            return None
+        self.offset += end + 1
+        records, skipped = tokenize_int_records(buf[:end + 1], len(self.schema.columns),
+                                                self.schema.delimiter)
+        self.n_rows += records.shape[0]
+        self.n_skipped += skipped
+        return records_to_columns(records, self.schema)
+
+    def poll_all(self):
+        """读到当前文件末尾，逐块产出列字典"""
+        while True:
+            cols = self.poll()
+            if cols is None:
+                return
+            yield cols
+
+
+class LiveStats:
+    """增量累计的 FCT / 丢包 / FEC 统计"""
+
+    def __init__(self, nodes_per_dc=53, alpha=DEFAULT_ALPHA):
+        self.nodes_per_dc = nodes_per_dc
+        self.slowdown = {'intra': DDSketch(alpha), 'inter': DDSketch(alpha)}
+        self.last_time_ns = 0
+        self.drops = {name: 0 for name in DROP_TYPE_NAMES.values()}
+        self.drops_intra = 0
+        self.drops_inter = 0
+        self.fec = {'repair_recv': 0, 'recovery_attempt': 0, 'recovered': 0, 'tail_flush': 0}
+
+    def _advance(self, t):
+        if t.size:
+            self.last_time_ns = max(self.last_time_ns, int(t.max()))
+
+    def add_fct(self, cols):
+        fct = cols['fct_ns']
+        slow = np.maximum(fct / np.maximum(cols['standalone_fct_ns'], 1), 1.0)
+        intra = cols['src_id'] // self.nodes_per_dc == cols['dst_id'] // self.nodes_per_dc
+        self.slowdown['intra'].add(slow[intra])
+        self.slowdown['inter'].add(slow[~intra])
+        self._advance(cols['start_ns'] + fct)
+
+    def add_drop(self, cols):
+        counts = np.bincount(cols['type'][(cols['type'] >= 0) & (cols['type'] < len(DROP_TYPE_NAMES))],
+                             minlength=len(DROP_TYPE_NAMES))
+        for t, name in DROP_TYPE_NAMES.items():
+            self.drops[name] += int(counts[t])
+        intra = cols['src_id'] // self.nodes_per_dc == cols['dst_id'] // self.nodes_per_dc
+        n_intra = int(np.count_nonzero(intra))
+        self.drops_intra += n_intra
+        self.drops_inter += intra.size - n_intra
+        self._advance(cols['time_ns'])
+
+    def add_fec(self, cols):
+        log_type = cols['log_type']
+        self.fec['repair_recv'] += int(np.count_nonzero(log_type == FEC_REPAIR_RECV))
+        self.fec['recovery_attempt'] += int(np.count_nonzero(log_type == FEC_RECOVERY_ATTEMPT))
+        self.fec['recovered'] += int(cols['param1'][log_type == FEC_RECOVERY_RESULT].sum())
+        self.fec['tail_flush'] += int(np.count_nonzero(log_type == FEC_TAIL_FLUSH))
+        self._advance(cols['time_ns'])
+
+    def snapshot(self):
+        """当前状态（可直接写 JSON）"""
+        status = {'sim_time_ms': self.last_time_ns / 1e6, 'flows': {}, 'slowdown': {}}
+        for name, sk in self.slowdown.items():
+            status['flows'][name] = sk.count
+            p50, p99 = sk.percentiles([50, 99]) if sk.count else (None, None)
+            status['slowdown'][name] = {'p50': p50, 'p99': p99}
+        n_flows = sum(status['flows'].values())
+        n_drops = sum(self.drops.values())
+        sim_s = self.last_time_ns / 1e9
+        status['drops'] = dict(self.drops, total=n_drops, intra=self.drops_intra, inter=self.drops_inter,
+                               per_sim_ms=n_drops / (sim_s * 1e3) if sim_s > 0 else 0.0,
+                               per_flow=n_drops / n_flows if n_flows else 0.0)
+        fec = dict(self.fec)
+        fec['recovery_rate'] = (fec['recovered'] / fec['recovery_attempt']) if fec['recovery_attempt'] else None
+        fec['recovered_per_repair'] = (fec['recovered'] / fec['repair_recv']) if fec['repair_recv'] else None
+        status['fec'] = fec
+        return status
+
+
+def _fmt(v, spec='.2f'):
+    return '-' if v is None else format(v, spec)
+
+
+def format_status(status, wall_s):
+    sd = status['slowdown']
+    line = (f"[{wall_s:7.0f}s] sim {status['sim_time_ms']:9.3f}ms | "
+            f"flows intra {status['flows']['intra']:,} inter {status['flows']['inter']:,} | "
+            f"slowdown intra p50/p99 {_fmt(sd['intra']['p50'])}/{_fmt(sd['intra']['p99'])} "
+            f"inter p50/p99 {_fmt(sd['inter']['p50'])}/{_fmt(sd['inter']['p99'])} | "
+            f"drops {status['drops']['total']:,} ({status['drops']['per_sim_ms']:.1f}/ms)")
+    fec = status['fec']
+    if fec['repair_recv'] or fec['recovery_attempt']:
+        line += (f" | fec recovered {fec['recovered']:,}/{fec['recovery_attempt']:,} attempts, "
+                 f"{_fmt(fec['recovered_per_repair'], '.3f')}/repair")
+    return line
+
+
+def write_status(path, status):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(status, f, indent=1)
+    os.replace(tmp, path)
+
+
+def resolve_run_files(target, output_dir):
+    """run 目录或 config id -> {日志类型: 路径}（文件可以尚未创建）"""
+    run_dir = target if os.path.isdir(target) else os.path.join(output_dir, target)
+    prefix = None
+    matches = sorted(glob.glob(os.path.join(run_dir, '*_out_fct.txt')))
+    if matches:
+        prefix = matches[0][:-len('_out_fct.txt')]
+    else:
+        prefix = os.path.join(run_dir, os.path.basename(os.path.normpath(run_dir)))
+    return {'fct': prefix + '_out_fct.txt', 'drop': prefix + '_out_drop.txt', 'fec': prefix + '_out_fec.txt'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='仿真运行期间增量分析 FCT/丢包/FEC 日志')
+    parser.add_argument('target', help='run 目录或 config id（在 mix/output 下查找）')
+    parser.add_argument('-i', '--interval', type=float, default=10.0, help='状态输出间隔（秒，默认: 10）')
+    parser.add_argument('--status-file', default=None, help='每次输出时同时写入该 JSON 文件')
+    parser.add_argument('--once', action='store_true', help='读完当前内容输出一次后退出')
+    parser.add_argument('--idle-exit', type=float, default=0,
+                        help='日志连续多少秒没有增长后退出（0 表示一直运行，默认: 0）')
+    parser.add_argument('--max-p99', type=float, default=None,
+                        help='任一类流的 p99 slowdown 超过该值时以退出码 3 结束，便于扫参脚本终止该配置')
+    parser.add_argument('--min-flows', type=int, default=1000, help='--max-p99 判定所需的最少完成流数（默认: 1000）')
+    parser.add_argument('--nodes-per-dc', type=int, default=53, help='每个数据中心的节点数（默认: 53）')
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help=f'DDSketch 相对误差（默认: {DEFAULT_ALPHA}）')
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'mix', 'output')
+    files = resolve_run_files(args.target, output_dir)
+    compressed = [p for p in files.values() if not os.path.exists(p) and find_log(p)]
+    if compressed:
+        # 压缩帧最长约 1 秒才写出一次，且无法按字节偏移增量读取
+        print(f"错误: 不支持跟踪压缩日志 (LOG_COMPRESSION)，请在仿真结束后用离线脚本分析: {', '.join(map(find_log, compressed))}")
+        return 1
+    readers = {name: TailReader(path, name) for name, path in files.items()}
+    stats = LiveStats(args.nodes_per_dc, args.alpha)
+    handlers = {'fct': stats.add_fct, 'drop': stats.add_drop, 'fec': stats.add_fec}
+    print(f"跟踪: {', '.join(files.values())}")
+
+    t_begin = time.time()
+    t_last_growth = t_begin
+    try:
+        while True:
+            grew = False
+            for name, reader in readers.items():
+                for cols in reader.poll_all():
+                    handlers[name](cols)
+                    grew = True
+            now = time.time()
+            if grew:
+                t_last_growth = now
+
+            status = stats.snapshot()
+            status['bytes_read'] = {name: r.offset for name, r in readers.items()}
+            status['skipped_lines'] = {name: r.n_skipped for name, r in readers.items()}
+            print(format_status(status, now - t_begin), flush=True)
+            if args.status_file:
+                write_status(args.status_file, status)
+
+            if args.max_p99 is not None:
+                for cls, sk in stats.slowdown.items():
+                    if sk.count >= args.min_flows and sk.quantile(0.99) > args.max_p99:
+                        print(f"{cls} p99 slowdown {sk.quantile(0.99):.2f} 超过阈值 {args.max_p99}")
+                        return EXIT_P99_EXCEEDED
+            if args.once:
+                return 0
+            if args.idle_exit and now - t_last_growth >= args.idle_exit:
+                print(f"日志 {args.idle_exit:.0f}s 没有增长，退出")
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
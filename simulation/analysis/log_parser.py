@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+内存映射的数值日志快速解析器
+
+仿真输出的 *_out_drop.txt / *_out_rto.txt / *_out_fec.txt / *_out_uplink.txt 等文件
+都是固定列数的整数记录（空格或逗号分隔）。本模块将文件 mmap 后按换行对齐切分为若干
+字节区间，在多个线程中用 NumPy 批量切词，直接得到每列一个 NumPy 数组，避免逐行 Python 解析。
+
+列数不符、含非数字字符（如 '#' 注释、小数点）的行会被跳过，与旧脚本逐行 try/except 的行为一致。
+
+仿真以 OUTPUT_FORMAT binary 运行时，同名文件改为“自描述头 + 定长小端记录”的二进制格式
+（见 src/point-to-point/model/monitor-log.h）。本模块自动识别该格式，用 np.memmap 直接映射为
+结构化数组，下面的各个接口对两种格式返回相同的列字典。
+
+以 LOG_COMPRESSION zstd|gzip 运行时日志文件名追加 .zst / .gz，内容是一串相互独立、
+各含整条记录的压缩帧，每帧前记录了帧的压缩/解压大小（格式见 monitor-log.h）。本模块先
+沿帧大小走一遍建立帧索引，再按帧把文件切成区间，在多个线程中并行解压并解析；传入未压缩的
+文件名时会自动找到对应的压缩文件。读取 .zst 需要 zstandard 模块，.gz 只依赖标准库。
+
+使用方法:
+python3 log_parser.py <log_file> [--schema drop|rto|fec|uplink|...] [-t 线程数]
+"""
+
+import argparse
+import functools
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 每种日志的列定义：columns 为 (列名, dtype) 序列，delimiter 为写入端使用的分隔符，
+# suffix 用于根据文件名自动识别日志类型。
+LogSchema = namedtuple('LogSchema', ['name', 'columns', 'delimiter', 'suffix'])
+
+# 二进制日志头：stream 为日志类型名，dtype 为记录的结构化 dtype，offset 为首条记录的字节偏移，
+# meta 为头部附带的其他 key=value
+BinaryHeader = namedtuple('BinaryHeader', ['stream', 'dtype', 'offset', 'meta'])
+
+# 压缩日志的帧索引（各字段为 int64 数组）：offset/size 为帧在压缩文件中的位置和字节数（含大小前缀），
+# raw_offset/raw_size 为帧解压后在原始日志中的区间
+FrameIndex = namedtuple('FrameIndex', ['offset', 'size', 'raw_offset', 'raw_size'])
+
+SCHEMAS = {
+    # cross_dc.cc: on_phy_drop / on_sw_admission_drop
+    'drop': LogSchema('drop', (
+        ('time_ns', np.int64), ('type', np.int8), ('node', np.uint32), ('interface', np.uint32),
+        ('src_id', np.uint32), ('dst_id', np.uint32), ('sport', np.uint16), ('dport', np.uint16),
+    ), b' ', '_out_drop.txt'),
+    # cross_dc.cc: on_rto_timeout
+    'rto': LogSchema('rto', (
+        ('time_ns', np.int64), ('node', np.uint32), ('flow_id', np.int32),
+        ('src_id', np.uint32), ('dst_id', np.uint32), ('sport', np.uint16), ('dport', np.uint16),
+        ('snd_una', np.int64), ('snd_nxt', np.int64), ('rto_ns', np.int64), ('timeout_count', np.uint32),
+    ), b' ', '_out_rto.txt'),
+    # cross_dc.cc: on_fec_debug（param 含义随 log_type 变化，见 on_fec_debug 注释）
+    'fec': LogSchema('fec', (
+        ('time_ns', np.int64), ('node', np.uint32), ('log_type', np.uint32),
+        ('param0', np.uint32), ('param1', np.uint32), ('param2', np.uint32), ('param3', np.uint32),
+    ), b' ', '_out_fec.txt'),
+    # cross_dc.cc: periodic_monitoring（累计发送字节）
+    'uplink': LogSchema('uplink', (
+        ('time_ns', np.int64), ('tor', np.uint32), ('iface', np.uint32), ('tx_bytes', np.int64),
+    ), b',', '_out_uplink.txt'),
+    # cross_dc.cc: qp_finish
+    'fct': LogSchema('fct', (
+        ('src_id', np.uint32), ('dst_id', np.uint32), ('sport', np.uint16), ('dport', np.uint16),
+        ('size', np.int64), ('start_ns', np.int64), ('fct_ns', np.int64), ('standalone_fct_ns', np.int64),
+    ), b' ', '_out_fct.txt'),
+    # cross_dc.cc: get_pfc
+    'pfc': LogSchema('pfc', (
+        ('time_ns', np.int64), ('node', np.uint32), ('node_type', np.uint8), ('interface', np.uint32),
+        ('pfc_type', np.uint8),
+    ), b' ', '_out_pfc.txt'),
+    # cross_dc.cc: cnp_freq_monitoring
+    'cnp': LogSchema('cnp', (
+        ('time_ns', np.int64), ('node', np.uint32), ('cnp_ecn', np.uint32), ('cnp_ooo', np.uint32),
+        ('cnp_total', np.uint32),
+    ), b' ', '_out_cnp.txt'),
+    # cross_dc.cc: periodic_monitoring（ConWeave VOQ）
+    'voq': LogSchema('voq', (
+        ('time_ns', np.int64), ('tor', np.uint32), ('n_queue', np.uint32), ('n_pkt', np.uint32),
+    ), b',', '_out_voq.txt'),
+    'voq_per_dst': LogSchema('voq_per_dst', (
+        ('time_ns', np.int64), ('dst', np.uint32), ('n_queue', np.uint32), ('n_pkt', np.uint32),
+    ), b',', '_out_voq_per_dst.txt'),
+    # cross_dc.cc: periodic_monitoring（每个服务器的 QP 数）
+    'conn': LogSchema('conn', (
+        ('time_ns', np.int64), ('server', np.uint32), ('n_qp', np.uint32), ('n_active_qp', np.uint32),
+    ), b',', '_out_conn.txt'),
+    # cross_dc.cc: ScheduleFlowInputs（流输入记录）
+    'in': LogSchema('in', (
+        ('src_id', np.uint32), ('dst_id', np.uint32), ('sport', np.uint16), ('dport', np.uint16),
+        ('size', np.int64), ('start_ns', np.int64),
+    ), b' ', '_in.txt'),
+}
+
+# 单块 1 MiB 左右时各中间数组能留在 CPU 缓存中，实测吞吐最高
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+
+# 二进制日志首行的魔数
+BINARY_MAGIC = b'#XDCBIN1'
+
+# 压缩日志的文件名后缀
+COMPRESSED_SUFFIXES = ('.zst', '.gz')
+# zstd：每帧前的 skippable frame（魔数、长度 8、压缩大小、解压大小）
+_ZSTD_INDEX = struct.Struct('<IIII')
+_ZSTD_INDEX_MAGIC = 0x184D2A5E
+# gzip：每帧是一个 gzip member，extra 字段 'XD' 中记录 member 大小和解压大小
+_GZIP_HEADER_BYTES = 24
+_GZIP_MAGIC = b'\x1f\x8b\x08\x04'
+
+_NEWLINE = 10
+_MINUS = 45
+_MAX_DIGITS = 18  # int64 可无损表示的十进制位数
+
+
+def get_schema(schema):
+    """接受 schema 名称或 LogSchema 对象，返回 LogSchema"""
+    if isinstance(schema, LogSchema):
+        return schema
+    if schema not in SCHEMAS:
+        raise ValueError(f"未知的日志类型: {schema} (可选: {', '.join(sorted(SCHEMAS))})")
+    return SCHEMAS[schema]
+
+
+def schema_for_file(file_path):
+    """根据文件名后缀推断日志类型，无法识别时返回 None"""
+    base = os.path.basename(file_path)
+    for suffix in COMPRESSED_SUFFIXES:
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    # 后缀最长者优先，避免 _out_voq_per_dst.txt 被识别为 _out_voq.txt 之类的误判
+    for schema in sorted(SCHEMAS.values(), key=lambda s: len(s.suffix), reverse=True):
+        if base.endswith(schema.suffix):
+            return schema
+    return None
+
+
+def find_log(file_path):
+    """file_path 或其压缩版本（追加 .zst / .gz）中存在的那个，都不存在时返回 None"""
+    for path in (file_path,) + tuple(file_path + s for s in COMPRESSED_SUFFIXES):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _log_path(file_path):
+    return find_log(file_path) or file_path
+
+
+def is_compressed(file_path):
+    return file_path.endswith(COMPRESSED_SUFFIXES)
+
+
+@functools.lru_cache(maxsize=64)
+def _frame_index(file_path, size, mtime_ns):
+    zstd = file_path.endswith('.zst')
+    rows = []
+    pos = raw = 0
+    with open(file_path, 'rb') as f:
+        while True:
+            f.seek(pos)
+            head = f.read(_ZSTD_INDEX.size if zstd else _GZIP_HEADER_BYTES)
+            if len(head) < (_ZSTD_INDEX.size if zstd else _GZIP_HEADER_BYTES):
+                break
+            if zstd:
+                magic, _, csize, raw_size = _ZSTD_INDEX.unpack(head)
+                if magic != _ZSTD_INDEX_MAGIC:
+                    raise ValueError(f"zstd 日志缺少帧索引（不是仿真写出的压缩日志）: {file_path}")
+                frame = _ZSTD_INDEX.size + csize
+            else:
+                if head[:4] != _GZIP_MAGIC or head[12:14] != b'XD':
+                    raise ValueError(f"gzip 日志缺少帧索引（不是仿真写出的压缩日志）: {file_path}")
+                frame, raw_size = struct.unpack_from('<II', head, 16)
+            # 最后一帧可能仍在写入
+            if pos + frame > size:
+                break
+            rows.append((pos, frame, raw, raw_size))
+            pos += frame
+            raw += raw_size
+    cols = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    return FrameIndex(*(cols[:, i] for i in range(4)))
+
+
+def read_frame_index(file_path):
+    """压缩日志的帧索引（FrameIndex），只读取每帧的大小前缀"""
+    st = os.stat(file_path)
+    return _frame_index(os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+
+
+def _decompress_frame(frame, zstd):
+    if not zstd:
+        return zlib.decompress(frame, wbits=31)
+    if zstandard is None:
+        raise ImportError("读取 .zst 日志需要 zstandard 模块 (pip install zstandard)")
+    return zstandard.ZstdDecompressor().decompress(frame[_ZSTD_INDEX.size:])
+
+
+def read_uncompressed(file_path, start=0, end=None):
+    """
+    压缩日志解压后 [start, end) 区间的字节，只解压覆盖该区间的帧
+
+    zlib 和 zstandard 解压时释放 GIL，不同区间可以在多个线程中并行读取。
+    """
+    index = read_frame_index(file_path)
+    total = log_size(file_path)
+    end = total if end is None else min(end, total)
+    if start >= end:
+        return b''
+    first = int(np.searchsorted(index.raw_offset, start, side='right')) - 1
+    last = int(np.searchsorted(index.raw_offset, end, side='left'))
+    zstd = file_path.endswith('.zst')
+    parts = []
+    with open(file_path, 'rb') as f:
+        for i in range(first, last):
+            f.seek(int(index.offset[i]))
+            parts.append(_decompress_frame(f.read(int(index.size[i])), zstd))
+    data = b''.join(parts)
+    base = int(index.raw_offset[first])
+    return data[start - base:end - base]
+
+
+def log_size(file_path):
+    """日志的（解压后）字节数；压缩日志只计入已完整写出的帧"""
+    if not is_compressed(file_path):
+        return os.path.getsize(file_path)
+    index = read_frame_index(file_path)
+    return int(index.raw_offset[-1] + index.raw_size[-1]) if index.offset.size else 0
+
+
+def _first_line(file_path):
+    """日志的首行（bytes，含换行符）；压缩日志从第一帧中读取"""
+    if not is_compressed(file_path):
+        with open(file_path, 'rb') as f:
+            return f.readline()
+    index = read_frame_index(file_path)
+    if index.offset.size == 0:
+        return b''
+    data = read_uncompressed(file_path, 0, int(index.raw_size[0]))
+    nl = data.find(b'\n')
+    return data if nl < 0 else data[:nl + 1]
+
+
+def parse_binary_header(line):
+    """
+    解析二进制日志的头部行，例如
+    #XDCBIN1 stream=fct record_bytes=36 fields=src_id:<u4,dst_id:<u4,... [key=value ...]
+    """
+    items = dict(kv.split('=', 1) for kv in line[len(BINARY_MAGIC):].decode('ascii').split())
+    dtype = np.dtype([tuple(f.split(':')) for f in items.pop('fields').split(',')])
+    record_bytes = int(items.pop('record_bytes'))
+    if dtype.itemsize != record_bytes:
+        raise ValueError(f"二进制日志头部不一致: 字段共 {dtype.itemsize} 字节, record_bytes={record_bytes}")
+    return BinaryHeader(items.pop('stream'), dtype, len(line), items)
+
+
+def read_binary_header(file_path):
+    """二进制日志返回 BinaryHeader；文本日志、空文件或头部尚未写完时返回 None"""
+    file_path = _log_path(file_path)
+    if not is_compressed(file_path):
+        with open(file_path, 'rb') as f:
+            if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+                return None
+    line = _first_line(file_path)
+    if not line.startswith(BINARY_MAGIC) or not line.endswith(b'\n'):
+        return None
+    return parse_binary_header(line)
+
+
+def read_log_meta(file_path):
+    """
+    日志头部附带的 key=value（如 sample_rate），没有头部时返回 {}
+
+    文本日志为首行 '# key=value ...'，二进制日志为头部行中 stream/record_bytes/fields 之外的项。
+    """
+    try:
+        file_path = _log_path(file_path)
+        header = read_binary_header(file_path)
+        if header is not None:
+            return dict(header.meta)
+        first = _first_line(file_path).decode('utf-8', errors='replace')
+    except (OSError, ValueError, ImportError):
+        return {}
+    if not first.startswith('#'):
+        return {}
+    meta = {}
+    for token in first[1:].split():
+        k, sep, v = token.partition('=')
+        if sep:
+            meta[k] = v
+    return meta
+
+
+def parse_rate(value):
+    """采样率字符串（小数或 1/N 形式）转为浮点数"""
+    num, sep, den = value.partition('/')
+    return float(num) / float(den) if sep else float(value)
+
+
+def read_sample_rates(file_path):
+    """
+    头部记录的采样率: (默认采样率, {事件类型: 采样率})，没有记录时默认采样率为 None
+
+    仿真按 flowHash 做确定性采样（sample_key=flow_hash），同一条流的事件全部保留或全部丢弃，
+    因此计数除以采样率即为全量估计；按类型的采样率记为 sample_rate.<type>=<rate>。
+    """
+    meta = read_log_meta(file_path)
+    default = parse_rate(meta['sample_rate']) if 'sample_rate' in meta else None
+    per_type = {int(k.split('.', 1)[1]): parse_rate(v) for k, v in meta.items()
+                if k.startswith('sample_rate.')}
+    return default, per_type
+
+
+def open_binary_log(file_path, header=None):
+    """
+    以 np.memmap 只读映射二进制日志，返回结构化数组（每个字段即一列）
+
+    文件末尾尚未写完的半条记录会被忽略，因此可以在仿真运行期间读取。
+    压缩日志无法映射，整体解压到内存中。
+    """
+    file_path = _log_path(file_path)
+    header = header or read_binary_header(file_path)
+    if header is None:
+        raise ValueError(f"不是二进制日志: {file_path}")
+    if is_compressed(file_path):
+        data = read_uncompressed(file_path, header.offset)
+        return np.frombuffer(data, dtype=header.dtype, count=len(data) // header.dtype.itemsize)
+    n_records = (os.path.getsize(file_path) - header.offset) // header.dtype.itemsize
+    if n_records <= 0:
+        return np.empty(0, dtype=header.dtype)
+    return np.memmap(file_path, dtype=header.dtype, mode='r', offset=header.offset, shape=(n_records,))
+
+
+def binary_to_columns(records, schema):
+    """将结构化记录数组按 schema 拆分为列字典（复制出独立数组，不再引用映射）"""
+    schema = get_schema(schema)
+    return {name: np.array(records[name], dtype=dtype) for name, dtype in schema.columns}
+
+
+def _resolve_schema(file_path, schema, header):
+    if schema is not None:
+        return get_schema(schema)
+    schema = schema_for_file(file_path)
+    if schema is None and header is not None and header.stream in SCHEMAS:
+        schema = SCHEMAS[header.stream]
+    return schema
+
+
+def empty_columns(schema):
+    """返回与 schema 对应的空列字典"""
+    schema = get_schema(schema)
+    return {name: np.empty(0, dtype=dtype) for name, dtype in schema.columns}
+
+
+def tokenize_int_records(buf, ncols, delimiter=b' '):
+    """
+    将一段文本批量切分为 (行数, ncols) 的 int64 矩阵
+
+    先用 NumPy 向量化地给每个字节分类，统计每行 token 数并找出坏行（列数不符、含非法字符、
+    数字超出 int64 范围），把坏行抹成空白后交给 np.fromstring 一次性转成整数。
+    返回 (records, n_skipped_lines)。
+    """
+    text = bytes(buf)
+    if not text:
+        return np.empty((0, ncols), dtype=np.int64), 0
+    if delimiter.strip():
+        # np.fromstring 只接受空白分隔，非空白分隔符统一替换成空格
+        text = text.translate(bytes.maketrans(delimiter, b' ' * len(delimiter)))
+    data = np.frombuffer(text, dtype=np.uint8)
+    n = data.size
+
+    is_digit = (data - np.uint8(48)) < 10
+    is_nl = data == _NEWLINE
+    is_minus = data == _MINUS
+    is_sep = (data == 32) | (data == 9) | (data == 13)
+
+    # 每行的 [起始, 结束) 位置，最后一行可能没有换行符
+    nl_pos = np.flatnonzero(is_nl)
+    if not is_nl[-1]:
+        nl_pos = np.append(nl_pos, n)
+    line_start = np.empty_like(nl_pos)
+    line_start[0] = 0
+    line_start[1:] = nl_pos[:-1] + 1
+    n_lines = nl_pos.size
+
+    # 非法字节所在行标记为坏行
+    bad_line = np.zeros(n_lines, dtype=bool)
+    bad_pos = np.flatnonzero(~(is_digit | is_nl | is_minus | is_sep))
+    del is_sep, is_nl
+
+    # '-' 只能作为负数前缀：后面紧跟数字，前面不是数字
+    minus_pos = np.flatnonzero(is_minus)
+    if minus_pos.size:
+        nxt = np.minimum(minus_pos + 1, n - 1)
+        prv = np.maximum(minus_pos - 1, 0)
+        ok = (minus_pos + 1 < n) & is_digit[nxt] & ((minus_pos == 0) | ~is_digit[prv])
+        bad_pos = np.concatenate((bad_pos, minus_pos[~ok]))
+    del is_minus
+    if bad_pos.size:
+        bad_line[np.searchsorted(nl_pos, bad_pos)] = True
+
+    # 每行 token 数必须等于列数，数字位数不能超出 int64 范围
+    starts = is_digit.copy()
+    starts[1:] &= ~is_digit[:-1]
+    ends = is_digit.copy()
+    ends[:-1] &= ~is_digit[1:]
+    tok_start = np.flatnonzero(starts)
+    tok_end = np.flatnonzero(ends)
+    del starts, ends, is_digit
+    tokens_per_line = np.bincount(np.searchsorted(nl_pos, tok_start), minlength=n_lines)
+    too_long = (tok_end - tok_start) >= _MAX_DIGITS
+    if too_long.any():
+        bad_line[np.searchsorted(nl_pos, tok_start[too_long])] = True
+    empty_line = tokens_per_line == 0
+    bad_line |= ~empty_line & (tokens_per_line != ncols)
+    n_skipped = int(np.count_nonzero(bad_line))
+
+    if n_skipped:
+        # 坏行整行抹成空格：剩下的 token 恰好是 ncols 的整数倍，且按行连续排列
+        mark = np.zeros(n + 1, dtype=np.int8)
+        mark[line_start[bad_line]] += 1
+        mark[nl_pos[bad_line]] -= 1
+        arr = data.copy()
+        arr[np.cumsum(mark[:-1], dtype=np.int8) > 0] = 32
+        text = arr.tobytes()
+        del arr, mark
+    del data
+
+    n_good = int(np.count_nonzero(~bad_line & ~empty_line))
+    if n_good == 0:
+        return np.empty((0, ncols), dtype=np.int64), n_skipped
+    values = np.fromstring(text, dtype=np.int64, sep=' ')
+    return values.reshape(n_good, ncols), n_skipped
+
+
+def records_to_columns(records, schema):
+    """将 (行数, ncols) 矩阵按 schema 拆分为列字典"""
+    schema = get_schema(schema)
+    return {name: records[:, i].astype(dtype, copy=False) for i, (name, dtype) in enumerate(schema.columns)}
+
+
+def concat_columns(parts, schema):
+    """拼接多个列字典"""
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return empty_columns(schema)
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name, _ in get_schema(schema).columns}
+
+
+def split_byte_ranges(file_path, chunk_bytes=DEFAULT_CHUNK_BYTES, start=0, end=None):
+    """
+    将文件（或其中的 [start, end) 区间）切分为若干换行对齐的字节区间 [(start, end), ...]
+
+    每个区间（除最后一个外）都以换行符结尾，因此可以被独立解析。
+    start 必须位于行首，end 必须位于行尾或文件末尾。
+    二进制日志的区间跳过头部并按整条记录对齐。
+    压缩日志的区间以解压后的偏移表示，边界取在帧边界上（帧总是由整条记录组成）。
+    """
+    file_path = _log_path(file_path)
+    size = log_size(file_path)
+    end = size if end is None else min(end, size)
+    if size == 0 or start >= end:
+        return []
+    chunk_bytes = max(int(chunk_bytes), 1)
+    header = read_binary_header(file_path)
+    if is_compressed(file_path):
+        if header is not None:
+            start = max(start, header.offset)
+        index = read_frame_index(file_path)
+        ranges = []
+        for frame_end in (index.raw_offset + index.raw_size).tolist():
+            if frame_end <= start:
+                continue
+            stop = min(frame_end, end)
+            if stop - start >= chunk_bytes or stop == end:
+                ranges.append((start, stop))
+                start = stop
+            if stop == end:
+                break
+        return ranges
+    if header is not None:
+        rec = header.dtype.itemsize
+        first = (max(start, header.offset) - header.offset + rec - 1) // rec
+        last = (end - header.offset) // rec
+        step = max(chunk_bytes // rec, 1)
+        return [(header.offset + i * rec, header.offset + min(i + step, last) * rec)
+                for i in range(first, last, step)]
+    ranges = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        while start < end:
+            target = start + chunk_bytes
+            if target >= end:
+                stop = end
+            else:
+                nl = mm.find(b'\n', target - 1, end)
+                stop = end if nl < 0 else nl + 1
+            ranges.append((start, stop))
+            start = stop
+    return ranges
+
+
+def _parse_mapped_range(mm, schema, start, end):
+    records, n_skipped = tokenize_int_records(mm[start:end], len(schema.columns), schema.delimiter)
+    return records_to_columns(records, schema), n_skipped
+
+
+def _parse_compressed_range(file_path, schema, header, start, end):
+    """解压并解析压缩日志中 [start, end) 区间（解压后的偏移，按帧/记录对齐）"""
+    data = read_uncompressed(file_path, start, end)
+    if header is not None:
+        return binary_to_columns(np.frombuffer(data, dtype=header.dtype), schema), 0
+    records, n_skipped = tokenize_int_records(data, len(schema.columns), schema.delimiter)
+    return records_to_columns(records, schema), n_skipped
+
+
+def _binary_range(records, header, schema, start, end):
+    """二进制日志中 [start, end) 字节区间（记录对齐）的列字典"""
+    rec = header.dtype.itemsize
+    return binary_to_columns(records[(start - header.offset) // rec:(end - header.offset) // rec], schema), 0
+
+
+def parse_byte_range(file_path, schema, start, end):
+    """
+    解析文件中的一个字节区间，返回 (列字典, 跳过行数)
+
+    自行打开并映射文件，可直接作为进程池任务使用。
+    """
+    schema = get_schema(schema)
+    if end <= start:
+        return empty_columns(schema), 0
+    file_path = _log_path(file_path)
+    header = read_binary_header(file_path)
+    if is_compressed(file_path):
+        return _parse_compressed_range(file_path, schema, header, start, end)
+    if header is not None:
+        return _binary_range(open_binary_log(file_path, header), header, schema, start, end)
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _parse_mapped_range(mm, schema, start, end)
+
+
+def iter_byte_range(file_path, schema, start, end, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    在单个线程内逐块解析 [start, end) 区间，产出 (列字典, 跳过行数)
+
+    适合作为进程池任务：每个进程负责一大段区间，内部仍按小块解析以保持缓存友好。
+    """
+    schema = get_schema(schema)
+    file_path = _log_path(file_path)
+    ranges = split_byte_ranges(file_path, chunk_bytes, start, end)
+    if not ranges:
+        return
+    header = read_binary_header(file_path)
+    if is_compressed(file_path):
+        for s, e in ranges:
+            yield _parse_compressed_range(file_path, schema, header, s, e)
+        return
+    if header is not None:
+        records = open_binary_log(file_path, header)
+        for s, e in ranges:
+            yield _binary_range(records, header, schema, s, e)
+        return
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for s, e in ranges:
+            yield _parse_mapped_range(mm, schema, s, e)
+
+
+def iter_log_chunks(file_path, schema=None, chunk_bytes=DEFAULT_CHUNK_BYTES, n_threads=None):
+    """
+    按文件顺序逐块产出 (列字典, 跳过行数)
+
+    同一时刻最多有 n_threads 个块在解析，内存占用与文件大小无关。
+    二进制日志直接从映射中按块取出记录，不需要解析线程。
+    压缩日志按帧切块，在解析线程中并行解压。
+    """
+    if find_log(file_path) is None:
+        raise FileNotFoundError(f"日志文件不存在: {file_path}")
+    file_path = find_log(file_path)
+    header = read_binary_header(file_path)
+    schema = _resolve_schema(file_path, schema, header)
+    if schema is None:
+        raise ValueError(f"无法根据文件名识别日志类型: {file_path}")
+
+    ranges = split_byte_ranges(file_path, chunk_bytes)
+    if not ranges:
+        return
+    if header is not None and not is_compressed(file_path):
+        records = open_binary_log(file_path, header)
+        for s, e in ranges:
+            yield _binary_range(records, header, schema, s, e)
+        return
+    n_threads = n_threads or min(len(ranges), os.cpu_count() or 1)
+
+    if is_compressed(file_path):
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            for i in range(0, len(ranges), n_threads):
+                futures = [pool.submit(_parse_compressed_range, file_path, schema, header, s, e)
+                           for s, e in ranges[i:i + n_threads]]
+                for fut in futures:
+                    yield fut.result()
+        return
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            for i in range(0, len(ranges), n_threads):
+                window = ranges[i:i + n_threads]
+                futures = [pool.submit(_parse_mapped_range, mm, schema, s, e) for s, e in window]
+                for fut in futures:
+                    yield fut.result()
+
+
+def parse_log(file_path, schema=None, chunk_bytes=DEFAULT_CHUNK_BYTES, n_threads=None):
+    """
+    解析整个日志文件，返回 {列名: NumPy 数组}
+
+    schema 缺省时根据文件名后缀（二进制日志还可根据头部的 stream）自动识别。
+    """
+    file_path = _log_path(file_path)
+    header = read_binary_header(file_path) if os.path.exists(file_path) else None
+    schema = _resolve_schema(file_path, schema, header)
+    if header is not None and not is_compressed(file_path):
+        return binary_to_columns(open_binary_log(file_path, header), schema)
+    parts = [cols for cols, _ in iter_log_chunks(file_path, schema, chunk_bytes, n_threads)]
+    return concat_columns(parts, schema)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数值日志快速解析（mmap + NumPy）')
+    parser.add_argument('log_file', help='日志文件路径')
+    parser.add_argument('--schema', choices=sorted(SCHEMAS), default=None,
+                        help='日志类型 (默认: 根据文件名后缀识别)')
+    parser.add_argument('-t', '--threads', type=int, default=None,
+                        help='解析线程数 (默认: CPU 核数)')
+    parser.add_argument('-c', '--chunk-mb', type=int, default=DEFAULT_CHUNK_BYTES // (1024 * 1024),
+                        help='每个解析块的大小 MB (默认: 1)')
+    args = parser.parse_args()
+
+    args.log_file = _log_path(args.log_file)
+    header = read_binary_header(args.log_file)
+    schema = _resolve_schema(args.log_file, args.schema, header)
+    if schema is None:
+        print(f"错误: 无法识别日志类型，请通过 --schema 指定: {args.log_file}")
+        return 1
+
+    file_size = os.path.getsize(args.log_file)
+    start_time = time.time()
+    parts = []
+    n_skipped = 0
+    for cols, skipped in iter_log_chunks(args.log_file, schema, args.chunk_mb * 1024 * 1024, args.threads):
+        parts.append(cols)
+        n_skipped += skipped
+    columns = concat_columns(parts, schema)
+    elapsed = max(time.time() - start_time, 1e-9)
+
+    n_rows = len(next(iter(columns.values())))
+    print(f"日志类型: {schema.name} ({'二进制' if header else '文本'}"
+          f"{', ' + args.log_file.rsplit('.', 1)[1] + ' 压缩' if is_compressed(args.log_file) else ''}), "
+          f"文件大小: {file_size / (1024 * 1024):.1f} MB")
+    print(f"记录数: {n_rows:,}, 跳过行数: {n_skipped:,}")
+    print(f"耗时: {elapsed:.2f} 秒 ({n_rows / elapsed:,.0f} 行/秒, {file_size / elapsed / (1024 * 1024):.1f} MB/秒)")
+    for name, _ in schema.columns:
+        col = columns[name]
+        if col.size:
+            print(f"  {name:<18} min={col.min():<14} max={col.max()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,127 +1,420 @@
 #!/usr/bin/env python3
+"""
+PFC 分析：pause 区间重建、端口/层级暂停时间占比、pause 传播链，以及有无 EdgeCNP 的对比
+
+事件按 (端口, 时间) 排序一次，再用 searchsorted 向量化地匹配 pause/resume，
+PFC 风暴下上百万条事件也是线性时间。
+
+使用方法:
+python3 analyze_pfc.py --pfc-file mix/pfc.txt --topology config/topo.txt
+python3 analyze_pfc.py --with-edge-cnp a_pfc.txt --without-edge-cnp b_pfc.txt
+"""
 import os
-import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
+import sys
 import argparse
-import seaborn as sns
-from matplotlib.ticker import FuncFormatter
+import numpy as np
+
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(_CUR_DIR))
+from log_parser import parse_log
+
+# 端口键 = node * IF_STRIDE + 接口号
+IF_STRIDE = 1 << 16
+
+# 按到最近服务器的跳数划分的交换机层级
+TIER_NAMES = ['Server', 'ToR', 'Agg', 'Core', 'DCI']
+
 
 def format_time(x, pos):
-    """Format time steps to microseconds"""
+    """将时间步格式化为微秒"""
     return f"{x/1000:.0f}μs"
 
-def analyze_pfc_file(pfc_file, default_pause_time=5000):  # Default 5 microseconds = 5000 nanoseconds
-    """Analyze PFC log file and return statistics"""
+
+def tier_name(tier):
+    return TIER_NAMES[tier] if 0 <= tier < len(TIER_NAMES) else f'Tier{tier}'
+
+
+def load_topology(topo_file):
+    """
+    读取拓扑文件，还原仿真中的端口编号
+
+    cross_dc.cc 按文件顺序为每条链路两端各安装一个 QbbNetDevice，且每个节点的 0 号设备是
+    loopback，因此链路在节点上的接口号 = 1 + 该节点此前的链路数。
+    返回每个端口的数组 (port, node, if_idx, peer_node, peer_if) 以及每个节点的层级
+    """
+    with open(topo_file, 'r') as f:
+        node_num, switch_num, link_num = map(int, f.readline().split()[:3])
+        switch_ids = [int(x) for x in f.readline().split()[:switch_num]]
+        links = []
+        for _ in range(link_num):
+            parts = f.readline().split()
+            if len(parts) >= 2:
+                links.append((int(parts[0]), int(parts[1])))
+
+    next_if = np.ones(node_num, dtype=np.int64)
+    port_node, port_if, peer_node, peer_if = [], [], [], []
+    for a, b in links:
+        ia, ib = next_if[a], next_if[b]
+        next_if[a] += 1
+        next_if[b] += 1
+        port_node += [a, b]
+        port_if += [ia, ib]
+        peer_node += [b, a]
+        peer_if += [ib, ia]
+
+    port_node = np.array(port_node, dtype=np.int64)
+    port_if = np.array(port_if, dtype=np.int64)
+    peer_node = np.array(peer_node, dtype=np.int64)
+    peer_if = np.array(peer_if, dtype=np.int64)
+
+    # 从所有服务器出发 BFS：ToR = 1 跳，Agg = 2，Core = 3，DCI = 4
+    is_switch = np.zeros(node_num, dtype=bool)
+    is_switch[switch_ids] = True
+    tier = np.full(node_num, -1, dtype=np.int64)
+    tier[~is_switch] = 0
+    frontier = np.flatnonzero(~is_switch)
+    depth = 0
+    while frontier.size:
+        depth += 1
+        reached = np.zeros(node_num, dtype=bool)
+        reached[frontier] = True
+        nxt = np.unique(peer_node[reached[port_node]])
+        nxt = nxt[tier[nxt] < 0]
+        tier[nxt] = depth
+        frontier = nxt
+
+    order = np.argsort(port_node * IF_STRIDE + port_if)
+    return {
+        'node_num': node_num,
+        'tier': tier,
+        'port': (port_node * IF_STRIDE + port_if)[order],
+        'node': port_node[order],
+        'if_idx': port_if[order],
+        'peer_node': peer_node[order],
+        'peer_if': peer_if[order],
+    }
+
+
+def reconstruct_pause_intervals(cols, default_pause_time=5000):
+    """
+    由 PFC 事件重建 pause 区间
+
+    端口在 resume 之后（或日志开头）的第一个 pause 进入暂停状态，重复的 pause 只延长该区间，
+    未暂停时的 resume 被忽略。区间在同一端口的下一个 resume 结束；末尾没有匹配 resume 的
+    pause 以最后一次 pause + 默认 pause time 结束，且不超过日志中的最后时间点
+    """
+    time_ns = cols['time_ns']
+    if time_ns.size == 0:
+        return None
+    max_time = time_ns.max()
+    # node / interface 为 uint32 列，先转成 int64 再拼键，否则节点号 >= 65536 时溢出
+    port = cols['node'].astype(np.int64) * IF_STRIDE + cols['interface'].astype(np.int64)
+
+    # 按 (端口, 时间) 排序一次；lexsort 是稳定排序，同一时刻的事件保持文件顺序
+    order = np.lexsort((time_ns, port))
+    port = port[order]
+    t = time_ns[order]
+    is_pause = cols['pfc_type'][order] == 1
+
+    new_port = np.ones(port.size, dtype=bool)
+    new_port[1:] = port[1:] != port[:-1]
+    prev_pause = np.zeros(port.size, dtype=bool)
+    prev_pause[1:] = is_pause[:-1]
+    starts = np.flatnonzero(is_pause & (new_port | ~prev_pause))
+
+    # 每个区间起点之后的第一个 resume，且必须属于同一端口
+    resume_idx = np.flatnonzero(~is_pause)
+    pos = np.searchsorted(resume_idx, starts, side='right')
+    end = np.full(starts.size, -1, dtype=np.int64)
+    has_resume = pos < resume_idx.size
+    end[has_resume] = resume_idx[pos[has_resume]]
+    matched = has_resume & (port[np.maximum(end, 0)] == port[starts])
+
+    # 区间内最后一次 pause 是其 resume 前的那条事件；没有 resume 时是该端口的最后一条事件
+    port_last = np.flatnonzero(np.append(port[1:] != port[:-1], True))
+    last_of_port = port_last[np.searchsorted(port_last, starts)]
+    last_pause_idx = np.where(matched, end - 1, last_of_port)
+
+    pause_time = t[starts]
+    last_pause_time = t[last_pause_idx]
+    resume_time = np.where(matched, t[np.maximum(end, 0)],
+                           np.minimum(last_pause_time + default_pause_time, max_time))
+    return {
+        'port': port[starts],
+        'node_id': port[starts] // IF_STRIDE,
+        'if_idx': port[starts] % IF_STRIDE,
+        'pause_time': pause_time,
+        'resume_time': resume_time,
+        'last_pause_time': last_pause_time,
+        'duration': resume_time - pause_time,
+        'matched': matched,
+    }
+
+
+def compute_port_stats(events, span_ns, topology=None, node_type=None):
+    """
+    每个端口、每个层级的暂停时间占比
+
+    给出拓扑时统计所有端口（包括从未暂停的端口）；否则层级退化为 nodeType 列
+    （服务器/交换机），且只统计日志中出现过的端口
+    """
+    ports, inverse = np.unique(events['port'], return_inverse=True)
+    paused_ns = np.bincount(inverse, weights=events['duration'], minlength=ports.size)
+    n_pauses = np.bincount(inverse, minlength=ports.size)
+    port_stats = {
+        'port': ports,
+        'node_id': ports // IF_STRIDE,
+        'if_idx': ports % IF_STRIDE,
+        'n_pauses': n_pauses,
+        'paused_ns': paused_ns,
+        'paused_fraction': paused_ns / span_ns if span_ns > 0 else np.zeros(ports.size),
+    }
+
+    if topology is not None:
+        all_tier = topology['tier'][topology['node']]
+        port_tier = topology['tier'][ports // IF_STRIDE]
+    else:
+        nodes, first = np.unique(node_type['node'], return_index=True)
+        switch = node_type['node_type'][first][np.searchsorted(nodes, ports // IF_STRIDE)] > 0
+        all_tier = np.where(switch, 1, 0)
+        port_tier = all_tier
+    port_stats['tier'] = port_tier
+
+    tier_stats = []
+    for tier in np.unique(all_tier):
+        n_ports = int(np.count_nonzero(all_tier == tier))
+        mask = port_tier == tier
+        total = float(paused_ns[mask].sum())
+        if topology is None:
+            name = 'Switch' if tier else 'Server'
+        else:
+            name = tier_name(int(tier))
+        tier_stats.append({
+            'tier': name,
+            'n_ports': n_ports,
+            'n_paused_ports': int(np.count_nonzero(mask)),
+            'n_pauses': int(n_pauses[mask].sum()),
+            'paused_ns': total,
+            'paused_fraction': total / (n_ports * span_ns) if span_ns > 0 and n_ports else 0.0,
+            'max_port_fraction': float(port_stats['paused_fraction'][mask].max()) if mask.any() else 0.0,
+        })
+    return port_stats, tier_stats
+
+
+def _propagation_edges(topology):
+    """
+    (下游端口, 上游端口) 对：端口 (N, i) 被对端 Q 暂停后，N 的入口缓存堆积，
+    N 会暂停其他每个邻居 U，即朝向 N 的端口 (U, j)，U != Q
+    """
+    tp = topology
+    # 朝向节点 N 的端口，按 N 分组
+    in_order = np.argsort(tp['peer_node'], kind='stable')
+    in_node = tp['peer_node'][in_order]
+    in_start = np.searchsorted(in_node, np.arange(tp['node_num']))
+    in_end = np.searchsorted(in_node, np.arange(tp['node_num']), side='right')
+
+    counts = in_end[tp['node']] - in_start[tp['node']]
+    down = np.repeat(np.arange(tp['port'].size), counts)
+    offset = np.arange(down.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    up = in_order[in_start[tp['node']][down] + offset]
+    keep = tp['node'][up] != tp['peer_node'][down]
+    return tp['port'][down[keep]], tp['port'][up[keep]]
+
+
+def find_pause_propagation(events, topology, window_ns):
+    """
+    相邻端口之间的 pause 传播
+
+    对拓扑中每条 (下游, 上游) 边，统计下游 pause 之后 window_ns 内出现上游 pause 的次数；
+    并把每个 pause 区间关联到可能引起它的最近一次下游 pause，构成传播链
+    """
+    down_keys, up_keys = _propagation_edges(topology)
+    ports, port_start = np.unique(events['port'], return_index=True)
+    port_end = np.append(port_start[1:], events['port'].size)
+    start = events['pause_time']
+    n = start.size
+
+    # (端口序号, 起点) 组合键；事件已按它排好序
+    t0 = start.min()
+    stride = int(start.max() - t0) + 2 * int(window_ns) + 1
+    rank = np.repeat(np.arange(ports.size), port_end - port_start)
+    comp = rank * stride + (start - t0)
+
+    # 只需考虑两端都至少暂停过一次的边
+    d_pos = np.searchsorted(ports, down_keys)
+    u_pos = np.searchsorted(ports, up_keys)
+    valid = ((d_pos < ports.size) & (u_pos < ports.size))
+    valid[valid] &= (ports[d_pos[valid]] == down_keys[valid]) & (ports[u_pos[valid]] == up_keys[valid])
+    d_pos, u_pos = d_pos[valid], u_pos[valid]
+    down_keys, up_keys = down_keys[valid], up_keys[valid]
+
+    edge_rows = []
+    if d_pos.size:
+        # 每个下游 pause × 每个上游端口：[t, t + window] 内的第一个上游起点
+        cnt = port_end[d_pos] - port_start[d_pos]
+        edge = np.repeat(np.arange(d_pos.size), cnt)
+        ev = np.repeat(port_start[d_pos], cnt) + (np.arange(edge.size) - np.repeat(np.cumsum(cnt) - cnt, cnt))
+        q = u_pos[edge] * stride + (start[ev] - t0)
+        hit = np.searchsorted(comp, q, side='left')
+        ok = hit < n
+        ok[ok] &= comp[hit[ok]] <= q[ok] + window_ns
+        lag = np.where(ok, start[np.minimum(hit, n - 1)] - start[ev], 0)
+        n_prop = np.bincount(edge, weights=ok, minlength=d_pos.size)
+        lag_sum = np.bincount(edge, weights=lag, minlength=d_pos.size)
+        for e in np.flatnonzero(n_prop):
+            edge_rows.append({
+                'down_node': int(down_keys[e] // IF_STRIDE), 'down_if': int(down_keys[e] % IF_STRIDE),
+                'up_node': int(up_keys[e] // IF_STRIDE), 'up_if': int(up_keys[e] % IF_STRIDE),
+                'n_down_pauses': int(cnt[e]), 'n_propagated': int(n_prop[e]),
+                'ratio': n_prop[e] / cnt[e], 'avg_lag_ns': lag_sum[e] / n_prop[e],
+            })
+        edge_rows.sort(key=lambda r: r['n_propagated'], reverse=True)
+
+    # 每个 pause 的父节点：[start - window, start] 内最近的下游起点
+    parent = np.full(n, -1, dtype=np.int64)
+    if d_pos.size:
+        cnt = port_end[u_pos] - port_start[u_pos]
+        edge = np.repeat(np.arange(u_pos.size), cnt)
+        child = np.repeat(port_start[u_pos], cnt) + (np.arange(edge.size) - np.repeat(np.cumsum(cnt) - cnt, cnt))
+        q = d_pos[edge] * stride + (start[child] - t0)
+        cand = np.searchsorted(comp, q, side='right') - 1
+        ok = (cand >= 0) & (comp[np.maximum(cand, 0)] >= q - window_ns)
+        child, cand = child[ok], cand[ok]
+        # 每个子节点保留最近的候选
+        order = np.lexsort((start[cand], child))
+        child, cand = child[order], cand[order]
+        last = np.append(child[1:] != child[:-1], True)
+        parent[child[last]] = cand[last]
+
+    # 沿父指针跳转求链深度与根
+    depth = np.zeros(n, dtype=np.int64)
+    root = np.arange(n)
+    has_parent = parent >= 0
+    for _ in range(64):
+        nxt = parent[root]
+        step = nxt >= 0
+        if not step.any():
+            break
+        depth[step] += 1
+        root[step] = nxt[step]
+
+    chain_size = np.bincount(root, minlength=n)
+    roots = np.flatnonzero((parent < 0) & (chain_size > 1))
+    roots = roots[np.argsort(chain_size[roots])[::-1]]
+    return {
+        'edges': edge_rows,
+        'parent': parent,
+        'depth': depth,
+        'n_propagated_pauses': int(np.count_nonzero(has_parent)),
+        'depth_histogram': np.bincount(depth),
+        'top_chains': [{
+            'root_node': int(events['node_id'][r]), 'root_if': int(events['if_idx'][r]),
+            'pause_time': int(start[r]), 'n_pauses': int(chain_size[r]),
+            'max_depth': int(depth[root == r].max()),
+        } for r in roots[:20]],
+    }
+
+
+def analyze_pfc_file(pfc_file, default_pause_time=5000, topology=None,
+                     propagation_window_ns=None, n_threads=None):  # 默认5微秒 = 5000纳秒
+    """分析PFC日志文件，返回PFC统计信息"""
     if not os.path.exists(pfc_file):
-        print(f"File does not exist: {pfc_file}")
+        print(f"文件不存在: {pfc_file}")
         return None
-    
-    # Read PFC log file
-    # Format: time nodeID nodeType interfaceIdx type(0:resume, 1:pause)
-    data = []
-    with open(pfc_file, 'r') as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) == 5:
-                time_step, node_id, node_type, if_idx, pfc_type = map(int, parts)
-                data.append({
-                    'time_step': time_step,
-                    'node_id': node_id,
-                    'node_type': node_type,
-                    'if_idx': if_idx,
-                    'pfc_type': pfc_type  # 0:resume, 1:pause
-                })
-    
-    if not data:
-        print(f"File is empty or has incorrect format: {pfc_file}")
+
+    # 格式: time nodeID nodeType interfaceIdx type(0:resume, 1:pause)
+    cols = parse_log(pfc_file, 'pfc', n_threads=n_threads)
+    events = reconstruct_pause_intervals(cols, default_pause_time)
+    if events is None or events['duration'].size == 0:
+        print(f"文件为空或格式错误: {pfc_file}")
         return None
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-    
-    # Get the last time point of the simulation
-    max_time = df['time_step'].max()
-    
-    # Group by node and interface, calculate PFC events
-    pfc_events = []
-    for (node_id, if_idx), group in df.groupby(['node_id', 'if_idx']):
-        group = group.sort_values('time_step')
-        
-        # Track current pause state
-        is_paused = False
-        current_pause_start = None
-        last_pause_time = None
-        
-        # Process each event
-        for idx, row in group.iterrows():
-            time_step = row['time_step']
-            pfc_type = row['pfc_type']
-            
-            if pfc_type == 1:  # pause
-                if not is_paused:  # If not currently paused, record new pause start
-                    is_paused = True
-                    current_pause_start = time_step
-                # Always update the last pause time
-                last_pause_time = time_step
-            
-            elif pfc_type == 0:  # resume
-                if is_paused:  # If currently paused, record pause end
-                    is_paused = False
-                    duration = time_step - current_pause_start
-                    pfc_events.append({
-                        'node_id': node_id,
-                        'if_idx': if_idx,
-                        'pause_time': current_pause_start,
-                        'resume_time': time_step,
-                        'last_pause_time': last_pause_time,
-                        'duration': duration
-                    })
-                    current_pause_start = None
-                    last_pause_time = None
-                # If not currently paused, ignore this resume event
-        
-        # Handle the last unmatched pause event
-        if is_paused and current_pause_start is not None:
-            # Use the last pause time plus default pause time as end time
-            resume_time = min(last_pause_time + default_pause_time, max_time)
-            duration = resume_time - current_pause_start
-            pfc_events.append({
-                'node_id': node_id,
-                'if_idx': if_idx,
-                'pause_time': current_pause_start,
-                'resume_time': resume_time,
-                'last_pause_time': last_pause_time,
-                'duration': duration
-            })
-    
-    pfc_events_df = pd.DataFrame(pfc_events)
-    
-    # Calculate statistics
+
+    durations = events['duration']
+    span_ns = int(cols['time_ns'].max() - cols['time_ns'].min())
+    port_stats, tier_stats = compute_port_stats(events, span_ns, topology, cols)
     stats = {
-        'total_pfc_count': len(pfc_events),
-        'total_pfc_time': pfc_events_df['duration'].sum() if not pfc_events_df.empty else 0,
-        'avg_pfc_time': pfc_events_df['duration'].mean() if not pfc_events_df.empty else 0,
-        'max_pfc_time': pfc_events_df['duration'].max() if not pfc_events_df.empty else 0,
-        'min_pfc_time': pfc_events_df['duration'].min() if not pfc_events_df.empty else 0,
-        'pfc_events': pfc_events_df
+        'total_pfc_count': int(durations.size),
+        'total_pfc_time': int(durations.sum()),
+        'avg_pfc_time': float(durations.mean()),
+        'max_pfc_time': int(durations.max()),
+        'min_pfc_time': int(durations.min()),
+        'span_ns': span_ns,
+        'pfc_events': events,
+        'port_stats': port_stats,
+        'tier_stats': tier_stats,
     }
-    
+    if topology is not None and propagation_window_ns is not None:
+        stats['propagation'] = find_pause_propagation(events, topology, propagation_window_ns)
     return stats
 
-def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, default_pause_time=5000):
-    """Compare PFC results with and without EdgeCNP and generate visualizations"""
-    with_stats = analyze_pfc_file(with_edge_cnp_file, default_pause_time)
-    without_stats = analyze_pfc_file(without_edge_cnp_file, default_pause_time)
-    
+
+def save_pfc_stats(stats, output_dir, prefix=''):
+    """把端口、层级和传播统计写成 CSV"""
+    os.makedirs(output_dir, exist_ok=True)
+    ps = stats['port_stats']
+    order = np.argsort(ps['paused_fraction'])[::-1]
+    with open(os.path.join(output_dir, f'{prefix}pfc_port_stats.csv'), 'w') as f:
+        f.write('node,if_idx,tier,n_pauses,paused_ns,paused_fraction\n')
+        for i in order:
+            f.write(f"{ps['node_id'][i]},{ps['if_idx'][i]},{ps['tier'][i]},{ps['n_pauses'][i]},"
+                    f"{ps['paused_ns'][i]:.0f},{ps['paused_fraction'][i]:.6f}\n")
+
+    with open(os.path.join(output_dir, f'{prefix}pfc_tier_stats.csv'), 'w') as f:
+        f.write('tier,n_ports,n_paused_ports,n_pauses,paused_ns,paused_fraction,max_port_fraction\n')
+        for row in stats['tier_stats']:
+            f.write(f"{row['tier']},{row['n_ports']},{row['n_paused_ports']},{row['n_pauses']},"
+                    f"{row['paused_ns']:.0f},{row['paused_fraction']:.6f},{row['max_port_fraction']:.6f}\n")
+
+    prop = stats.get('propagation')
+    if prop is None:
+        return
+    with open(os.path.join(output_dir, f'{prefix}pfc_propagation.csv'), 'w') as f:
+        f.write('down_node,down_if,up_node,up_if,n_down_pauses,n_propagated,ratio,avg_lag_ns\n')
+        for r in prop['edges']:
+            f.write(f"{r['down_node']},{r['down_if']},{r['up_node']},{r['up_if']},{r['n_down_pauses']},"
+                    f"{r['n_propagated']},{r['ratio']:.4f},{r['avg_lag_ns']:.1f}\n")
+    with open(os.path.join(output_dir, f'{prefix}pfc_chains.csv'), 'w') as f:
+        f.write('root_node,root_if,pause_time,n_pauses,max_depth\n')
+        for r in prop['top_chains']:
+            f.write(f"{r['root_node']},{r['root_if']},{r['pause_time']},{r['n_pauses']},{r['max_depth']}\n")
+
+
+def print_pfc_summary(stats):
+    print(f"PFC总数={stats['total_pfc_count']}, PFC总时间={stats['total_pfc_time']}ns, "
+          f"PFC平均时间={stats['avg_pfc_time']:.2f}ns, 时间跨度={stats['span_ns']}ns")
+    for row in stats['tier_stats']:
+        print(f"  {row['tier']:<7} 端口数={row['n_ports']:<5} 暂停过的端口={row['n_paused_ports']:<5} "
+              f"暂停时间占比={row['paused_fraction']:.4%} (端口最大 {row['max_port_fraction']:.4%})")
+    prop = stats.get('propagation')
+    if prop is not None:
+        print(f"  传播引起的 pause: {prop['n_propagated_pauses']} / {stats['total_pfc_count']}, "
+              f"传播链深度分布: {prop['depth_histogram'].tolist()}")
+
+
+def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, default_pause_time=5000,
+                        topology=None, propagation_window_ns=None, n_threads=None):
+    """比较有无EdgeCNP的PFC结果并生成可视化"""
+    # 绘图依赖只在对比时导入，单文件分析（--pfc-file）不需要 seaborn
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+    from matplotlib.ticker import FuncFormatter
+
+    with_stats = analyze_pfc_file(with_edge_cnp_file, default_pause_time, topology,
+                                  propagation_window_ns, n_threads)
+    without_stats = analyze_pfc_file(without_edge_cnp_file, default_pause_time, topology,
+                                     propagation_window_ns, n_threads)
+
     if not with_stats or not without_stats:
-        print("Cannot compare PFC results, please check file paths")
+        print("无法比较PFC结果，请检查文件路径")
         return
-    
-    # Create output directory
+
+    # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
-    
-    # Prepare comparison data
+    save_pfc_stats(with_stats, output_dir, 'with_edge_cnp_')
+    save_pfc_stats(without_stats, output_dir, 'without_edge_cnp_')
+
+    # 准备比较数据
     comparison_data = {
         'Metric': [
             'Total PFC Count', 
@@ -148,10 +441,10 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
     
     comparison_df = pd.DataFrame(comparison_data)
     
-    # Save comparison data to CSV
+    # 保存比较数据到CSV
     comparison_df.to_csv(f"{output_dir}/pfc_comparison.csv", index=False)
     
-    # 1. Plot PFC count comparison bar chart
+    # 1. 绘制PFC总数对比柱状图
     plt.figure(figsize=(10, 6))
     sns.barplot(x='Metric', y='value', hue='variable', 
                 data=pd.melt(comparison_df[['Metric', 'With EdgeCNP', 'Without EdgeCNP']], 
@@ -163,7 +456,7 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
     plt.savefig(f"{output_dir}/pfc_count_comparison.png", dpi=300)
     plt.close()
     
-    # 2. Plot PFC total time comparison bar chart
+    # 2. 绘制PFC总时间对比柱状图
     plt.figure(figsize=(10, 6))
     sns.barplot(x='Metric', y='value', hue='variable', 
                 data=pd.melt(comparison_df[['Metric', 'With EdgeCNP', 'Without EdgeCNP']], 
@@ -176,7 +469,7 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
     plt.savefig(f"{output_dir}/pfc_total_time_comparison.png", dpi=300)
     plt.close()
     
-    # 3. Plot PFC average time comparison bar chart
+    # 3. 绘制PFC平均时间对比柱状图
     plt.figure(figsize=(10, 6))
     sns.barplot(x='Metric', y='value', hue='variable', 
                 data=pd.melt(comparison_df[['Metric', 'With EdgeCNP', 'Without EdgeCNP']], 
@@ -189,60 +482,56 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
     plt.savefig(f"{output_dir}/pfc_avg_time_comparison.png", dpi=300)
     plt.close()
     
-    # 4. Plot PFC duration distribution comparison
+    # 4. 绘制PFC时间分布对比
     plt.figure(figsize=(12, 6))
     with_events = with_stats['pfc_events']
     without_events = without_stats['pfc_events']
     
-    if not with_events.empty and not without_events.empty:
-        plt.subplot(1, 2, 1)
-        sns.histplot(with_events['duration'], kde=True)
-        plt.title('PFC Duration Distribution with EdgeCNP')
-        plt.xlabel('PFC Duration (ns)')
-        plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
-        
-        plt.subplot(1, 2, 2)
-        sns.histplot(without_events['duration'], kde=True)
-        plt.title('PFC Duration Distribution without EdgeCNP')
-        plt.xlabel('PFC Duration (ns)')
-        plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
-        
-        plt.tight_layout()
-        plt.savefig(f"{output_dir}/pfc_duration_distribution.png", dpi=300)
+    plt.subplot(1, 2, 1)
+    sns.histplot(with_events['duration'], kde=True)
+    plt.title('PFC Duration Distribution with EdgeCNP')
+    plt.xlabel('PFC Duration (ns)')
+    plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
+    
+    plt.subplot(1, 2, 2)
+    sns.histplot(without_events['duration'], kde=True)
+    plt.title('PFC Duration Distribution without EdgeCNP')
+    plt.xlabel('PFC Duration (ns)')
+    plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
+    
+    plt.tight_layout()
+    plt.savefig(f"{output_dir}/pfc_duration_distribution.png", dpi=300)
     plt.close()
     
-    # 5. Plot PFC time series comparison
+    # 5. 绘制PFC时间序列对比（每个区间一条线段，一次 hlines 画完）
     plt.figure(figsize=(14, 8))
     
-    if not with_events.empty and not without_events.empty:
-        plt.subplot(2, 1, 1)
-        for _, event in with_events.iterrows():
-            plt.hlines(event['node_id'] * 100 + event['if_idx'], 
-                      event['pause_time'], event['resume_time'], 
-                      linewidth=2, color='red')
-        plt.title('PFC Time Series with EdgeCNP')
-        plt.xlabel('Time (ns)')
-        plt.ylabel('NodeID*100 + InterfaceID')
-        plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
-        
-        plt.subplot(2, 1, 2)
-        for _, event in without_events.iterrows():
-            plt.hlines(event['node_id'] * 100 + event['if_idx'], 
-                      event['pause_time'], event['resume_time'], 
-                      linewidth=2, color='blue')
-        plt.title('PFC Time Series without EdgeCNP')
-        plt.xlabel('Time (ns)')
-        plt.ylabel('NodeID*100 + InterfaceID')
-        plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
-        
-        plt.tight_layout()
-        plt.savefig(f"{output_dir}/pfc_time_series.png", dpi=300)
+    plt.subplot(2, 1, 1)
+    plt.hlines(with_events['node_id'] * 100 + with_events['if_idx'], 
+               with_events['pause_time'], with_events['resume_time'], 
+               linewidth=2, color='red')
+    plt.title('PFC Time Series with EdgeCNP')
+    plt.xlabel('Time (ns)')
+    plt.ylabel('NodeID*100 + InterfaceID')
+    plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
+    
+    plt.subplot(2, 1, 2)
+    plt.hlines(without_events['node_id'] * 100 + without_events['if_idx'], 
+               without_events['pause_time'], without_events['resume_time'], 
+               linewidth=2, color='blue')
+    plt.title('PFC Time Series without EdgeCNP')
+    plt.xlabel('Time (ns)')
+    plt.ylabel('NodeID*100 + InterfaceID')
+    plt.gca().xaxis.set_major_formatter(FuncFormatter(format_time))
+    
+    plt.tight_layout()
+    plt.savefig(f"{output_dir}/pfc_time_series.png", dpi=300)
     plt.close()
     
-    # 6. Plot comprehensive comparison chart
+    # 6. 绘制综合对比图表
     plt.figure(figsize=(15, 10))
     
-    # Prepare data
+    # 准备数据
     metrics = ['Total PFC Count', 'Total PFC Time (ns)', 'Avg PFC Time (ns)']
     with_values = [
         with_stats['total_pfc_count'], 
@@ -255,7 +544,7 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
         without_stats['avg_pfc_time']
     ]
     
-    # Calculate improvement percentages
+    # 计算改进百分比
     improvements = []
     for w, wo in zip(with_values, without_values):
         if wo > 0:
@@ -269,11 +558,11 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
     
     fig, ax1 = plt.subplots(figsize=(12, 8))
     
-    # Draw bar chart
+    # 绘制柱状图
     rects1 = ax1.bar(x - width/2, with_values, width, label='With EdgeCNP')
     rects2 = ax1.bar(x + width/2, without_values, width, label='Without EdgeCNP')
     
-    # Add improvement percentage labels
+    # 添加改进百分比标签
     for i, imp in enumerate(improvements):
         if imp != 0:
             plt.annotate(f'{imp:.1f}%', 
@@ -293,9 +582,9 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
     plt.savefig(f"{output_dir}/pfc_comprehensive_comparison.png", dpi=300)
     plt.close()
     
-    print(f"Analysis completed, results saved in {output_dir} directory")
+    print(f"分析完成，结果保存在 {output_dir} 目录下")
     
-    # Return comparison summary
+    # 返回比较结果的摘要
     summary = {
         'with_edge_cnp': {
             'total_count': with_stats['total_pfc_count'],
@@ -316,27 +605,53 @@ def compare_pfc_results(with_edge_cnp_file, without_edge_cnp_file, output_dir, d
     
     return summary
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Analyze and compare PFC results with and without EdgeCNP')
-    parser.add_argument('--with-edge-cnp', required=True, help='Path to PFC log file with EdgeCNP enabled')
-    parser.add_argument('--without-edge-cnp', required=True, help='Path to PFC log file with EdgeCNP disabled')
-    parser.add_argument('--output-dir', default='pfc_analysis_results', help='Output directory')
+
+def main():
+    parser = argparse.ArgumentParser(description='分析PFC日志，并比较有无EdgeCNP的PFC结果')
+    parser.add_argument('--pfc-file', help='只分析单个PFC日志文件')
+    parser.add_argument('--with-edge-cnp', help='开启EdgeCNP的PFC日志文件路径')
+    parser.add_argument('--without-edge-cnp', help='不开启EdgeCNP的PFC日志文件路径')
+    parser.add_argument('--output-dir', default='pfc_analysis_results', help='输出目录')
     parser.add_argument('--default-pause-time', type=int, default=5000, 
-                        help='Default pause time in nanoseconds, default is 5 microseconds (5000 ns)')
-    
+                        help='默认的pause time，单位为纳秒，默认为5微秒(5000纳秒)')
+    parser.add_argument('--topology', help='拓扑文件；给出时按层级统计并分析pause传播链')
+    parser.add_argument('--propagation-window-us', type=float, default=10.0,
+                        help='下游pause之后多少微秒内的上游pause算作传播（默认: 10）')
+    parser.add_argument('-t', '--threads', type=int, default=None, help='解析线程数')
     args = parser.parse_args()
-    
+
+    if not args.pfc_file and not (args.with_edge_cnp and args.without_edge_cnp):
+        parser.error('需要 --pfc-file，或同时给出 --with-edge-cnp 和 --without-edge-cnp')
+
+    topology = load_topology(args.topology) if args.topology else None
+    window_ns = int(args.propagation_window_us * 1000)
+
+    if args.pfc_file:
+        stats = analyze_pfc_file(args.pfc_file, args.default_pause_time, topology, window_ns, args.threads)
+        if not stats:
+            return 1
+        save_pfc_stats(stats, args.output_dir)
+        print_pfc_summary(stats)
+        print(f"分析完成，结果保存在 {args.output_dir} 目录下")
+        return 0
+
     summary = compare_pfc_results(args.with_edge_cnp, args.without_edge_cnp, 
-                                 args.output_dir, args.default_pause_time)
+                                 args.output_dir, args.default_pause_time,
+                                 topology, window_ns, args.threads)
     
     if summary:
-        print("\n=== EdgeCNP Impact on PFC Analysis Summary ===")
-        print(f"With EdgeCNP: Total PFC Count={summary['with_edge_cnp']['total_count']}, " +
-              f"Total PFC Time={summary['with_edge_cnp']['total_time']}ns, " +
-              f"Avg PFC Time={summary['with_edge_cnp']['avg_time']:.2f}ns")
-        print(f"Without EdgeCNP: Total PFC Count={summary['without_edge_cnp']['total_count']}, " +
-              f"Total PFC Time={summary['without_edge_cnp']['total_time']}ns, " +
-              f"Avg PFC Time={summary['without_edge_cnp']['avg_time']:.2f}ns")
-        print(f"Improvement Percentages: Total PFC Count={summary['improvements']['total_count']:.2f}%, " +
-              f"Total PFC Time={summary['improvements']['total_time']:.2f}%, " +
-              f"Avg PFC Time={summary['improvements']['avg_time']:.2f}%")
\ No newline at end of file
+        print("\n=== EdgeCNP对PFC影响的分析摘要 ===")
+        print(f"开启EdgeCNP: PFC总数={summary['with_edge_cnp']['total_count']}, " +
+              f"PFC总时间={summary['with_edge_cnp']['total_time']}ns, " +
+              f"PFC平均时间={summary['with_edge_cnp']['avg_time']:.2f}ns")
+        print(f"不开启EdgeCNP: PFC总数={summary['without_edge_cnp']['total_count']}, " +
+              f"PFC总时间={summary['without_edge_cnp']['total_time']}ns, " +
+              f"PFC平均时间={summary['without_edge_cnp']['avg_time']:.2f}ns")
+        print(f"改进百分比: PFC总数={summary['improvements']['total_count']:.2f}%, " +
+              f"PFC总时间={summary['improvements']['total_time']:.2f}%, " +
+              f"PFC平均时间={summary['improvements']['avg_time']:.2f}%")
+    return 0 if summary else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,493 @@
+#!/usr/bin/python3
+"""
+Batch figure renderer for the FCT / queue / uplink plots.
+
+Computes the data of every requested figure once in the main process from the
+columnar run cache (run_cache.py), then renders the figures in a process pool
+with the Agg backend. matplotlib is imported only inside the workers. Each
+figure records a hash of its inputs (source file signatures, parameters and
+this script) in figures/.plot_batch_manifest.json and is skipped when the hash
+is unchanged and its outputs still exist.
+
+Figures (same names/styles as the individual scripts):
+  fct      AVG_/P99_TOPO_*_LOAD_*_FC_*.pdf per .history key      (plot_fct.py)
+  queue    CDF_QUEUE_TOPO_*.pdf per .history key, ConWeave runs (plot_queue.py)
+  uplink   CDF_UPLINK_TOPO_*.pdf per .history key               (plot_uplink.py)
+  single   fct_id_<id> + avg/p50/p99 figures for --single IDs   (plot_single_fct.py)
+  compare  avg/p50/p99/combined figures for --compare A B       (compare_fct.py)
+
+Example:
+    python3 plot_batch.py --kinds fct,uplink -j 8
+    python3 plot_batch.py --kinds single,compare --single 123 --compare 123 456
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, _CUR_DIR)
+from fct_query import load_file
+from run_cache import signature_digest
+from uplink_imbalance import imbalance_spread_values
+
+# LB/CC mode matching
+cc_modes = {
+    1: "dcqcn",
+    3: "hp",
+    7: "timely",
+    8: "dctcp",
+}
+lb_modes = {
+    0: "fecmp",
+    2: "drill",
+    3: "conga",
+    6: "letflow",
+    9: "conweave",
+}
+
+LBMODE_ORDER = ["fecmp", "conga", "letflow", "conweave"]
+FIGURE_KINDS = ["fct", "queue", "uplink", "single", "compare"]
+MANIFEST_NAME = ".plot_batch_manifest.json"
+STEP = 5  # 5% step
+
+
+def _script_digest():
+    with open(os.path.realpath(__file__), "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+##################################################
+# Data (main process, NumPy only)
+##################################################
+
+def read_history(history_filename, lb_filter=None):
+    """(topo, netload, flow_control) -> [[config_id, lb_mode], ...] from mix/.history"""
+    map_key_to_id = dict()
+    with open(history_filename, "r") as f:
+        for line in f.readlines():
+            if "cross_dc_k" in line or "fat_k" in line or "leaf_spine" in line:
+                parsed_line = line.replace("\n", "").split(',')
+                config_id = parsed_line[1]
+                lb_mode = lb_modes[int(parsed_line[3])]
+                if lb_filter is not None and lb_mode != lb_filter:
+                    continue
+                encoded_fc = (int(parsed_line[9]), int(parsed_line[10]))
+                if encoded_fc == (0, 1):
+                    flow_control = "IRN"
+                elif encoded_fc == (1, 0):
+                    flow_control = "Lossless"
+                else:
+                    continue
+                key = (parsed_line[13], parsed_line[16], flow_control)
+                map_key_to_id.setdefault(key, []).append([config_id, lb_mode])
+    return map_key_to_id
+
+
+def fct_steps(fct_file, time_start, time_end, step=STEP):
+    """Slowdown per 5% flow-size step (fct_query.FctTable.size_steps), all 0 when no flow matches"""
+    return load_file(fct_file).select(time_start=time_start, time_end=time_end).size_steps(step)[fct_file]
+
+
+def cdf_points(values):
+    """(value, p) of each distinct value except 0, p = rank of its last sample / (n - 1)"""
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    if values.size < 2:
+        return [], []
+    uniq, counts = np.unique(values, return_counts=True)
+    p = (np.cumsum(counts) - 1) / (values.size - 1)
+    keep = uniq != 0
+    return uniq[keep].tolist(), p[keep].tolist()
+
+
+def queue_cdf(cdf_file):
+    x, y = [], []
+    with open(cdf_file, "r") as f:
+        for line in f.readlines():
+            parsed_line = line.replace("\n", "").split(" ")
+            x.append(float(parsed_line[0]))
+            y.append(float(parsed_line[3]))
+    return x, y
+
+
+def read_run_config(config_id, output_dir):
+    """Human-readable simulation parameters from mix/output/<id>/config.txt"""
+    info = {"cc_mode": "unknown", "lb_mode": "unknown", "pfc": "unknown", "irn": "unknown",
+            "topo": "unknown", "load": "unknown"}
+    keys = {"CC_MODE": "cc_mode", "LB_MODE": "lb_mode", "ENABLE_PFC": "pfc", "ENABLE_IRN": "irn",
+            "TOPOLOGY_FILE": "topo", "LOAD": "load"}
+    config_file = f"{output_dir}/{config_id}/config.txt"
+    if os.path.exists(config_file):
+        with open(config_file, "r") as f:
+            for line in f.readlines():
+                parts = line.strip().split(" ")
+                if len(parts) >= 2 and parts[0] in keys:
+                    info[keys[parts[0]]] = parts[1]
+    info["topo"] = info["topo"].split("/")[-1].replace(".txt", "")
+    cc_names = {"1": "DCQCN", "3": "HPCC", "7": "Timely", "8": "DCTCP"}
+    lb_names = {"0": "FECMP", "2": "DRILL", "3": "CONGA", "6": "LetFlow", "9": "ConWeave"}
+    info["cc_mode"] = cc_names.get(info["cc_mode"], info["cc_mode"])
+    info["lb_mode"] = lb_names.get(info["lb_mode"], info["lb_mode"])
+    info["flow_control"] = "Lossless" if info["pfc"] == "1" else ("IRN" if info["irn"] == "1" else "Unknown")
+    return info
+
+
+##################################################
+# Figure specs
+##################################################
+
+def _spec(name, renderer, outputs, inputs, params, loader):
+    """A figure: loader() builds the renderer payload, only called when the figure is stale"""
+    return {"name": name, "renderer": renderer, "outputs": outputs, "inputs": inputs,
+            "params": params, "loader": loader}
+
+
+def build_specs(args, file_dir, output_dir, fig_dir):
+    history_filename = file_dir + "/../mix/.history"
+    kinds = args.kinds
+    specs = []
+    memo = {}
+
+    def steps(config_id):
+        key = (config_id, args.time_limit_begin, args.time_limit_end)
+        if key not in memo:
+            fct_file = output_dir + "/{id}/{id}_out_fct.txt".format(id=config_id)
+            memo[key] = fct_steps(fct_file, args.time_limit_begin, args.time_limit_end, STEP)
+        return memo[key]
+
+    def fct_file(config_id):
+        return output_dir + "/{id}/{id}_out_fct.txt".format(id=config_id)
+
+    fct_params = {"sT": args.time_limit_begin, "fT": args.time_limit_end, "step": STEP}
+
+    if "fct" in kinds or "uplink" in kinds:
+        history = read_history(history_filename)
+        for k, v in history.items():
+            runs = [vv for tgt in LBMODE_ORDER for vv in v if vv[1] == tgt]
+            suffix = "TOPO_{}_LOAD_{}_FC_{}".format(k[0], k[1], k[2])
+            if "fct" in kinds:
+                for metric, ylabel, prefix in (("avg", "Avg FCT Slowdown", "AVG"),
+                                               ("p99", "p99 FCT Slowdown", "P99")):
+                    def load(runs=runs, metric=metric, ylabel=ylabel):
+                        results = [(lb, steps(cid)) for cid, lb in runs]
+                        return {"ylabel": ylabel, "series": [(lb, r[metric]) for lb, r in results],
+                                "sizes": results[-1][1]["size"] if results else []}
+                    specs.append(_spec(f"{prefix}_{suffix}", "fct_sweep",
+                                       [fig_dir + f"/{prefix}_{suffix}.pdf"],
+                                       [fct_file(cid) for cid, _ in runs],
+                                       dict(fct_params, metric=metric, runs=runs), load))
+            if "uplink" in kinds:
+                files = [output_dir + "/{id}/{id}_out_uplink.txt".format(id=cid) for cid, _ in runs]
+
+                def load(runs=runs, files=files):
+                    series = []
+                    for (cid, lb), path in zip(runs, files):
+                        series.append((lb,) + cdf_points(imbalance_spread_values(
+                            path, args.uplink_time_begin, args.uplink_time_end, 100000)))
+                    return {"series": series}
+                specs.append(_spec(f"CDF_UPLINK_{suffix}", "uplink_cdf",
+                                   [fig_dir + f"/CDF_UPLINK_{suffix}.pdf"], files,
+                                   {"sT": args.uplink_time_begin, "fT": args.uplink_time_end, "runs": runs},
+                                   load))
+
+    if "queue" in kinds:
+        for k, v in read_history(history_filename, lb_filter="conweave").items():
+            suffix = "TOPO_{}_LOAD_{}_FC_{}".format(k[0], k[1], k[2])
+            files = [output_dir + "/{id}/{id}_out_voq_cdf.txt".format(id=cid) for cid, _ in v]
+
+            def load(v=v, files=files):
+                return {"series": [(lb,) + queue_cdf(path) for (cid, lb), path in zip(v, files)]}
+            specs.append(_spec(f"CDF_QUEUE_{suffix}", "queue_cdf",
+                               [fig_dir + f"/CDF_QUEUE_{suffix}.pdf"], files, {"runs": v}, load))
+
+    metrics = [("avg", "avg FCT slowdown", "avg FCT"), ("p50", "p50 FCT slowdown", "median FCT"),
+               ("p99", "p99 FCT slowdown", "p99 FCT")]
+
+    if "single" in kinds:
+        for config_id in args.single or []:
+            info = read_run_config(config_id, output_dir)
+            title = (f"ID: {config_id}, {info['topo']}, {info['cc_mode']}, {info['lb_mode']}, "
+                     f"{info['flow_control']}, Load: {info['load']}")
+            inputs = [fct_file(config_id), f"{output_dir}/{config_id}/config.txt"]
+            label = f"ID: {config_id}"
+
+            def load(config_id=config_id, label=label, title=title):
+                r = steps(config_id)
+                return {"series": [(label, r)], "sizes": r["size"], "title": title}
+            specs.append(_spec(f"fct_id_{config_id}", "fct_panels",
+                               [f"{fig_dir}/fct_id_{config_id}.pdf", f"{fig_dir}/fct_id_{config_id}.png"],
+                               inputs, dict(fct_params, label=label), load))
+            for metric, ylabel, _ in metrics:
+                def load(config_id=config_id, label=label, title=title, metric=metric, ylabel=ylabel):
+                    r = steps(config_id)
+                    return {"series": [(label, r[metric])], "sizes": r["size"], "ylabel": ylabel,
+                            "title": title}
+                name = f"{metric}_fct_id_{config_id}"
+                specs.append(_spec(name, "fct_metric", [f"{fig_dir}/{name}.pdf", f"{fig_dir}/{name}.png"],
+                                   inputs, dict(fct_params, metric=metric, label=label), load))
+
+    if "compare" in kinds:
+        for intra_id, mixed_id in args.compare or []:
+            inputs = [fct_file(intra_id), fct_file(mixed_id)]
+            labels = ("enable_edge_cnp", "disable_edge_cnp")
+            pair = f"intra_{intra_id}_mixed_{mixed_id}"
+            for metric, ylabel, _ in metrics:
+                def load(intra_id=intra_id, mixed_id=mixed_id, metric=metric, ylabel=ylabel):
+                    a, b = steps(intra_id), steps(mixed_id)
+                    return {"series": [(labels[0], a[metric]), (labels[1], b[metric])], "sizes": a["size"],
+                            "ylabel": ylabel, "title": None}
+                specs.append(_spec(f"{metric}_fct_{pair}", "fct_metric", [f"{fig_dir}/{metric}_fct_{pair}.pdf"],
+                                   inputs, dict(fct_params, metric=metric), load))
+
+            def load(intra_id=intra_id, mixed_id=mixed_id):
+                a, b = steps(intra_id), steps(mixed_id)
+                return {"series": [(labels[0], a), (labels[1], b)], "sizes": a["size"], "title": None}
+            specs.append(_spec(f"combined_fct_{pair}", "fct_panels",
+                               [f"{fig_dir}/combined_fct_{pair}.pdf", f"{fig_dir}/combined_fct_{pair}.png"],
+                               inputs, fct_params, load))
+    return specs
+
+
+##################################################
+# Rendering (worker processes only)
+##################################################
+
+def _init_worker():
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+    from plot_fct import setup
+    setup()
+
+
+def _style_axes(ax):
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.yaxis.set_ticks_position('left')
+    ax.xaxis.set_ticks_position('bottom')
+
+
+def _size_ticks(ax, xvals, sizes, every, fontsize):
+    from plot_fct import size2str
+    ax.tick_params(axis="x", rotation=40)
+    ax.set_xticks(([0] + xvals)[::every])
+    ax.set_xticklabels(([0] + size2str(sizes))[::every], fontsize=fontsize)
+
+
+def render_fct_sweep(data, outputs):
+    import matplotlib.pyplot as plt
+    xvals = [i for i in range(STEP, 100 + STEP, STEP)]
+    fig = plt.figure(figsize=(4, 4))
+    ax = fig.add_subplot(111)
+    ax.set_xlabel("Flow Size (Bytes)", fontsize=11.5)
+    ax.set_ylabel(data["ylabel"], fontsize=11.5)
+    _style_axes(ax)
+    for label, yvals in data["series"]:
+        ax.plot(xvals, yvals, markersize=1.0, linewidth=3.0, label=label)
+    ax.legend(bbox_to_anchor=(0.0, 1.2), loc="upper left", borderaxespad=0,
+              frameon=False, fontsize=12, facecolor='white', ncol=2,
+              labelspacing=0.4, columnspacing=0.8)
+    _size_ticks(ax, xvals, data["sizes"], 2, 10.5)
+    ax.set_ylim(bottom=1)
+    fig.tight_layout()
+    ax.grid(which='minor', alpha=0.2)
+    ax.grid(which='major', alpha=0.5)
+    for out in outputs:
+        plt.savefig(out, transparent=False, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_fct_metric(data, outputs):
+    import matplotlib.pyplot as plt
+    xvals = [i for i in range(STEP, 100 + STEP, STEP)]
+    fig = plt.figure(figsize=(6, 4))
+    ax = fig.add_subplot(111)
+    ax.set_xlabel("flow size (Bytes)", fontsize=11.5)
+    ax.set_ylabel(data["ylabel"], fontsize=11.5)
+    _style_axes(ax)
+    for label, yvals in data["series"]:
+        ax.plot(xvals, yvals, markersize=4.0, linewidth=2.0, label=label)
+    ax.legend(loc="best", frameon=False, fontsize=12)
+    _size_ticks(ax, xvals, data["sizes"], 2, 10.5)
+    ax.set_ylim(bottom=1)
+    if data["title"]:
+        plt.title(data["title"], fontsize=12)
+    fig.tight_layout()
+    ax.grid(which='minor', alpha=0.2)
+    ax.grid(which='major', alpha=0.5)
+    for out in outputs:
+        plt.savefig(out, transparent=False, bbox_inches='tight', **({"dpi": 150} if out.endswith(".png") else {}))
+    plt.close(fig)
+
+
+def render_fct_panels(data, outputs):
+    import matplotlib.pyplot as plt
+    xvals = [i for i in range(STEP, 100 + STEP, STEP)]
+    fig = plt.figure(figsize=(10, 6))
+    panels = [("avg", "FCT slowdown", "FCT"), ("p50", "p50 FCT slowdown", "median FCT"),
+              ("p99", "p99 FCT slowdown", "p99 FCT")]
+    avg_name = "avg" if data["title"] else "average"
+    for i, (metric, ylabel, title) in enumerate(panels):
+        if metric == "avg":
+            ylabel, title = f"{avg_name} {ylabel}", f"{avg_name} {title}"
+        ax = fig.add_subplot(131 + i)
+        ax.set_xlabel("flow size (Bytes)", fontsize=11.5)
+        ax.set_ylabel(ylabel, fontsize=11.5)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        for label, result in data["series"]:
+            ax.plot(xvals, result[metric], markersize=3.0, linewidth=2.0, label=label)
+        ax.legend(loc="best", frameon=False, fontsize=10)
+        _size_ticks(ax, xvals, data["sizes"], 4, 9)
+        ax.set_ylim(bottom=1)
+        ax.grid(which='major', alpha=0.5)
+        ax.set_title(title, fontsize=12)
+    if data["title"]:
+        plt.suptitle(data["title"], fontsize=14)
+        fig.tight_layout(rect=[0, 0, 1, 0.95])
+    else:
+        fig.tight_layout()
+    for out in outputs:
+        plt.savefig(out, transparent=False, bbox_inches='tight', **({"dpi": 150} if out.endswith(".png") else {}))
+    plt.close(fig)
+
+
+def render_queue_cdf(data, outputs):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(4, 4))
+    ax = fig.add_subplot(111)
+    ax.set_xlabel("Memory Usage (Packets)", fontsize=11.5)
+    ax.set_ylabel("CDF", fontsize=11.5)
+    for label, x, y in data["series"]:
+        ax.plot(x, y, markersize=0, linewidth=3.0, label=label)
+    ax.legend(bbox_to_anchor=(0.0, 1.2), loc="upper left", borderaxespad=0,
+              frameon=False, fontsize=12, facecolor='white', ncol=2,
+              labelspacing=0.4, columnspacing=0.8)
+    fig.tight_layout()
+    ax.grid(which='minor', alpha=0.2)
+    ax.grid(which='major', alpha=0.5)
+    for out in outputs:
+        plt.savefig(out, transparent=False, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_uplink_cdf(data, outputs):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(5, 3))
+    ax = fig.add_subplot(111)
+    fig.tight_layout()
+    ax.set_xlabel("Throughput Imbalance (MAX-MIN)/AVG (%)", fontsize=11.5)
+    ax.set_ylabel("CDF", fontsize=11.5)
+    _style_axes(ax)
+    for label, x, y in data["series"]:
+        ax.plot(x, y, markersize=0, linewidth=3.0, label=label)
+    ax.legend(frameon=False, fontsize=12, facecolor='white')
+    ax.grid(which='minor', alpha=0.2)
+    ax.grid(which='major', alpha=0.5)
+    for out in outputs:
+        plt.savefig(out, transparent=False, bbox_inches='tight')
+    plt.close(fig)
+
+
+RENDERERS = {
+    "fct_sweep": render_fct_sweep,
+    "fct_metric": render_fct_metric,
+    "fct_panels": render_fct_panels,
+    "queue_cdf": render_queue_cdf,
+    "uplink_cdf": render_uplink_cdf,
+}
+
+
+def _render(renderer, data, outputs):
+    RENDERERS[renderer](data, outputs)
+    return outputs
+
+
+##################################################
+# Driver
+##################################################
+
+def _load_manifest(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render FCT/queue/uplink figures in parallel')
+    parser.add_argument('--kinds', default="fct,queue,uplink",
+                        help="comma separated figure kinds: {} (default: fct,queue,uplink)".format(",".join(FIGURE_KINDS)))
+    parser.add_argument('--single', nargs='+', default=None, help="simulation IDs for single-run FCT figures")
+    parser.add_argument('--compare', nargs=2, action='append', default=None, metavar=('INTRA_ID', 'MIXED_ID'),
+                        help="pair of simulation IDs for comparison figures (repeatable)")
+    parser.add_argument('-sT', dest='time_limit_begin', action='store', type=int, default=2005000000, help="only consider flows that finish after T, default=2005000000 ns")
+    parser.add_argument('-fT', dest='time_limit_end', action='store', type=int, default=10000000000, help="only consider flows that finish before T, default=10000000000 ns")
+    parser.add_argument('-usT', dest='uplink_time_begin', action='store', type=int, default=2005000000, help="uplink samples after T, default=2005000000 ns")
+    parser.add_argument('-ufT', dest='uplink_time_end', action='store', type=int, default=2100000000, help="uplink samples before T, default=2100000000 ns")
+    parser.add_argument('-o', dest='fig_dir', action='store', default=None, help="output directory, default=analysis/figures")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of render processes, default=CPU count")
+    parser.add_argument('--force', action='store_true', help="re-render figures even if inputs are unchanged")
+    args = parser.parse_args()
+    args.kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    for k in args.kinds:
+        if k not in FIGURE_KINDS:
+            parser.error(f"unknown figure kind: {k}")
+
+    file_dir = _CUR_DIR
+    fig_dir = args.fig_dir or file_dir + "/figures"
+    output_dir = file_dir + "/../mix/output"
+    os.makedirs(fig_dir, exist_ok=True)
+
+    manifest_path = os.path.join(fig_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    script_digest = _script_digest()
+
+    specs = build_specs(args, file_dir, output_dir, fig_dir)
+    tasks = []
+    n_skipped = 0
+    for spec in specs:
+        digest = signature_digest(spec["inputs"], json.dumps(spec["params"], sort_keys=True) + script_digest)
+        if (not args.force and manifest.get(spec["name"]) == digest
+                and all(os.path.exists(out) for out in spec["outputs"])):
+            n_skipped += 1
+            continue
+        missing = [p for p in spec["inputs"] if not os.path.exists(p) and not p.endswith("config.txt")]
+        if missing:
+            print(f"skip {spec['name']}: missing input {missing[0]}")
+            continue
+        tasks.append((spec, digest, spec["loader"]()))
+    print(f"{len(specs)} figures: {len(tasks)} to render, {n_skipped} up to date")
+    if not tasks:
+        return 0
+
+    n_failed = 0
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(args.jobs or os.cpu_count() or 1, len(tasks)),
+                             mp_context=ctx, initializer=_init_worker) as pool:
+        futures = {pool.submit(_render, spec["renderer"], data, spec["outputs"]): (spec, digest)
+                   for spec, digest, data in tasks}
+        for fut in as_completed(futures):
+            spec, digest = futures[fut]
+            try:
+                for out in fut.result():
+                    print(out)
+                manifest[spec["name"]] = digest
+            except Exception as e:
+                n_failed += 1
+                print(f"failed to render {spec['name']}: {e}")
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 #!/usr/bin/python3
 
-import subprocess
 import os
 import sys
 import argparse
@@ -17,6 +16,7 @@ if _TOPO2BDP_DIR not in sys.path:
     sys.path.insert(0, _TOPO2BDP_DIR)
 from topo_bdp import get_bdp
 from cycler import cycler
+from fct_query import fct_steps
 
 
 
@@ -108,10 +108,6 @@ def getFilePath():
     print("File directory: {}".format(dir_path))
     return dir_path
 
-def get_pctl(a, p):
-	i = int(len(a) * p)
-	return a[i]
-
 def size2str(steps):
     result = []
     for step in steps:
@@ -125,47 +121,6 @@ def size2str(steps):
     return result
 
 
-def get_steps_from_raw(filename, time_start, time_end, step=5):
-    # time_start = int(2.005 * 1000000000)
-    # time_end = int(3.0 * 1000000000) 
-    cmd_slowdown = "cat %s"%(filename)+" | awk '{ if ($6>"+"%d"%time_start+" && $6+$7<"+"%d"%(time_end)+") { slow=$7/$8; print slow<1?1:slow, $5} }' | sort -n -k 2"    
-    output_slowdown = subprocess.check_output(cmd_slowdown, shell=True)
-    aa = output_slowdown.decode("utf-8").split('\n')[:-2]
-    nn = len(aa)
-
-    # CDF of FCT
-    res = [[i/100.] for i in range(0, 100, step)]
-    for i in range(0,100,step):
-        l = int(i * nn / 100)
-        r = int((i+step) * nn / 100)
-        fct_size = aa[l:r]
-        fct_size = [[float(x.split(" ")[0]), int(x.split(" ")[1])] for x in fct_size]
-        fct = sorted(map(lambda x: x[0], fct_size))
-        
-        res[int(i/step)].append(fct_size[-1][1]) # flow size
-        
-        res[int(i/step)].append(sum(fct) / len(fct)) # avg fct
-        res[int(i/step)].append(get_pctl(fct, 0.5)) # mid fct
-        res[int(i/step)].append(get_pctl(fct, 0.95)) # 95-pct fct
-        res[int(i/step)].append(get_pctl(fct, 0.99)) # 99-pct fct
-        res[int(i/step)].append(get_pctl(fct, 0.999)) # 99-pct fct
-    
-    # ## DEBUGING ###
-    # print("{:5} {:10} {:5} {:5} {:5} {:5} {:5}  <<scale: {}>>".format("CDF", "Size", "Avg", "50%", "95%", "99%", "99.9%", "us-scale"))
-    # for item in res:
-    #     line = "%.3f %3d"%(item[0] + step/100.0, item[1])
-    #     i = 1
-    #     line += "\t{:.3f} {:.3f} {:.3f} {:.3f} {:.3f}".format(item[i+1], item[i+2], item[i+3], item[i+4], item[i+5])
-    #     print(line)
-
-    result = {"avg": [], "p99": [], "size": []}
-    for item in res:
-        result["avg"].append(item[2])
-        result["p99"].append(item[5])
-        result["size"].append(item[1])
-
-    return result
-
 def main():
     parser = argparse.ArgumentParser(description='Plotting FCT of results')
     parser.add_argument('-sT', dest='time_limit_begin', action='store', type=int, default=2005000000, help="only consider flows that finish after T, default=2005000000 ns")
@@ -234,7 +189,7 @@ def main():
                 if lb_mode == tgt_lbmode:
                     # plotting
                     fct_slowdown = output_dir + "/{id}/{id}_out_fct.txt".format(id=config_id)
-                    result = get_steps_from_raw(fct_slowdown, int(time_start), int(time_end), STEP)
+                    result = fct_steps(fct_slowdown, int(time_start), int(time_end), STEP)
                     
                     ax.plot(xvals,
                         result["avg"],
@@ -287,7 +242,7 @@ def main():
                 if lb_mode == tgt_lbmode:
                     # plotting
                     fct_slowdown = output_dir + "/{id}/{id}_out_fct.txt".format(id=config_id)
-                    result = get_steps_from_raw(fct_slowdown, int(time_start), int(time_end), STEP)
+                    result = fct_steps(fct_slowdown, int(time_start), int(time_end), STEP)
                     
                     ax.plot(xvals,
                         result["p99"],
@@ -1,6 +1,5 @@
 #!/usr/bin/python3
 
-import subprocess
 import os
 import sys
 import argparse
@@ -9,6 +8,8 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as tick
 import math
 from cycler import cycler
+from fct_query import fct_steps
+from log_parser import find_log
 
 # color config
 C = [
@@ -68,10 +69,6 @@ def getFilePath():
     print("script directory: {}".format(dir_path))
     return dir_path
 
-def get_pctl(a, p):
-    i = int(len(a) * p)
-    return a[i]
-
 def size2str(steps):
     result = []
     for step in steps:
@@ -85,52 +82,6 @@ def size2str(steps):
     return result
 
 
-def get_steps_from_raw(filename, time_start, time_end, step=5):
-    cmd_slowdown = "cat %s"%(filename)+" | awk '{ if ($6>"+"%d"%time_start+" && $6+$7<"+"%d"%(time_end)+") { slow=$7/$8; print slow<1?1:slow, $5} }' | sort -n -k 2"    
-    output_slowdown = subprocess.check_output(cmd_slowdown, shell=True)
-    aa = output_slowdown.decode("utf-8").split('\n')[:-2]
-    nn = len(aa)
-    
-    if nn == 0:
-        print(f"warning: file {filename} has no data in the time range")
-        return None
-
-    # CDF of FCT
-    res = [[i/100.] for i in range(0, 100, step)]
-    for i in range(0,100,step):
-        l = int(i * nn / 100)
-        r = int((i+step) * nn / 100)
-        fct_size = aa[l:r]
-        fct_size = [[float(x.split(" ")[0]), int(x.split(" ")[1])] for x in fct_size]
-        fct = sorted(map(lambda x: x[0], fct_size))
-        
-        if not fct:  # check if the list is empty
-            res[int(i/step)].append(0)  # flow size
-            res[int(i/step)].append(0)  # avg FCT
-            res[int(i/step)].append(0)  # median FCT
-            res[int(i/step)].append(0)  # 95%FCT
-            res[int(i/step)].append(0)  # 99%FCT
-            res[int(i/step)].append(0)  # 99.9%FCT
-            continue
-            
-        res[int(i/step)].append(fct_size[-1][1]) # flow size
-        
-        res[int(i/step)].append(sum(fct) / len(fct)) # avg FCT
-        res[int(i/step)].append(get_pctl(fct, 0.5)) # median FCT
-        res[int(i/step)].append(get_pctl(fct, 0.95)) # 95%FCT
-        res[int(i/step)].append(get_pctl(fct, 0.99)) # 99%FCT
-        res[int(i/step)].append(get_pctl(fct, 0.999)) # 99.9%FCT
-    
-    result = {"avg": [], "p50": [], "p95": [], "p99": [], "size": []}
-    for item in res:
-        result["avg"].append(item[2])
-        result["p50"].append(item[3])
-        result["p95"].append(item[4])
-        result["p99"].append(item[5])
-        result["size"].append(item[1])
-
-    return result
-
 def get_config_info(config_id, output_dir):
     """get the simulation parameters from the config file"""
     config_file = f"{output_dir}/{config_id}/config.txt"
@@ -219,12 +170,12 @@ def main():
     # get the FCT data
     fct_file = f"{output_dir}/{config_id}/{config_id}_out_fct.txt"
     
-    if not os.path.exists(fct_file):
+    if find_log(fct_file) is None:
         print(f"error: cannot find the FCT file: {fct_file}")
         return
     
     print(f"processing the FCT file: {fct_file}")
-    result = get_steps_from_raw(fct_file, time_start, time_end, STEP)
+    result = fct_steps(fct_file, time_start, time_end, STEP)
     
     if not result:
         print("error: cannot get the valid data from the FCT file")
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+可合并的分位数草图（DDSketch）
+
+fctAnalysis.py 为每个 run 写出 *_out_fct_sketch.json（与 CDF 文件放在一起），
+其中按 slowdown/absolute × 流大小分组保存 DDSketch。DDSketch 以相对误差 alpha
+将数值映射到对数桶，桶计数可直接相加，因此多个 run / seed / 流大小分组可以在常数
+内存内合并，得到全局的 p99/p99.9 与 CDF，而无需重新读取原始 FCT 文件。
+
+使用方法:
+python3 quantile_sketch.py merge <sketch.json|目录>... -o merged.json
+python3 quantile_sketch.py report <sketch.json>... [-k slowdown/small] [--cdf out.txt]
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+DEFAULT_ALPHA = 0.01
+# 桶数上限：超出时合并最低的桶（只影响最低分位的精度）
+DEFAULT_MAX_BINS = 4096
+# 小于该值的样本记入零桶
+MIN_INDEXABLE = 1e-9
+
+SKETCH_SUFFIX = '_out_fct_sketch.json'
+REPORT_PERCENTILES = [50, 95, 99, 99.9, 99.99]
+
+
+class DDSketch:
+    """相对误差为 alpha 的 DDSketch，桶以 {index: count} 稀疏保存"""
+
+    def __init__(self, alpha=DEFAULT_ALPHA, max_bins=DEFAULT_MAX_BINS):
+        if not 0 < alpha < 1:
+            raise ValueError(f"alpha 必须在 (0, 1) 之间: {alpha}")
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        """批量加入样本（标量或数组，要求非负）"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+        if (values < 0).any():
+            raise ValueError("DDSketch 只支持非负样本")
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > MIN_INDEXABLE]
+        self.zero_count += int(values.size - positive.size)
+        if positive.size:
+            idx, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                                    return_counts=True)
+            for i, c in zip(idx.tolist(), counts.tolist()):
+                self.bins[i] = self.bins.get(i, 0) + c
+            self._collapse()
+
+    def merge(self, other):
+        """合并另一个草图（alpha 必须一致）"""
+        if not math.isclose(self.alpha, other.alpha):
+            raise ValueError(f"无法合并不同 alpha 的草图: {self.alpha} vs {other.alpha}")
+        if other.count == 0:
+            return self
+        for i, c in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._collapse()
+        return self
+
+    def _collapse(self):
+        if len(self.bins) <= self.max_bins:
+            return
+        keys = sorted(self.bins)
+        n_drop = len(keys) - self.max_bins
+        folded = sum(self.bins.pop(k) for k in keys[:n_drop])
+        self.bins[keys[n_drop]] += folded
+
+    def _bin_value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def sorted_bins(self):
+        """(代表值, 计数) 按值升序，零桶在最前"""
+        keys = sorted(self.bins)
+        values = [self._bin_value(k) for k in keys]
+        counts = [self.bins[k] for k in keys]
+        if self.zero_count:
+            values.insert(0, 0.0)
+            counts.insert(0, self.zero_count)
+        values = np.clip(np.array(values, dtype=np.float64), self.min, self.max)
+        return values, np.array(counts, dtype=np.int64)
+
+    def quantile(self, q):
+        """q 为 0-1 之间的分位点，返回值的相对误差不超过 alpha"""
+        if self.count == 0:
+            return math.nan
+        values, counts = self.sorted_bins()
+        rank = q * (self.count - 1)
+        pos = int(np.searchsorted(np.cumsum(counts), rank, side='right'))
+        return float(values[min(pos, values.size - 1)])
+
+    def percentiles(self, ps=REPORT_PERCENTILES):
+        return [self.quantile(p / 100.) for p in ps]
+
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+    def cdf_lines(self):
+        """与 getCdfFromArray 相同格式的 CDF 行: value count cumcount p"""
+        values, counts = self.sorted_bins()
+        cum = np.cumsum(counts)
+        denom = max(self.count - 1, 1)
+        return [f"{v} {c} {acc} {(acc - 1) / denom}\n"
+                for v, c, acc in zip(values.tolist(), counts.tolist(), cum.tolist())]
+
+    def to_dict(self):
+        keys = sorted(self.bins)
+        return {
+            'alpha': self.alpha,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'zero_count': self.zero_count,
+            'keys': keys,
+            'counts': [self.bins[k] for k in keys],
+        }
+
+    @classmethod
+    def from_dict(cls, d, max_bins=DEFAULT_MAX_BINS):
+        sk = cls(d['alpha'], max_bins)
+        sk.bins = dict(zip(d['keys'], d['counts']))
+        sk.zero_count = d['zero_count']
+        sk.count = d['count']
+        sk.sum = d['sum']
+        if sk.count:
+            sk.min = d['min']
+            sk.max = d['max']
+        return sk
+
+
+def size_bucket_name(lo, hi):
+    return f"size_{lo}_{hi}" if hi is not None else f"size_{lo}_inf"
+
+
+def build_fct_sketches(values, sizes, one_bdp, size_edges, alpha=DEFAULT_ALPHA):
+    """
+    按流大小分组构建草图：all / small(<1BDP) / large(>=1BDP) 以及
+    固定边界的流大小分组（固定边界保证不同 run 之间的分组可以直接合并）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    groups = {'all': np.ones(values.size, dtype=bool),
+              'small': sizes < one_bdp,
+              'large': sizes >= one_bdp}
+    edges = [0] + list(size_edges) + [None]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        mask = sizes >= lo
+        if hi is not None:
+            mask &= sizes < hi
+        groups[size_bucket_name(lo, hi)] = mask
+
+    sketches = {}
+    for name, mask in groups.items():
+        sk = DDSketch(alpha)
+        sk.add(values[mask])
+        sketches[name] = sk
+    return sketches
+
+
+def save_sketch_file(path, sketches, meta):
+    """sketches: {metric: {group: DDSketch}}"""
+    data = {'meta': meta,
+            'sketches': {m: {g: sk.to_dict() for g, sk in groups.items()} for m, groups in sketches.items()}}
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def load_sketch_file(path):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    sketches = {m: {g: DDSketch.from_dict(d) for g, d in groups.items()}
+                for m, groups in data['sketches'].items()}
+    return sketches, data.get('meta', {})
+
+
+def expand_inputs(inputs):
+    """展开目录（递归查找 *_out_fct_sketch.json）与通配符"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files += sorted(glob.glob(os.path.join(item, '**', '*' + SKETCH_SUFFIX), recursive=True))
+        else:
+            files += sorted(glob.glob(item)) or [item]
+    return files
+
+
+def merge_sketch_files(files):
+    """逐个文件读入并合并，内存只与桶数相关"""
+    merged = {}
+    metas = []
+    for path in files:
+        sketches, meta = load_sketch_file(path)
+        metas.append(meta)
+        for metric, groups in sketches.items():
+            dst = merged.setdefault(metric, {})
+            for group, sk in groups.items():
+                if group in dst:
+                    dst[group].merge(sk)
+                else:
+                    dst[group] = sk
+    return merged, metas
+
+
+def select_sketch(sketches, key):
+    """key 形如 metric/group1+group2，多个分组先合并"""
+    metric, _, groups = key.partition('/')
+    if metric not in sketches:
+        raise KeyError(f"草图中没有指标 {metric} (可选: {', '.join(sorted(sketches))})")
+    names = groups.split('+') if groups else ['all']
+    out = None
+    for name in names:
+        if name not in sketches[metric]:
+            raise KeyError(f"草图中没有分组 {metric}/{name} (可选: {', '.join(sorted(sketches[metric]))})")
+        sk = sketches[metric][name]
+        out = DDSketch.from_dict(sk.to_dict()) if out is None else out.merge(sk)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FCT 分位数草图合并与报告')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_merge = sub.add_parser('merge', help='合并多个 run/seed 的草图文件')
+    p_merge.add_argument('inputs', nargs='+', help='草图文件、通配符或目录')
+    p_merge.add_argument('-o', '--output', required=True, help='合并结果文件')
+
+    p_report = sub.add_parser('report', help='输出合并后的分位数（及可选 CDF 文件）')
+    p_report.add_argument('inputs', nargs='+', help='草图文件、通配符或目录')
+    p_report.add_argument('-k', '--key', action='append', default=None,
+                          help='metric/group，可用 + 合并多个分组，如 slowdown/size_0_10000+size_10000_100000 '
+                               '(默认: 所有分组)')
+    p_report.add_argument('--cdf', default=None, help='将第一个 key 的 CDF 写入该文件')
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("错误: 没有找到草图文件")
+        return 1
+    merged, metas = merge_sketch_files(files)
+    print(f"合并 {len(files)} 个草图文件")
+
+    if args.cmd == 'merge':
+        save_sketch_file(args.output, merged, {'merged_from': files, 'runs': metas})
+        print(f"合并结果已保存到: {args.output}")
+        return 0
+
+    keys = args.key or [f"{m}/{g}" for m in sorted(merged) for g in merged[m]]
+    print("{:<32} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "key", "count", "avg", "50%", "95%", "99%", "99.9%", "99.99%"))
+    for key in keys:
+        sk = select_sketch(merged, key)
+        pct = sk.percentiles()
+        print("{:<32} {:>10} {:>10.3f} ".format(key, sk.count, sk.mean()) +
+              " ".join("{:>10.3f}".format(v) for v in pct))
+
+    if args.cdf:
+        with open(args.cdf, 'w') as f:
+            f.writelines(select_sketch(merged, keys[0]).cdf_lines())
+        print(f"CDF 已保存到: {args.cdf}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
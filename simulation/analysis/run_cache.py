@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+按 run 缓存的列式日志
+
+首次读取某个日志时用 log_parser 解析，并把各列保存为同目录 .cache/ 下的 .npz；
+之后只要源文件的大小和修改时间不变，就直接从 .npz 读取列数组，免去重复解析。
+画图、对比等脚本可以共享同一份缓存。
+
+使用方法:
+python3 run_cache.py <log_file>... [--schema fct|uplink|...]   # 预先建立缓存
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+from log_parser import find_log, get_schema, is_compressed, schema_for_file, parse_log, read_binary_header
+
+CACHE_DIR_NAME = '.cache'
+# 缓存格式变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+
+def file_signature(path):
+    """源文件签名 (size, mtime_ns)，文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def signature_digest(paths, extra=''):
+    """多个输入文件签名 + 额外参数的摘要，用作依赖哈希"""
+    h = hashlib.sha1()
+    for path in paths:
+        h.update(os.path.abspath(path).encode())
+        h.update(repr(file_signature(path)).encode())
+    h.update(extra.encode())
+    return h.hexdigest()
+
+
+def cache_path(log_path):
+    directory, base = os.path.split(os.path.abspath(log_path))
+    return os.path.join(directory, CACHE_DIR_NAME, base + '.npz')
+
+
+def _read_cache(path, log_path, schema):
+    try:
+        with np.load(path) as data:
+            meta = data['__meta__'].tolist()
+            if meta != [CACHE_VERSION, *file_signature(log_path)]:
+                return None
+            return {name: data[name] for name, _ in schema.columns}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_columns(log_path, schema=None, n_threads=None):
+    """
+    返回日志的 {列名: NumPy 数组}，命中缓存时不解析原始文件
+
+    schema 缺省时根据文件名后缀识别。缓存目录不可写时退化为直接解析。
+    二进制日志本身就能直接映射读取，不再另建缓存；压缩日志（.zst / .gz）按压缩文件建缓存。
+    """
+    schema = get_schema(schema) if schema is not None else schema_for_file(log_path)
+    if schema is None:
+        raise ValueError(f"无法根据文件名识别日志类型: {log_path}")
+    log_path = find_log(log_path) or log_path
+    if file_signature(log_path) is None:
+        raise FileNotFoundError(f"日志文件不存在: {log_path}")
+    if not is_compressed(log_path) and read_binary_header(log_path) is not None:
+        return parse_log(log_path, schema)
+
+    path = cache_path(log_path)
+    cols = _read_cache(path, log_path, schema) if os.path.exists(path) else None
+    if cols is not None:
+        return cols
+
+    signature = file_signature(log_path)
+    cols = parse_log(log_path, schema, n_threads=n_threads)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + f'.{os.getpid()}.tmp.npz'
+        np.savez(tmp, __meta__=np.array([CACHE_VERSION, *signature], dtype=np.int64), **cols)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"警告: 无法写入缓存 {path}: {e}")
+    return cols
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为仿真日志建立列式缓存')
+    parser.add_argument('log_files', nargs='+', help='日志文件路径')
+    parser.add_argument('--schema', default=None, help='日志类型 (默认: 根据文件名后缀识别)')
+    args = parser.parse_args()
+
+    for log_file in args.log_files:
+        cols = load_columns(log_file, args.schema)
+        n_rows = len(next(iter(cols.values()))) if cols else 0
+        print(f"{log_file}: {n_rows:,} 行 -> {cache_path(log_file)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
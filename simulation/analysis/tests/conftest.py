@@ -0,0 +1,10 @@
+import os
+import sys
+
+_TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+_ANALYSIS_DIR = os.path.dirname(_TESTS_DIR)
+# 分析脚本以目录内的裸模块名互相导入；queueAnalysis.py 位于 simulation/ 下
+sys.path.insert(0, _ANALYSIS_DIR)
+sys.path.insert(0, os.path.join(_ANALYSIS_DIR, 'pfc'))
+sys.path.insert(0, os.path.join(_ANALYSIS_DIR, 'fec'))
+sys.path.insert(0, os.path.dirname(_ANALYSIS_DIR))
@@ -0,0 +1,98 @@
+"""CNP/RTO time-series aggregation against per-record loops on a small run"""
+
+import numpy as np
+import pytest
+
+from cnp_rto_analysis import analyze_run, followed_fraction, lagged_correlation, pearson, read_sample_rate
+
+NODES_PER_DC = 10
+DCI_IDS = [9, 19]
+T0 = 2_000_000_000
+BIN_NS = 100_000
+N_BINS = 40
+
+
+def make_run(tmp_path, seed, rto_header='# sample_rate=1/4\n'):
+    rng = np.random.default_rng(seed)
+    prefix = str(tmp_path / '1')
+    (tmp_path / 'config.txt').write_text('DCI_SWITCH_IDS 2 {} {}\nFLOWGEN_START_TIME 2.0\nFLOWGEN_STOP_TIME 2.1\n'
+                                         .format(*DCI_IDS))
+    cnp = [(T0 + int(rng.integers(0, N_BINS * BIN_NS)), int(rng.integers(0, 20)), int(rng.integers(0, 5)),
+            int(rng.integers(0, 5))) for _ in range(300)]
+    with open(prefix + '_out_cnp.txt', 'w') as f:
+        for t, node, ecn, ooo in cnp:
+            f.write(f'{t} {node} {ecn} {ooo} {ecn + ooo}\n')
+    rto = [(T0 + int(rng.integers(0, N_BINS * BIN_NS)), int(rng.integers(0, 20)), int(rng.integers(0, 20)),
+            int(rng.integers(0, 20))) for _ in range(80)]
+    with open(prefix + '_out_rto.txt', 'w') as f:
+        f.write(rto_header)
+        for i, (t, node, src, dst) in enumerate(rto):
+            f.write(f'{t} {node} {i % 7} {src} {dst} 10000 100 0 1000 {4000 + i} {1 + i % 3}\n')
+    pfc = [(T0 + int(rng.integers(0, N_BINS * BIN_NS)), int(rng.choice([3, 9, 19])), int(rng.integers(0, 2)))
+           for _ in range(100)]
+    with open(prefix + '_out_pfc.txt', 'w') as f:
+        for t, node, typ in pfc:
+            f.write(f'{t} {node} 1 2 {typ}\n')
+    return prefix, str(tmp_path / 'config.txt'), cnp, rto, pfc
+
+
+def test_analyze_run_matches_loops(tmp_path):
+    prefix, config, cnp, rto, pfc = make_run(tmp_path, seed=1)
+    summary, series = analyze_run(prefix, config, BIN_NS, 5, 1.0 / 256)
+    assert summary['t0_ns'] == T0
+    n_bins = summary['n_bins']
+
+    cnp_dc = np.zeros((2, n_bins))
+    for t, node, ecn, ooo in cnp:
+        cnp_dc[min(node // NODES_PER_DC, 1), (t - T0) // BIN_NS] += ecn + ooo
+    np.testing.assert_array_equal(series['cnp_dc0'], cnp_dc[0])
+    np.testing.assert_array_equal(series['cnp_dc1'], cnp_dc[1])
+    assert summary['cnp']['total'] == sum(e + o for _, _, e, o in cnp)
+    assert summary['cnp']['per_dc'] == cnp_dc.sum(axis=1).tolist()
+
+    # one logged RTO stands for 4 at sample_rate=1/4
+    rto_dc = np.zeros((2, n_bins))
+    for t, node, _, _ in rto:
+        rto_dc[min(node // NODES_PER_DC, 1), (t - T0) // BIN_NS] += 4
+    np.testing.assert_array_equal(series['rto_est_dc0'], rto_dc[0])
+    np.testing.assert_array_equal(series['rto_est_dc1'], rto_dc[1])
+    assert summary['rto']['sample_rate'] == 0.25
+    assert summary['rto']['estimated_total'] == 4 * len(rto)
+    inter = sum(src // NODES_PER_DC != dst // NODES_PER_DC for _, _, src, dst in rto)
+    assert summary['rto']['estimated_inter_dc'] == 4 * inter
+    assert summary['rto']['estimated_intra_dc'] == 4 * (len(rto) - inter)
+
+    pauses = np.zeros(n_bins)
+    for t, node, typ in pfc:
+        if node in DCI_IDS and typ == 1:
+            pauses[(t - T0) // BIN_NS] += 1
+    np.testing.assert_array_equal(series['dci_pfc_pause'], pauses)
+    assert summary['correlation']['cnp_rto'] == pytest.approx(np.corrcoef(cnp_dc.sum(axis=0),
+                                                                          rto_dc.sum(axis=0))[0, 1])
+
+
+def test_sample_rate_default_without_header(tmp_path):
+    prefix, _, _, _, _ = make_run(tmp_path, seed=2, rto_header='')
+    assert read_sample_rate(prefix + '_out_rto.txt', 1.0 / 256) == 1.0 / 256
+    prefix, _, _, _, _ = make_run(tmp_path, seed=2, rto_header='# sample_rate=0.5\n')
+    assert read_sample_rate(prefix + '_out_rto.txt', 1.0 / 256) == 0.5
+
+
+def test_lagged_correlation_matches_shifts():
+    rng = np.random.default_rng(3)
+    x = rng.random(50)
+    y = np.roll(x, 3) + 0.01 * rng.random(50)
+    lag, r = lagged_correlation(x, y, 6)
+    rs = [np.corrcoef(x[:x.size - k], y[k:])[0, 1] for k in range(7)]
+    assert lag == int(np.argmax(rs)) == 3
+    assert r == pytest.approx(max(rs))
+    assert pearson(np.ones(5), x[:5]) is None
+
+
+def test_followed_fraction_matches_loop():
+    rng = np.random.default_rng(4)
+    src = rng.random(200) < 0.1
+    dst = rng.random(200) < 0.1
+    expected = np.mean([dst[i:i + 4].any() for i in np.flatnonzero(src)])
+    assert followed_fraction(src, dst, 3) == pytest.approx(expected)
+    assert followed_fraction(np.zeros(5, dtype=bool), dst[:5], 3) is None
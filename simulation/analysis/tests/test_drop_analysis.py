@@ -0,0 +1,103 @@
+"""Process-pool drop aggregation against a serial run and the old per-line analysis"""
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from drop_analysis_simple import analyze_drop_statistics_simple, get_drop_cause_type, get_switch_type
+
+NODES_PER_DC = 53
+BIN_NS = 100_000
+COUNTER_KEYS = ['link_type_distribution', 'drop_cause_distribution', 'switch_type_distribution']
+BY_LINK_KEYS = ['type_by_link', 'drop_cause_by_link', 'switch_type_by_link', 'node_by_link']
+
+
+def write_drops(path, n, seed):
+    rng = np.random.default_rng(seed)
+    with open(path, 'w') as f:
+        for i in range(n):
+            if i % 97 == 0:
+                f.write('malformed line\n')
+            f.write('{} {} {} 1 {} {} 10000 100\n'.format(
+                2_000_000_000 + int(rng.integers(0, 5_000_000)), int(rng.integers(0, 3)),
+                int(rng.integers(0, 2 * NODES_PER_DC)), int(rng.integers(0, 2 * NODES_PER_DC)),
+                int(rng.integers(0, 2 * NODES_PER_DC))))
+
+
+def legacy_stats(path):
+    """Counters of the old parse_drop_file_simple / analyze_drop_statistics_simple at sample_rate=1"""
+    link_types = ('Intra-DC Link', 'Inter-DC Link')
+    stats = {k: Counter() for k in COUNTER_KEYS}
+    stats.update({k: {lt: Counter() for lt in link_types} for k in BY_LINK_KEYS})
+    times = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 8:
+                continue
+            try:
+                t, drop_type, node, _, src, dst, _, _ = map(int, parts)
+            except ValueError:
+                continue
+            times.append(t)
+            link = link_types[src // NODES_PER_DC != dst // NODES_PER_DC]
+            cause = get_drop_cause_type(drop_type)
+            switch = get_switch_type(node, NODES_PER_DC)
+            stats['link_type_distribution'][link] += 1
+            stats['drop_cause_distribution'][cause] += 1
+            stats['switch_type_distribution'][switch] += 1
+            stats['type_by_link'][link][drop_type] += 1
+            stats['drop_cause_by_link'][link][cause] += 1
+            stats['switch_type_by_link'][link][switch] += 1
+            stats['node_by_link'][link][node] += 1
+    stats['total_drops'] = len(times)
+    stats['time_range_ns'] = max(times) - min(times)
+    return stats
+
+
+def heat_dict(stats):
+    h = stats['drop_rate_heatmap']
+    return dict(zip(zip(h['bin_start_ns'].tolist(), h['nodes'].tolist()), h['drops_per_sec'].tolist()))
+
+
+def assert_same_counts(got, expected):
+    assert got['total_drops'] == expected['total_drops']
+    assert got['time_range_ns'] == expected['time_range_ns']
+    for k in COUNTER_KEYS:
+        assert Counter(got[k]) == expected[k], k
+    for k in BY_LINK_KEYS:
+        for link, counter in expected[k].items():
+            assert Counter(got[k][link]) == counter, (k, link)
+
+
+def test_parallel_matches_serial_and_legacy(tmp_path):
+    path = str(tmp_path / '1_out_drop.txt')
+    write_drops(path, 5000, seed=1)
+    serial = analyze_drop_statistics_simple(path, jobs=1, nodes_per_dc=NODES_PER_DC, bin_ns=BIN_NS)
+    parallel = analyze_drop_statistics_simple(path, jobs=2, task_bytes=4096, nodes_per_dc=NODES_PER_DC,
+                                              bin_ns=BIN_NS)
+    expected = legacy_stats(path)
+    assert_same_counts(serial, expected)
+    assert_same_counts(parallel, expected)
+    assert heat_dict(parallel) == heat_dict(serial)
+
+    heat = Counter()
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 8:
+                heat[(int(parts[0]) // BIN_NS * BIN_NS, int(parts[2]))] += 1
+    assert heat_dict(serial) == {k: v / (BIN_NS / 1e9) for k, v in heat.items()}
+
+
+def test_sampled_drop_rate_is_scaled(tmp_path):
+    path = str(tmp_path / '1_out_drop.txt')
+    write_drops(path, 20000, seed=2)
+    stats = analyze_drop_statistics_simple(path, sample_rate=0.25, jobs=2, task_bytes=64 * 1024,
+                                           nodes_per_dc=NODES_PER_DC, bin_ns=BIN_NS)
+    # counts are of the sampled records, the heatmap rate estimates the full log
+    assert stats['total_drops'] == pytest.approx(5000, rel=0.1)
+    rate = stats['drop_rate_heatmap']['drops_per_sec']
+    assert rate.sum() * BIN_NS / 1e9 == pytest.approx(stats['total_drops'] / 0.25)
+    assert rate.sum() * BIN_NS / 1e9 == pytest.approx(20000, rel=0.1)
@@ -0,0 +1,113 @@
+"""fct_query size steps against the awk/sort get_steps_from_raw of the plot scripts"""
+
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from fct_query import fct_steps, load_file, load_runs
+
+needs_awk = pytest.mark.skipif(shutil.which("awk") is None or shutil.which("sort") is None,
+                               reason="get_steps_from_raw needs awk and sort")
+
+KEYS = ["size", "avg", "p50", "p95", "p99"]
+
+
+def get_pctl(a, p):
+    i = int(len(a) * p)
+    return a[i]
+
+
+def legacy_steps(filename, time_start, time_end, step=5, drop_largest=True):
+    """get_steps_from_raw of compare_fct.py; drop_largest=False keeps the last line"""
+    cmd_slowdown = "cat %s" % (filename) + " | awk '{ if ($6>" + "%d" % time_start + " && $6+$7<" + "%d" % (time_end) + \
+        ") { slow=$7/$8; print slow<1?1:slow, $5} }' | sort -n -k 2"
+    output_slowdown = subprocess.check_output(cmd_slowdown, shell=True)
+    aa = output_slowdown.decode("utf-8").split('\n')[:-2 if drop_largest else -1]
+    nn = len(aa)
+    if nn == 0:
+        return None
+    result = {k: [] for k in KEYS}
+    for i in range(0, 100, step):
+        l = int(i * nn / 100)
+        r = int((i + step) * nn / 100)
+        fct_size = [[float(x.split(" ")[0]), int(x.split(" ")[1])] for x in aa[l:r]]
+        fct = sorted(map(lambda x: x[0], fct_size))
+        if not fct:
+            for k in KEYS:
+                result[k].append(0)
+            continue
+        result["size"].append(fct_size[-1][1])
+        result["avg"].append(sum(fct) / len(fct))
+        result["p50"].append(get_pctl(fct, 0.5))
+        result["p95"].append(get_pctl(fct, 0.95))
+        result["p99"].append(get_pctl(fct, 0.99))
+    return result
+
+
+def write_fct(path, n, seed):
+    """
+    Distinct flow sizes, so the sort order of the legacy pipeline is unique, and
+    slowdowns with at most 6 significant digits, which awk prints exactly
+    """
+    rng = np.random.default_rng(seed)
+    size = rng.permutation(10 * n)[:n] + 1000
+    start = rng.integers(1900000000, 2200000000, size=n)
+    fct = rng.integers(500, 1000000, size=n)
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write("{} {} 10000 100 {} {} {} 1000\n".format(i % 64, (i * 7) % 64, size[i], start[i], fct[i]))
+
+
+def assert_steps(got, expected):
+    assert got["size"] == expected["size"]
+    for k in KEYS[1:]:
+        assert got[k] == pytest.approx(expected[k], rel=1e-12)
+
+
+@needs_awk
+@pytest.mark.parametrize("n", [7, 19, 20, 21, 1000, 4321])
+@pytest.mark.parametrize("drop_largest", [True, False])
+def test_steps_match_legacy(tmp_path, n, drop_largest):
+    path = str(tmp_path / "1_out_fct.txt")
+    write_fct(path, n, seed=n)
+    ts, te = 2000000000, 2150000000
+    expected = legacy_steps(path, ts, te, drop_largest=drop_largest)
+    got = fct_steps(path, ts, te, drop_largest=drop_largest)
+    assert expected is not None
+    assert_steps(got, expected)
+
+
+def test_steps_empty_window(tmp_path):
+    path = str(tmp_path / "1_out_fct.txt")
+    write_fct(path, 50, seed=1)
+    assert fct_steps(path, 3000000000, 4000000000) is None
+
+
+def test_multi_run_steps_match_single_runs(tmp_path):
+    ids = ["101", "102", "103"]
+    for i, rid in enumerate(ids):
+        os.makedirs(str(tmp_path / rid))
+        write_fct(str(tmp_path / rid / (rid + "_out_fct.txt")), 500 + 300 * i, seed=i)
+    table = load_runs(ids, output_dir=str(tmp_path), nodes_per_dc=16)
+    assert table.run_ids == ids
+    for drop_largest in (True, False):
+        steps = table.select(time_start=2000000000, time_end=2150000000).size_steps(drop_largest=drop_largest)
+        for rid in ids:
+            single = load_file(str(tmp_path / rid / (rid + "_out_fct.txt")), 16)
+            expected = single.select(time_start=2000000000, time_end=2150000000).size_steps(drop_largest=drop_largest)
+            assert_steps(steps[rid], next(iter(expected.values())))
+
+
+def test_select_scope(tmp_path):
+    path = str(tmp_path / "1_out_fct.txt")
+    write_fct(path, 200, seed=2)
+    table = load_file(path, nodes_per_dc=16)
+    counts = table.counts()[path]
+    intra = table.select(scope="intra")
+    assert len(intra) == counts["intra"] and len(table.select(scope="inter")) == counts["inter"]
+    assert (intra["src_id"] // 16 == intra["dst_id"] // 16).all()
+    with pytest.raises(ValueError):
+        table.select(scope="both")
@@ -0,0 +1,87 @@
+"""fct_regression bootstrap: metric convention, per-run resampling, determinism and flagging"""
+
+import numpy as np
+import pytest
+
+from fct_query import FctTable
+from fct_regression import bootstrap_metrics, classify, compare_sets, metric_value
+
+
+def make_table(slowdowns_per_run, seed=0):
+    rng = np.random.default_rng(seed)
+    run = np.concatenate([np.full(len(s), i) for i, s in enumerate(slowdowns_per_run)]).astype(np.int64)
+    slow = np.concatenate(slowdowns_per_run).astype(np.float64)
+    size = rng.integers(1000, 2000000, size=slow.size)
+    return FctTable([str(i) for i in range(len(slowdowns_per_run))], {"run": run, "size": size, "slowdown": slow})
+
+
+def test_metric_value_uses_get_pctl_index():
+    rng = np.random.default_rng(0)
+    values = rng.random(1234)
+    s = np.sort(values)
+    assert metric_value(values, "p99") == s[int(1234 * 0.99)]
+    assert metric_value(values, "p999") == s[int(1234 * 0.999)]
+    assert metric_value(values, "p50") == s[617]
+    assert metric_value(values, "mean") == pytest.approx(values.mean())
+    rows = rng.random((3, 50))
+    assert metric_value(rows, "p90", axis=1).tolist() == [np.sort(r)[45] for r in rows]
+
+
+def test_resampling_stays_within_runs():
+    # every resample keeps 5 flows of run 0 (all 1.0) and 15 of run 1 (all 3.0)
+    values = np.array([1.0] * 5 + [3.0] * 15)
+    counts = np.array([5, 15])
+    out = bootstrap_metrics(values, counts, ["mean", "p50"], 400, np.random.default_rng(1))
+    assert np.allclose(out["mean"], 2.5)
+    assert (out["p50"] == 3.0).all()
+
+
+def test_bootstrap_is_deterministic():
+    values = np.random.default_rng(2).lognormal(size=300)
+    counts = np.array([100, 200])
+    a = bootstrap_metrics(values, counts, ["mean", "p99"], 100, np.random.default_rng(7))
+    b = bootstrap_metrics(values, counts, ["mean", "p99"], 100, np.random.default_rng(7))
+    assert all((a[m] == b[m]).all() for m in a)
+
+
+def test_compare_sets_flags_regression():
+    rng = np.random.default_rng(3)
+    base = make_table([1 + rng.lognormal(0, 0.5, 800) for _ in range(3)], seed=1)
+    cand = make_table([1.5 * (1 + rng.lognormal(0, 0.5, 800)) for _ in range(3)], seed=2)
+    edges = [0, 100000, 1000000]
+    rows, conf = compare_sets(base, cand, edges, ["mean", "p99"], n_boot=300, min_flows=50, seed=5, jobs=1)
+    # 2 buckets x 2 metrics, Bonferroni-adjusted
+    assert conf == pytest.approx(1 - 0.05 / 4)
+    for row in rows:
+        r = row["metrics"]["mean"]
+        assert r["ci"][0] <= r["rel"] <= r["ci"][1]
+        assert r["rel"] == pytest.approx(0.5, abs=0.1)
+        assert r["flag"] == "regression"
+
+    # same seed, same CIs regardless of the number of workers
+    rows2, _ = compare_sets(base, cand, edges, ["mean", "p99"], n_boot=300, min_flows=50, seed=5, jobs=2)
+    assert [r["metrics"] for r in rows] == [r["metrics"] for r in rows2]
+
+
+def test_compare_sets_no_change():
+    rng = np.random.default_rng(4)
+    runs = [1 + rng.lognormal(0, 0.5, 1000) for _ in range(2)]
+    base = make_table(runs, seed=1)
+    cand = make_table([r[::-1].copy() for r in runs], seed=1)
+    rows, _ = compare_sets(base, cand, [0, 100000], ["mean", "p99"], n_boot=300, min_flows=50, jobs=1)
+    for r in rows[0]["metrics"].values():
+        assert r["ci"][0] <= 0 <= r["ci"][1]
+        assert r["flag"] == ""
+
+
+def test_compare_sets_skips_small_buckets():
+    base = make_table([np.ones(30)])
+    rows, conf = compare_sets(base, base, [0, 100000], ["mean"], n_boot=10, min_flows=100, jobs=1)
+    assert rows[0]["metrics"] is None and conf == pytest.approx(0.95)
+
+
+def test_classify():
+    assert classify({"ci": [0.01, 0.2], "rel": 0.1}, 0.05) == "regression"
+    assert classify({"ci": [0.01, 0.2], "rel": 0.03}, 0.05) == ""
+    assert classify({"ci": [-0.2, -0.01], "rel": -0.1}, 0.05) == "improvement"
+    assert classify({"ci": [-0.1, 0.1], "rel": 0.0}, 0.05) == ""
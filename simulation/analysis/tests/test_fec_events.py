@@ -0,0 +1,151 @@
+"""Vectorized FEC event analysis against a line-by-line reference on a small log"""
+
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from analyze_fec_events import (FEC_RECIPE_ENTRY_BYTES, FEC_REPAIR_HEADER_BYTES, load_fec_events,
+                                negotiation_latency, negotiation_timeline, per_flow_stats, per_node_stats,
+                                unpack_rc)
+
+PAYLOAD_BYTES = 1000
+FLOWS = [0x1234, 0xFFFFFFF0, 77, 5]
+
+
+def pack(r, c):
+    return (r & 0xFFFF) | ((c & 0xFFFF) << 16)
+
+
+def random_events(n, seed):
+    """(time, node, type, p0, p1, p2, p3) rows with the flowHash in the parameter on_fec_debug uses"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    t = 2_000_000_000
+    for _ in range(n):
+        t += int(rng.integers(0, 3000))
+        node = int(rng.integers(0, 6))
+        flow = FLOWS[int(rng.integers(0, len(FLOWS)))]
+        ev = int(rng.choice([0, 1, 2, 3, 4, 20, 21, 22, 23, 24]))
+        a, b = int(rng.integers(0, 9)), int(rng.integers(0, 9))
+        rc_old, rc_new = pack(int(rng.integers(1, 64)), int(rng.integers(1, 16))), pack(int(rng.integers(1, 64)),
+                                                                                       int(rng.integers(1, 16)))
+        if ev == 0:
+            p = (a, b, flow, 0)
+        elif ev == 1:
+            p = (a, b, int(rng.integers(1, 9)), flow)
+        elif ev == 2:
+            p = (a, b, flow, 0)
+        elif ev == 3:
+            p = (a, int(rng.integers(0, 3)), flow, 0)
+        elif ev == 4:
+            p = (flow, a, int(rng.integers(1, 64)), int(rng.integers(0, 3)))
+        elif ev == 21:
+            p = (flow, rc_new, b, 0)
+        elif ev == 24:
+            p = (flow, 0, 0, 0)
+        else:
+            p = (flow, rc_old, rc_new, b)
+        rows.append((t, node, ev) + p)
+    return rows
+
+
+def write_events(path, rows):
+    with open(path, 'w') as f:
+        for r in rows:
+            f.write(' '.join(map(str, r)) + '\n')
+
+
+def naive_stats(rows, key):
+    """Per-group sums of _event_metrics computed one line at a time; key(row) selects the group"""
+    out = defaultdict(lambda: defaultdict(float))
+    for r in rows:
+        t, node, ev, p0, p1, p2, p3 = r
+        g = out[key(r)]
+        if ev == 1:
+            g['repairs'] += 1
+            g['repair_bytes'] += PAYLOAD_BYTES + FEC_REPAIR_HEADER_BYTES + FEC_RECIPE_ENTRY_BYTES * p2
+        elif ev == 2:
+            g['attempts'] += 1
+        elif ev == 3:
+            g['recovered'] += p1
+        elif ev == 4:
+            g['tail_flushes'] += 1
+            g['tail_skipped'] += p3 == 0
+            g['tail_data'] += p2
+            g['tail_repairs'] += p3
+        elif ev == 20:
+            g['negotiate_reqs'] += 1
+        elif ev == 22:
+            g['param_applies'] += 1
+        elif ev == 24:
+            g['idle_gc'] += 1
+    return out
+
+
+def row_flow(r):
+    ev = r[2]
+    return r[3 + {0: 2, 1: 3, 2: 2, 3: 2}.get(ev, 0)]
+
+
+def assert_table(table, key_col, expected):
+    assert table[key_col].tolist() == sorted(expected)
+    for i, k in enumerate(table[key_col].tolist()):
+        exp = expected[k]
+        for name in ('repairs', 'attempts', 'recovered', 'tail_flushes', 'tail_skipped', 'tail_data',
+                     'tail_repairs', 'negotiate_reqs', 'param_applies', 'idle_gc'):
+            assert table[name][i] == exp[name], (k, name)
+        assert table['repair_bytes'][i] == pytest.approx(exp['repair_bytes'])
+        if exp['repairs']:
+            assert table['recovery_efficiency'][i] == pytest.approx(exp['recovered'] / exp['repairs'])
+        else:
+            assert np.isnan(table['recovery_efficiency'][i])
+        if exp['tail_data']:
+            assert table['tail_overhead'][i] == pytest.approx(exp['tail_repairs'] / exp['tail_data'])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_group_stats_match_naive(tmp_path, seed):
+    rows = random_events(400, seed)
+    path = str(tmp_path / '1_out_fec.txt')
+    write_events(path, rows)
+    cols = load_fec_events(path)
+    assert cols['flow'].tolist() == [row_flow(r) for r in rows]
+    assert_table(per_flow_stats(cols, PAYLOAD_BYTES), 'flow', naive_stats(rows, row_flow))
+    assert_table(per_node_stats(cols, PAYLOAD_BYTES), 'node', naive_stats(rows, lambda r: r[1]))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_negotiation_matches_naive(tmp_path, seed):
+    rows = random_events(400, seed)
+    path = str(tmp_path / '1_out_fec.txt')
+    write_events(path, rows)
+    timeline = negotiation_timeline(load_fec_events(path))
+
+    neg = sorted((r for r in rows if r[2] in (20, 21, 22, 23)), key=lambda r: (r[3], r[0]))
+    assert timeline['time_ns'].tolist() == [r[0] for r in neg]
+    assert timeline['event'].tolist() == [r[2] for r in neg]
+    for i, r in enumerate(neg):
+        if r[2] == 21:
+            assert (timeline['old_r'][i], timeline['old_c'][i]) == (-1, -1)
+            assert (timeline['new_r'][i], timeline['new_c'][i]) == (r[4] & 0xFFFF, r[4] >> 16)
+            assert timeline['arg'][i] == r[5]
+        else:
+            assert (timeline['old_r'][i], timeline['old_c'][i]) == (r[4] & 0xFFFF, r[4] >> 16)
+            assert (timeline['new_r'][i], timeline['new_c'][i]) == (r[5] & 0xFFFF, r[5] >> 16)
+            assert timeline['arg'][i] == r[6]
+
+    expected = []
+    for a in neg:
+        if a[2] != 22:
+            continue
+        reqs = [q[0] for q in neg if q[2] == 20 and q[3] == a[3] and q[0] <= a[0]]
+        if reqs:
+            expected.append(a[0] - max(reqs))
+    assert sorted(negotiation_latency(timeline).tolist()) == sorted(expected)
+
+
+def test_unpack_rc():
+    r, c = unpack_rc([pack(12, 3), pack(0xFFFF, 0xFFFF), 0])
+    assert r.tolist() == [12, 0xFFFF, 0]
+    assert c.tolist() == [3, 0xFFFF, 0]
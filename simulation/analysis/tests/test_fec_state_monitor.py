@@ -0,0 +1,93 @@
+"""FEC state-monitor parsing, RSS attribution and projection on synthetic state files"""
+
+import numpy as np
+import pytest
+
+from fec_state_monitor import (attribute_rss, growth_slopes, leak_flags, parse_state_file, parse_state_lines,
+                               project_rss_kb, read_sim_horizon_ns)
+
+
+def state_line(t, **kv):
+    return '{} {}\n'.format(t, ' '.join(f'{k}={v}' for k, v in kv.items()))
+
+
+def synthetic_table(n=40, seed=0):
+    """RSS = base + xor_bytes + 300 B/block + 80 B/repair, in whole KB"""
+    rng = np.random.default_rng(seed)
+    t = 2_000_000_000 + np.arange(n) * 1_000_000
+    blocks = np.cumsum(rng.integers(0, 200, n))
+    repairs = rng.integers(0, 5000, n)
+    xor_bytes = np.cumsum(rng.integers(0, 100_000, n))
+    rss_kb = 100_000 + (xor_bytes + 300 * blocks + 80 * repairs) // 1024
+    return t, {'rss_kb': rss_kb, 'blocks': blocks, 'repairs': repairs, 'xor_bytes': xor_bytes}
+
+
+def test_parse_state_lines_matches_naive():
+    lines = [state_line(10, rss_kb=5, flows=2),
+             'garbage\n',
+             state_line(20, rss_kb=6, flows=3, blocks=7),
+             '30 rss_kb=x\n',
+             state_line(40, rss_kb=8, blocks=1)]
+    table = parse_state_lines(lines)
+    assert list(table) == ['time_ns', 'rss_kb', 'flows', 'blocks']
+    assert table['time_ns'].tolist() == [10, 20, 40]
+    assert table['rss_kb'].tolist() == [5, 6, 8]
+    assert table['flows'].tolist() == [2, 3, 0]
+    assert table['blocks'].tolist() == [0, 7, 1]
+
+
+def test_parse_state_file_drops_partial_line(tmp_path):
+    path = tmp_path / '1_out_fec_state.txt'
+    path.write_text(state_line(10, rss_kb=5) + state_line(20, rss_kb=6) + '30 rss_k')
+    assert parse_state_file(str(path))['time_ns'].tolist() == [10, 20]
+
+
+def test_growth_slopes_match_polyfit():
+    t, comps = synthetic_table()
+    table = dict(time_ns=t, **comps)
+    slopes = growth_slopes(table)
+    t_s = t / 1e9
+    for k, v in comps.items():
+        assert slopes[k]['slope'] == pytest.approx(np.polyfit(t_s, v.astype(float), 1)[0], rel=1e-9)
+        assert slopes[k]['end'] == v[-1]
+
+
+def test_attribute_rss_recovers_object_sizes():
+    t, comps = synthetic_table(n=200)
+    table = dict(time_ns=t, **comps)
+    attr = attribute_rss(table)
+    growth = (comps['rss_kb'][-1] - comps['rss_kb'][0]) * 1024
+    assert attr['rss_growth_bytes'] == growth
+    assert attr['components']['xor_bytes']['bytes'] == comps['xor_bytes'][-1] - comps['xor_bytes'][0]
+    # rss_kb is truncated to whole KB, so the fitted sizes are only close
+    assert attr['components']['blocks']['bytes_per_object'] == pytest.approx(300, rel=0.05)
+    assert abs(attr['unexplained_bytes']) < 0.01 * growth
+
+
+def test_attribute_rss_never_negative():
+    t = np.arange(10) * 1_000_000
+    table = {'time_ns': t, 'rss_kb': 1000 + t // 1_000_000, 'flows': 100 - np.arange(10), 'repairs': np.arange(10)}
+    attr = attribute_rss(table)
+    assert all(v['bytes_per_object'] >= 0 for v in attr['components'].values())
+
+
+def test_leak_flags():
+    t = np.arange(50) * 1_000_000
+    table = {'time_ns': t, 'rss_kb': 100 + 20 * np.arange(50), 'blocks': 10 + np.arange(50) * 3,
+             'repairs': (np.arange(50) % 7) * 100}
+    assert set(leak_flags(table)) == {'rss_kb', 'blocks'}
+
+
+def test_project_rss_kb_linear():
+    t = 2_000_000_000 + np.arange(20) * 10_000_000
+    table = {'time_ns': t, 'rss_kb': 5000 + np.arange(20) * 100}
+    # 100 KB per 10 ms of simulated time -> 10 MB/s
+    assert project_rss_kb(table, t[-1] + 1_000_000_000) == pytest.approx(5000 + 19 * 100 + 10_000)
+    assert project_rss_kb({'time_ns': t[:3], 'rss_kb': table['rss_kb'][:3]}, 0) is None
+
+
+def test_read_sim_horizon(tmp_path):
+    cfg = tmp_path / 'config.txt'
+    cfg.write_text('FLOWGEN_START_TIME 2.0\nFLOWGEN_STOP_TIME 2.1\n')
+    assert read_sim_horizon_ns(str(cfg)) == 2_200_000_000
+    assert read_sim_horizon_ns(str(tmp_path / 'missing.txt')) is None
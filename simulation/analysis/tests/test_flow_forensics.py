@@ -0,0 +1,125 @@
+"""Partitioned flow index lookups against filtering the parsed logs directly"""
+
+import os
+
+import numpy as np
+import pytest
+
+from flow_forensics import FlowIndex, flow_hash, flow_key, flow_timeline, node_ip
+from log_parser import parse_log
+
+FNV_OFFSET = 1469598103934665603
+FNV_PRIME = 1099511628211
+MASK64 = (1 << 64) - 1
+
+FLOWS = [(1, 12, 10000, 100), (12, 1, 100, 10000), (3, 4, 10001, 100), (5, 25, 10002, 100),
+         (25, 5, 100, 10002), (7, 8, 10003, 100)]
+
+
+def reference_flow_hash(src, dst, sport, dport):
+    """FecFlowKeyHash: FNV-1a over sip, dip and (sport << 16 | dport) as 64-bit words, low 32 bits"""
+    def ip(n):
+        return 0x0b000001 + (n // 256) * 0x10000 + (n % 256) * 0x100
+
+    h = FNV_OFFSET
+    for v in (ip(src), ip(dst), (sport << 16) | dport):
+        h ^= v
+        h = (h * FNV_PRIME) & MASK64
+    return h & 0xFFFFFFFF
+
+
+def make_run(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    run_dir = tmp_path / '9'
+    run_dir.mkdir()
+    prefix = str(run_dir / '9')
+
+    def pick():
+        return FLOWS[int(rng.integers(0, len(FLOWS)))]
+
+    with open(prefix + '_out_fct.txt', 'w') as f:
+        for i, (s, d, sp, dp) in enumerate(FLOWS):
+            f.write(f'{s} {d} {sp} {dp} {1000 * (i + 1)} {2_000_000_000 + i} {5000 + i} 4000\n')
+    with open(prefix + '_in.txt', 'w') as f:
+        for i, (s, d, sp, dp) in enumerate(FLOWS):
+            f.write(f'{s} {d} {sp} {dp} {1000 * (i + 1)} {2_000_000_000 + i}\n')
+    with open(prefix + '_out_drop.txt', 'w') as f:
+        for _ in range(300):
+            s, d, sp, dp = pick()
+            f.write(f'{2_000_000_000 + int(rng.integers(0, 10 ** 6))} {int(rng.integers(0, 3))} '
+                    f'{int(rng.integers(0, 30))} 1 {s} {d} {sp} {dp}\n')
+    with open(prefix + '_out_rto.txt', 'w') as f:
+        for i in range(50):
+            s, d, sp, dp = pick()
+            f.write(f'{2_000_000_000 + int(rng.integers(0, 10 ** 6))} {s} {i} {s} {d} {sp} {dp} 0 1000 4000 1\n')
+    with open(prefix + '_out_fec.txt', 'w') as f:
+        for _ in range(300):
+            h = reference_flow_hash(*pick())
+            t, node = 2_000_000_000 + int(rng.integers(0, 10 ** 6)), int(rng.integers(0, 30))
+            if rng.random() < 0.5:
+                f.write(f'{t} {node} 1 0 1 3 {h}\n')  # repair_recv: flowHash in param3
+            else:
+                f.write(f'{t} {node} 4 {h} 0 8 2\n')  # tail_flush: flowHash in param0
+    return str(run_dir), prefix
+
+
+def naive_rows(cols, mask, time_col):
+    idx = np.flatnonzero(mask)
+    return idx[np.argsort(cols[time_col][idx], kind='stable')]
+
+
+def assert_records(got, cols, idx):
+    assert got.size == idx.size
+    for name in cols:
+        np.testing.assert_array_equal(got[name], cols[name][idx])
+
+
+def test_flow_hash_matches_reference():
+    rng = np.random.default_rng(0)
+    src, dst = rng.integers(0, 2000, 50), rng.integers(0, 2000, 50)
+    sport, dport = rng.integers(0, 65536, 50), rng.integers(0, 65536, 50)
+    got = flow_hash(src, dst, sport, dport)
+    assert got.tolist() == [reference_flow_hash(*map(int, t)) for t in zip(src, dst, sport, dport)]
+    assert int(node_ip(257)) == 0x0b000001 + 0x10000 + 0x100
+    assert int(flow_key(1, 2, 3, 4)) == (1 << 48) | (2 << 32) | (3 << 16) | 4
+
+
+@pytest.mark.parametrize('n_partitions', [1, 4])
+def test_flow_events_match_filtering(tmp_path, n_partitions):
+    run_dir, prefix = make_run(tmp_path, seed=n_partitions)
+    index = FlowIndex(run_dir, prefix, n_partitions=n_partitions, verbose=False)
+    logs = {'fct': ('_out_fct.txt', 'start_ns'), 'in': ('_in.txt', 'start_ns'),
+            'drop': ('_out_drop.txt', 'time_ns'), 'rto': ('_out_rto.txt', 'time_ns')}
+    parsed = {log: parse_log(prefix + suffix, log) for log, (suffix, _) in logs.items()}
+    fec = parse_log(prefix + '_out_fec.txt', 'fec')
+    fec_flow = np.where(fec['log_type'] == 1, fec['param3'], fec['param0'])
+
+    for s, d, sp, dp in FLOWS:
+        events = index.flow_events(s, d, sp, dp)
+        for log, (_, time_col) in logs.items():
+            c = parsed[log]
+            m = (c['src_id'] == s) & (c['dst_id'] == d) & (c['sport'] == sp) & (c['dport'] == dp)
+            assert_records(events[log], c, naive_rows(c, m, time_col))
+        c = parsed['drop']
+        m = (c['src_id'] == d) & (c['dst_id'] == s) & (c['sport'] == dp) & (c['dport'] == sp)
+        assert_records(events['drop_ack'], c, naive_rows(c, m, 'time_ns'))
+        assert_records(events['fec'], fec, naive_rows(fec, fec_flow == reference_flow_hash(s, d, sp, dp),
+                                                      'time_ns'))
+
+        rows = flow_timeline(events)
+        assert [r[0] for r in rows] == sorted(r[0] for r in rows)
+        n = sum(events[k].size for k in ('in', 'drop', 'drop_ack', 'rto', 'fec')) + 2 * events['fct'].size
+        assert len(rows) == n
+
+
+def test_index_rebuilds_changed_log(tmp_path):
+    run_dir, prefix = make_run(tmp_path, seed=5)
+    index = FlowIndex(run_dir, prefix, n_partitions=4, verbose=False)
+    assert index.flow_events(*FLOWS[0])['fct'].size == 1
+    with open(prefix + '_out_fct.txt', 'a') as f:
+        f.write('{} {} {} {} 1 2100000000 10 10\n'.format(*FLOWS[0]))
+    index = FlowIndex(run_dir, prefix, n_partitions=4, verbose=False)
+    assert index.flow_events(*FLOWS[0])['fct']['start_ns'].tolist() == [2_000_000_000, 2_100_000_000]
+    os.remove(prefix + '_out_rto.txt')
+    index = FlowIndex(run_dir, prefix, n_partitions=4, verbose=False)
+    assert 'rto' not in index.flow_events(*FLOWS[0])
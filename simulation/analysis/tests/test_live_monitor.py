@@ -0,0 +1,114 @@
+"""Incremental tailing of live_monitor against parsing the finished logs in one pass"""
+
+import numpy as np
+import pytest
+
+from live_monitor import LiveStats, TailReader
+from log_parser import parse_log
+
+NODES_PER_DC = 10
+
+
+def fct_lines(n, seed):
+    rng = np.random.default_rng(seed)
+    return ['{} {} {} 100 {} {} {} {}\n'.format(rng.integers(0, 30), rng.integers(0, 30), 10000 + i,
+                                                rng.integers(1000, 10 ** 6), 2 * 10 ** 9 + i * 1000,
+                                                rng.integers(1000, 10 ** 6), rng.integers(1000, 10 ** 5))
+            for i in range(n)]
+
+
+def drop_lines(n, seed):
+    rng = np.random.default_rng(seed)
+    return ['{} {} {} 1 {} {} 10000 100\n'.format(2 * 10 ** 9 + i * 100, rng.integers(0, 3), rng.integers(0, 40),
+                                                  rng.integers(0, 30), rng.integers(0, 30))
+            for i in range(n)]
+
+
+def fec_lines(n, seed):
+    rng = np.random.default_rng(seed)
+    return ['{} {} {} {} {} {} {}\n'.format(2 * 10 ** 9 + i * 100, rng.integers(0, 30), rng.integers(0, 5),
+                                            rng.integers(0, 100), rng.integers(0, 3), rng.integers(0, 100), 7)
+            for i in range(n)]
+
+
+def append_in_pieces(path, text, reader, seed):
+    """Append text in random pieces (splitting lines), polling after each; returns the polled chunks"""
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.choice(np.arange(1, len(text)), size=min(40, len(text) - 1), replace=False))
+    chunks = []
+    prev = 0
+    for cut in list(cuts) + [len(text)]:
+        with open(path, 'a') as f:
+            f.write(text[prev:cut])
+        prev = cut
+        chunks.extend(reader.poll_all())
+    return chunks
+
+
+@pytest.mark.parametrize('log,make', [('fct', fct_lines), ('drop', drop_lines), ('fec', fec_lines)])
+def test_tail_reader_matches_full_parse(tmp_path, log, make):
+    path = str(tmp_path / f'1_out_{log}.txt')
+    text = ''.join(make(300, seed=1))
+    reader = TailReader(path, log, read_bytes=997)
+    assert reader.poll() is None  # not created yet
+    chunks = append_in_pieces(path, text, reader, seed=2)
+    expected = parse_log(path, log)
+    for k in expected:
+        np.testing.assert_array_equal(np.concatenate([c[k] for c in chunks]), expected[k])
+    assert reader.n_rows == 300
+    assert reader.offset == len(text)
+
+
+def test_tail_reader_restarts_after_truncation(tmp_path):
+    path = str(tmp_path / '1_out_fct.txt')
+    lines = fct_lines(5, seed=3)
+    with open(path, 'w') as f:
+        f.writelines(lines)
+    reader = TailReader(path, 'fct')
+    assert reader.poll()['sport'].size == 5
+    with open(path, 'w') as f:
+        f.writelines(lines[:2])
+    assert reader.poll()['sport'].tolist() == [10000, 10001]
+
+
+def test_live_stats_match_naive_counts(tmp_path):
+    fct = fct_lines(200, seed=7)
+    drops = drop_lines(500, seed=4)
+    fec = fec_lines(500, seed=5)
+    stats = LiveStats(nodes_per_dc=NODES_PER_DC)
+    for log, lines, add in (('fct', fct, stats.add_fct), ('drop', drops, stats.add_drop),
+                            ('fec', fec, stats.add_fec)):
+        path = str(tmp_path / f'1_out_{log}.txt')
+        reader = TailReader(path, log, read_bytes=1500)
+        for chunk in append_in_pieces(path, ''.join(lines), reader, seed=6):
+            add(chunk)
+    status = stats.snapshot()
+
+    fct_intra = sum(int(l.split()[0]) // NODES_PER_DC == int(l.split()[1]) // NODES_PER_DC for l in fct)
+    assert status['flows'] == {'intra': fct_intra, 'inter': len(fct) - fct_intra}
+
+    names = {0: 'random', 1: 'ingress', 2: 'egress'}
+    expected = {name: 0 for name in names.values()}
+    intra = 0
+    for line in drops:
+        p = [int(x) for x in line.split()]
+        expected[names[p[1]]] += 1
+        intra += p[4] // NODES_PER_DC == p[5] // NODES_PER_DC
+    for name, count in expected.items():
+        assert status['drops'][name] == count
+    assert status['drops']['intra'] == intra
+    assert status['drops']['inter'] == len(drops) - intra
+
+    recv = attempts = recovered = flushes = 0
+    for line in fec:
+        p = [int(x) for x in line.split()]
+        recv += p[2] == 1
+        attempts += p[2] == 2
+        recovered += p[4] if p[2] == 3 else 0
+        flushes += p[2] == 4
+    assert status['fec']['repair_recv'] == recv
+    assert status['fec']['recovery_attempt'] == attempts
+    assert status['fec']['recovered'] == recovered
+    assert status['fec']['tail_flush'] == flushes
+    last_ns = max([int(l.split()[5]) + int(l.split()[6]) for l in fct] + [int(l.split()[0]) for l in drops + fec])
+    assert status['sim_time_ms'] == pytest.approx(last_ns / 1e6)
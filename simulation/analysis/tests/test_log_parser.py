@@ -0,0 +1,258 @@
+"""log_parser：分词器与各种日志格式（文本 / 二进制 / gzip 帧 / zstd 帧）的往返测试"""
+
+import re
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+import log_parser
+from log_parser import (SCHEMAS, iter_byte_range, parse_byte_range, parse_log, read_binary_header,
+                        read_frame_index, read_log_meta, read_sample_rates, read_uncompressed,
+                        split_byte_ranges, tokenize_int_records)
+
+_INT_TOKEN = re.compile(rb'-?[0-9]{1,18}\Z')
+
+
+def reference_tokenize(buf, ncols, delimiter=b' '):
+    """逐行 split + int 的参考实现：列数不符或含非整数 token 的非空行计为跳过"""
+    rows, skipped = [], 0
+    for line in buf.split(b'\n'):
+        tokens = line.replace(delimiter, b' ').split()
+        if not tokens:
+            continue
+        if len(tokens) != ncols or not all(_INT_TOKEN.match(t) for t in tokens):
+            skipped += 1
+            continue
+        rows.append([int(t) for t in tokens])
+    return np.array(rows, dtype=np.int64).reshape(-1, ncols), skipped
+
+
+@pytest.mark.parametrize('buf,delimiter', [
+    (b'1 2 3\n4 5 6\n', b' '),
+    (b'1 2 3\n4 5 6', b' '),
+    (b'-1 2 -3\r\n4\t5 6\r\n', b' '),
+    (b'\n\n1 2 3\n   \n', b' '),
+    (b'# sample_rate=0.5\n1 2 3\n', b' '),
+    (b'1 2\n1 2 3 4\n7 8 9\n', b' '),
+    (b'1.5 2 3\n1 2 3\n', b' '),
+    (b'1-2 3 4\n--1 2 3\n- 1 2\n1 2 3-\n5 6 -7\n', b' '),
+    (b'1234567890123456789 1 2\n123456789012345678 1 2\n', b' '),
+    (b'1,2,3\n4,,5,6\n7,8\n', b','),
+    (b'10,20,30\r\n-1,-2,-3\n', b','),
+    (b'', b' '),
+    (b'# only a comment\n', b' '),
+])
+def test_tokenize_matches_reference(buf, delimiter):
+    records, skipped = tokenize_int_records(buf, 3, delimiter)
+    expected, expected_skipped = reference_tokenize(buf, 3, delimiter)
+    np.testing.assert_array_equal(records, expected)
+    assert skipped == expected_skipped
+
+
+def test_tokenize_random_lines():
+    rng = np.random.default_rng(1)
+    lines = []
+    for _ in range(2000):
+        row = [str(v) for v in rng.integers(-10 ** 12, 10 ** 12, size=4)]
+        kind = rng.integers(0, 8)
+        if kind == 0:
+            row = row[:3]
+        elif kind == 1:
+            row[1] = row[1] + 'x'
+        elif kind == 2:
+            row = []
+        lines.append(' '.join(row))
+    buf = '\n'.join(lines).encode()
+    records, skipped = tokenize_int_records(buf, 4)
+    expected, expected_skipped = reference_tokenize(buf, 4)
+    np.testing.assert_array_equal(records, expected)
+    assert skipped == expected_skipped
+
+
+def random_fct_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 200, n), rng.integers(0, 200, n), rng.integers(0, 65536, n),
+        rng.integers(0, 65536, n), rng.integers(1, 10 ** 9, n), rng.integers(0, 10 ** 10, n),
+        rng.integers(1, 10 ** 7, n), rng.integers(1, 10 ** 7, n),
+    ]).astype(np.int64)
+
+
+def text_lines(rows, delimiter=' '):
+    return [(delimiter.join(str(v) for v in r) + '\n').encode() for r in rows.tolist()]
+
+
+def assert_columns(cols, rows, schema):
+    for i, (name, dtype) in enumerate(SCHEMAS[schema].columns):
+        assert cols[name].dtype == dtype
+        np.testing.assert_array_equal(cols[name], rows[:, i].astype(dtype))
+
+
+def gzip_frame(raw):
+    """与 monitor-log.cc 相同的 gzip 帧：extra 字段 'XD' 中记录 member 大小和解压大小"""
+    comp = zlib.compressobj(1, zlib.DEFLATED, -15)
+    body = comp.compress(raw) + comp.flush()
+    size = 24 + len(body) + 8
+    head = bytes([0x1f, 0x8b, 8, 4, 0, 0, 0, 0, 0, 0xff, 12, 0]) + b'XD' + struct.pack('<HII', 8, size, len(raw))
+    return head + body + struct.pack('<II', zlib.crc32(raw), len(raw))
+
+
+def zstd_frame(raw):
+    zstandard = pytest.importorskip('zstandard')
+    body = zstandard.ZstdCompressor(level=1).compress(raw)
+    return struct.pack('<IIII', 0x184D2A5E, 8, len(body), len(raw)) + body
+
+
+def write_frames(path, lines, frame_lines, make_frame):
+    """每帧由 frame_lines 整行组成"""
+    with open(path, 'wb') as f:
+        for i in range(0, len(lines), frame_lines):
+            f.write(make_frame(b''.join(lines[i:i + frame_lines])))
+
+
+def test_text_roundtrip(tmp_path):
+    rows = random_fct_rows(5000)
+    path = tmp_path / '1_out_fct.txt'
+    path.write_bytes(b''.join(text_lines(rows)))
+    cols = parse_log(str(path))
+    assert_columns(cols, rows, 'fct')
+    # 小块并行解析与整体解析结果一致
+    assert_columns(parse_log(str(path), chunk_bytes=1000, n_threads=3), rows, 'fct')
+
+
+def test_text_byte_ranges(tmp_path):
+    rows = random_fct_rows(3000, seed=2)
+    lines = text_lines(rows)
+    path = tmp_path / '1_out_fct.txt'
+    path.write_bytes(b''.join(lines))
+    size = path.stat().st_size
+    ranges = split_byte_ranges(str(path), 4096)
+    assert ranges[0][0] == 0 and ranges[-1][1] == size
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    data = path.read_bytes()
+    assert all(data[e - 1:e] == b'\n' for _, e in ranges)
+
+    parts = [parse_byte_range(str(path), 'fct', s, e)[0] for s, e in ranges]
+    assert_columns(log_parser.concat_columns(parts, 'fct'), rows, 'fct')
+    # 子区间：从第 100 行开始到第 2000 行结束
+    start = sum(len(l) for l in lines[:100])
+    end = sum(len(l) for l in lines[:2000])
+    parts = [cols for cols, _ in iter_byte_range(str(path), 'fct', start, end, chunk_bytes=777)]
+    assert_columns(log_parser.concat_columns(parts, 'fct'), rows[100:2000], 'fct')
+
+
+def test_text_meta_header(tmp_path):
+    rows = random_fct_rows(10)
+    path = tmp_path / '1_out_fct.txt'
+    path.write_bytes(b'# sample_rate=0.5 sample_rate.3=1/8\n' + b''.join(text_lines(rows)))
+    assert read_log_meta(str(path)) == {'sample_rate': '0.5', 'sample_rate.3': '1/8'}
+    assert read_sample_rates(str(path)) == (0.5, {3: 0.125})
+    assert_columns(parse_log(str(path)), rows, 'fct')
+    assert read_sample_rates(str(tmp_path / 'missing_out_fct.txt')) == (None, {})
+
+
+def test_comma_schema_skips_bad_lines(tmp_path):
+    rows = random_fct_rows(50)[:, :4]
+    lines = text_lines(rows, ',')
+    lines.insert(10, b'1,2,3\n')
+    lines.insert(20, b'not,a,valid,row\n')
+    path = tmp_path / '1_out_uplink.txt'
+    path.write_bytes(b''.join(lines))
+    parts = list(log_parser.iter_log_chunks(str(path)))
+    assert sum(n for _, n in parts) == 2
+    assert_columns(log_parser.concat_columns([c for c, _ in parts], 'uplink'), rows, 'uplink')
+
+
+FCT_DTYPE = np.dtype([('src_id', '<u4'), ('dst_id', '<u4'), ('sport', '<u2'), ('dport', '<u2'),
+                      ('size', '<i8'), ('start_ns', '<i8'), ('fct_ns', '<i8'), ('standalone_fct_ns', '<i8')])
+
+
+def binary_header(dtype, stream='fct', extra=''):
+    fields = ','.join('{}:{}'.format(n, dtype.fields[n][0].str) for n in dtype.names)
+    return '#XDCBIN1 stream={} record_bytes={} fields={}{}\n'.format(stream, dtype.itemsize, fields, extra).encode()
+
+
+def binary_records(rows):
+    rec = np.empty(len(rows), dtype=FCT_DTYPE)
+    for i, name in enumerate(FCT_DTYPE.names):
+        rec[name] = rows[:, i]
+    return rec
+
+
+def test_binary_roundtrip(tmp_path):
+    rows = random_fct_rows(2000, seed=3)
+    head = binary_header(FCT_DTYPE, extra=' sample_rate=1/4')
+    path = tmp_path / '1_out_fct.txt'
+    # 末尾半条记录（仿真仍在写入）被忽略
+    path.write_bytes(head + binary_records(rows).tobytes() + b'\x01\x02\x03')
+
+    header = read_binary_header(str(path))
+    assert header.stream == 'fct' and header.dtype == FCT_DTYPE and header.offset == len(head)
+    assert read_sample_rates(str(path)) == (0.25, {})
+    assert_columns(parse_log(str(path)), rows, 'fct')
+    ranges = split_byte_ranges(str(path), 1000)
+    assert all((e - s) % FCT_DTYPE.itemsize == 0 for s, e in ranges)
+    parts = [cols for s, e in ranges for cols, _ in iter_byte_range(str(path), 'fct', s, e, 300)]
+    assert_columns(log_parser.concat_columns(parts, 'fct'), rows, 'fct')
+
+
+def test_binary_schema_from_stream(tmp_path):
+    rows = random_fct_rows(20)
+    path = tmp_path / 'renamed.bin'
+    path.write_bytes(binary_header(FCT_DTYPE) + binary_records(rows).tobytes())
+    assert_columns(parse_log(str(path)), rows, 'fct')
+
+
+def test_binary_header_mismatch():
+    with pytest.raises(ValueError):
+        log_parser.parse_binary_header(b'#XDCBIN1 stream=fct record_bytes=7 fields=a:<u4\n')
+
+
+@pytest.mark.parametrize('suffix,make_frame', [('.gz', gzip_frame), ('.zst', zstd_frame)])
+def test_compressed_text_roundtrip(tmp_path, suffix, make_frame):
+    rows = random_fct_rows(3000, seed=4)
+    lines = [b'# sample_rate=1/2\n'] + text_lines(rows)
+    path = tmp_path / ('1_out_fct.txt' + suffix)
+    write_frames(str(path), lines, 250, make_frame)
+    raw = b''.join(lines)
+
+    index = read_frame_index(str(path))
+    assert index.offset.size == (len(lines) + 249) // 250 and int(index.raw_size.sum()) == len(raw)
+    assert read_uncompressed(str(path)) == raw
+    assert read_uncompressed(str(path), 1000, 60000) == raw[1000:60000]
+    assert read_sample_rates(str(path)) == (0.5, {})
+    if suffix == '.gz':
+        # 每帧都是标准 gzip member
+        assert zlib.decompress(path.read_bytes(), wbits=31) == b''.join(lines[:250])
+
+    # 按不带压缩后缀的日志名查找
+    assert_columns(parse_log(str(tmp_path / '1_out_fct.txt')), rows, 'fct')
+    ranges = split_byte_ranges(str(path), 20000)
+    frame_ends = set((index.raw_offset + index.raw_size).tolist())
+    assert all(e in frame_ends for _, e in ranges)
+    parts = [parse_byte_range(str(path), 'fct', s, e)[0] for s, e in ranges]
+    assert_columns(log_parser.concat_columns(parts, 'fct'), rows, 'fct')
+
+
+@pytest.mark.parametrize('suffix,make_frame', [('.gz', gzip_frame), ('.zst', zstd_frame)])
+def test_compressed_binary_roundtrip(tmp_path, suffix, make_frame):
+    rows = random_fct_rows(1000, seed=5)
+    rec = binary_records(rows)
+    frames = [binary_header(FCT_DTYPE) + rec[:300].tobytes(), rec[300:700].tobytes(), rec[700:].tobytes()]
+    path = tmp_path / ('1_out_fct.txt' + suffix)
+    # 最后一帧不完整（仍在写入）时不计入
+    path.write_bytes(b''.join(make_frame(f) for f in frames) + make_frame(b'x' * 100)[:20])
+    assert read_binary_header(str(path)).stream == 'fct'
+    assert_columns(parse_log(str(path)), rows, 'fct')
+    parts = [cols for cols, _ in log_parser.iter_log_chunks(str(path), chunk_bytes=1)]
+    assert len(parts) == 3
+    assert_columns(log_parser.concat_columns(parts, 'fct'), rows, 'fct')
+
+
+def test_gzip_without_index(tmp_path):
+    path = tmp_path / '1_out_fct.txt.gz'
+    path.write_bytes(b'\x1f\x8b\x08\x00' + b'\x00' * 30)
+    with pytest.raises(ValueError):
+        parse_log(str(path))
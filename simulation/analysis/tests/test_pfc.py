@@ -0,0 +1,90 @@
+"""PFC pause interval reconstruction against the per-port state machine it replaced"""
+
+import numpy as np
+import pytest
+
+from analyze_pfc import reconstruct_pause_intervals
+
+DEFAULT_PAUSE = 5000
+
+
+def legacy_intervals(events, default_pause_time=DEFAULT_PAUSE):
+    """
+    Per-port loop of analyze_pfc_file before the vectorized rewrite, without
+    the DataFrame: events of each (node_id, if_idx) in time order
+    """
+    max_time = max(e[0] for e in events)
+    ports = {}
+    for e in events:
+        ports.setdefault((e[1], e[3]), []).append(e)
+    out = []
+    for (node_id, if_idx), group in sorted(ports.items()):
+        is_paused = False
+        current_pause_start = None
+        last_pause_time = None
+        for time_step, _, _, _, pfc_type in sorted(group, key=lambda e: e[0]):
+            if pfc_type == 1:
+                if not is_paused:
+                    is_paused = True
+                    current_pause_start = time_step
+                last_pause_time = time_step
+            elif pfc_type == 0 and is_paused:
+                is_paused = False
+                out.append((node_id, if_idx, current_pause_start, time_step, last_pause_time,
+                            time_step - current_pause_start))
+                current_pause_start = None
+                last_pause_time = None
+        if is_paused and current_pause_start is not None:
+            resume_time = min(last_pause_time + default_pause_time, max_time)
+            out.append((node_id, if_idx, current_pause_start, resume_time, last_pause_time,
+                        resume_time - current_pause_start))
+    return sorted(out)
+
+
+def to_cols(events):
+    ev = np.array(events, dtype=np.int64).reshape(-1, 5)
+    return {'time_ns': ev[:, 0], 'node': ev[:, 1].astype(np.uint32), 'node_type': ev[:, 2].astype(np.uint8),
+            'interface': ev[:, 3].astype(np.uint32), 'pfc_type': ev[:, 4].astype(np.uint8)}
+
+
+def interval_tuples(res):
+    keys = ['node_id', 'if_idx', 'pause_time', 'resume_time', 'last_pause_time', 'duration']
+    return sorted(zip(*(res[k].tolist() for k in keys)))
+
+
+def random_events(n, seed):
+    rng = np.random.default_rng(seed)
+    nodes = np.array([0, 1, 5, 65535, 65537, 70001])
+    # distinct times, so the order of same-time events never matters
+    times = rng.permutation(n * 3)[:n] * 100
+    return [(int(t), int(rng.choice(nodes)), 1, int(rng.integers(0, 4)), int(rng.random() < 0.6)) for t in times]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_legacy(seed):
+    events = random_events(3000, seed)
+    res = reconstruct_pause_intervals(to_cols(events))
+    assert interval_tuples(res) == legacy_intervals(events)
+
+
+def test_trailing_pause_and_ignored_resume():
+    events = [(100, 3, 1, 1, 0),     # resume while not paused: ignored
+              (200, 3, 1, 1, 1),
+              (300, 3, 1, 1, 1),     # repeated pause extends the interval
+              (900, 3, 1, 1, 0),
+              (1000, 3, 1, 1, 1),    # never resumed
+              (3000, 4, 1, 0, 0)]
+    res = reconstruct_pause_intervals(to_cols(events), default_pause_time=5000)
+    assert interval_tuples(res) == [(3, 1, 200, 900, 300, 700), (3, 1, 1000, 3000, 1000, 2000)]
+    assert res['matched'].tolist() == [True, False]
+
+
+def test_large_node_ids_do_not_alias():
+    # node 65537 interface 0 and node 1 interface 0 collide if the port key wraps in uint32
+    events = [(100, 1, 1, 0, 1), (200, 65537, 1, 0, 0), (300, 1, 1, 0, 0), (400, 65537, 1, 0, 1)]
+    res = reconstruct_pause_intervals(to_cols(events))
+    assert interval_tuples(res) == [(1, 0, 100, 300, 100, 200), (65537, 0, 400, 400, 400, 0)]
+
+
+def test_empty():
+    assert reconstruct_pause_intervals(to_cols([])) is None
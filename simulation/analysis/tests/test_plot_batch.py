@@ -0,0 +1,90 @@
+"""plot_batch data helpers and the columnar run cache against the per-script implementations"""
+
+import os
+
+import numpy as np
+import pytest
+
+import run_cache
+from log_parser import parse_log
+from plot_batch import cdf_points
+
+
+def legacy_cdf(data_arr):
+    """getCdfFromArray of plot_uplink.py / plot_queue.py: [value, count, n_accum, p] per distinct value"""
+    v_sorted = np.sort(data_arr)
+    p = 1. * np.arange(len(data_arr)) / (len(data_arr) - 1)
+
+    od = []
+    bkt = [0, 0, 0, 0]
+    n_accum = 0
+    for i in range(len(v_sorted)):
+        key = v_sorted[i]
+        n_accum += 1
+        if bkt[0] == key:
+            bkt[1] += 1
+            bkt[2] = n_accum
+            bkt[3] = p[i]
+        else:
+            od.append(bkt)
+            bkt = [0, 0, 0, 0]
+            bkt[0] = key
+            bkt[1] = 1
+            bkt[2] = n_accum
+            bkt[3] = p[i]
+    if od[-1][0] != bkt[0]:
+        od.append(bkt)
+    od.pop(0)
+    return od
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_cdf_points_match_legacy(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 40, size=int(rng.integers(2, 300))).astype(np.float64) * 2.5
+    expected = legacy_cdf(values)
+    x, p = cdf_points(values)
+    assert x == [b[0] for b in expected]
+    assert p == pytest.approx([b[3] for b in expected], rel=1e-12)
+
+
+def test_cdf_points_single_value():
+    assert cdf_points([3.0]) == ([], [])
+
+
+def write_fct(path, rows):
+    with open(path, 'w') as f:
+        for r in rows:
+            f.write(' '.join(map(str, r)) + '\n')
+
+
+def test_run_cache_roundtrip_and_invalidation(tmp_path, monkeypatch):
+    path = str(tmp_path / '7_out_fct.txt')
+    write_fct(path, [(1, 2, 10000, 100, 5000, 2000000000, 12000, 8000),
+                     (3, 4, 10001, 100, 70000, 2000001000, 99000, 64000)])
+    cols = run_cache.load_columns(path)
+    expected = parse_log(path, 'fct')
+    assert set(cols) == set(expected)
+    for k in expected:
+        np.testing.assert_array_equal(cols[k], expected[k])
+    assert os.path.exists(run_cache.cache_path(path))
+
+    def fail(*args, **kwargs):
+        raise AssertionError('cache hit expected')
+
+    with monkeypatch.context() as m:
+        m.setattr(run_cache, 'parse_log', fail)
+        cached = run_cache.load_columns(path)
+    for k in expected:
+        np.testing.assert_array_equal(cached[k], expected[k])
+
+    # a different size changes the signature, so the log is parsed again
+    write_fct(path, [(1, 2, 10000, 100, 5000, 2000000000, 12000, 8000)])
+    assert run_cache.load_columns(path)['src_id'].tolist() == [1]
+
+
+def test_run_cache_unknown_schema(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('1 2 3\n')
+    with pytest.raises(ValueError):
+        run_cache.load_columns(str(path))
@@ -0,0 +1,89 @@
+"""quantile_sketch：DDSketch 的相对误差、合并与序列化"""
+
+import json
+import math
+
+import numpy as np
+import pytest
+
+from quantile_sketch import DDSketch
+
+QS = [0, 0.01, 0.25, 0.5, 0.9, 0.99, 0.999, 1]
+
+
+def exact_quantile(values, q):
+    """与 DDSketch.quantile 相同的秩：排序后第 floor(q * (n - 1)) 个样本"""
+    v = np.sort(values)
+    return v[int(math.floor(q * (v.size - 1)))]
+
+
+def slowdowns(n, seed):
+    rng = np.random.default_rng(seed)
+    return 1 + rng.lognormal(0, 2, size=n)
+
+
+@pytest.mark.parametrize('alpha', [0.01, 0.05])
+def test_relative_error(alpha):
+    values = slowdowns(20000, 0)
+    sk = DDSketch(alpha)
+    sk.add(values)
+    for q in QS:
+        exact = exact_quantile(values, q)
+        assert abs(sk.quantile(q) - exact) <= alpha * exact * (1 + 1e-9)
+    assert sk.count == values.size and sk.mean() == pytest.approx(values.mean())
+
+
+def test_merge_equals_union():
+    a, b = slowdowns(5000, 1), slowdowns(3000, 2) * 10
+    b[:100] = 0
+    sk_a, sk_b, sk_all = DDSketch(), DDSketch(), DDSketch()
+    sk_a.add(a)
+    sk_b.add(b)
+    sk_all.add(np.concatenate([a, b]))
+    merged = sk_a.merge(sk_b)
+    assert merged.bins == sk_all.bins
+    assert (merged.zero_count, merged.count, merged.min, merged.max) == \
+        (sk_all.zero_count, sk_all.count, sk_all.min, sk_all.max)
+    assert merged.sum == pytest.approx(sk_all.sum)
+    assert merged.percentiles() == sk_all.percentiles()
+    assert merged.cdf_lines() == sk_all.cdf_lines()
+
+
+def test_merge_empty_and_alpha_mismatch():
+    sk = DDSketch()
+    sk.add([1.0, 2.0])
+    sk.merge(DDSketch())
+    assert sk.count == 2 and sk.min == 1.0
+    with pytest.raises(ValueError):
+        sk.merge(DDSketch(0.02))
+
+
+def test_rejects_invalid_input():
+    with pytest.raises(ValueError):
+        DDSketch().add([1.0, -1.0])
+    with pytest.raises(ValueError):
+        DDSketch(0)
+    assert math.isnan(DDSketch().quantile(0.5))
+
+
+def test_collapse_keeps_high_quantiles():
+    values = np.geomspace(1e-3, 1e6, 50000)
+    sk = DDSketch(0.01, max_bins=200)
+    sk.add(values)
+    assert len(sk.bins) == 200
+    assert sum(sk.bins.values()) + sk.zero_count == values.size
+    for q in [0.9, 0.99, 1]:
+        exact = exact_quantile(values, q)
+        assert abs(sk.quantile(q) - exact) <= 0.01 * exact * (1 + 1e-9)
+
+
+def test_dict_roundtrip():
+    sk = DDSketch()
+    sk.add(np.concatenate([[0.0], slowdowns(1000, 3)]))
+    restored = DDSketch.from_dict(json.loads(json.dumps(sk.to_dict())))
+    assert restored.bins == sk.bins
+    assert restored.percentiles() == sk.percentiles()
+    assert (restored.count, restored.zero_count, restored.min, restored.max) == \
+        (sk.count, sk.zero_count, sk.min, sk.max)
+    empty = DDSketch.from_dict(DDSketch().to_dict())
+    assert empty.count == 0 and empty.min == math.inf
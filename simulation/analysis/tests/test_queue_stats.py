@@ -0,0 +1,115 @@
+"""queueAnalysis histogram statistics against the per-sample implementation they replaced"""
+
+import numpy as np
+import pytest
+
+import queueAnalysis
+from queueAnalysis import get_cdf, hist_add, hist_percentile, hist_stat, hist_with_zeros
+
+QUANTILES = [0, 1, 12.5, 50, 95, 99, 99.9, 99.99, 100]
+
+
+def legacy_get_cdf(v):
+    """get_cdf of queueAnalysis.py before the histogram rewrite"""
+    v_sorted = np.sort(v)
+    p = 1. * np.arange(len(v)) / (len(v) - 1)
+    od = []
+    bkt = [0, 0, 0, 0]
+    n_accum = 0
+    for i in range(len(v_sorted)):
+        key = v_sorted[i]
+        n_accum += 1
+        if bkt[0] == key:
+            bkt[1] += 1
+            bkt[2] = n_accum
+            bkt[3] = p[i]
+        else:
+            od.append(bkt)
+            bkt = [key, 1, n_accum, p[i]]
+    if od[-1][0] != bkt[0]:
+        od.append(bkt)
+    od.pop(0)
+    return "".join(str(b[0]) + " " + str(b[1]) + " " + str(b[2]) + " " + str(b[3]) + "\n" for b in od)
+
+
+def legacy_stat(samples):
+    return [sum(samples) / len(samples)] + [int(np.percentile(samples, q)) for q in queueAnalysis.PERCENTILES] \
+        + [np.max(samples)]
+
+
+def legacy_queue_per_switch(filename, time_limit_start, time_limit_end, monitoring_interval):
+    """get_queue_per_switch_info_from_raw before the histogram rewrite: (result_stat, CDF text)"""
+    set_switch = set()
+    samples = {"nQueue": [], "nPkt": []}
+    with open(filename, "r") as f:
+        for line in f.readlines():
+            parsed_line = line.replace("\n", "").split(",")
+            if len(parsed_line) != 4:
+                continue
+            set_switch.add(int(parsed_line[1]))
+            timestamp = int(parsed_line[0])
+            if timestamp < time_limit_start or timestamp > time_limit_end:
+                continue
+            samples["nQueue"].append(int(parsed_line[2]))
+            samples["nPkt"].append(int(parsed_line[3]))
+    nSample = int((float(time_limit_end) - float(time_limit_start)) / float(monitoring_interval) * len(set_switch))
+    for k in samples:
+        samples[k] += [0] * int(nSample - len(samples[k]))
+    stat = {k: legacy_stat(v) for k, v in samples.items()}
+    return stat, legacy_get_cdf(samples["nPkt"])
+
+
+def histogram(samples):
+    hist = {}
+    hist_add(hist, np.asarray(samples))
+    return hist_with_zeros(hist, len(samples))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_hist_percentile_matches_numpy(seed):
+    rng = np.random.default_rng(seed)
+    samples = rng.geometric(0.05, size=int(rng.integers(1, 3000))) - 1
+    values, counts = histogram(samples)
+    for q in QUANTILES:
+        assert hist_percentile(values, counts, q) == pytest.approx(np.percentile(samples, q), rel=1e-12, abs=1e-12)
+
+
+def test_hist_with_zeros():
+    hist = {}
+    hist_add(hist, np.array([3, 1, 3, 7]))
+    values, counts = hist_with_zeros(hist, 10)
+    assert values.tolist() == [0, 1, 3, 7] and counts.tolist() == [6, 1, 2, 1]
+    hist_add(hist, np.array([0, 0]))
+    values, counts = hist_with_zeros(hist, 10)
+    assert values.tolist() == [0, 1, 3, 7] and counts.tolist() == [6, 1, 2, 1]
+    # no implicit zeros when the log already holds every sample
+    values, counts = hist_with_zeros(hist, 3)
+    assert counts.tolist() == [2, 1, 2, 1]
+
+
+def test_hist_stat_and_cdf_match_legacy():
+    rng = np.random.default_rng(7)
+    samples = np.concatenate([np.zeros(500, dtype=np.int64), rng.integers(1, 40, size=1500)]).tolist()
+    values, counts = histogram(samples)
+    assert hist_stat(values, counts) == legacy_stat(samples)
+    assert get_cdf(values, counts) == legacy_get_cdf(samples)
+    assert hist_stat(*hist_with_zeros({}, 0)) == [0] * 7
+
+
+def test_queue_per_switch_matches_legacy(tmp_path):
+    rng = np.random.default_rng(11)
+    t0, t1, interval = 2000000, 3000000, 10000
+    rows = []
+    for t in range(t0 - 5 * interval, t1 + 5 * interval, interval):
+        for tor in rng.choice(8, size=int(rng.integers(0, 8)), replace=False):
+            n_pkt = int(rng.geometric(0.02))
+            rows.append("{},{},{},{}\n".format(t, tor, int(rng.integers(1, 5)), n_pkt))
+    rows.insert(50, "garbage\n")
+    path = tmp_path / "1_out_voq.txt"
+    path.write_text("".join(rows))
+
+    legacy_stat_, legacy_cdf = legacy_queue_per_switch(str(path), t0, t1, interval)
+    _, stat = queueAnalysis.get_queue_per_switch_info_from_raw(str(path), t0, t1, interval, cdf_flag=True)
+    assert stat["nQueue"] == legacy_stat_["nQueue"]
+    assert stat["nPkt"] == legacy_stat_["nPkt"]
+    assert (tmp_path / "1_out_voq_cdf.txt").read_text() == legacy_cdf
@@ -0,0 +1,141 @@
+"""Goodput timelines against the start-time windows of the old throughput_analysis.py"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from throughput_analysis import (MAX_TIMELINE_CELLS, calculate_goodput_timelines, parse_fct_file,
+                                 spread_flow_bytes)
+
+NODES_PER_DC = 10
+
+
+def legacy_parse_fct_file(fct_file_path):
+    data = []
+    with open(fct_file_path, 'r') as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) >= 8:
+                data.append({
+                    'srcId': int(parts[0]),
+                    'dstId': int(parts[1]),
+                    'sport': int(parts[2]),
+                    'dport': int(parts[3]),
+                    'flowSize': int(parts[4]),
+                    'startTime': int(parts[5]),
+                    'actualFCT': int(parts[6]),
+                    'standaloneFCT': int(parts[7])
+                })
+    return pd.DataFrame(data)
+
+
+def legacy_window_bytes(df, time_window_ms):
+    """total_bytes of calculate_aggregate_throughput: flows binned by start time"""
+    start_ms = df['startTime'] / 1e6
+    min_time = start_ms.min()
+    time_windows = np.arange(min_time, start_ms.max() + time_window_ms, time_window_ms)
+    out = {}
+    for i in range(len(time_windows) - 1):
+        in_window = (start_ms >= time_windows[i]) & (start_ms < time_windows[i + 1])
+        if in_window.any():
+            out[i] = int(df['flowSize'][in_window].sum())
+    return out
+
+
+def random_flows(n, seed, t0=2_000_000_000, span_ns=5_000_000, max_fct_ns=2_000_000):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'srcId': rng.integers(0, 3 * NODES_PER_DC, n),
+        'dstId': rng.integers(0, 3 * NODES_PER_DC, n),
+        'flowSize': rng.integers(1000, 10_000_000, n),
+        'startTime': t0 + rng.integers(0, span_ns, n),
+        'actualFCT': rng.integers(0, max_fct_ns, n),
+    })
+
+
+def naive_bytes(start, fct, size, t0, bin_ns, n_bins):
+    """Bytes of each flow in each bin at a constant rate over [start, start + max(fct, 1))"""
+    out = np.zeros(n_bins)
+    for s, f, b in zip(start, fct, size):
+        e = s + max(f, 1)
+        rate = b / (e - s)
+        for k in range(n_bins):
+            lo, hi = t0 + k * bin_ns, t0 + (k + 1) * bin_ns
+            out[k] += rate * max(0, min(e, hi) - max(s, lo))
+    return out
+
+
+def test_parse_fct_file_matches_legacy(tmp_path):
+    path = tmp_path / '1_out_fct.txt'
+    path.write_text('0 11 10000 100 5000 2000000000 12000 8000\n'
+                    'bad line\n'
+                    '3 4 10001 100 123456 2000001000 99000 64000\n')
+    got = parse_fct_file(str(path))
+    expected = legacy_parse_fct_file(str(path))
+    assert list(got.columns) == list(expected.columns)
+    for c in expected.columns:
+        np.testing.assert_array_equal(got[c].to_numpy(np.int64), expected[c].to_numpy(np.int64))
+
+
+def test_goodput_matches_legacy_windows():
+    """Flows that finish inside their start window: spreading keeps each flow's bytes in that window"""
+    rng = np.random.default_rng(3)
+    window_ns = 100_000_000
+    n = 500
+    window = rng.integers(0, 20, n)
+    window[0] = 0
+    offset = rng.integers(0, window_ns // 2, n)
+    offset[0] = 0
+    df = pd.DataFrame({
+        'srcId': rng.integers(0, 2 * NODES_PER_DC, n),
+        'dstId': rng.integers(0, 2 * NODES_PER_DC, n),
+        'flowSize': rng.integers(1000, 10_000_000, n),
+        'startTime': 2_000_000_000 + window * window_ns + offset,
+        'actualFCT': rng.integers(1, window_ns // 2, n),
+    })
+    tl = calculate_goodput_timelines(df, bin_us=window_ns / 1000, nodes_per_dc=NODES_PER_DC)
+    got = tl['total'] * tl['bin_ns'] / 8
+    expected = legacy_window_bytes(df, window_ns / 1e6)
+    for i, total in expected.items():
+        assert got[i] == pytest.approx(total, rel=1e-9)
+    empty = np.setdiff1d(np.arange(got.size), list(expected))
+    np.testing.assert_allclose(got[empty], 0, atol=1e-6)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_goodput_matches_naive_overlap(seed):
+    df = random_flows(60, seed)
+    bin_us = 137.0
+    tl = calculate_goodput_timelines(df, bin_us=bin_us, nodes_per_dc=NODES_PER_DC, per_host=True)
+    bin_ns = tl['bin_ns']
+    start = df['startTime'].to_numpy()
+    fct = df['actualFCT'].to_numpy()
+    size = df['flowSize'].to_numpy()
+    t0 = start.min() // bin_ns * bin_ns
+    n_bins = tl['total'].size
+    to_bytes = bin_ns / 8
+
+    np.testing.assert_allclose(tl['total'] * to_bytes, naive_bytes(start, fct, size, t0, bin_ns, n_bins),
+                               rtol=1e-9, atol=1e-3)
+    assert (tl['total'] * to_bytes).sum() == pytest.approx(size.sum(), rel=1e-9)
+
+    src_dc = df['srcId'].to_numpy() // NODES_PER_DC
+    dst_dc = df['dstId'].to_numpy() // NODES_PER_DC
+    inter = src_dc != dst_dc
+    np.testing.assert_allclose(tl['inter'] * to_bytes,
+                               naive_bytes(start[inter], fct[inter], size[inter], t0, bin_ns, n_bins),
+                               rtol=1e-9, atol=1e-3)
+    for (a, b), series in tl['dc_pair'].items():
+        m = (src_dc == a) & (dst_dc == b)
+        np.testing.assert_allclose(series * to_bytes, naive_bytes(start[m], fct[m], size[m], t0, bin_ns, n_bins),
+                                   rtol=1e-9, atol=1e-3)
+    for i, host in enumerate(tl['hosts']):
+        m = df['srcId'].to_numpy() == host
+        np.testing.assert_allclose(tl['host_tx'][i] * to_bytes,
+                                   naive_bytes(start[m], fct[m], size[m], t0, bin_ns, n_bins),
+                                   rtol=1e-9, atol=1e-3)
+
+
+def test_timeline_size_limit():
+    with pytest.raises(ValueError):
+        spread_flow_bytes([0], [1], [1], 0, 1, MAX_TIMELINE_CELLS)
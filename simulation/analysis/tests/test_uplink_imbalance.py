@@ -0,0 +1,107 @@
+"""Uplink imbalance tensor metrics against the per-line loop of plot_uplink.py"""
+
+import numpy as np
+import pytest
+
+from uplink_imbalance import imbalance_metrics, imbalance_spread_values, load_uplink_tensor, uplink_rates
+
+
+def legacy_spread(filename, time_start, time_end, time_interval):
+    """(MAX-MIN)/AVG*100 samples exactly as plot_uplink.py computes them"""
+    history_data = {}
+    diff_data = {}
+    last_ts = 0
+    with open(filename, 'r') as f:
+        for line in f.readlines():
+            parsed_line = line.replace('\n', '').split(',')
+            now_ts = int(parsed_line[0])
+            now_swid = int(parsed_line[1])
+            now_portid = int(parsed_line[2])
+            now_val = int(parsed_line[3])
+            if now_ts < time_start or now_ts > time_end:
+                continue
+            if last_ts == 0:
+                last_ts = now_ts
+            elif last_ts + time_interval <= now_ts:
+                last_ts = now_ts
+            elif last_ts == now_ts:
+                pass
+            else:
+                continue
+            key = (now_swid, now_portid)
+            if key not in history_data:
+                history_data[key] = now_val
+            else:
+                diff_data.setdefault(key, []).append(now_val - history_data[key])
+                history_data[key] = now_val
+
+    switch_diff_data = {}
+    for (switch_id, _), vvv in diff_data.items():
+        switch_diff_data.setdefault(switch_id, []).append(vvv)
+    out = []
+    for vvvv in switch_diff_data.values():
+        for vec in np.array(vvvv).T.tolist():
+            if np.average(vec) == 0:
+                continue
+            out.append((np.max(vec) - np.min(vec)) / np.average(vec) * 100)
+    return out
+
+
+def write_uplink(path, seed, n_tor=4, n_up=4, n_samples=60, period=50_000):
+    """
+    Every ToR/uplink at each timestamp, sampled every 50us with occasional extra
+    timestamps that the 100us gating must skip; some intervals carry no traffic
+    """
+    rng = np.random.default_rng(seed)
+    times = 2_000_000_000 + np.arange(n_samples) * period
+    extra = times[:-1] + period // 3
+    times = np.sort(np.concatenate([times, rng.choice(extra, size=10, replace=False)]))
+    cum = np.zeros((n_tor, n_up), dtype=np.int64)
+    with open(path, 'w') as f:
+        for t in times:
+            if rng.random() > 0.1:
+                cum += rng.integers(0, 100_000, size=(n_tor, n_up))
+            for tor in range(n_tor):
+                for up in range(n_up):
+                    f.write('{},{},{},{}\n'.format(t, 100 + tor, 8 + 2 * up, cum[tor, up]))
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('interval', [0, 100_000])
+def test_spread_matches_legacy(tmp_path, seed, interval):
+    path = str(tmp_path / '1_out_uplink.txt')
+    write_uplink(path, seed)
+    ts, te = 2_000_100_000, 2_002_500_000
+    got = imbalance_spread_values(path, ts, te, interval)
+    expected = legacy_spread(path, ts, te, interval)
+    assert len(expected) > 0
+    np.testing.assert_allclose(np.sort(got), np.sort(expected), rtol=1e-12)
+
+
+def test_metrics_match_naive(tmp_path):
+    path = str(tmp_path / '1_out_uplink.txt')
+    write_uplink(path, seed=7)
+    times, tors, ifaces, tensor = load_uplink_tensor(path, time_interval=100_000)
+    assert tors.tolist() == [100, 101, 102, 103]
+    assert ifaces.tolist() == [[8, 10, 12, 14]] * 4
+    t_end, rates = uplink_rates(times, tensor)
+    metrics = imbalance_metrics(rates)
+    for i in range(t_end.size):
+        for r in range(tors.size):
+            x = rates[i, r]
+            if x.mean() == 0:
+                assert np.isnan(metrics['jain'][i, r])
+                continue
+            assert metrics['max_mean'][i, r] == pytest.approx(x.max() / x.mean())
+            assert metrics['cv'][i, r] == pytest.approx(x.std() / x.mean())
+            assert metrics['jain'][i, r] == pytest.approx(x.sum() ** 2 / (x.size * (x ** 2).sum()))
+
+
+def test_missing_uplink_is_padded(tmp_path):
+    path = tmp_path / '1_out_uplink.txt'
+    path.write_text('10,1,3,0\n10,1,4,0\n10,2,5,0\n'
+                    '20,1,3,100\n20,1,4,300\n20,2,5,200\n')
+    times, tors, ifaces, tensor = load_uplink_tensor(str(path))
+    assert ifaces.tolist() == [[3, 4], [5, -1]]
+    metrics = imbalance_metrics(uplink_rates(times, tensor)[1])
+    assert metrics['spread'][0].tolist() == pytest.approx([100.0, 0.0])
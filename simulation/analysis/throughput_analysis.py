@@ -8,28 +8,33 @@ import matplotlib.pyplot as plt
 from datetime import datetime
 import pandas as pd
 
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, _CUR_DIR)
+from log_parser import parse_log
+
+# parse_log 的列名 -> 旧 DataFrame 列名
+FCT_COLUMNS = {
+    'src_id': 'srcId',
+    'dst_id': 'dstId',
+    'sport': 'sport',
+    'dport': 'dport',
+    'size': 'flowSize',  # bytes
+    'start_ns': 'startTime',  # ns
+    'fct_ns': 'actualFCT',  # ns
+    'standalone_fct_ns': 'standaloneFCT',  # ns
+}
+
+# 单个时间线矩阵 (分组数 × 时间片数) 的元素上限：每个 float64 矩阵约 160 MB，
+# spread_flow_bytes 计算时同时存在约 3 个
+MAX_TIMELINE_CELLS = 20_000_000
+
 def parse_fct_file(fct_file_path):
     """
     解析 FCT 文件，返回 DataFrame
     格式：srcId dstId sport dport flowSize startTime actualFCT standaloneFCT
     """
-    data = []
-    with open(fct_file_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) >= 8:
-                data.append({
-                    'srcId': int(parts[0]),
-                    'dstId': int(parts[1]),
-                    'sport': int(parts[2]),
-                    'dport': int(parts[3]),
-                    'flowSize': int(parts[4]),  # bytes
-                    'startTime': int(parts[5]),  # ns
-                    'actualFCT': int(parts[6]),  # ns
-                    'standaloneFCT': int(parts[7])  # ns
-                })
-    
-    return pd.DataFrame(data)
+    cols = parse_log(fct_file_path, 'fct')
+    return pd.DataFrame({new: cols[old] for old, new in FCT_COLUMNS.items()})
 
 def calculate_flow_throughput(df):
     """
@@ -50,46 +55,96 @@ def calculate_flow_throughput(df):
     
     return df
 
-def calculate_aggregate_throughput(df, time_window_ms=100):
+def spread_flow_bytes(start_ns, fct_ns, nbytes, t0, bin_ns, n_bins, group=None, n_groups=1):
     """
-    计算时间窗口内的聚合吞吐量
+    将每个流的字节按恒定速率摊到 [start, start+FCT) 上，返回 (n_groups, n_bins) 的每时间片字节数
+
+    速率在 start 处 +r、在 end 处 -r。对落在时间片 b 内偏移 f 处的跳变，
+    b 之后的时间片各得 r*bin（差分数组 D[b+1] += r），b 本身得 r*(bin-f)（修正项 C[b]），
+    于是 bytes[k] = bin*cumsum(D)[k] + C[k]，整体 O(flows + groups*bins)。
+
+    结果是稠密矩阵，n_groups * n_bins 超过 MAX_TIMELINE_CELLS 时抛出 ValueError。
     """
-    # 将开始时间从纳秒转换为毫秒
-    df['startTime_ms'] = df['startTime'] / 1e6
-    
-    # 计算时间范围
-    min_time = df['startTime_ms'].min()
-    max_time = df['startTime_ms'].max()
-    
-    # 创建时间窗口
-    time_windows = np.arange(min_time, max_time + time_window_ms, time_window_ms)
-    
-    window_stats = []
-    for i in range(len(time_windows) - 1):
-        start_t = time_windows[i]
-        end_t = time_windows[i + 1]
-        
-        # 找到在此时间窗口内完成的流
-        window_flows = df[(df['startTime_ms'] >= start_t) & (df['startTime_ms'] < end_t)]
-        
-        if len(window_flows) > 0:
-            total_bytes = window_flows['flowSize'].sum()
-            total_time = window_flows['actualFCT_sec'].sum()
-            avg_throughput = total_bytes / total_time if total_time > 0 else 0
-            
-            window_stats.append({
-                'time_start': start_t,
-                'time_end': end_t,
-                'num_flows': len(window_flows),
-                'total_bytes': total_bytes,
-                'total_time': total_time,
-                'avg_throughput_mbps': avg_throughput / 1e6,
-                'max_throughput_mbps': window_flows['throughput_mbps'].max(),
-                'min_throughput_mbps': window_flows['throughput_mbps'].min(),
-                'median_throughput_mbps': window_flows['throughput_mbps'].median()
-            })
-    
-    return pd.DataFrame(window_stats)
+    if n_groups * (n_bins + 2) > MAX_TIMELINE_CELLS:
+        raise ValueError(f"goodput 时间线过大: {n_groups} 组 × {n_bins} 个时间片 "
+                         f"(上限 {MAX_TIMELINE_CELLS} 个元素)，请增大时间片宽度 (--bin-us)")
+    start_ns = np.asarray(start_ns, dtype=np.int64)
+    end_ns = start_ns + np.maximum(np.asarray(fct_ns, dtype=np.int64), 1)
+    rate = np.asarray(nbytes, dtype=np.float64) / (end_ns - start_ns)  # bytes/ns
+    group = np.zeros(start_ns.size, dtype=np.int64) if group is None else np.asarray(group, dtype=np.int64)
+
+    width = n_bins + 2
+    diff = np.zeros(n_groups * width)
+    corr = np.zeros(n_groups * width)
+    for t, sign in ((start_ns, 1.0), (end_ns, -1.0)):
+        b, f = np.divmod(t - t0, bin_ns)
+        np.add.at(diff, group * width + b + 1, sign * rate)
+        np.add.at(corr, group * width + b, sign * rate * (bin_ns - f))
+    diff = diff.reshape(n_groups, width)
+    corr = corr.reshape(n_groups, width)
+    return (bin_ns * np.cumsum(diff, axis=1) + corr)[:, :n_bins]
+
+def calculate_goodput_timelines(df, bin_us=100.0, nodes_per_dc=53, per_host=False):
+    """
+    计算 goodput 时间线（Gbps）：总体、DC 内/跨 DC、每个 DC 对；per_host 时另算每个主机收/发
+
+    每主机时间线是 主机数 × 时间片数 的稠密矩阵，细时间片下很大，因此只在需要时计算
+    """
+    bin_ns = max(1, int(round(bin_us * 1000)))
+    start = df['startTime'].to_numpy(dtype=np.int64)
+    fct = df['actualFCT'].to_numpy(dtype=np.int64)
+    size = df['flowSize'].to_numpy(dtype=np.float64)
+    src = df['srcId'].to_numpy(dtype=np.int64)
+    dst = df['dstId'].to_numpy(dtype=np.int64)
+
+    t0 = start.min() // bin_ns * bin_ns
+    n_bins = int(-(-((start + np.maximum(fct, 1)).max() - t0) // bin_ns))
+    to_gbps = 8.0 / bin_ns  # bytes per bin -> Gbps
+
+    src_dc = src // nodes_per_dc
+    dst_dc = dst // nodes_per_dc
+    n_dc = int(max(src_dc.max(), dst_dc.max())) + 1
+
+    def spread(group=None, n_groups=1):
+        return spread_flow_bytes(start, fct, size, t0, bin_ns, n_bins, group, n_groups) * to_gbps
+
+    link = spread((src_dc != dst_dc).astype(np.int64), 2)
+    pairs = spread(src_dc * n_dc + dst_dc, n_dc * n_dc)
+
+    timelines = {
+        'bin_ns': bin_ns,
+        'time_us': (t0 + np.arange(n_bins) * bin_ns) / 1e3,
+        'total': link.sum(axis=0),
+        'intra': link[0],
+        'inter': link[1],
+        'dc_pair': {(a, b): pairs[a * n_dc + b] for a in range(n_dc) for b in range(n_dc)
+                    if pairs[a * n_dc + b].any()},
+    }
+    if per_host:
+        hosts, host_idx = np.unique(np.concatenate([src, dst]), return_inverse=True)
+        timelines['hosts'] = hosts
+        timelines['host_tx'] = spread(host_idx[:src.size], hosts.size)
+        timelines['host_rx'] = spread(host_idx[src.size:], hosts.size)
+    return timelines
+
+def save_goodput_timelines(timelines, output_dir):
+    """
+    保存 goodput 时间线 CSV（单位 Gbps）
+    """
+    pairs = sorted(timelines['dc_pair'])
+    header = 'time_us,total,intra_dc,inter_dc' + ''.join(f',dc{a}->dc{b}' for a, b in pairs)
+    columns = [timelines['time_us'], timelines['total'], timelines['intra'], timelines['inter']]
+    columns += [timelines['dc_pair'][p] for p in pairs]
+    np.savetxt(os.path.join(output_dir, 'goodput_timeline.csv'), np.column_stack(columns),
+               fmt='%.4f', delimiter=',', header=header, comments='')
+
+    if 'hosts' not in timelines:
+        return
+    for key in ('host_tx', 'host_rx'):
+        header = 'time_us' + ''.join(f',{h}' for h in timelines['hosts'])
+        np.savetxt(os.path.join(output_dir, f'goodput_{key}.csv'),
+                   np.column_stack([timelines['time_us'], timelines[key].T]),
+                   fmt='%.4f', delimiter=',', header=header, comments='')
 
 def calculate_per_host_throughput(df):
     """
@@ -113,7 +168,7 @@ def calculate_per_host_throughput(df):
     
     return src_stats, dst_stats
 
-def plot_throughput_analysis(df, window_df, output_dir):
+def plot_throughput_analysis(df, timelines, output_dir):
     """
     Plot throughput analysis charts
     """
@@ -136,14 +191,16 @@ def plot_throughput_analysis(df, window_df, output_dir):
     axes[0, 1].set_title('Flow Throughput CDF')
     axes[0, 1].grid(True, alpha=0.3)
     
-    # Time window aggregated throughput
-    if len(window_df) > 0:
-        axes[1, 0].plot(window_df['time_start'], window_df['avg_throughput_mbps'], 
-                       marker='o', markersize=3, linewidth=1)
-        axes[1, 0].set_xlabel('Time (ms)')
-        axes[1, 0].set_ylabel('Average Throughput (Mbps)')
-        axes[1, 0].set_title('Time Window Aggregated Throughput')
-        axes[1, 0].grid(True, alpha=0.3)
+    # Aggregate goodput timeline
+    time_ms = timelines['time_us'] / 1e3
+    axes[1, 0].plot(time_ms, timelines['total'], linewidth=1, label='Total')
+    axes[1, 0].plot(time_ms, timelines['intra'], linewidth=1, label='Intra-DC')
+    axes[1, 0].plot(time_ms, timelines['inter'], linewidth=1, label='Inter-DC')
+    axes[1, 0].set_xlabel('Time (ms)')
+    axes[1, 0].set_ylabel('Goodput (Gbps)')
+    axes[1, 0].set_title(f'Aggregate Goodput ({timelines["bin_ns"] / 1e3:g} us bins)')
+    axes[1, 0].legend()
+    axes[1, 0].grid(True, alpha=0.3)
     
     # Flow size vs throughput scatter plot
     axes[1, 1].scatter(df['flowSize'] / 1024, df['throughput_mbps'], alpha=0.6, s=10)
@@ -178,8 +235,22 @@ def plot_throughput_analysis(df, window_df, output_dir):
     plt.tight_layout()
     plt.savefig(os.path.join(output_dir, 'slowdown_analysis.png'), dpi=300, bbox_inches='tight')
     plt.close()
+    
+    # 3. Goodput per DC pair
+    if timelines['dc_pair']:
+        plt.figure(figsize=(12, 5))
+        for (a, b), series in sorted(timelines['dc_pair'].items()):
+            plt.plot(time_ms, series, linewidth=1, label=f'DC{a} -> DC{b}')
+        plt.xlabel('Time (ms)')
+        plt.ylabel('Goodput (Gbps)')
+        plt.title('Goodput per DC Pair')
+        plt.legend()
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        plt.savefig(os.path.join(output_dir, 'goodput_dc_pair.png'), dpi=300, bbox_inches='tight')
+        plt.close()
 
-def generate_summary_report(df, window_df, src_stats, dst_stats, output_dir):
+def generate_summary_report(df, timelines, src_stats, dst_stats, output_dir):
     """
     Generate summary report
     """
@@ -210,19 +281,26 @@ def generate_summary_report(df, window_df, src_stats, dst_stats, output_dir):
         f.write(f"Max Flow Size: {df['flowSize'].max() / 1024:.2f} KB\n")
         f.write(f"Min Flow Size: {df['flowSize'].min() / 1024:.2f} KB\n\n")
         
-        # Time window statistics
-        if len(window_df) > 0:
-            f.write("=== Time Window Statistics ===\n")
-            f.write(f"Number of Time Windows: {len(window_df)}\n")
-            f.write(f"Average Window Throughput: {window_df['avg_throughput_mbps'].mean():.2f} Mbps\n")
-            f.write(f"Max Window Throughput: {window_df['avg_throughput_mbps'].max():.2f} Mbps\n")
-            f.write(f"Min Window Throughput: {window_df['avg_throughput_mbps'].min():.2f} Mbps\n\n")
+        # Goodput timeline statistics
+        f.write("=== Goodput Timeline Statistics ===\n")
+        f.write(f"Bin Width: {timelines['bin_ns'] / 1e3:g} us, Number of Bins: {len(timelines['time_us'])}\n")
+        for name, key in (("Total", 'total'), ("Intra-DC", 'intra'), ("Inter-DC", 'inter')):
+            series = timelines[key]
+            f.write(f"{name} Goodput: mean {series.mean():.3f} Gbps, peak {series.max():.3f} Gbps\n")
+        for (a, b), series in sorted(timelines['dc_pair'].items()):
+            f.write(f"DC{a} -> DC{b} Goodput: mean {series.mean():.3f} Gbps, peak {series.max():.3f} Gbps\n")
+        f.write("\n")
 
 def main():
     parser = argparse.ArgumentParser(description='Calculate application layer throughput from FCT data')
     parser.add_argument('-f', '--fct-file', required=True, help='FCT file path')
     parser.add_argument('-o', '--output-dir', default='.', help='Output directory')
-    parser.add_argument('-w', '--window-size', type=int, default=100, help='Time window size (ms)')
+    parser.add_argument('-b', '--bin-us', type=float, default=100.0,
+                        help='Goodput timeline bin width in microseconds (default: 100)')
+    parser.add_argument('--nodes-per-dc', type=int, default=53,
+                        help='Nodes per datacenter, used to tell intra/inter-DC flows (default: 53, k=4 fat-tree)')
+    parser.add_argument('--host-timelines', action='store_true',
+                        help='Also write per-host tx/rx goodput timelines (hosts x bins CSV)')
     
     args = parser.parse_args()
     
@@ -236,17 +314,18 @@ def main():
     print("Calculating throughput...")
     df = calculate_flow_throughput(df)
     
-    print("Calculating time window aggregated throughput...")
-    window_df = calculate_aggregate_throughput(df, args.window_size)
+    print("Calculating goodput timelines...")
+    timelines = calculate_goodput_timelines(df, args.bin_us, args.nodes_per_dc, args.host_timelines)
+    save_goodput_timelines(timelines, args.output_dir)
     
     print("Calculating per-host statistics...")
     src_stats, dst_stats = calculate_per_host_throughput(df)
     
     print("Generating plots...")
-    plot_throughput_analysis(df, window_df, args.output_dir)
+    plot_throughput_analysis(df, timelines, args.output_dir)
     
     print("Generating report...")
-    generate_summary_report(df, window_df, src_stats, dst_stats, args.output_dir)
+    generate_summary_report(df, timelines, src_stats, dst_stats, args.output_dir)
     
     print(f"Analysis completed! Results saved to: {args.output_dir}")
     
@@ -0,0 +1,258 @@
+#!/usr/bin/python3
+"""
+ToR uplink load-imbalance analysis.
+
+periodic_monitoring writes cumulative `time,tor,iface,txbytes` samples for
+every ToR uplink at the same timestamps. The file is pivoted into a
+(time x ToR x uplink) tensor, differenced into per-interval rates and reduced
+along the uplink axis, so every metric is a handful of NumPy operations:
+
+  max/mean   peak uplink load relative to the ToR average
+  cv         coefficient of variation across uplinks
+  jain       Jain's fairness index, (sum x)^2 / (n * sum x^2)
+  spread     (max-min)/mean * 100, the metric plotted by plot_uplink.py
+
+Runs are grouped by .history key (topology, load, flow control) and compared
+per LB mode; each run is processed in its own worker process.
+
+Usage:
+    python3 uplink_imbalance.py                      # every run in mix/.history
+    python3 uplink_imbalance.py --ids 123 456 -j 8   # selected runs
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, _CUR_DIR)
+from log_parser import find_log
+from run_cache import load_columns
+
+lb_modes = {
+    0: "fecmp",
+    2: "drill",
+    3: "conga",
+    6: "letflow",
+    9: "conweave",
+}
+LBMODE_ORDER = ["fecmp", "drill", "conga", "letflow", "conweave"]
+
+METRICS = ["max_mean", "cv", "jain", "spread"]
+PERCENTILES = [50, 90, 99]
+
+
+def sample_times(times, time_interval):
+    """
+    Timestamps kept by plot_uplink.py's gating: the first one, then each
+    timestamp at least time_interval after the previously kept one
+    """
+    uniq = np.unique(times)
+    if time_interval <= 0 or uniq.size == 0:
+        return uniq
+    kept = []
+    i = 0
+    while i < uniq.size:
+        kept.append(uniq[i])
+        i = int(np.searchsorted(uniq, uniq[i] + time_interval, side="left"))
+    return np.array(kept, dtype=uniq.dtype)
+
+
+def load_uplink_tensor(uplink_file, time_start=0, time_end=None, time_interval=0):
+    """
+    Pivot an _out_uplink.txt file into a cumulative byte tensor.
+
+    Returns (times[T], tors[R], ifaces[R x U], tx_bytes[T x R x U]) where U is
+    the largest uplink count of any ToR; missing uplinks/samples are NaN and
+    ifaces is -1 for padding.
+    """
+    cols = load_columns(uplink_file, "uplink")
+    t = cols["time_ns"]
+    mask = t >= time_start
+    if time_end is not None:
+        mask &= t <= time_end
+    t, tor, iface, val = t[mask], cols["tor"][mask], cols["iface"][mask], cols["tx_bytes"][mask]
+
+    times = sample_times(t, time_interval)
+    keep = np.isin(t, times)
+    t, tor, iface, val = t[keep], tor[keep], iface[keep], val[keep]
+
+    tors, tor_idx = np.unique(tor, return_inverse=True)
+    # uplink index = rank of the interface among the ToR's interfaces
+    pairs, pair_idx = np.unique(np.stack((tor_idx, iface), axis=1), axis=0, return_inverse=True)
+    pair_idx = pair_idx.ravel()
+    first = np.flatnonzero(np.r_[True, pairs[1:, 0] != pairs[:-1, 0]])
+    n_per_tor = np.diff(np.r_[first, pairs.shape[0]])
+    rank = np.arange(pairs.shape[0]) - np.repeat(first, n_per_tor)
+    n_up = int(n_per_tor.max()) if n_per_tor.size else 0
+
+    ifaces = np.full((tors.size, n_up), -1, dtype=np.int64)
+    ifaces[pairs[:, 0], rank] = pairs[:, 1]
+
+    tensor = np.full((times.size, tors.size, n_up), np.nan)
+    tensor[np.searchsorted(times, t), tor_idx, rank[pair_idx]] = val
+    return times, tors, ifaces, tensor
+
+
+def uplink_rates(times, tensor):
+    """Per-interval uplink rates in Gbps, shape (T-1) x R x U, stamped at interval ends"""
+    dt = np.diff(times).astype(np.float64)
+    rates = np.diff(tensor, axis=0) * 8.0 / dt[:, None, None]
+    return times[1:], rates
+
+
+def imbalance_metrics(rates):
+    """
+    Reduce rates (T x R x U) across uplinks. Returns {metric: T x R} with NaN
+    where the ToR carried no traffic in that interval
+    """
+    n = np.sum(~np.isnan(rates), axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.nansum(rates, axis=2)
+        mean = total / n
+        busy = mean > 0
+        vmax = np.nanmax(np.where(np.isnan(rates), -np.inf, rates), axis=2)
+        vmin = np.nanmin(np.where(np.isnan(rates), np.inf, rates), axis=2)
+        std = np.sqrt(np.nansum((rates - mean[..., None]) ** 2, axis=2) / n)
+        sq = np.nansum(rates ** 2, axis=2)
+        metrics = {
+            "max_mean": vmax / mean,
+            "cv": std / mean,
+            "jain": total ** 2 / (n * sq),
+            "spread": (vmax - vmin) / mean * 100,
+            "mean_gbps": mean,
+        }
+    for k in metrics:
+        metrics[k] = np.where(busy, metrics[k], np.nan)
+    return metrics
+
+
+def summarize_run(uplink_file, time_start, time_end, time_interval):
+    """Imbalance distribution, per-ToR medians and the time series for one run"""
+    times, tors, ifaces, tensor = load_uplink_tensor(uplink_file, time_start, time_end, time_interval)
+    if times.size < 2:
+        return None
+    t_end, rates = uplink_rates(times, tensor)
+    metrics = imbalance_metrics(rates)
+
+    summary = {"n_intervals": int(t_end.size), "n_tors": int(tors.size), "n_uplinks": int(ifaces.shape[1])}
+    for m in METRICS:
+        v = metrics[m][~np.isnan(metrics[m])]
+        summary[m] = {"mean": float(v.mean()) if v.size else float("nan")}
+        summary[m].update({f"p{p}": float(x) for p, x in
+                           zip(PERCENTILES, np.percentile(v, PERCENTILES) if v.size else [np.nan] * len(PERCENTILES))})
+    with np.errstate(invalid="ignore"):
+        per_tor = {m: np.nanmedian(metrics[m], axis=0) for m in METRICS}
+        over_time = {m: np.nanmean(metrics[m], axis=1) for m in METRICS}
+    return {"summary": summary, "tors": tors, "per_tor": per_tor, "time_ns": t_end, "over_time": over_time}
+
+
+def imbalance_spread_values(uplink_file, time_start, time_end, time_interval):
+    """Flattened (max-min)/mean*100 samples over all busy (interval, ToR) cells"""
+    times, _, _, tensor = load_uplink_tensor(uplink_file, time_start, time_end, time_interval)
+    if times.size < 2:
+        return np.empty(0)
+    spread = imbalance_metrics(uplink_rates(times, tensor)[1])["spread"]
+    return spread[~np.isnan(spread)]
+
+
+def read_history(history_filename):
+    """(topo, netload, flow_control) -> [[config_id, lb_mode], ...]"""
+    map_key_to_id = dict()
+    with open(history_filename, "r") as f:
+        for line in f.readlines():
+            if "cross_dc_k" in line or "fat_k" in line or "leaf_spine" in line:
+                parsed_line = line.replace("\n", "").split(',')
+                encoded_fc = (int(parsed_line[9]), int(parsed_line[10]))
+                if encoded_fc == (0, 1):
+                    flow_control = "IRN"
+                elif encoded_fc == (1, 0):
+                    flow_control = "Lossless"
+                else:
+                    continue
+                key = (parsed_line[13], parsed_line[16], flow_control)
+                map_key_to_id.setdefault(key, []).append([parsed_line[1], lb_modes[int(parsed_line[3])]])
+    return map_key_to_id
+
+
+def _run_job(job):
+    config_id, path, time_start, time_end, time_interval = job
+    if find_log(path) is None:
+        return config_id, None
+    return config_id, summarize_run(path, time_start, time_end, time_interval)
+
+
+def save_run_csv(path, result):
+    header = ["time_ns"] + METRICS
+    np.savetxt(path, np.column_stack([result["time_ns"]] + [result["over_time"][m] for m in METRICS]),
+               fmt=["%d"] + ["%.6f"] * len(METRICS), delimiter=",", header=",".join(header), comments="")
+    tor_path = path.replace("_over_time.csv", "_per_tor.csv")
+    np.savetxt(tor_path, np.column_stack([result["tors"]] + [result["per_tor"][m] for m in METRICS]),
+               fmt=["%d"] + ["%.6f"] * len(METRICS), delimiter=",", header=",".join(["tor"] + METRICS),
+               comments="")
+
+
+def print_comparison(key, rows):
+    print("\n=== TOPO {} LOAD {} FC {} ===".format(*key))
+    print("{:<10} {:>8} {:>18} {:>18} {:>18} {:>18}".format(
+        "lb_mode", "id", "max/mean avg|p99", "cv avg|p99", "jain avg|p50", "spread% p50|p99"))
+    for lb_mode, config_id, s in rows:
+        print("{:<10} {:>8} {:>8.3f} | {:<7.3f} {:>8.3f} | {:<7.3f} {:>8.3f} | {:<7.3f} {:>8.1f} | {:<7.1f}".format(
+            lb_mode, config_id, s["max_mean"]["mean"], s["max_mean"]["p99"], s["cv"]["mean"], s["cv"]["p99"],
+            s["jain"]["mean"], s["jain"]["p50"], s["spread"]["p50"], s["spread"]["p99"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ToR uplink load-imbalance analysis per LB mode')
+    parser.add_argument('--ids', nargs='+', default=None, help="simulation IDs (default: every run in mix/.history)")
+    parser.add_argument('-sT', dest='time_limit_begin', action='store', type=int, default=2005000000, help="only consider samples after T, default=2005000000 ns")
+    parser.add_argument('-fT', dest='time_limit_end', action='store', type=int, default=2100000000, help="only consider samples before T, default=2100000000 ns")
+    parser.add_argument('--interval-us', type=float, default=100, help="minimum sampling interval (us), default=100")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes, default=CPU count")
+    parser.add_argument('-o', dest='out_dir', default=None, help="write per-run time series / per-ToR CSVs here")
+    args = parser.parse_args()
+
+    output_dir = _CUR_DIR + "/../mix/output"
+    history = read_history(_CUR_DIR + "/../mix/.history")
+    if args.ids:
+        wanted = set(args.ids)
+        known = {cid for v in history.values() for cid, _ in v}
+        history = {k: [vv for vv in v if vv[0] in wanted] for k, v in history.items()}
+        history = {k: v for k, v in history.items() if v}
+        missing = sorted(wanted - known)
+        if missing:
+            history[("-", "-", "-")] = [[cid, "unknown"] for cid in missing]
+
+    time_interval = int(args.interval_us * 1000)
+    jobs = [(cid, output_dir + "/{id}/{id}_out_uplink.txt".format(id=cid),
+             args.time_limit_begin, args.time_limit_end, time_interval)
+            for v in history.values() for cid, _ in v]
+    if not jobs:
+        print("No runs found")
+        return 1
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = dict(pool.map(_run_job, jobs))
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    for key, runs in history.items():
+        rows = []
+        order = {m: i for i, m in enumerate(LBMODE_ORDER)}
+        for config_id, lb_mode in sorted(runs, key=lambda r: order.get(r[1], len(order))):
+            result = results.get(config_id)
+            if result is None:
+                print("skip {}: no uplink samples".format(config_id))
+                continue
+            rows.append((lb_mode, config_id, result["summary"]))
+            if args.out_dir:
+                save_run_csv(os.path.join(args.out_dir, "{}_uplink_imbalance_over_time.csv".format(config_id)), result)
+        if rows:
+            print_comparison(key, rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
 import subprocess
 import argparse
+import os
+import sys
 import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), 'analysis'))
+from quantile_sketch import DEFAULT_ALPHA, build_fct_sketches, save_sketch_file
 
 def get_pctl(a, p):
 	i = int(len(a) * p)
@@ -40,6 +44,8 @@ if __name__=="__main__":
 	parser.add_argument('-bdp', dest='bdp', action='store', required=True, help="1 BDP of this topology, default=104000 (100G with 2-tier)")
 	parser.add_argument('-sT', dest='time_limit_begin', action='store', type=int, default=2005000000, help="only consider flows that finish after T, default=2.005*10^9 ns")
 	parser.add_argument('-fT', dest='time_limit_end', action='store', type=int, default=100000000000, help="only consider flows that finish before T, default=100 * 10^9 ns")
+	parser.add_argument('-alpha', dest='sketch_alpha', action='store', type=float, default=DEFAULT_ALPHA, help="relative error of the FCT quantile sketches, default=0.01")
+	parser.add_argument('-sizeEdges', dest='size_edges', action='store', default="10000,100000,1000000,10000000", help="flow size bucket edges (bytes) of the FCT quantile sketches, default=10KB,100KB,1MB,10MB")
 	
 	args = parser.parse_args()
 
@@ -58,6 +64,7 @@ if __name__=="__main__":
 	output_fct_large_slowdown_cdf = dirname + "/" + fdirname + "/output/{id}/{id}_out_fct_large_slowdown_cdf.txt".format(id=config_ID)
 	output_fct_all_slowdown_cdf = dirname + "/" + fdirname + "/output/{id}/{id}_out_fct_all_slowdown_cdf.txt".format(id=config_ID)
 	output_fct_all_absolute_cdf = dirname + "/" + fdirname + "/output/{id}/{id}_out_fct_all_absolute_cdf.txt".format(id=config_ID)
+	output_fct_sketch = dirname + "/" + fdirname + "/output/{id}/{id}_out_fct_sketch.json".format(id=config_ID)
 
 	# time interval to consider
 	time_limit_start = args.time_limit_begin
@@ -291,4 +298,19 @@ if __name__=="__main__":
 			outfile_fct_large_absolute.write(var)
 
 
-
+	##############################
+	### MERGEABLE FCT SKETCHES ###
+	##############################
+	# DDSketch per metric and flow size bucket, merged across runs/seeds by analysis/quantile_sketch.py
+	size_edges = [int(x) for x in args.size_edges.split(",") if x]
+	sketches = {}
+	for metric, output in (("slowdown", output_slowdown), ("absolute", output_absolute)):
+		rows = [x.split(" ") for x in output.decode("utf-8").split('\n')[:-2]]
+		values = np.array([float(x[0]) for x in rows], dtype=np.float64)
+		sizes = np.array([int(x[1]) for x in rows], dtype=np.int64)
+		sketches[metric] = build_fct_sketches(values, sizes, OneBDP, size_edges, args.sketch_alpha)
+	save_sketch_file(output_fct_sketch, sketches, {
+		"id": config_ID, "bdp": OneBDP, "size_edges": size_edges,
+		"time_limit_begin": time_limit_start, "time_limit_end": time_limit_end,
+		"absolute_unit": "us"})
+	print("FCT sketches saved to", output_fct_sketch)
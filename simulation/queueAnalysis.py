@@ -14,6 +14,8 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'tools', 'topo2bdp'))
 from topo_bdp import get_bdp
+sys.path.append(os.path.join(os.path.dirname(__file__), 'analysis'))
+from log_parser import iter_log_chunks
 
 
 # LB/CC mode matching
@@ -31,113 +33,124 @@ lb_modes = {
     9: "conweave",
 }
 
-def get_cdf(v: list):        
-    # calculate cdf
-    v_sorted = np.sort(v)
-    p = 1. * np.arange(len(v)) / (len(v) - 1)
-    od = []
-    bkt = [0,0,0,0]
-    n_accum = 0
-    for i in range(len(v_sorted)):
-        key = v_sorted[i]
-        n_accum += 1
-        if bkt[0] == key:
-            bkt[1] += 1
-            bkt[2] = n_accum
-            bkt[3] = p[i]
-        else:
-            od.append(bkt)
-            bkt = [0,0,0,0]
-            bkt[0] = key
-            bkt[1] = 1
-            bkt[2] = n_accum
-            bkt[3] = p[i]
-    if od[-1][0] != bkt[0]:
-        od.append(bkt)
-    od.pop(0)
+PERCENTILES = [50, 95, 99, 99.9, 99.99]
 
-    ret = ""
-    for bkt in od:
-        var = str(bkt[0]) + " " + str(bkt[1]) + " " + str(bkt[2]) + " " + str(bkt[3]) + "\n"
-        ret += var
-        
-    return ret
 
+def hist_add(hist: dict, values):
+    """Accumulate an array of integer samples into a {value: count} histogram"""
+    vals, counts = np.unique(values, return_counts=True)
+    for v, c in zip(vals.tolist(), counts.tolist()):
+        hist[v] = hist.get(v, 0) + c
 
 
-def get_queue_per_switch_info_from_raw(filename, time_limit_start, time_limit_end, monitoring_interval, cdf_flag=True):
-
-    # get number of ToR switches
-    num_switch = 0
-    set_switch = set()
-    with open(filename, "r") as f:
-        for line in f.readlines():
-            parsed_line = line.replace("\n", "").split(",")
-            if len(parsed_line) != 4:
-                continue
-            set_switch.add(int(parsed_line[1]))
-    num_switch = len(set_switch)
-    print("Number of ToR switches: {}".format(num_switch))
-    assert(num_switch != 0)
-
-    # start calculating percentiles
-    nSample = int((float(time_limit_end) - float(time_limit_start)) / float(monitoring_interval) * num_switch) # 10us sampling interval
-    result = {"nQueue": [], "nPkt": [], "nSample": nSample} 
-    with open(filename, "r") as f:
-        for line in f.readlines():
-            parsed_line = line.replace("\n", "").split(",")
-            if len(parsed_line) != 4:
-                continue
+def hist_with_zeros(hist: dict, nSample: int):
+    """
+    Sorted (values, counts) of a histogram where samples missing from the log
+    (nSample - logged samples) count as an implicit zero bucket
+    """
+    values = np.array(sorted(hist), dtype=np.int64)
+    counts = np.array([hist[v] for v in values.tolist()], dtype=np.int64)
+    n_zero = int(nSample) - int(counts.sum())
+    if n_zero > 0:
+        if values.size and values[0] == 0:
+            counts[0] += n_zero
+        else:
+            values = np.concatenate(([0], values))
+            counts = np.concatenate(([n_zero], counts))
+    return values, counts
+
+
+def hist_percentile(values, counts, q):
+    """Same result as np.percentile(samples, q) (linear interpolation), computed from the histogram"""
+    cum = np.cumsum(counts)
+    n = int(cum[-1])
+    h = (n - 1) * (q / 100.)
+    lo = int(np.floor(h))
+    t = h - lo
+    a = values[np.searchsorted(cum, lo, side='right')]
+    b = values[np.searchsorted(cum, min(lo + 1, n - 1), side='right')]
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def hist_stat(values, counts):
+    """Avg, p50, p95, p99, p999, p9999, MAX of a histogram"""
+    if counts.sum() == 0:
+        return [0, 0, 0, 0, 0, 0, 0]
+    avg = float(np.dot(values, counts)) / int(counts.sum())
+    return [avg] + [int(hist_percentile(values, counts, q)) for q in PERCENTILES] + [values[-1]]
+
+
+def get_cdf(values, counts):
+    """
+    CDF lines "value count cumcount p" from a histogram, where p is the
+    fraction rank of the last sample of each value. Zero-valued samples are
+    counted in cumcount but not printed.
+    """
+    cum = np.cumsum(counts)
+    n = int(cum[-1]) if cum.size else 0
+    ret = ""
+    for v, c, acc in zip(values.tolist(), counts.tolist(), cum.tolist()):
+        if v == 0:
+            continue
+        ret += str(v) + " " + str(c) + " " + str(acc) + " " + str((acc - 1) / (n - 1)) + "\n"
+    return ret
 
-            timestamp = int(parsed_line[0])
-            if timestamp < time_limit_start or timestamp > time_limit_end:
-                continue
 
-            nQueue = int(parsed_line[2])
-            nPkt = int(parsed_line[3])
+def get_queue_hist_from_raw(filename, schema, time_limit_start, time_limit_end):
+    """
+    Single streaming pass over a VOQ log: per-value histograms of nQueue and
+    nPkt within [time_limit_start, time_limit_end] plus the set of ids seen
+    """
+    hist = {"nQueue": {}, "nPkt": {}}
+    ids = set()
+    for cols, _ in iter_log_chunks(filename, schema):
+        id_col = cols["tor"] if schema == "voq" else cols["dst"]
+        ids.update(np.unique(id_col).tolist())
+        mask = (cols["time_ns"] >= time_limit_start) & (cols["time_ns"] <= time_limit_end)
+        hist_add(hist["nQueue"], cols["n_queue"][mask])
+        hist_add(hist["nPkt"], cols["n_pkt"][mask])
+    return hist, ids
 
-            result["nQueue"].append(nQueue)
-            result["nPkt"].append(nPkt)
 
-    print("-> Total sample: {}, non-empty sample: {}".format(nSample, len(result["nQueue"])))
-    result["nQueue"] += [0] * int(nSample - len(result["nQueue"]))
-    result["nPkt"] += [0] * int(nSample - len(result["nPkt"]))
-    assert(len(result["nQueue"]) == len(result["nPkt"]))
+def summarize_queue_hist(filename, hist, nSample, cdf_key, cdf_flag):
+    n_logged = sum(hist["nQueue"].values())
+    print("-> Total sample: {}, non-empty sample: {}".format(nSample, n_logged))
 
+    result = {"nQueue": hist_with_zeros(hist["nQueue"], nSample),
+              "nPkt": hist_with_zeros(hist["nPkt"], nSample),
+              "nSample": nSample}
 
-    result_stat = {"nQueue": [], "nPkt": [], "nSample": nSample} 
     ### Processing to get Avg, p50, p95, p99, p999, p9999, MAX
-    result_stat["nQueue"] += [sum(result["nQueue"]) / len(result["nQueue"]),
-                        int(np.percentile(result["nQueue"], 50)), 
-                        int(np.percentile(result["nQueue"], 95)), 
-                        int(np.percentile(result["nQueue"], 99)), 
-                        int(np.percentile(result["nQueue"], 99.9)), 
-                        int(np.percentile(result["nQueue"], 99.99)), 
-                        np.max(result["nQueue"])]
-
-    result_stat["nPkt"] += [sum(result["nPkt"]) / len(result["nPkt"]),
-                        int(np.percentile(result["nPkt"], 50)), 
-                        int(np.percentile(result["nPkt"], 95)), 
-                        int(np.percentile(result["nPkt"], 99)), 
-                        int(np.percentile(result["nPkt"], 99.9)), 
-                        int(np.percentile(result["nPkt"], 99.99)), 
-                        np.max(result["nPkt"])]
+    result_stat = {"nQueue": hist_stat(*result["nQueue"]),
+                   "nPkt": hist_stat(*result["nPkt"]),
+                   "nSample": nSample}
 
     print("-> nQueue: {}".format(result_stat["nQueue"]))
     print("-> nPkt: {}".format(result_stat["nPkt"]))
 
-
     ### SAVE CDF FILE IF NEEDED
     if cdf_flag == True:
-        cdf_outfile = filename.replace(".txt", "") + "_cdf.txt" 
-        cdf_output = get_cdf(result["nPkt"])
-        
+        cdf_outfile = filename.replace(".txt", "") + "_cdf.txt"
+        cdf_output = get_cdf(*result[cdf_key])
+
         with open(cdf_outfile, "w") as fw:
             fw.write(cdf_output)
 
     return result, result_stat
 
 
+def get_queue_per_switch_info_from_raw(filename, time_limit_start, time_limit_end, monitoring_interval, cdf_flag=True):
+    hist, set_switch = get_queue_hist_from_raw(filename, "voq", time_limit_start, time_limit_end)
+
+    # get number of ToR switches
+    num_switch = len(set_switch)
+    print("Number of ToR switches: {}".format(num_switch))
+    assert(num_switch != 0)
+
+    # samples missing from the log are empty queues (implicit zero bucket)
+    nSample = int((float(time_limit_end) - float(time_limit_start)) / float(monitoring_interval) * num_switch) # 10us sampling interval
+    return summarize_queue_hist(filename, hist, nSample, "nPkt", cdf_flag)
 
 
 def get_queue_per_dst_info_from_raw(filename, time_limit_start, time_limit_end, monitoring_interval, cdf_flag=True):
@@ -160,64 +173,9 @@ def get_queue_per_dst_info_from_raw(filename, time_limit_start, time_limit_end,
     print("Number of Servers: {}".format(nHost))
     assert(nHost != 0)
 
-
     nSample = int((time_limit_end - time_limit_start) / monitoring_interval * nHost) # 10us sampling interval
-
-    result = {"nQueue": [], "nPkt": [], "nSample": nSample} 
-    with open(filename, "r") as f:
-        for line in f.readlines():
-            parsed_line = line.replace("\n", "").split(",")
-            timestamp = int(parsed_line[0])
-            if timestamp < time_limit_start or timestamp > time_limit_end:
-                continue
-
-            nQueue = int(parsed_line[2])
-            nPkt = int(parsed_line[3])
-
-            result["nQueue"].append(nQueue)
-            result["nPkt"].append(nPkt)
-    
-    print("-> Total sample: {}, non-empty sample: {}".format(nSample, len(result["nQueue"])))
-    result["nQueue"] += [0] * int(nSample - len(result["nQueue"]))
-    result["nPkt"] += [0] * int(nSample - len(result["nPkt"]))
-    assert(len(result["nQueue"]) == len(result["nPkt"]))
-
-
-    result_stat = {"nQueue": [], "nPkt": [], "nSample": nSample} 
-    ### Processing to get Avg, p50, p95, p99, p999, p9999, MAX
-    result_stat["nQueue"] += [sum(result["nQueue"]) / len(result["nQueue"]),
-                        int(np.percentile(result["nQueue"], 50)), 
-                        int(np.percentile(result["nQueue"], 95)), 
-                        int(np.percentile(result["nQueue"], 99)), 
-                        int(np.percentile(result["nQueue"], 99.9)), 
-                        int(np.percentile(result["nQueue"], 99.99)), 
-                        np.max(result["nQueue"])]
-
-    result_stat["nPkt"] += [sum(result["nPkt"]) / len(result["nPkt"]),
-                        int(np.percentile(result["nPkt"], 50)), 
-                        int(np.percentile(result["nPkt"], 95)), 
-                        int(np.percentile(result["nPkt"], 99)), 
-                        int(np.percentile(result["nPkt"], 99.9)), 
-                        int(np.percentile(result["nPkt"], 99.99)), 
-                        np.max(result["nPkt"])]
-
-    print("-> nQueue: {}".format(result_stat["nQueue"]))
-    print("-> nPkt: {}".format(result_stat["nPkt"]))
-
-
-    ### SAVE CDF FILE IF NEEDED
-    if cdf_flag == True:
-        cdf_outfile = filename.replace(".txt", "") + "_cdf.txt" 
-        cdf_output = get_cdf(result["nQueue"])
-        
-        with open(cdf_outfile, "w") as fw:
-            fw.write(cdf_output)
-
-    return result, result_stat
-
-
-
-
+    hist, _ = get_queue_hist_from_raw(filename, "voq_per_dst", time_limit_start, time_limit_end)
+    return summarize_queue_hist(filename, hist, nSample, "nQueue", cdf_flag)
 
 
 if __name__=="__main__":
@@ -64,14 +64,20 @@ FEC_BLOCK_SIZE {fec_block_size}
 FEC_INTERLEAVING_DEPTH {fec_interleaving_depth}
 FEC_TAIL_FLUSH_MIN_PKTS {fec_tail_flush_min_pkts}
 FEC_MAX_REPAIRS_PER_BLOCK {fec_max_repairs_per_block}
+FEC_SYMBOLIC {fec_symbolic}
 FEC_REPAIR_PACING_ENABLED {fec_repair_pacing_enabled}
 FEC_REPAIR_RATE_RATIO {fec_repair_rate_ratio}
 FEC_REPAIR_BURST_BYTES {fec_repair_burst_bytes}
 FEC_REPAIR_MAX_BACKLOG_BYTES {fec_repair_max_backlog_bytes}
 FEC_LOG_ENABLED {fec_log_enabled}
+{fec_log_sample_rates}RTO_LOG_SAMPLE_RATE {rto_log_sample_rate}
 FEC_STATE_MON_ENABLED {fec_state_mon_enabled}
 FEC_STATE_MON_INTERVAL_NS {fec_state_mon_interval_ns}
 
+OUTPUT_FORMAT {output_format}
+LOG_COMPRESSION {log_compression}
+ROUTE_CACHE_DIR {route_cache_dir}
+
 CONWEAVE_TX_EXPIRY_TIME {cwh_tx_expiry_time}
 CONWEAVE_REPLY_TIMEOUT_EXTRA {cwh_extra_reply_deadline}
 CONWEAVE_PATH_PAUSE_TIME {cwh_path_pause_time}
@@ -202,6 +208,8 @@ def main():
                       type=int, default=8, help="Tail flush min data pkts (default: 8)")
     parser.add_argument('--fec-max-repairs-per-block', dest='fec_max_repairs_per_block', action='store',
                       type=int, default=0, help="Max repairs per block (0=unlimited, default: 0)")
+    parser.add_argument('--fec-symbolic', dest='fec_symbolic', action='store',
+                      type=int, default=0, help="Symbolic FEC: track recipes/lengths only, no payload XOR (default: 0)")
     parser.add_argument('--fec-repair-pacing-enabled', dest='fec_repair_pacing_enabled', action='store',
                       type=int, default=1, help="Enable repair injection pacing (default: 1)")
     parser.add_argument('--fec-repair-rate-ratio', dest='fec_repair_rate_ratio', action='store',
@@ -212,10 +220,24 @@ def main():
                       type=int, default=8 * 1024 * 1024, help="Max pending repair backlog bytes (default: 8MiB)")
     parser.add_argument('--fec-log-enabled', dest='fec_log_enabled', action='store',
                       type=int, default=1, help="Enable FEC debug log file output (default: 1)")
+    parser.add_argument('--fec-log-sample-rate', dest='fec_log_sample_rate', action='append', nargs=2,
+                      metavar=('TYPE', 'RATE'), default=[],
+                      help="Per-flow sampling rate of FEC debug events of TYPE (log type or '*'), e.g. '* 0.1' or '0 1/64'; repeatable (default: type 0 off, others 1)")
+    parser.add_argument('--rto-log-sample-rate', dest='rto_log_sample_rate', action='store',
+                      default="1/256", help="Per-flow sampling rate of RTO events, 0..1 or 1/N (default: 1/256)")
     parser.add_argument('--fec-state-mon-enabled', dest='fec_state_mon_enabled', action='store',
                       type=int, default=0, help="Enable FEC state monitor output (default: 0)")
     parser.add_argument('--fec-state-mon-interval-ns', dest='fec_state_mon_interval_ns', action='store',
                       type=int, default=10000000, help="FEC state monitor interval (ns) (default: 10000000)")
+    parser.add_argument('--output-format', dest='output_format', action='store',
+                      choices=['text', 'binary'], default='text',
+                      help="Monitor log format; binary logs are read by analysis/log_parser.py (default: text)")
+    parser.add_argument('--log-compression', dest='log_compression', action='store',
+                      choices=['none', 'zstd', 'gzip'], default='none',
+                      help="Compress monitor logs on the writer thread (zstd falls back to gzip if not built); files get a .zst/.gz suffix (default: none)")
+    parser.add_argument('--route-cache-dir', dest='route_cache_dir', action='store',
+                      default="mix/route_cache",
+                      help="Cache routing/BDP results per topology in this directory, 'none' to disable (default: mix/route_cache)")
     parser.add_argument('--dry-run', dest='dry_run', action='store_true',
                       help="Only generate topology/traffic/config then exit (no waf run / analysis)")
     parser.add_argument('--minimal-flows', dest='minimal_flows', action='store',
@@ -517,13 +539,19 @@ def main():
             fec_interleaving_depth=args.fec_interleaving_depth,
             fec_tail_flush_min_pkts=args.fec_tail_flush_min_pkts,
             fec_max_repairs_per_block=args.fec_max_repairs_per_block,
+            fec_symbolic=args.fec_symbolic,
             fec_repair_pacing_enabled=args.fec_repair_pacing_enabled,
             fec_repair_rate_ratio=args.fec_repair_rate_ratio,
             fec_repair_burst_bytes=args.fec_repair_burst_bytes,
             fec_repair_max_backlog_bytes=args.fec_repair_max_backlog_bytes,
             fec_log_enabled=args.fec_log_enabled,
+            fec_log_sample_rates="".join("FEC_LOG_SAMPLE_RATE {} {}\n".format(t, r) for t, r in args.fec_log_sample_rate),
+            rto_log_sample_rate=args.rto_log_sample_rate,
             fec_state_mon_enabled=args.fec_state_mon_enabled,
-            fec_state_mon_interval_ns=args.fec_state_mon_interval_ns
+            fec_state_mon_interval_ns=args.fec_state_mon_interval_ns,
+            output_format=args.output_format,
+            log_compression=args.log_compression,
+            route_cache_dir=args.route_cache_dir
         )
     else:
         print("unknown cc:{}".format(args.cc))
@@ -27,8 +27,11 @@
 #include <ns3/switch-node.h>
 #include <time.h>
 
+#include <cmath>
 #include <fstream>
 #include <iostream>
+#include <sstream>
+#include <sys/stat.h>
 #include <unordered_map>
 #include <unistd.h>
 
@@ -42,11 +45,13 @@
 #include "ns3/internet-module.h"
 #include "ns3/ipv4-static-routing-helper.h"
 #include "ns3/letflow-routing.h"
+#include "ns3/monitor-log.h"
 #include "ns3/packet.h"
 #include "ns3/point-to-point-helper.h"
 #include "ns3/qbb-helper.h"
 #include "ns3/qbb-net-device.h"
 #include "ns3/rdma-hw.h"
+#include "ns3/route-table.h"
 #include "ns3/settings.h"
 #include "../../tools/topo2bdp/topo_bdp.h"
 
@@ -95,15 +100,105 @@ uint64_t cnp_monitor_bucket = 100000;  // ns
 uint64_t irn_mon_start;                // ns
 uint64_t irn_monitor_bucket = 100000;  // ns
 
-FILE *pfc_file = NULL;
-FILE *fct_output = NULL;
+MonitorLog *pfc_file = NULL;
+MonitorLog *fct_output = NULL;
 FILE *flow_input_stream = NULL;
-FILE *cnp_output = NULL;
+MonitorLog *cnp_output = NULL;
 FILE *est_error_output = NULL;
-FILE *voq_output = NULL;
-FILE *voq_detail_output = NULL;
-FILE *uplink_output = NULL;
-FILE *conn_output = NULL;
+MonitorLog *voq_output = NULL;
+MonitorLog *voq_detail_output = NULL;
+MonitorLog *uplink_output = NULL;
+MonitorLog *conn_output = NULL;
+
+// 监控日志输出格式：text（默认，十进制文本）或 binary（定长小端记录 + 自描述头）
+MonitorLog::Format output_format = MonitorLog::TEXT;
+
+// 各监控日志的记录格式，字段名与 analysis/log_parser.py 中的 SCHEMAS 保持一致
+const char *kFctFields =
+    "src_id:u4 dst_id:u4 sport:u2 dport:u2 size:i8 start_ns:i8 fct_ns:i8 standalone_fct_ns:i8";
+const char *kPfcFields = "time_ns:i8 node:u4 node_type:u1 interface:u4 pfc_type:u1";
+const char *kDropFields =
+    "time_ns:i8 type:i1 node:u4 interface:u4 src_id:u4 dst_id:u4 sport:u2 dport:u2";
+const char *kRtoFields =
+    "time_ns:i8 node:u4 flow_id:i4 src_id:u4 dst_id:u4 sport:u2 dport:u2 snd_una:i8 snd_nxt:i8 "
+    "rto_ns:i8 timeout_count:u4";
+const char *kFecFields = "time_ns:i8 node:u4 log_type:u4 param0:u4 param1:u4 param2:u4 param3:u4";
+const char *kCnpFields = "time_ns:i8 node:u4 cnp_ecn:u4 cnp_ooo:u4 cnp_total:u4";
+const char *kUplinkFields = "time_ns:i8 tor:u4 iface:u4 tx_bytes:i8";
+const char *kVoqFields = "time_ns:i8 tor:u4 n_queue:u4 n_pkt:u4";
+const char *kVoqPerDstFields = "time_ns:i8 dst:u4 n_queue:u4 n_pkt:u4";
+const char *kConnFields = "time_ns:i8 server:u4 n_qp:u4 n_active_qp:u4";
+
+/**
+ * @brief Open a monitor stream in the configured OUTPUT_FORMAT (NULL if the file cannot be created)
+ */
+MonitorLog *open_monitor_log(const std::string &path, const char *stream, const char *fields,
+                             char delimiter = ' ') {
+    MonitorLog *log = new MonitorLog(path, stream, fields, delimiter, output_format);
+    if (!log->IsOpen()) {
+        delete log;
+        return NULL;
+    }
+    return log;
+}
+
+/**
+ * @brief Deterministic per-flow sampling of monitor log events
+ *
+ * A flow is kept iff fmix32(flowHash) < rate * 2^32, so all events of one flow are kept or dropped
+ * together, and the RTO and FEC logs sampled at the same rate keep the same flows.
+ */
+struct FlowSampler {
+    uint64_t threshold = 1ull << 32;  // keep everything
+    std::string rate = "1";           // as configured, recorded in the log header
+
+    // 接受小数 (0.01) 或 1/N 形式
+    bool Parse(const std::string &v) {
+        std::string s = v;
+        size_t slash = s.find('/');
+        if (slash != std::string::npos) s[slash] = ' ';
+        std::istringstream iss(s);
+        double num = 0, den = 1;
+        if (!(iss >> num)) return false;
+        if (slash != std::string::npos && !(iss >> den)) return false;
+        double p = num / den;
+        if (!(p >= 0.0 && p <= 1.0)) return false;
+        threshold = (uint64_t)std::llround(p * 4294967296.0);
+        rate = v;
+        return true;
+    }
+
+    bool Keep(uint32_t flowHash) const {
+        // murmur3 fmix32：打散 flowHash 的低位，使相邻端口号的流也均匀采样
+        uint32_t h = flowHash;
+        h ^= h >> 16;
+        h *= 0x85ebca6bu;
+        h ^= h >> 13;
+        h *= 0xc2b2ae35u;
+        h ^= h >> 16;
+        return h < threshold;
+    }
+};
+
+/**
+ * @brief flowHash of a data flow as logged by on_fec_debug (low 32 bits of
+ * QbbNetDevice::FecFlowKeyHash over sip, dip, sport, dport)
+ */
+uint32_t flow_log_hash(uint32_t sip, uint32_t dip, uint16_t sport, uint16_t dport) {
+    uint64_t h = 1469598103934665603ull;
+    h = (h ^ sip) * 1099511628211ull;
+    h = (h ^ dip) * 1099511628211ull;
+    h = (h ^ (((uint32_t)sport << 16) | dport)) * 1099511628211ull;
+    return (uint32_t)h;
+}
+
+// RTO 日志按流采样（默认值在 main 中设置），避免丢包/高负载下日志与 IO 成为瓶颈
+FlowSampler rto_log_sampler;
+// FEC 调试日志按事件类型分别采样（类型编号见 on_fec_debug），未单独配置的类型使用默认采样率
+const uint32_t FEC_LOG_TYPES = 32;
+FlowSampler fec_log_sampler_default;
+FlowSampler fec_log_sampler[FEC_LOG_TYPES];
+bool fec_log_sampler_set[FEC_LOG_TYPES] = {};
 
 std::string data_rate, link_delay, topology_file, flow_file;
 std::string flow_input_file = "flow.txt";
@@ -118,6 +213,7 @@ std::string conn_mon_file = "conn.txt";
 std::string est_error_output_file = "est_error.txt";
 std::string rto_mon_file = "rto.txt";
 std::string fec_mon_file = "fec.txt";
+std::string route_cache_dir;  // 路由缓存目录，空表示不缓存
 
 // CC params
 double alpha_resume_interval = 55, rp_timer = 300, ewma_gain = 1 / 16;
@@ -156,6 +252,7 @@ uint32_t fec_block_size = 64;         // r: coding block size (number of packets
 uint32_t fec_interleaving_depth = 8;  // c: interleaving depth (number of layers)
 uint32_t fec_tail_flush_min_pkts = 8; // 尾块 flush 最小数据包数（短尾块不注入 repair）
 uint32_t fec_max_repairs_per_block = 0; // 每块最多 repair 数（0 表示不限制）
+uint32_t fec_symbolic = 0;              // 符号化 FEC：只跟踪 recipe/长度/bitmap，不做 payload XOR
 uint32_t fec_repair_pacing_enabled = 1; // repair 注入 pacing（LoWAR 风格 best-effort）
 double fec_repair_rate_ratio = 0.0;     // repair 注入速率比例（0 表示按 c/r 自动）
 uint64_t fec_repair_burst_bytes = 65536; // token bucket burst
@@ -173,22 +270,8 @@ int random_seed = 1;  // change this randomly if you want random expt
 uint64_t maxRtt, maxBdp;
 
 // app parameters
-struct Interface {
-    uint32_t idx;
-    bool up;
-    uint64_t delay;
-    uint64_t bw;
-
-    Interface() : idx(0), up(false) {}
-};
-map<Ptr<Node>, map<Ptr<Node>, Interface>> nbr2if;
-// Mapping destination to next hop for each node: <node, <dest, <nexthop0, ...> > >
-map<Ptr<Node>, map<Ptr<Node>, vector<Ptr<Node>>>> nextHop;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t>> pairDelay;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t>> pairTxDelay;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t>> pairBw;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t>> pairBdp;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t>> pairRtt;
+// 拓扑邻接（node id 索引的 CSR）与每个 host 的 BFS 路由；pair 的 RTT/BDP/带宽按需沿 BFS 树计算
+RouteTable routes;
 
 // for uplink/Downlink monitoring at TOR switches (load balance performance)
 std::map<uint32_t, std::vector<uint32_t>> torId2UplinkIf;
@@ -285,8 +368,8 @@ void ScheduleFlowInputs(FILE *infile) {
             apps0s.Stop(Seconds(100.0));
         }  // end of logging input streams
 
-        if (pairRtt.find(n.Get(src)) == pairRtt.end() ||
-            pairRtt[n.Get(src)].find(n.Get(dst)) == pairRtt[n.Get(src)].end()) {
+        if (src == dst || routes.IsSwitch(src) || routes.IsSwitch(dst) ||
+            !routes.IsReachable(src, dst)) {
             std::cerr << "pairRtt src: " << src << " -> dst: " << dst
                       << " ==> cannot be found from database" << std::endl;
             assert(false);
@@ -294,8 +377,8 @@ void ScheduleFlowInputs(FILE *infile) {
 
         RdmaClientHelper clientHelper(
             pg, serverAddress[src], serverAddress[dst], sport, dport, target_len,
-            has_win ? (global_t == 1 ? maxBdp : pairBdp[n.Get(src)][n.Get(dst)]) : 0,
-            global_t == 1 ? maxRtt : pairRtt[n.Get(src)][n.Get(dst)]);
+            has_win ? (global_t == 1 ? maxBdp : routes.GetBdp(src, dst)) : 0,
+            global_t == 1 ? maxRtt : routes.GetRtt(src, dst));
         clientHelper.SetAttribute("StatFlowID", IntegerValue(flow_input.idx));
 
         ApplicationContainer appCon = clientHelper.Install(n.Get(src));  // SRC
@@ -318,18 +401,11 @@ void ScheduleFlowInputs(FILE *infile) {
 /**
  * @brief CNP frequency monitoring (timestamp nodeId ECN OoO Total)
  */
-void cnp_freq_monitoring(FILE *fout, Ptr<RdmaHw> rdmahw) {
+void cnp_freq_monitoring(MonitorLog *fout, Ptr<RdmaHw> rdmahw) {
     if (rdmahw->cnp_total > 0) {
         // flush
-        fprintf(fout, "%lu %u %u %u %u\n", Simulator::Now().GetNanoSeconds(),
-                rdmahw->m_node->GetId(), rdmahw->cnp_by_ecn, rdmahw->cnp_by_ooo, rdmahw->cnp_total);
-        // 大规模场景下逐行 fflush 会产生较高 IO 开销；这里做轻量节流。
-        static uint32_t s_cnp_lines = 0;
-        s_cnp_lines++;
-        if ((s_cnp_lines & 0xFFu) == 0)
-        {
-            fflush(fout);
-        }
+        fout->Write(Simulator::Now().GetNanoSeconds(), rdmahw->m_node->GetId(), rdmahw->cnp_by_ecn,
+                    rdmahw->cnp_by_ooo, rdmahw->cnp_total);
 
         // initialize
         rdmahw->cnp_by_ecn = 0;
@@ -346,8 +422,8 @@ void cnp_freq_monitoring(FILE *fout, Ptr<RdmaHw> rdmahw) {
  * - VOQ number and uplink throughput at switches
  * - the number of active connections at RNICS
  */
-void periodic_monitoring(FILE *fout_voq, FILE *fout_voq_detail, FILE *fout_uplink, FILE *fout_conn,
-                         uint32_t *lb_mode) {
+void periodic_monitoring(MonitorLog *fout_voq, MonitorLog *fout_voq_detail, MonitorLog *fout_uplink,
+                         MonitorLog *fout_conn, uint32_t *lb_mode) {
     uint32_t lb_mode_val = *lb_mode;
     uint64_t now = Simulator::Now().GetNanoSeconds();
     for (const auto &tor2If : torId2UplinkIf) {  // for each TOR switches
@@ -359,7 +435,7 @@ void periodic_monitoring(FILE *fout_voq, FILE *fout_voq_detail, FILE *fout_uplin
             // monitor VOQ number per switch <time, ToRId, #VOQ, #Pkts>
             uint32_t nVOQ = swNode->m_mmu->m_conweaveRouting.GetNumVOQ();
             uint32_t nVolumeVOQ = swNode->m_mmu->m_conweaveRouting.GetVolumeVOQ();
-            fprintf(fout_voq, "%lu,%u,%u,%u\n", now, tor2If.first, nVOQ, nVolumeVOQ);
+            fout_voq->Write(now, tor2If.first, nVOQ, nVolumeVOQ);
 
             // monitor VOQ per destination IP <time, dstip, #VOQ, #Pkts>
             std::unordered_map<uint32_t, std::pair<uint32_t, uint32_t>> dip_to_nvoq_npkt;
@@ -369,8 +445,7 @@ void periodic_monitoring(FILE *fout_voq, FILE *fout_voq_detail, FILE *fout_uplin
                 nvoq_npkt.second += voq.second.getQueueSize();
             }
             for (auto x : dip_to_nvoq_npkt) {
-                fprintf(fout_voq_detail, "%lu,%u,%u,%u\n", now, x.first, x.second.first,
-                        x.second.second);
+                fout_voq_detail->Write(now, x.first, x.second.first, x.second.second);
             }
         }
 
@@ -378,7 +453,7 @@ void periodic_monitoring(FILE *fout_voq, FILE *fout_voq_detail, FILE *fout_uplin
         for (const auto &iface : tor2If.second) {
             // monitor uplink txBytes <time, ToRId, OutDev, Bytes>
             uint64_t uplink_txbyte = swNode->GetTxBytesOutDev(iface);
-            fprintf(fout_uplink, "%lu,%u,%u,%lu\n", now, tor2If.first, iface, uplink_txbyte);
+            fout_uplink->Write(now, tor2If.first, iface, uplink_txbyte);
         }
     }
 
@@ -396,7 +471,7 @@ void periodic_monitoring(FILE *fout_voq, FILE *fout_voq_detail, FILE *fout_uplin
                     nActiveQP++;
                 }
             }
-            fprintf(fout_conn, "%lu,%u,%lu,%lu\n", now, i, nQP, nActiveQP);
+            fout_conn->Write(now, i, nQP, nActiveQP);
         }
     }
 
@@ -493,10 +568,10 @@ void conweave_history_print() {
 /**
  * @brief When one RDMA is finished, so does (1) QP, (2) RxQP, (3) write it on file fct.txt.
  */
-void qp_finish(FILE *fout, Ptr<RdmaQueuePair> q) {
+void qp_finish(MonitorLog *fout, Ptr<RdmaQueuePair> q) {
     uint32_t sid = Settings::ip_to_node_id(q->sip), did = Settings::ip_to_node_id(q->dip);
-    uint64_t base_rtt = pairRtt[n.Get(sid)][n.Get(did)];
-    uint64_t b = pairBw[n.Get(sid)][n.Get(did)];
+    uint64_t base_rtt = routes.GetRtt(sid, did);
+    uint64_t b = routes.GetPath(sid, did).bw;
     uint32_t total_bytes =
         q->m_size + ((q->m_size - 1) / packet_payload_size + 1) *
                         (CustomHeader::GetStaticWholeHeaderSize() -
@@ -510,10 +585,9 @@ void qp_finish(FILE *fout, Ptr<RdmaQueuePair> q) {
     rdma->m_rdma->DeleteRxQp(q->sip.Get(), q->sport, q->dport, q->m_pg);
 
     // fprintf(fout, "%lu QP complete\n", Simulator::Now().GetTimeStep());
-    fprintf(fout, "%u %u %u %u %lu %lu %lu %lu\n", Settings::ip_to_node_id(q->sip),
-            Settings::ip_to_node_id(q->dip), q->sport, q->dport, q->m_size,
-            q->startTime.GetTimeStep(), (Simulator::Now() - q->startTime).GetTimeStep(),
-            standalone_fct);
+    fout->Write(Settings::ip_to_node_id(q->sip), Settings::ip_to_node_id(q->dip), q->sport,
+                q->dport, q->m_size, q->startTime.GetTimeStep(),
+                (Simulator::Now() - q->startTime).GetTimeStep(), standalone_fct);
 
     // for debugging
     NS_LOG_DEBUG("%u %u %u %u %lu %lu %lu %lu\n" %
@@ -521,23 +595,22 @@ void qp_finish(FILE *fout, Ptr<RdmaQueuePair> q) {
                   q->dport, q->m_size, q->startTime.GetTimeStep(),
                   (Simulator::Now() - q->startTime).GetTimeStep(), standalone_fct));
     Settings::cnt_finished_flows++;
-    fflush(fout);
 }
 
 /**
  * @brief PFC event logging
  */
-void get_pfc(FILE *fout, Ptr<QbbNetDevice> dev, uint32_t type) {
+void get_pfc(MonitorLog *fout, Ptr<QbbNetDevice> dev, uint32_t type) {
     // time, nodeID, nodeType, Interface's Idx, 0:resume, 1:pause
-    fprintf(fout, "%lu %u %u %u %u\n", Simulator::Now().GetTimeStep(), dev->GetNode()->GetId(),
-            dev->GetNode()->GetNodeType(), dev->GetIfIndex(), type);
+    fout->Write(Simulator::Now().GetTimeStep(), dev->GetNode()->GetId(),
+                dev->GetNode()->GetNodeType(), dev->GetIfIndex(), type);
 }
 
 /**
  * @brief PHY RX drop logging (ErrorModel-driven packet drops)
  * Trace source args: Ptr<const Packet>
  */
-void on_phy_drop(FILE *fout, Ptr<QbbNetDevice> dev, Ptr<const Packet> pkt) {
+void on_phy_drop(MonitorLog *fout, Ptr<QbbNetDevice> dev, Ptr<const Packet> pkt) {
     if (!fout) return;
     // Standardized format: time_ns type node if srcId dstId sport dport
     uint32_t nodeId = dev ? dev->GetNode()->GetId() : 0;
@@ -553,46 +626,24 @@ void on_phy_drop(FILE *fout, Ptr<QbbNetDevice> dev, Ptr<const Packet> pkt) {
         else if (ch.l3Prot == 0x11) { sport = ch.udp.sport; dport = ch.udp.dport; }
         else if (ch.l3Prot == 0xFC || ch.l3Prot == 0xFD) { sport = ch.ack.sport; dport = ch.ack.dport; }
     }
-    fprintf(fout, "%lu %d %u %u %u %u %u %u\n",
-            (unsigned long)Simulator::Now().GetNanoSeconds(),
-            0, nodeId, ifIndex,
-            srcId, dstId, sport, dport);
-    fflush(fout);
+    fout->Write(Simulator::Now().GetNanoSeconds(), 0, nodeId, ifIndex, srcId, dstId, sport, dport);
 }
 
 /**
  * @brief RTO timeout retransmission logging
  * Format: time_ns node_id flow_id sip dip sport dport snd_una snd_nxt rto_ns timeout_count
  */
-void on_rto_timeout(FILE *fout, uint32_t nodeId, Ptr<RdmaQueuePair> qp, Time rto, uint32_t timeoutCount) {
+void on_rto_timeout(MonitorLog *fout, uint32_t nodeId, Ptr<RdmaQueuePair> qp, Time rto, uint32_t timeoutCount) {
     if (!fout || !qp) return;
-    // RTO 事件在丢包/高负载下可能非常密集，默认采样以避免日志与 IO 成为瓶颈（影响宿主机稳定性/SSH）。
-    // 仅保留 1/256 的事件用于趋势观察；如需全量，可把该采样逻辑去掉或改小采样率。
-    static uint32_t s_rto_sample = 0;
-    s_rto_sample++;
-    if ((s_rto_sample & 0xFFu) != 0)
+    // 按流采样（RTO_LOG_SAMPLE_RATE），同一条流的 RTO 事件全部保留或全部丢弃
+    if (!rto_log_sampler.Keep(flow_log_hash(qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport)))
     {
         return;
     }
     uint32_t srcId = Settings::ip_to_node_id(qp->sip);
     uint32_t dstId = Settings::ip_to_node_id(qp->dip);
-    fprintf(fout, "%lu %u %d %u %u %u %u %lu %lu %lu %u\n",
-            (unsigned long)Simulator::Now().GetNanoSeconds(),
-            nodeId,
-            qp->m_flow_id,
-            srcId, dstId,
-            qp->sport, qp->dport,
-            (unsigned long)qp->snd_una,
-            (unsigned long)qp->snd_nxt,
-            (unsigned long)rto.GetNanoSeconds(),
-            timeoutCount);
-    // 大规模场景下逐行 fflush 会产生较高 IO 开销；这里做轻量节流。
-    static uint32_t s_rto_lines = 0;
-    s_rto_lines++;
-    if ((s_rto_lines & 0x3FFu) == 0)
-    {
-        fflush(fout);
-    }
+    fout->Write(Simulator::Now().GetNanoSeconds(), nodeId, qp->m_flow_id, srcId, dstId, qp->sport,
+                qp->dport, qp->snd_una, qp->snd_nxt, rto.GetNanoSeconds(), timeoutCount);
 }
 
 /**
@@ -612,29 +663,27 @@ void on_rto_timeout(FILE *fout, uint32_t nodeId, Ptr<RdmaQueuePair> qp, Time rto
  * - 22=negotiate_apply: param0=flowHash, param1=pack(old_r,old_c), param2=pack(new_r,new_c), param3=0
  * - 23=param_switch_rx: param0=flowHash, param1=pack(old_r,old_c), param2=pack(new_r,new_c), param3=0(data)/1(repair)
  *
+ * - 24=idle_gc:          param0=flowHash, param1=1(tail)/2(hard), param2/param3 见 QbbNetDevice
+ *
  * pack(r,c) := (r & 0xFFFF) | ((c & 0xFFFF) << 16)
+ *
+ * 各事件类型按 FEC_LOG_SAMPLE_RATE 以 flowHash 采样。data_recv 事件量极大（每个数据包一条），
+ * 默认采样率为 0（不记录），以免大规模实验引发 IO 爆炸并拖垮宿主机。
  */
-void on_fec_debug(FILE *fout, uint32_t nodeId, uint32_t logType,
+void on_fec_debug(MonitorLog *fout, uint32_t nodeId, uint32_t logType,
                   uint32_t param0, uint32_t param1, uint32_t param2, uint32_t param3) {
     if (!fout) return;
 
-    // data_recv 事件量极大（每个数据包一条），大规模实验会引发 IO 爆炸并拖垮宿主机（SSH 卡顿/掉线）。
-    // 默认关闭 logType==0；建议只用 repair/negotiate/recovery/tail_flush 事件做 FEC 观测。
-    if (logType == 0) return;
+    const FlowSampler &sampler =
+        logType < FEC_LOG_TYPES ? fec_log_sampler[logType] : fec_log_sampler_default;
+    if (sampler.threshold == 0) return;
+    // flowHash 所在参数随事件类型变化
+    uint32_t flowHash = param0;
+    if (logType == 0 || logType == 2 || logType == 3) flowHash = param2;
+    else if (logType == 1) flowHash = param3;
+    if (!sampler.Keep(flowHash)) return;
 
-    fprintf(fout, "%lu %u %u %u %u %u %u\n",
-            (unsigned long)Simulator::Now().GetNanoSeconds(),
-            nodeId,
-            logType,
-            param0, param1, param2, param3);
-    // 大规模场景下按行 fflush 会产生极高 IO 开销，可能触发超时/被杀（SIGKILL）。
-    // 这里做轻量节流：每 4096 行再 flush 一次，必要时你也可以手动在退出前 fflush。
-    static uint32_t s_fec_log_lines = 0;
-    s_fec_log_lines++;
-    if ((s_fec_log_lines & 0xFFFu) == 0)
-    {
-        fflush(fout);
-    }
+    fout->Write(Simulator::Now().GetNanoSeconds(), nodeId, logType, param0, param1, param2, param3);
 }
 
 static uint64_t ReadSelfRssKb()
@@ -665,6 +714,7 @@ void fec_state_monitoring(FILE* fout, NodeContainer* n, uint32_t intervalNs)
     uint64_t flows = 0;
     uint64_t headers = 0;
     uint64_t blocks = 0;
+    uint64_t blockSlots = 0;
     uint64_t repairs = 0;
     uint64_t xorBytes = 0;
     uint64_t ackqPkts = 0;
@@ -709,6 +759,7 @@ void fec_state_monitoring(FILE* fout, NodeContainer* n, uint32_t intervalNs)
             flows += s.flowCount;
             headers += s.totalRxBlockHeaders;
             blocks += s.totalDecoderBlocks;
+            blockSlots += s.totalDecoderBlockSlots;
             repairs += s.totalDecoderRepairs;
             xorBytes += s.totalDecoderXorBytes;
             pendingRepairPkts += s.pendingRepairCount;
@@ -725,12 +776,13 @@ void fec_state_monitoring(FILE* fout, NodeContainer* n, uint32_t intervalNs)
     }
 
     uint64_t rssKb = ReadSelfRssKb();
-    fprintf(fout, "%lu rss_kb=%lu flows=%lu headers=%lu blocks=%lu repairs=%lu xor_bytes=%lu ackq_pkts=%lu ackq_bytes=%lu pending_repair_pkts=%lu pending_repair_bytes=%lu repair_dropped=%lu beq_pkts=%lu beq_bytes=%lu sw_mmu_used=%lu sw_mmu_total=%lu\n",
+    fprintf(fout, "%lu rss_kb=%lu flows=%lu headers=%lu blocks=%lu block_slots=%lu repairs=%lu xor_bytes=%lu ackq_pkts=%lu ackq_bytes=%lu pending_repair_pkts=%lu pending_repair_bytes=%lu repair_dropped=%lu beq_pkts=%lu beq_bytes=%lu sw_mmu_used=%lu sw_mmu_total=%lu\n",
             (unsigned long)Simulator::Now().GetNanoSeconds(),
             (unsigned long)rssKb,
             (unsigned long)flows,
             (unsigned long)headers,
             (unsigned long)blocks,
+            (unsigned long)blockSlots,
             (unsigned long)repairs,
             (unsigned long)xorBytes,
             (unsigned long)ackqPkts,
@@ -751,7 +803,7 @@ void fec_state_monitoring(FILE* fout, NodeContainer* n, uint32_t intervalNs)
  * @brief Switch admission drop logging (Ingress/Egress buffer admission drop)
  * type: 1=ingress, 2=egress; devIndex: device index at switch
  */
-void on_sw_admission_drop(FILE *fout, Ptr<QbbNetDevice> swDev, Ptr<const Packet> pkt, uint32_t type, uint32_t devIndex) {
+void on_sw_admission_drop(MonitorLog *fout, Ptr<QbbNetDevice> swDev, Ptr<const Packet> pkt, uint32_t type, uint32_t devIndex) {
     if (!fout) return;
     uint32_t nodeId = swDev ? swDev->GetNode()->GetId() : 0;
     uint32_t ifIndex = devIndex;
@@ -766,17 +818,7 @@ void on_sw_admission_drop(FILE *fout, Ptr<QbbNetDevice> swDev, Ptr<const Packet>
     uint16_t sport = 0, dport = 0;
     if (ch.l3Prot == 0x6) { sport = ch.tcp.sport; dport = ch.tcp.dport; }
     else if (ch.l3Prot == 0x11) { sport = ch.udp.sport; dport = ch.udp.dport; }
-    fprintf(fout, "%lu %d %u %u %u %u %u %u\n",
-            (unsigned long)Simulator::Now().GetNanoSeconds(),
-            (int)type, nodeId, ifIndex,
-            srcId, dstId, sport, dport);
-    // 大规模场景下逐行 fflush 会产生较高 IO 开销；这里做轻量节流。
-    static uint32_t s_drop_lines = 0;
-    s_drop_lines++;
-    if ((s_drop_lines & 0x3FFu) == 0)
-    {
-        fflush(fout);
-    }
+    fout->Write(Simulator::Now().GetNanoSeconds(), type, nodeId, ifIndex, srcId, dstId, sport, dport);
 }
 
 /*******************************************************************/
@@ -858,88 +900,23 @@ void stop_simulation_middle() {
     Simulator::Schedule(MicroSeconds(100), &stop_simulation_middle);  // check every 100us
 }
 
-/**
- * @brief Calculate edge-to-edge delays, TX delays, and bandwidths
- */
-void CalculateRoute(Ptr<Node> host) {
-    // queue for the BFS.
-    vector<Ptr<Node>> q;
-    // Distance from the host to each node.
-    map<Ptr<Node>, int> dis;
-    map<Ptr<Node>, uint64_t> delay;
-    map<Ptr<Node>, uint64_t> txDelay;
-    map<Ptr<Node>, uint64_t> bw;
-    // init BFS.
-    q.push_back(host);
-    dis[host] = 0;
-    delay[host] = 0;
-    txDelay[host] = 0;
-    bw[host] = 0xfffffffffffffffflu;
-
-    // BFS.
-    for (int i = 0; i < (int)q.size(); i++) {
-        Ptr<Node> now = q[i];
-        int d = dis[now];
-        for (auto it = nbr2if[now].begin(); it != nbr2if[now].end(); it++) {
-            // skip down link
-            if (!it->second.up) continue;
-            Ptr<Node> next = it->first;
-            // If 'next' have not been visited.
-            if (dis.find(next) == dis.end()) {
-                dis[next] = d + 1;
-                delay[next] = delay[now] + it->second.delay;  // maybe nanoseconds?
-                txDelay[next] = txDelay[now] + packet_payload_size * 1000000000lu * 8 /
-                                                   it->second.bw;  // maybe nanoseconds?
-                bw[next] = std::min(bw[now], it->second.bw);
-                // we only enqueue switch, because we do not want packets to go through host as
-                // middle point
-                if (next->GetNodeType() == 1) {
-                    q.push_back(next);
-                }
-            }
-            // if 'now' is on the shortest path from 'next' to 'host'.
-            if (d + 1 == dis[next]) {
-                nextHop[next][host].push_back(now);
-            }
-        }
-    }
-    for (auto it : delay) {
-        pairDelay[it.first][host] = it.second;
-    }
-    for (auto it : txDelay) {
-        pairTxDelay[it.first][host] = it.second;
-    }
-    for (auto it : bw) {
-        pairBw[it.first][host] = it.second;
-    }
-}
-void CalculateRoutes(NodeContainer &n) {
-    for (int i = 0; i < (int)n.GetN(); i++) {
-        Ptr<Node> node = n.Get(i);
-        if (node->GetNodeType() == 0) {
-            CalculateRoute(node);
-        }
-    }
-}
-
 /**
  * @brief Set the Routing Entries object
  */
 void SetRoutingEntries() {
-    // For each node.
-    for (auto i = nextHop.begin(); i != nextHop.end(); i++) {
-        Ptr<Node> node = i->first;
-        auto &table = i->second;
-        for (auto j = table.begin(); j != table.end(); j++) {
-            // The destination node.
-            Ptr<Node> dst = j->first;
-            // The IP address of the dst.
-            Ipv4Address dstAddr = dst->GetObject<Ipv4>()->GetAddress(1, 0).GetLocal();
+    vector<uint32_t> nexts;
+    // For each destination host.
+    for (uint32_t dst : routes.GetHosts()) {
+        // The IP address of the dst.
+        Ipv4Address dstAddr = n.Get(dst)->GetObject<Ipv4>()->GetAddress(1, 0).GetLocal();
+        // For each node.
+        for (uint32_t i = 0; i < routes.GetNNodes(); i++) {
             // The next hops towards the dst.
-            vector<Ptr<Node>> nexts = j->second;
-            for (int k = 0; k < (int)nexts.size(); k++) {
-                Ptr<Node> next = nexts[k];
-                uint32_t interface = nbr2if[node][next].idx;
+            routes.GetNextHops(i, dst, &nexts);
+            if (nexts.empty()) continue;
+            Ptr<Node> node = n.Get(i);
+            for (uint32_t next : nexts) {
+                uint32_t interface = routes.GetInterface(i, next)->idx;
                 if (node->GetNodeType() == 1)
                     DynamicCast<SwitchNode>(node)->AddTableEntry(dstAddr, interface);
                 else {
@@ -953,11 +930,12 @@ void SetRoutingEntries() {
  * @brief take down the link between a and b, and redo the routing
  */
 void TakeDownLink(NodeContainer n, Ptr<Node> a, Ptr<Node> b) {
-    if (!nbr2if[a][b].up) return;
+    RouteTable::Interface *ab = routes.GetInterface(a->GetId(), b->GetId());
+    RouteTable::Interface *ba = routes.GetInterface(b->GetId(), a->GetId());
+    if (ab == nullptr || !ab->up) return;
     // take down link between a and b
-    nbr2if[a][b].up = nbr2if[b][a].up = false;
-    nextHop.clear();
-    CalculateRoutes(n);
+    ab->up = ba->up = false;
+    routes.CalculateRoutes(packet_payload_size);
     // clear routing tables
     for (uint32_t i = 0; i < n.GetN(); i++) {
         if (n.Get(i)->GetNodeType() == 1)
@@ -965,8 +943,8 @@ void TakeDownLink(NodeContainer n, Ptr<Node> a, Ptr<Node> b) {
         else
             n.Get(i)->GetObject<RdmaDriver>()->m_rdma->ClearTable();
     }
-    DynamicCast<QbbNetDevice>(a->GetDevice(nbr2if[a][b].idx))->TakeDown();
-    DynamicCast<QbbNetDevice>(b->GetDevice(nbr2if[b][a].idx))->TakeDown();
+    DynamicCast<QbbNetDevice>(a->GetDevice(ab->idx))->TakeDown();
+    DynamicCast<QbbNetDevice>(b->GetDevice(ba->idx))->TakeDown();
     // reset routing table
     SetRoutingEntries();
 
@@ -1006,6 +984,10 @@ int main(int argc, char *argv[]) {
     if (true)
 #endif
     {
+        // 日志采样默认值：RTO 保留 1/256 的流；FEC data_recv（每个数据包一条）默认不记录
+        rto_log_sampler.Parse("1/256");
+        fec_log_sampler[0].Parse("0");
+
         // Read the configuration file
         std::ifstream conf;
 #ifndef PGO_TRAINING
@@ -1358,6 +1340,9 @@ int main(int argc, char *argv[]) {
             } else if (key.compare("FEC_MAX_REPAIRS_PER_BLOCK") == 0) {
                 conf >> fec_max_repairs_per_block;
                 std::cerr << "FEC_MAX_REPAIRS_PER_BLOCK\t\t" << fec_max_repairs_per_block << '\n';
+            } else if (key.compare("FEC_SYMBOLIC") == 0) {
+                conf >> fec_symbolic;
+                std::cerr << "FEC_SYMBOLIC\t\t\t\t" << fec_symbolic << '\n';
             } else if (key.compare("FEC_REPAIR_PACING_ENABLED") == 0) {
                 conf >> fec_repair_pacing_enabled;
                 std::cerr << "FEC_REPAIR_PACING_ENABLED\t\t" << fec_repair_pacing_enabled << '\n';
@@ -1373,6 +1358,81 @@ int main(int argc, char *argv[]) {
             } else if (key.compare("FEC_LOG_ENABLED") == 0) {
                 conf >> fec_log_enabled;
                 std::cerr << "FEC_LOG_ENABLED\t\t\t\t" << fec_log_enabled << '\n';
+            } else if (key.compare("RTO_LOG_SAMPLE_RATE") == 0) {
+                std::string v;
+                conf >> v;
+                if (!rto_log_sampler.Parse(v)) {
+                    std::cerr << "Error: bad RTO_LOG_SAMPLE_RATE " << v << " (0..1 or 1/N)\n";
+                    return 1;
+                }
+                std::cerr << "RTO_LOG_SAMPLE_RATE\t\t\t" << v << '\n';
+            } else if (key.compare("FEC_LOG_SAMPLE_RATE") == 0) {
+                // FEC_LOG_SAMPLE_RATE <log_type|*> <rate>，'*' 设置所有未单独配置的类型
+                std::string type, v;
+                conf >> type >> v;
+                FlowSampler sampler;
+                if (!sampler.Parse(v)) {
+                    std::cerr << "Error: bad FEC_LOG_SAMPLE_RATE " << type << ' ' << v
+                              << " (0..1 or 1/N)\n";
+                    return 1;
+                }
+                if (type == "*") {
+                    fec_log_sampler_default = sampler;
+                    for (uint32_t t = 0; t < FEC_LOG_TYPES; t++) {
+                        if (!fec_log_sampler_set[t]) fec_log_sampler[t] = sampler;
+                    }
+                } else {
+                    uint32_t t = std::stoul(type);
+                    if (t >= FEC_LOG_TYPES) {
+                        std::cerr << "Error: FEC_LOG_SAMPLE_RATE log type " << t << " out of range\n";
+                        return 1;
+                    }
+                    fec_log_sampler[t] = sampler;
+                    fec_log_sampler_set[t] = true;
+                }
+                std::cerr << "FEC_LOG_SAMPLE_RATE\t\t\t" << type << ' ' << v << '\n';
+            } else if (key.compare("OUTPUT_FORMAT") == 0) {
+                std::string v;
+                conf >> v;
+                if (!MonitorLog::ParseFormat(v, &output_format)) {
+                    std::cerr << "Error: unknown OUTPUT_FORMAT " << v << " (text|binary)\n";
+                    return 1;
+                }
+                std::cerr << "OUTPUT_FORMAT\t\t\t\t" << v << '\n';
+            } else if (key.compare("ROUTE_CACHE_DIR") == 0) {
+                // 同一拓扑的 BFS 路由结果缓存到该目录，后续运行直接加载（none 表示关闭）
+                conf >> route_cache_dir;
+                if (route_cache_dir == "none") route_cache_dir.clear();
+                std::cerr << "ROUTE_CACHE_DIR\t\t\t\t"
+                          << (route_cache_dir.empty() ? "none" : route_cache_dir) << '\n';
+            } else if (key.compare("LOG_BUFFER_BYTES") == 0) {
+                uint64_t v;
+                conf >> v;
+                MonitorLog::SetBufferBytes(v);
+                std::cerr << "LOG_BUFFER_BYTES\t\t\t" << v << '\n';
+            } else if (key.compare("LOG_BACKPRESSURE") == 0) {
+                std::string v;
+                conf >> v;
+                MonitorLog::Backpressure policy;
+                if (!MonitorLog::ParseBackpressure(v, &policy)) {
+                    std::cerr << "Error: unknown LOG_BACKPRESSURE " << v << " (block|drop)\n";
+                    return 1;
+                }
+                MonitorLog::SetBackpressure(policy);
+                std::cerr << "LOG_BACKPRESSURE\t\t\t" << v << '\n';
+            } else if (key.compare("LOG_COMPRESSION") == 0) {
+                // 监控日志压缩由后台写线程完成，文件名追加 .zst / .gz
+                std::string v;
+                conf >> v;
+                MonitorLog::Compression compression;
+                if (!MonitorLog::ParseCompression(v, &compression)) {
+                    std::cerr << "Error: unknown LOG_COMPRESSION " << v << " (none|zstd|gzip)\n";
+                    return 1;
+                }
+                compression = MonitorLog::SetCompression(compression);
+                std::cerr << "LOG_COMPRESSION\t\t\t" << v
+                          << (compression == MonitorLog::ZSTD ? " (zstd)"
+                              : compression == MonitorLog::GZIP ? " (gzip)" : " (none)") << '\n';
             } else if (key.compare("EDGE_CNP_INTERVAL") == 0) {
                 conf >> edge_cnp_interval;
                 std::cerr << "EDGE_CNP_INTERVAL\t\t\t\t" << edge_cnp_interval << '\n';
@@ -1510,6 +1570,7 @@ int main(int argc, char *argv[]) {
         }
     }
     NS_LOG_INFO("Create nodes.");
+    routes.Reset(std::vector<bool>(node_type.begin(), node_type.end()));
 
     /*----------------------------------------*/
 
@@ -1531,12 +1592,32 @@ int main(int argc, char *argv[]) {
     //
     // Explicitly create the channels required by the topology.
     //
-    pfc_file = fopen(pfc_output_file.c_str(), "w");
-    FILE* rto_output = fopen(rto_mon_file.c_str(), "w");
-    FILE* fec_output = nullptr;
+    // 监控日志由后台线程异步写出，Simulator::Destroy 时写完剩余记录并关闭
+    Simulator::ScheduleDestroy(&MonitorLog::CloseAll);
+    pfc_file = open_monitor_log(pfc_output_file, "pfc", kPfcFields);
+    MonitorLog* rto_output = open_monitor_log(rto_mon_file, "rto", kRtoFields);
+    if (rto_output)
+    {
+        // 记录实际采样率，分析脚本据此把计数还原为全量估计
+        rto_output->SetMeta("sample_rate", rto_log_sampler.rate);
+        rto_output->SetMeta("sample_key", "flow_hash");
+    }
+    MonitorLog* fec_output = nullptr;
     if (fec_log_enabled)
     {
-        fec_output = fopen(fec_mon_file.c_str(), "w");
+        fec_output = open_monitor_log(fec_mon_file, "fec", kFecFields);
+    }
+    if (fec_output)
+    {
+        fec_output->SetMeta("sample_rate", fec_log_sampler_default.rate);
+        for (uint32_t t = 0; t < FEC_LOG_TYPES; t++)
+        {
+            if (fec_log_sampler[t].threshold != fec_log_sampler_default.threshold)
+            {
+                fec_output->SetMeta("sample_rate." + std::to_string(t), fec_log_sampler[t].rate);
+            }
+        }
+        fec_output->SetMeta("sample_key", "flow_hash");
     }
     FILE* fec_state_output = nullptr;
     if (fec_state_mon_enabled)
@@ -1544,9 +1625,7 @@ int main(int argc, char *argv[]) {
         fec_state_output = fopen(fec_state_mon_file.c_str(), "w");
     }
     // 统一设置较大的 stdio buffer，显著减少系统调用，避免大规模实验下 IO 抖动影响主机（例如 SSH 卡顿/掉线）。
-    if (pfc_file) setvbuf(pfc_file, NULL, _IOFBF, 1 << 20);
-    if (rto_output) setvbuf(rto_output, NULL, _IOFBF, 1 << 20);
-    if (fec_output) setvbuf(fec_output, NULL, _IOFBF, 1 << 20);
+    // （MonitorLog 自带默认 4 MiB 的写缓冲，可用 LOG_BUFFER_BYTES 调整，这里只需处理仍使用 stdio 的文件）
     if (fec_state_output) setvbuf(fec_state_output, NULL, _IOFBF, 1 << 20);
 
     QbbHelper qbb;
@@ -1603,20 +1682,20 @@ int main(int argc, char *argv[]) {
         }
 
         // used to create a graph of the topology
-        nbr2if[snode][dnode].idx = DynamicCast<QbbNetDevice>(d.Get(0))->GetIfIndex();
-        nbr2if[snode][dnode].up = true;
-        nbr2if[snode][dnode].delay =
-            DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(0))->GetChannel())
-                ->GetDelay()
-                .GetTimeStep();
-        nbr2if[snode][dnode].bw = DynamicCast<QbbNetDevice>(d.Get(0))->GetDataRate().GetBitRate();
-        nbr2if[dnode][snode].idx = DynamicCast<QbbNetDevice>(d.Get(1))->GetIfIndex();
-        nbr2if[dnode][snode].up = true;
-        nbr2if[dnode][snode].delay =
-            DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(1))->GetChannel())
-                ->GetDelay()
-                .GetTimeStep();
-        nbr2if[dnode][snode].bw = DynamicCast<QbbNetDevice>(d.Get(1))->GetDataRate().GetBitRate();
+        RouteTable::Interface ab, ba;
+        ab.idx = DynamicCast<QbbNetDevice>(d.Get(0))->GetIfIndex();
+        ab.up = true;
+        ab.delay = DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(0))->GetChannel())
+                       ->GetDelay()
+                       .GetTimeStep();
+        ab.bw = DynamicCast<QbbNetDevice>(d.Get(0))->GetDataRate().GetBitRate();
+        ba.idx = DynamicCast<QbbNetDevice>(d.Get(1))->GetIfIndex();
+        ba.up = true;
+        ba.delay = DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(1))->GetChannel())
+                       ->GetDelay()
+                       .GetTimeStep();
+        ba.bw = DynamicCast<QbbNetDevice>(d.Get(1))->GetDataRate().GetBitRate();
+        routes.AddLink(src, dst, ab, ba);
 
         // This is just to set up the connectivity between nodes. The IP addresses are useless
         char ipstring[16];
@@ -1650,6 +1729,8 @@ int main(int argc, char *argv[]) {
         // }
     }
 
+    routes.Finalize();
+
     std::cout << "(AVG) NIC RATE: " << get_nic_rate(n) << std::endl;
 
     /* Get IP address <-> NodeID pairs */
@@ -1729,6 +1810,7 @@ int main(int argc, char *argv[]) {
                     dev->SetFecParameters(fec_block_size, fec_interleaving_depth);
                     dev->SetFecTailFlushMinPkts(fec_tail_flush_min_pkts);
                     dev->SetFecMaxRepairsPerBlock(fec_max_repairs_per_block);
+                    dev->SetFecSymbolic(static_cast<bool>(fec_symbolic));
                     dev->SetFecRepairPacing(static_cast<bool>(fec_repair_pacing_enabled),
                                             fec_repair_rate_ratio,
                                             fec_repair_max_backlog_bytes,
@@ -1755,14 +1837,12 @@ int main(int argc, char *argv[]) {
                             fec_state_mon_interval_ns);
     }
 
-    fct_output = fopen(fct_output_file.c_str(), "w");
+    fct_output = open_monitor_log(fct_output_file, "fct", kFctFields);
     flow_input_stream = fopen(flow_input_file.c_str(), "w");
     if (cc_mode == 1) {
-        cnp_output = fopen(cnp_output_file.c_str(), "w");
+        cnp_output = open_monitor_log(cnp_output_file, "cnp", kCnpFields);
     }
-    if (fct_output) setvbuf(fct_output, NULL, _IOFBF, 1 << 20);
     if (flow_input_stream) setvbuf(flow_input_stream, NULL, _IOFBF, 1 << 20);
-    if (cnp_output) setvbuf(cnp_output, NULL, _IOFBF, 1 << 20);
 
     /**
      * @brief install RDMA driver (Mellanox parameters)
@@ -1894,32 +1974,35 @@ int main(int argc, char *argv[]) {
     /**
      * @brief setup routing
      */
-    CalculateRoutes(n);
+    // 缓存文件名由拓扑结构哈希决定（不含链路错误率），命中时跳过所有 host 的 BFS
+    std::string route_cache_file;
+    if (!route_cache_dir.empty()) {
+        char name[64];
+        snprintf(name, sizeof(name), "routes_%016lx.bin",
+                 (unsigned long)routes.GetTopologyHash(packet_payload_size));
+        route_cache_file = route_cache_dir + "/" + name;
+    }
+    if (!route_cache_file.empty() && routes.Load(route_cache_file, packet_payload_size)) {
+        std::cerr << "Routes loaded from " << route_cache_file << '\n';
+    } else {
+        routes.CalculateRoutes(packet_payload_size);
+        if (!route_cache_file.empty()) {
+            mkdir(route_cache_dir.c_str(), 0755);
+            if (routes.Save(route_cache_file))
+                std::cerr << "Routes saved to " << route_cache_file << '\n';
+            else
+                std::cerr << "Warning: cannot write route cache " << route_cache_file << '\n';
+        }
+    }
     SetRoutingEntries();
 
     /**
      * @brief get BDP and delay
+     * (per-pair RTT/BDP are computed on demand for the flows that are scheduled)
      */
-    maxRtt = maxBdp = 0;
+    maxRtt = routes.GetMaxRtt();
+    maxBdp = routes.GetMaxBdp();
     fprintf(stderr, "node_num=%d\n", node_num);
-    for (uint32_t i = 0; i < node_num; i++) {
-        if (n.Get(i)->GetNodeType() != 0) continue;
-        for (uint32_t j = i + 1; j < node_num; j++) {
-            if (n.Get(j)->GetNodeType() != 0) continue;
-            uint64_t delay = pairDelay[n.Get(i)][n.Get(j)];
-            uint64_t txDelay = pairTxDelay[n.Get(i)][n.Get(j)];
-            uint64_t rtt = delay * 2 + txDelay;
-            uint64_t bw = pairBw[n.Get(i)][n.Get(j)];
-            uint64_t bdp = rtt * bw / 1000000000 / 8;
-            pairBdp[n.Get(i)][n.Get(j)] = bdp;
-            pairBdp[n.Get(j)][n.Get(i)] = bdp;
-            pairRtt[n.Get(i)][n.Get(j)] = rtt;
-            pairRtt[n.Get(j)][n.Get(i)] = rtt;
-
-            if (bdp > maxBdp) maxBdp = bdp;
-            if (rtt > maxRtt) maxRtt = rtt;
-        }
-    }
     fprintf(stderr, "maxRtt: %lu, maxBdp: %lu\n", maxRtt, maxBdp);
     assert(maxBdp == irn_bdp_lookup);
 
@@ -1959,19 +2042,19 @@ int main(int argc, char *argv[]) {
         // Conga: m_congaFromLeafTable, m_congaToLeafTable, m_congaRoutingTable
         // Letflow: m_letflowRoutingTable
         // Conweave: m_ConWeaveRoutingTable, m_rxToRId2BaseRTT
-        for (auto i = nextHop.begin(); i != nextHop.end(); i++) {  // every node
-            if (i->first->GetNodeType() == 1) {                    // switch
-                Ptr<Node> nodeSrc = i->first;
+        vector<uint32_t> nexts1, nexts2, nexts3, nexts4;
+        for (uint32_t i = 0; i < node_num; i++) {  // every node
+            if (routes.IsSwitch(i)) {               // switch
+                Ptr<Node> nodeSrc = n.Get(i);
                 Ptr<SwitchNode> swSrc = DynamicCast<SwitchNode>(nodeSrc);  // switch
                 uint32_t swSrcId = swSrc->GetId();
 
                 if (swSrc->m_isToR) {
                     // printf("--- ToR Switch %d\n", swSrcId);
 
-                    auto table1 = i->second;
-                    for (auto j = table1.begin(); j != table1.end(); j++) {
-                        Ptr<Node> dst = j->first;  // dst
-                        uint32_t dstIP = Settings::hostId2IpMap[dst->GetId()];
+                    for (uint32_t dst : routes.GetHosts()) {  // dst
+                        if (!routes.IsReachable(swSrcId, dst)) continue;
+                        uint32_t dstIP = Settings::hostId2IpMap[dst];
                         uint32_t swDstId = Settings::hostIp2SwitchId[dstIP];  // Rx(dst)ToR
 
                         if (swSrcId == swDstId) {
@@ -1989,13 +2072,13 @@ int main(int argc, char *argv[]) {
                         // construct paths
                         uint32_t pathId;
                         uint8_t path_ports[4] = {0, 0, 0, 0};  // interface is always large than 0
-                        vector<Ptr<Node>> nexts1 = j->second;
+                        routes.GetNextHops(swSrcId, dst, &nexts1);
                         for (auto next1 : nexts1) {
-                            uint32_t outPort1 = nbr2if[nodeSrc][next1].idx;
-                            auto nexts2 = nextHop[next1][dst];
-                            if (nexts2.size() == 1 && nexts2[0]->GetId() == swDstId) {
+                            uint32_t outPort1 = routes.GetInterface(swSrcId, next1)->idx;
+                            routes.GetNextHops(next1, dst, &nexts2);
+                            if (nexts2.size() == 1 && nexts2[0] == swDstId) {
                                 // this destination has 2-hop distance
-                                uint32_t outPort2 = nbr2if[next1][nexts2[0]].idx;
+                                uint32_t outPort2 = routes.GetInterface(next1, nexts2[0])->idx;
                                 // printf("[IntraPod-2hop] %d (%d)-> %d (%d) -> %d -> %d\n",
                                 // nodeSrc->GetId(), outPort1, next1->GetId(), outPort2,
                                 // nexts2[0]->GetId(), dst->GetId());
@@ -2020,11 +2103,11 @@ int main(int argc, char *argv[]) {
                             }
 
                             for (auto next2 : nexts2) {
-                                uint32_t outPort2 = nbr2if[next1][next2].idx;
-                                auto nexts3 = nextHop[next2][dst];
-                                if (nexts3.size() == 1 && nexts3[0]->GetId() == swDstId) {
+                                uint32_t outPort2 = routes.GetInterface(next1, next2)->idx;
+                                routes.GetNextHops(next2, dst, &nexts3);
+                                if (nexts3.size() == 1 && nexts3[0] == swDstId) {
                                     // this destination has 3-hop distance
-                                    uint32_t outPort3 = nbr2if[next2][nexts3[0]].idx;
+                                    uint32_t outPort3 = routes.GetInterface(next2, nexts3[0])->idx;
                                     // printf("[IntraPod-3hop] %d (%d)-> %d (%d) -> %d (%d) -> %d ->
                                     // %d\n", nodeSrc->GetId(), outPort1, next1->GetId(), outPort2,
                                     // next2->GetId(), outPort3, nexts3[0]->GetId(), dst->GetId());
@@ -2052,11 +2135,11 @@ int main(int argc, char *argv[]) {
                                 }
 
                                 for (auto next3 : nexts3) {
-                                    uint32_t outPort3 = nbr2if[next2][next3].idx;
-                                    auto nexts4 = nextHop[next3][dst];
-                                    if (nexts4.size() == 1 && nexts4[0]->GetId() == swDstId) {
+                                    uint32_t outPort3 = routes.GetInterface(next2, next3)->idx;
+                                    routes.GetNextHops(next3, dst, &nexts4);
+                                    if (nexts4.size() == 1 && nexts4[0] == swDstId) {
                                         // this destination has 4-hop distance
-                                        uint32_t outPort4 = nbr2if[next3][nexts4[0]].idx;
+                                        uint32_t outPort4 = routes.GetInterface(next3, nexts4[0])->idx;
                                         // printf("[IntraPod-4hop] %d (%d)-> %d (%d) -> %d (%d) ->
                                         // %d (%d) -> %d -> %d\n", nodeSrc->GetId(), outPort1,
                                         // next1->GetId(), outPort2, next2->GetId(), outPort3,
@@ -2098,21 +2181,21 @@ int main(int argc, char *argv[]) {
         }
 
         // m_outPort2BitRateMap - only for Conga
-        for (auto i = nextHop.begin(); i != nextHop.end(); i++) {  // every node
-            if (i->first->GetNodeType() == 1) {                    // switch
-                Ptr<Node> node = i->first;
+        vector<uint32_t> nexts;
+        for (uint32_t i = 0; i < node_num; i++) {  // every node
+            if (routes.IsSwitch(i)) {               // switch
+                Ptr<Node> node = n.Get(i);
                 Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(node);  // switch
                 uint32_t swId = sw->GetId();
 
-                auto table = i->second;
-                for (auto j = table.begin(); j != table.end(); j++) {
-                    Ptr<Node> dst = j->first;  // dst
-                    uint32_t dstIP = Settings::hostId2IpMap[dst->GetId()];
+                for (uint32_t dst : routes.GetHosts()) {  // dst
+                    uint32_t dstIP = Settings::hostId2IpMap[dst];
                     uint32_t swDstId = Settings::hostIp2SwitchId[dstIP];
 
-                    for (auto next : j->second) {
-                        uint32_t outPort = nbr2if[node][next].idx;
-                        uint64_t bw = nbr2if[node][next].bw;
+                    routes.GetNextHops(swId, dst, &nexts);
+                    for (auto next : nexts) {
+                        uint32_t outPort = routes.GetInterface(swId, next)->idx;
+                        uint64_t bw = routes.GetInterface(swId, next)->bw;
                         sw->m_mmu->m_congaRouting.SetLinkCapacity(outPort, bw);
                         // printf("Node: %d, interface: %d, bw: %lu\n", swId, outPort, bw);
                     }
@@ -2121,9 +2204,9 @@ int main(int argc, char *argv[]) {
         }
 
         // Constant setup, and switchInfo
-        for (auto i = nextHop.begin(); i != nextHop.end(); i++) {  // every node
-            if (i->first->GetNodeType() == 1) {
-                Ptr<Node> node = i->first;
+        for (uint32_t i = 0; i < node_num; i++) {  // every node
+            if (routes.IsSwitch(i)) {
+                Ptr<Node> node = n.Get(i);
                 Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(node);  // switch
                 NS_LOG_INFO("Switch Info - ID:%u, ToR:%d\n" % (sw->GetId(), sw->m_isToR));
                 if (lb_mode == 3) {
@@ -2190,12 +2273,13 @@ int main(int argc, char *argv[]) {
     }
 
     if (lb_mode == 9) {
-        voq_output = fopen(voq_mon_file.c_str(), "w");                // specific to ConWeave
-        voq_detail_output = fopen(voq_mon_detail_file.c_str(), "w");  // specific to ConWeave
+        voq_output = open_monitor_log(voq_mon_file, "voq", kVoqFields, ',');  // specific to ConWeave
+        voq_detail_output = open_monitor_log(voq_mon_detail_file, "voq_per_dst", kVoqPerDstFields,
+                                             ',');  // specific to ConWeave
     }
 
-    uplink_output = fopen(uplink_mon_file.c_str(), "w");  // common
-    conn_output = fopen(conn_mon_file.c_str(), "w");      // common
+    uplink_output = open_monitor_log(uplink_mon_file, "uplink", kUplinkFields, ',');  // common
+    conn_output = open_monitor_log(conn_mon_file, "conn", kConnFields, ',');          // common
 
     // update torId2UplinkIf, torId2DownlinkIf
     for (size_t ToRId = 0; ToRId < Settings::node_num; ToRId++) {
@@ -2203,19 +2287,18 @@ int main(int argc, char *argv[]) {
         if (node->GetNodeType() == 1) {  // switches
             auto swNode = DynamicCast<SwitchNode>(n.Get(ToRId));
             if (swNode->m_isToR) {  // TOR switch
-                for (auto &nextNodeIf : nbr2if[node]) {
-                    if (nextNodeIf.first->GetNodeType() ==
-                        1) {  // nextNode is switch (i.e., uplink)
+                for (uint32_t j = 0; j < routes.GetNNeighbors(ToRId); j++) {
+                    const RouteTable::Interface &nextIf = routes.GetNeighborInterface(ToRId, j);
+                    if (routes.IsSwitch(
+                            routes.GetNeighbor(ToRId, j))) {  // nextNode is switch (i.e., uplink)
                         auto &vec = torId2UplinkIf[ToRId];
-                        vec.push_back(
-                            nextNodeIf.second.idx);  // record this uplink port (outDev index)
-                        // printf("Sw %lu - uplink port %u\n", ToRId, nextNodeIf.second.idx);  //
+                        vec.push_back(nextIf.idx);  // record this uplink port (outDev index)
+                        // printf("Sw %lu - uplink port %u\n", ToRId, nextIf.idx);  //
                         // debugging
                     } else {
                         auto &vec = torId2DownlinkIf[ToRId];
-                        vec.push_back(
-                            nextNodeIf.second.idx);  // record this downlink port (outDev index)
-                        // printf("Sw %lu - downlink port %u\n", ToRId, nextNodeIf.second.idx);  //
+                        vec.push_back(nextIf.idx);  // record this downlink port (outDev index)
+                        // printf("Sw %lu - downlink port %u\n", ToRId, nextIf.idx);  //
                         // debugging
                     }
                 }
@@ -13,6 +13,9 @@
 #include "ns3/fec-decoder.h"
 #include "ns3/packet.h"
 
+#include <chrono>
+#include <cstdio>
+
 using namespace ns3;
 
 NS_LOG_COMPONENT_DEFINE("FecStandaloneTest");
@@ -334,6 +337,70 @@ bool TestEndToEnd()
     TEST_PASS("End-to-end FEC encode-decode cycle");
 }
 
+/**
+ * XOR throughput of LoWAR(r, c) for r in {16, 64, 128} and c in {1, 4, 8}
+ *
+ * - engine:  FecXorEngine::XorPackets over the r / c packets of each coding unit
+ * - encoder: FecEncoder::EncodePacket for r packets + GenerateRepairPackets
+ *
+ * GB/s counts the data bytes XORed (r * payload per block).
+ */
+void BenchmarkXorEngine()
+{
+    std::cout << "\n=== XOR throughput (payload 1000 B) ===" << std::endl;
+
+    const uint32_t payload = 1000;
+    const uint64_t bytesPerRun = 256ull << 20;
+    const uint32_t rs[] = {16, 64, 128};
+    const uint32_t cs[] = {1, 4, 8};
+
+    printf("  %5s %3s | %12s %12s\n", "r", "c", "engine GB/s", "encoder GB/s");
+    for (uint32_t r : rs) {
+        std::vector<Ptr<Packet>> packets;
+        std::vector<uint8_t> data(payload);
+        for (uint32_t i = 0; i < r; i++) {
+            for (uint32_t j = 0; j < payload; j++) {
+                data[j] = (uint8_t)(i * 131 + j * 7);
+            }
+            packets.push_back(Create<Packet>(data.data(), payload));
+        }
+        uint64_t blocks = bytesPerRun / ((uint64_t)r * payload);
+
+        for (uint32_t c : cs) {
+            std::vector<std::vector<Ptr<Packet>>> units(c);
+            for (uint32_t i = 0; i < r; i++) {
+                units[i % c].push_back(packets[i]);
+            }
+
+            uint32_t check = 0;
+            auto t0 = std::chrono::steady_clock::now();
+            for (uint64_t b = 0; b < blocks; b++) {
+                for (uint32_t u = 0; u < c; u++) {
+                    check += FecXorEngine::XorPackets(units[u])->GetSize();
+                }
+            }
+            double engineSec = std::chrono::duration<double>(std::chrono::steady_clock::now() - t0).count();
+
+            Ptr<FecEncoder> encoder = Ptr<FecEncoder>(new FecEncoder(r, c));
+            t0 = std::chrono::steady_clock::now();
+            for (uint64_t b = 0; b < blocks; b++) {
+                for (uint32_t i = 0; i < r; i++) {
+                    encoder->EncodePacket(packets[i], b * r + i);
+                }
+                check += encoder->GenerateRepairPackets().size();
+                encoder->ResetBlock();
+            }
+            double encoderSec = std::chrono::duration<double>(std::chrono::steady_clock::now() - t0).count();
+
+            double gb = (double)blocks * r * payload / 1e9;
+            printf("  %5u %3u | %12.2f %12.2f\n", r, c, gb / engineSec, gb / encoderSec);
+            if (check == 0) {
+                printf("  no repair generated\n");
+            }
+        }
+    }
+}
+
 /**
  * Main test runner
  */
@@ -352,6 +419,8 @@ int main(int argc, char *argv[])
     TestDecoder();
     TestEndToEnd();
 
+    BenchmarkXorEngine();
+
     // Summary
     std::cout << "\n";
     std::cout << "╔════════════════════════════════════════════╗\n";
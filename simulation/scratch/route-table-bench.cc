@@ -0,0 +1,299 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * Routing startup benchmark
+ *
+ * Times the route computation done by cross_dc.cc at startup on two-DC
+ * fat-trees of increasing size, laid out like
+ * tools/topology_gen/cross_dc_topology_gen.py (oversubscription 2, one DCI
+ * per DC, 100G / 1us intra-DC links, 400G / 400us DCI link):
+ *   - legacy: the former per-host BFS into map<node, map<node, ...>> tables
+ *     plus the all-pairs RTT / BDP fill (only up to --legacy-max-k, it needs
+ *     tens of GB beyond k=16)
+ *   - RouteTable: CSR adjacency + per-host BFS ranks, then the same work
+ *     SetRoutingEntries does (every next hop of every node towards every host)
+ *   - route cache (ROUTE_CACHE_DIR): saving the BFS state, and loading it
+ *     instead of running the BFS
+ *
+ * Usage: ./waf --run "route-table-bench 4 8 16 32 --legacy-max-k=8"
+ */
+
+#include "ns3/route-table.h"
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <map>
+#include <string>
+#include <vector>
+
+using namespace ns3;
+
+static const uint32_t kPayload = 1000;
+
+struct Link
+{
+    uint32_t a, b;
+    RouteTable::Interface itf; ///< a towards b; b towards a only differs in idx
+    uint32_t baIdx;
+};
+
+static double
+Seconds(std::chrono::steady_clock::time_point start)
+{
+    return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+}
+
+/**
+ * Two-DC fat-tree with the node numbering of cross_dc_topology_gen.py
+ */
+static void
+BuildCrossDc(uint32_t k, std::vector<bool>* isSwitch, std::vector<Link>* links)
+{
+    const uint32_t nDc = 2;
+    const uint32_t half = k / 2, nTor = k * half, nAgg = k * half, nCore = half * half;
+    const uint32_t nServer = nTor * half * 2;
+    const uint32_t perDc = nServer + nTor + nAgg + nCore + 1;
+    isSwitch->assign(perDc * nDc, true);
+    links->clear();
+    Link l;
+    l.itf.up = true;
+    l.itf.delay = 1000;
+    l.itf.bw = 100000000000lu;
+    for (uint32_t dc = 0; dc < nDc; ++dc)
+    {
+        uint32_t base = dc * perDc, tor = base + nServer, agg = tor + nTor, core = agg + nAgg;
+        for (uint32_t s = 0; s < nServer; ++s)
+        {
+            (*isSwitch)[base + s] = false;
+            l.a = base + s;
+            l.b = tor + s / (half * 2);
+            links->push_back(l);
+        }
+        for (uint32_t t = 0; t < nTor; ++t)
+        {
+            for (uint32_t a = 0; a < half; ++a)
+            {
+                l.a = tor + t;
+                l.b = agg + t / half * half + a;
+                links->push_back(l);
+            }
+        }
+        for (uint32_t a = 0; a < nAgg; ++a)
+        {
+            for (uint32_t c = 0; c < half; ++c)
+            {
+                l.a = agg + a;
+                l.b = core + a % half * half + c;
+                links->push_back(l);
+            }
+        }
+        for (uint32_t c = 0; c < nCore; ++c)
+        {
+            l.a = core + c;
+            l.b = core + nCore;
+            links->push_back(l);
+        }
+    }
+    l.a = perDc - 1;
+    l.b = 2 * perDc - 1;
+    l.itf.delay = 400000;
+    l.itf.bw = 400000000000lu;
+    links->push_back(l);
+
+    // interface index = position on the node, as the devices are created
+    std::vector<uint32_t> nDevices(isSwitch->size(), 1);
+    for (auto& link : *links)
+    {
+        link.itf.idx = nDevices[link.a]++;
+        link.baIdx = nDevices[link.b]++;
+    }
+}
+
+/**
+ * The former cross_dc.cc routing setup, keyed by node id instead of Ptr<Node>
+ */
+struct LegacyRoutes
+{
+    std::map<uint32_t, std::map<uint32_t, RouteTable::Interface>> nbr2if;
+    std::map<uint32_t, std::map<uint32_t, std::vector<uint32_t>>> nextHop;
+    std::map<uint32_t, std::map<uint32_t, uint64_t>> pairDelay, pairTxDelay, pairBw, pairBdp, pairRtt;
+    uint64_t maxRtt = 0, maxBdp = 0;
+
+    void CalculateRoute(uint32_t host, const std::vector<bool>& isSwitch)
+    {
+        std::vector<uint32_t> q;
+        std::map<uint32_t, int> dis;
+        std::map<uint32_t, uint64_t> delay, txDelay, bw;
+        q.push_back(host);
+        dis[host] = 0;
+        delay[host] = 0;
+        txDelay[host] = 0;
+        bw[host] = 0xfffffffffffffffflu;
+        for (int i = 0; i < (int)q.size(); i++)
+        {
+            uint32_t now = q[i];
+            int d = dis[now];
+            for (auto it = nbr2if[now].begin(); it != nbr2if[now].end(); it++)
+            {
+                if (!it->second.up)
+                    continue;
+                uint32_t next = it->first;
+                if (dis.find(next) == dis.end())
+                {
+                    dis[next] = d + 1;
+                    delay[next] = delay[now] + it->second.delay;
+                    txDelay[next] = txDelay[now] + kPayload * 1000000000lu * 8 / it->second.bw;
+                    bw[next] = std::min(bw[now], it->second.bw);
+                    if (isSwitch[next])
+                        q.push_back(next);
+                }
+                if (d + 1 == dis[next])
+                    nextHop[next][host].push_back(now);
+            }
+        }
+        for (auto it : delay)
+            pairDelay[it.first][host] = it.second;
+        for (auto it : txDelay)
+            pairTxDelay[it.first][host] = it.second;
+        for (auto it : bw)
+            pairBw[it.first][host] = it.second;
+    }
+
+    void Run(const std::vector<bool>& isSwitch, const std::vector<Link>& links)
+    {
+        for (auto& l : links)
+        {
+            nbr2if[l.a][l.b] = l.itf;
+            nbr2if[l.b][l.a] = l.itf;
+            nbr2if[l.b][l.a].idx = l.baIdx;
+        }
+        for (uint32_t i = 0; i < isSwitch.size(); i++)
+        {
+            if (!isSwitch[i])
+                CalculateRoute(i, isSwitch);
+        }
+        for (uint32_t i = 0; i < isSwitch.size(); i++)
+        {
+            if (isSwitch[i])
+                continue;
+            for (uint32_t j = i + 1; j < isSwitch.size(); j++)
+            {
+                if (isSwitch[j])
+                    continue;
+                uint64_t rtt = pairDelay[i][j] * 2 + pairTxDelay[i][j];
+                uint64_t bdp = rtt * pairBw[i][j] / 1000000000 / 8;
+                pairBdp[i][j] = pairBdp[j][i] = bdp;
+                pairRtt[i][j] = pairRtt[j][i] = rtt;
+                maxBdp = std::max(maxBdp, bdp);
+                maxRtt = std::max(maxRtt, rtt);
+            }
+        }
+    }
+};
+
+int
+main(int argc, char* argv[])
+{
+    std::vector<uint32_t> ks;
+    uint32_t legacyMaxK = 8;
+    for (int i = 1; i < argc; ++i)
+    {
+        if (strncmp(argv[i], "--legacy-max-k=", 15) == 0)
+            legacyMaxK = atoi(argv[i] + 15);
+        else
+            ks.push_back(atoi(argv[i]));
+    }
+    if (ks.empty())
+        ks = {4, 8, 16, 32};
+
+    printf("%4s %7s %6s | %10s | %8s %8s %9s %9s %8s | %8s %8s | %10s %9s\n", "k", "hosts",
+           "sw", "legacy(s)", "build(s)", "bfs(s)", "nexthop(s)", "entries", "mem(MB)", "save(s)",
+           "load(s)", "maxRtt", "maxBdp");
+    for (uint32_t k : ks)
+    {
+        std::vector<bool> isSwitch;
+        std::vector<Link> links;
+        BuildCrossDc(k, &isSwitch, &links);
+        uint32_t nHosts = 0;
+        for (bool s : isSwitch)
+            nHosts += !s;
+
+        double legacySec = -1;
+        LegacyRoutes legacy;
+        if (k <= legacyMaxK)
+        {
+            auto t0 = std::chrono::steady_clock::now();
+            legacy.Run(isSwitch, links);
+            legacySec = Seconds(t0);
+        }
+
+        auto t0 = std::chrono::steady_clock::now();
+        RouteTable routes;
+        routes.Reset(isSwitch);
+        for (auto& l : links)
+        {
+            RouteTable::Interface ba = l.itf;
+            ba.idx = l.baIdx;
+            routes.AddLink(l.a, l.b, l.itf, ba);
+        }
+        routes.Finalize();
+        double buildSec = Seconds(t0);
+
+        t0 = std::chrono::steady_clock::now();
+        routes.CalculateRoutes(kPayload);
+        double bfsSec = Seconds(t0);
+
+        // what SetRoutingEntries does: every next hop of every node towards every host
+        t0 = std::chrono::steady_clock::now();
+        uint64_t entries = 0;
+        std::vector<uint32_t> nexts;
+        for (uint32_t h : routes.GetHosts())
+        {
+            for (uint32_t v = 0; v < routes.GetNNodes(); ++v)
+            {
+                routes.GetNextHops(v, h, &nexts);
+                entries += nexts.size();
+            }
+        }
+        double walkSec = Seconds(t0);
+
+        const std::string cacheFile = "route-table-bench.cache";
+        t0 = std::chrono::steady_clock::now();
+        bool saved = routes.Save(cacheFile);
+        double saveSec = Seconds(t0);
+        RouteTable cached;
+        cached.Reset(isSwitch);
+        for (auto& l : links)
+        {
+            RouteTable::Interface ba = l.itf;
+            ba.idx = l.baIdx;
+            cached.AddLink(l.a, l.b, l.itf, ba);
+        }
+        cached.Finalize();
+        t0 = std::chrono::steady_clock::now();
+        bool loaded = saved && cached.Load(cacheFile, kPayload);
+        double loadSec = Seconds(t0);
+        remove(cacheFile.c_str());
+
+        printf("%4u %7u %6u | %10s | %8.3f %8.3f %9.3f %9lu %8.1f | %8.3f %8.3f | %10lu %9lu\n",
+               k, nHosts, (uint32_t)isSwitch.size() - nHosts,
+               legacySec < 0 ? "skipped" : std::to_string(legacySec).c_str(), buildSec, bfsSec,
+               walkSec, (unsigned long)entries, routes.GetMemoryBytes() / 1048576.0, saveSec,
+               loadSec, (unsigned long)routes.GetMaxRtt(), (unsigned long)routes.GetMaxBdp());
+        if (!loaded || cached.GetMaxBdp() != routes.GetMaxBdp())
+        {
+            printf("  route cache round trip failed\n");
+            return 1;
+        }
+        if (legacySec >= 0 &&
+            (legacy.maxRtt != routes.GetMaxRtt() || legacy.maxBdp != routes.GetMaxBdp()))
+        {
+            printf("  MISMATCH: legacy maxRtt %lu maxBdp %lu\n", (unsigned long)legacy.maxRtt,
+                   (unsigned long)legacy.maxBdp);
+            return 1;
+        }
+        fflush(stdout);
+    }
+    return 0;
+}
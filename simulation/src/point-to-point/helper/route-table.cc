@@ -0,0 +1,559 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * Copyright (c) 2024 NUS
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ */
+
+#include "route-table.h"
+
+#include "ns3/abort.h"
+#include "ns3/assert.h"
+
+#include <algorithm>
+#include <cstdio>
+#include <cstring>
+#include <sstream>
+#include <unistd.h>
+
+namespace ns3 {
+
+namespace {
+
+/// FNV-1a over the little-endian bytes of an integer
+template <typename T>
+void
+HashValue (uint64_t* h, T v)
+{
+  for (uint32_t i = 0; i < sizeof (T); ++i)
+    {
+      *h = (*h ^ ((uint64_t)v >> (8 * i) & 0xff)) * 1099511628211ull;
+    }
+}
+
+template <typename T>
+bool
+WriteArray (FILE* f, const std::vector<T>& v)
+{
+  return fwrite (v.data (), sizeof (T), v.size (), f) == v.size ();
+}
+
+template <typename T>
+bool
+ReadArray (FILE* f, std::vector<T>* v, uint64_t n)
+{
+  v->resize (n);
+  return fread (v->data (), sizeof (T), n, f) == n;
+}
+
+} // anonymous namespace
+
+const uint16_t RouteTable::UNREACHABLE;
+const uint32_t RouteTable::NO_ROUTE;
+const char RouteTable::CACHE_MAGIC[8] = {'X', 'D', 'C', 'R', 'O', 'U', 'T', '1'};
+
+RouteTable::RouteTable ()
+  : m_nSwitches (0),
+    m_payloadSize (0),
+    m_maxRtt (0),
+    m_maxBdp (0)
+{
+}
+
+void
+RouteTable::Reset (const std::vector<bool>& isSwitch)
+{
+  m_isSwitch = isSwitch;
+  m_hosts.clear ();
+  m_index.assign (isSwitch.size (), 0);
+  m_nSwitches = 0;
+  for (uint32_t v = 0; v < isSwitch.size (); ++v)
+    {
+      if (isSwitch[v])
+        {
+          m_index[v] = m_nSwitches++;
+        }
+      else
+        {
+          m_index[v] = m_hosts.size ();
+          m_hosts.push_back (v);
+        }
+    }
+  // ranks are positions in a BFS queue of switches, 0xffff marks unreachable
+  NS_ABORT_MSG_IF (m_nSwitches >= UNREACHABLE, "RouteTable supports up to 65534 switches");
+  m_linkFrom.clear ();
+  m_linkTo.clear ();
+  m_linkIf.clear ();
+  m_adjStart.assign (isSwitch.size () + 1, 0);
+  m_adjNode.clear ();
+  m_adjIf.clear ();
+  m_rank.clear ();
+  m_levelStart.clear ();
+  m_levels.clear ();
+  m_maxRtt = m_maxBdp = 0;
+}
+
+void
+RouteTable::AddLink (uint32_t a, uint32_t b, const Interface& ab, const Interface& ba)
+{
+  NS_ASSERT (a < m_isSwitch.size () && b < m_isSwitch.size ());
+  m_linkFrom.push_back (a);
+  m_linkTo.push_back (b);
+  m_linkIf.push_back (ab);
+  m_linkFrom.push_back (b);
+  m_linkTo.push_back (a);
+  m_linkIf.push_back (ba);
+}
+
+void
+RouteTable::Finalize ()
+{
+  uint32_t nNodes = m_isSwitch.size ();
+  // counting sort by source node, links keep the order they were added in
+  std::vector<uint32_t> order (m_linkFrom.size ());
+  std::vector<uint32_t> pos (nNodes + 1, 0);
+  for (uint32_t e = 0; e < m_linkFrom.size (); ++e)
+    {
+      pos[m_linkFrom[e] + 1]++;
+    }
+  for (uint32_t v = 0; v < nNodes; ++v)
+    {
+      pos[v + 1] += pos[v];
+    }
+  for (uint32_t e = 0; e < m_linkFrom.size (); ++e)
+    {
+      order[pos[m_linkFrom[e]]++] = e;
+    }
+
+  m_adjNode.clear ();
+  m_adjIf.clear ();
+  m_adjStart.assign (nNodes + 1, 0);
+  uint32_t begin = 0;
+  for (uint32_t v = 0; v < nNodes; ++v)
+    {
+      uint32_t end = pos[v];
+      std::stable_sort (order.begin () + begin, order.begin () + end,
+                        [this] (uint32_t x, uint32_t y) { return m_linkTo[x] < m_linkTo[y]; });
+      for (uint32_t i = begin; i < end; ++i)
+        {
+          uint32_t e = order[i];
+          if (m_adjNode.size () > m_adjStart[v] && m_adjNode.back () == m_linkTo[e])
+            {
+              // parallel link: the last one wins, as with the former nbr2if map
+              m_adjIf.back () = m_linkIf[e];
+              continue;
+            }
+          m_adjNode.push_back (m_linkTo[e]);
+          m_adjIf.push_back (m_linkIf[e]);
+        }
+      m_adjStart[v + 1] = m_adjNode.size ();
+      begin = end;
+    }
+  std::vector<uint32_t> ().swap (m_linkFrom);
+  std::vector<uint32_t> ().swap (m_linkTo);
+  std::vector<Interface> ().swap (m_linkIf);
+}
+
+uint32_t
+RouteTable::GetNNodes () const
+{
+  return m_isSwitch.size ();
+}
+
+bool
+RouteTable::IsSwitch (uint32_t node) const
+{
+  return m_isSwitch[node];
+}
+
+const std::vector<uint32_t>&
+RouteTable::GetHosts () const
+{
+  return m_hosts;
+}
+
+const RouteTable::Interface*
+RouteTable::GetInterface (uint32_t a, uint32_t b) const
+{
+  std::vector<uint32_t>::const_iterator first = m_adjNode.begin () + m_adjStart[a];
+  std::vector<uint32_t>::const_iterator last = m_adjNode.begin () + m_adjStart[a + 1];
+  std::vector<uint32_t>::const_iterator it = std::lower_bound (first, last, b);
+  if (it == last || *it != b)
+    {
+      return 0;
+    }
+  return &m_adjIf[it - m_adjNode.begin ()];
+}
+
+RouteTable::Interface*
+RouteTable::GetInterface (uint32_t a, uint32_t b)
+{
+  return const_cast<Interface*> (static_cast<const RouteTable*> (this)->GetInterface (a, b));
+}
+
+uint32_t
+RouteTable::GetNNeighbors (uint32_t node) const
+{
+  return m_adjStart[node + 1] - m_adjStart[node];
+}
+
+uint32_t
+RouteTable::GetNeighbor (uint32_t node, uint32_t i) const
+{
+  return m_adjNode[m_adjStart[node] + i];
+}
+
+const RouteTable::Interface&
+RouteTable::GetNeighborInterface (uint32_t node, uint32_t i) const
+{
+  return m_adjIf[m_adjStart[node] + i];
+}
+
+void
+RouteTable::CalculateRoutes (uint32_t payloadSize)
+{
+  uint32_t nNodes = m_isSwitch.size ();
+  m_payloadSize = payloadSize;
+  m_maxRtt = m_maxBdp = 0;
+  m_rank.assign ((uint64_t)m_hosts.size () * m_nSwitches, UNREACHABLE);
+  m_levelStart.assign (1, 0);
+  m_levels.clear ();
+  m_queue.reserve (m_nSwitches + 1);
+  m_visitDist.resize (nNodes);
+  m_visitDelay.resize (nNodes);
+  m_visitTxDelay.resize (nNodes);
+  m_visitBw.resize (nNodes);
+  for (uint32_t i = 0; i < m_hosts.size (); ++i)
+    {
+      CalculateRoute (i);
+    }
+}
+
+void
+RouteTable::CalculateRoute (uint32_t hostIndex)
+{
+  uint32_t host = m_hosts[hostIndex];
+  uint16_t* rank = &m_rank[(uint64_t)hostIndex * m_nSwitches];
+  std::fill (m_visitDist.begin (), m_visitDist.end (), NO_ROUTE);
+
+  m_queue.clear ();
+  m_queue.push_back (host);
+  m_levels.push_back (0);
+  m_visitDist[host] = 0;
+  m_visitDelay[host] = 0;
+  m_visitTxDelay[host] = 0;
+  m_visitBw[host] = 0xfffffffffffffffflu;
+  for (uint32_t i = 0; i < m_queue.size (); ++i)
+    {
+      uint32_t now = m_queue[i];
+      uint32_t d = m_visitDist[now];
+      for (uint32_t e = m_adjStart[now]; e < m_adjStart[now + 1]; ++e)
+        {
+          const Interface& itf = m_adjIf[e];
+          // skip down link
+          if (!itf.up)
+            {
+              continue;
+            }
+          uint32_t next = m_adjNode[e];
+          if (m_visitDist[next] != NO_ROUTE)
+            {
+              continue;
+            }
+          m_visitDist[next] = d + 1;
+          m_visitDelay[next] = m_visitDelay[now] + itf.delay;
+          m_visitTxDelay[next] = m_visitTxDelay[now] + m_payloadSize * 1000000000lu * 8 / itf.bw;
+          m_visitBw[next] = std::min (m_visitBw[now], itf.bw);
+          // only switches are expanded, packets must not go through a host
+          if (m_isSwitch[next])
+            {
+              if (d + 1 == m_levels.size () - m_levelStart.back ())
+                {
+                  m_levels.push_back (m_queue.size ());
+                }
+              rank[m_index[next]] = m_queue.size ();
+              m_queue.push_back (next);
+            }
+        }
+    }
+  m_levelStart.push_back (m_levels.size ());
+
+  // pairs with the hosts of smaller id, each pair is evaluated once
+  for (uint32_t i = 0; i < hostIndex; ++i)
+    {
+      uint32_t v = m_hosts[i];
+      if (m_visitDist[v] == NO_ROUTE)
+        {
+          continue;
+        }
+      uint64_t rtt = m_visitDelay[v] * 2 + m_visitTxDelay[v];
+      uint64_t bdp = rtt * m_visitBw[v] / 1000000000 / 8;
+      m_maxRtt = std::max (m_maxRtt, rtt);
+      m_maxBdp = std::max (m_maxBdp, bdp);
+    }
+}
+
+uint32_t
+RouteTable::GetDistance (uint32_t node, uint32_t host) const
+{
+  if (node == host)
+    {
+      return 0;
+    }
+  uint32_t hostIndex = m_index[host];
+  if (m_isSwitch[node])
+    {
+      uint16_t r = m_rank[(uint64_t)hostIndex * m_nSwitches + m_index[node]];
+      if (r == UNREACHABLE)
+        {
+          return NO_ROUTE;
+        }
+      uint32_t d = m_levelStart[hostIndex + 1] - m_levelStart[hostIndex] - 1;
+      const uint16_t* levels = &m_levels[m_levelStart[hostIndex]];
+      while (levels[d] > r)
+        {
+          d--;
+        }
+      return d;
+    }
+  // hosts are reached through their closest expanded neighbour
+  uint32_t best = NO_ROUTE;
+  for (uint32_t e = m_adjStart[node]; e < m_adjStart[node + 1]; ++e)
+    {
+      if (!m_adjIf[e].up)
+        {
+          continue;
+        }
+      uint32_t u = m_adjNode[e];
+      uint32_t d = u == host ? 0 : (m_isSwitch[u] ? GetDistance (u, host) : NO_ROUTE);
+      if (d != NO_ROUTE && d + 1 < best)
+        {
+          best = d + 1;
+        }
+    }
+  return best;
+}
+
+void
+RouteTable::GetLevel (uint32_t hostIndex, uint32_t d, uint32_t* lo, uint32_t* hi) const
+{
+  const uint16_t* levels = &m_levels[m_levelStart[hostIndex]];
+  uint32_t nLevels = m_levelStart[hostIndex + 1] - m_levelStart[hostIndex];
+  *lo = d < nLevels ? levels[d] : UNREACHABLE;
+  *hi = d + 1 < nLevels ? levels[d + 1] : UNREACHABLE;
+}
+
+bool
+RouteTable::IsNextHop (uint32_t u, uint32_t host, uint32_t lo, uint32_t hi, uint32_t* rank) const
+{
+  if (u == host)
+    {
+      *rank = 0;
+      return lo == 0;
+    }
+  if (!m_isSwitch[u])
+    {
+      return false;
+    }
+  *rank = m_rank[(uint64_t)m_index[host] * m_nSwitches + m_index[u]];
+  return *rank >= lo && *rank < hi;
+}
+
+bool
+RouteTable::IsReachable (uint32_t node, uint32_t host) const
+{
+  uint32_t d = GetDistance (node, host);
+  return d != 0 && d != NO_ROUTE;
+}
+
+void
+RouteTable::GetNextHops (uint32_t node, uint32_t host, std::vector<uint32_t>* nexts) const
+{
+  nexts->clear ();
+  uint32_t dist = GetDistance (node, host);
+  if (dist == 0 || dist == NO_ROUTE)
+    {
+      return;
+    }
+  uint32_t lo, hi;
+  GetLevel (m_index[host], dist - 1, &lo, &hi);
+  // links are taken down in both directions, so the local flag is enough
+  m_hops.clear ();
+  for (uint32_t e = m_adjStart[node]; e < m_adjStart[node + 1]; ++e)
+    {
+      uint32_t rank;
+      if (m_adjIf[e].up && IsNextHop (m_adjNode[e], host, lo, hi, &rank))
+        {
+          m_hops.push_back (std::make_pair (rank, m_adjNode[e]));
+        }
+    }
+  // the BFS of host appended the next hops in the order it expanded them
+  std::sort (m_hops.begin (), m_hops.end ());
+  for (uint32_t i = 0; i < m_hops.size (); ++i)
+    {
+      nexts->push_back (m_hops[i].second);
+    }
+}
+
+RouteTable::PathInfo
+RouteTable::GetPath (uint32_t node, uint32_t host) const
+{
+  PathInfo path;
+  uint32_t dist = GetDistance (node, host);
+  if (dist == NO_ROUTE)
+    {
+      return path;
+    }
+  path.bw = 0xfffffffffffffffflu;
+  // walk up the BFS tree: the parent of v is its next hop expanded first
+  uint32_t v = node;
+  while (v != host)
+    {
+      uint32_t parent = NO_ROUTE;
+      uint32_t parentRank = NO_ROUTE;
+      uint32_t lo, hi;
+      GetLevel (m_index[host], dist - 1, &lo, &hi);
+      for (uint32_t e = m_adjStart[v]; e < m_adjStart[v + 1]; ++e)
+        {
+          uint32_t rank;
+          if (m_adjIf[e].up && IsNextHop (m_adjNode[e], host, lo, hi, &rank) && rank < parentRank)
+            {
+              parent = m_adjNode[e];
+              parentRank = rank;
+            }
+        }
+      const Interface* itf = GetInterface (parent, v);
+      path.delay += itf->delay;
+      path.txDelay += m_payloadSize * 1000000000lu * 8 / itf->bw;
+      path.bw = std::min (path.bw, itf->bw);
+      v = parent;
+      dist--;
+    }
+  return path;
+}
+
+uint64_t
+RouteTable::GetRtt (uint32_t a, uint32_t b) const
+{
+  PathInfo path = GetPath (std::min (a, b), std::max (a, b));
+  return path.delay * 2 + path.txDelay;
+}
+
+uint64_t
+RouteTable::GetBdp (uint32_t a, uint32_t b) const
+{
+  PathInfo path = GetPath (std::min (a, b), std::max (a, b));
+  return (path.delay * 2 + path.txDelay) * path.bw / 1000000000 / 8;
+}
+
+uint64_t
+RouteTable::GetMaxRtt () const
+{
+  return m_maxRtt;
+}
+
+uint64_t
+RouteTable::GetMaxBdp () const
+{
+  return m_maxBdp;
+}
+
+uint64_t
+RouteTable::GetTopologyHash (uint32_t payloadSize) const
+{
+  uint64_t h = 1469598103934665603ull;
+  HashValue (&h, m_isSwitch.size ());
+  for (uint32_t v = 0; v < m_isSwitch.size (); ++v)
+    {
+      HashValue (&h, m_isSwitch[v]);
+      HashValue (&h, GetNNeighbors (v));
+      for (uint32_t e = m_adjStart[v]; e < m_adjStart[v + 1]; ++e)
+        {
+          HashValue (&h, m_adjNode[e]);
+          HashValue (&h, m_adjIf[e].idx);
+          HashValue (&h, m_adjIf[e].up);
+          HashValue (&h, m_adjIf[e].delay);
+          HashValue (&h, m_adjIf[e].bw);
+        }
+    }
+  HashValue (&h, payloadSize);
+  return h;
+}
+
+bool
+RouteTable::Save (const std::string& path) const
+{
+  if (m_levelStart.size () != m_hosts.size () + 1)
+    {
+      return false; // routes were never calculated
+    }
+  std::ostringstream tmp;
+  tmp << path << ".tmp." << getpid ();
+  FILE* f = fopen (tmp.str ().c_str (), "wb");
+  if (f == 0)
+    {
+      return false;
+    }
+  // native byte order: the cache is meant for the machine that wrote it
+  const uint64_t header[8] = {GetTopologyHash (m_payloadSize), m_isSwitch.size (), m_nSwitches,
+                              m_hosts.size (), m_payloadSize, m_maxRtt, m_maxBdp,
+                              m_levels.size ()};
+  bool ok = fwrite (CACHE_MAGIC, 1, sizeof (CACHE_MAGIC), f) == sizeof (CACHE_MAGIC)
+            && fwrite (header, sizeof (uint64_t), 8, f) == 8 && WriteArray (f, m_levelStart)
+            && WriteArray (f, m_levels) && WriteArray (f, m_rank);
+  ok = fclose (f) == 0 && ok;
+  if (ok && rename (tmp.str ().c_str (), path.c_str ()) == 0)
+    {
+      return true;
+    }
+  unlink (tmp.str ().c_str ());
+  return false;
+}
+
+bool
+RouteTable::Load (const std::string& path, uint32_t payloadSize)
+{
+  FILE* f = fopen (path.c_str (), "rb");
+  if (f == 0)
+    {
+      return false;
+    }
+  char magic[sizeof (CACHE_MAGIC)];
+  uint64_t header[8];
+  std::vector<uint32_t> levelStart;
+  std::vector<uint16_t> levels;
+  std::vector<uint16_t> rank;
+  bool ok = fread (magic, 1, sizeof (magic), f) == sizeof (magic)
+            && memcmp (magic, CACHE_MAGIC, sizeof (magic)) == 0
+            && fread (header, sizeof (uint64_t), 8, f) == 8
+            && header[0] == GetTopologyHash (payloadSize) && header[1] == m_isSwitch.size ()
+            && header[2] == m_nSwitches && header[3] == m_hosts.size ()
+            && header[4] == payloadSize && ReadArray (f, &levelStart, m_hosts.size () + 1)
+            && levelStart.back () == header[7] && ReadArray (f, &levels, header[7])
+            && ReadArray (f, &rank, (uint64_t)m_hosts.size () * m_nSwitches)
+            && fgetc (f) == EOF;
+  fclose (f);
+  if (!ok)
+    {
+      return false;
+    }
+  m_payloadSize = payloadSize;
+  m_maxRtt = header[5];
+  m_maxBdp = header[6];
+  m_levelStart.swap (levelStart);
+  m_levels.swap (levels);
+  m_rank.swap (rank);
+  return true;
+}
+
+uint64_t
+RouteTable::GetMemoryBytes () const
+{
+  return m_adjStart.size () * sizeof (uint32_t) + m_adjNode.size () * sizeof (uint32_t)
+         + m_adjIf.size () * sizeof (Interface) + m_rank.size () * sizeof (uint16_t)
+         + m_levelStart.size () * sizeof (uint32_t) + m_levels.size () * sizeof (uint16_t);
+}
+
+} // namespace ns3
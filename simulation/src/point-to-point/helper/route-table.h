@@ -0,0 +1,249 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * Copyright (c) 2024 NUS
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ */
+
+#ifndef ROUTE_TABLE_H
+#define ROUTE_TABLE_H
+
+#include <stdint.h>
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace ns3 {
+
+/**
+ * \ingroup point-to-point
+ * \brief Shortest-path (ECMP) routes of the simulated topology, indexed by node id
+ *
+ * Nodes are identified by their dense id (NodeContainer index == Node::GetId()).
+ * The adjacency is stored as CSR arrays with the neighbours of every node
+ * sorted by id, and CalculateRoutes() runs one BFS per host over the links
+ * that are up. As in the original per-host BFS, only switches are expanded,
+ * so routes never transit a host.
+ *
+ * For each (host, switch) pair only the BFS visit rank of the switch is kept
+ * (2 bytes), plus the first rank of every BFS level per host, from which the
+ * hop distance follows. Everything else is derived when needed:
+ * - the next hops of a node towards a host are its neighbours one hop
+ *   closer to the host, in BFS visit order
+ * - the delay / tx delay / bottleneck bandwidth of a pair are summed along
+ *   the BFS tree (each node's first visited next hop), in O(hops)
+ *
+ * The largest RTT and BDP over all host pairs are computed during the BFS.
+ *
+ * The BFS state can be saved to a file and loaded by later runs on the same
+ * topology (see GetTopologyHash()), which skips CalculateRoutes() entirely.
+ */
+class RouteTable
+{
+public:
+  /// One direction of a link
+  struct Interface
+  {
+    uint32_t idx;   ///< interface (device) index on the local node
+    bool up;
+    uint64_t delay; ///< propagation delay in ns
+    uint64_t bw;    ///< bit rate in bps
+
+    Interface () : idx (0), up (false), delay (0), bw (0) {}
+  };
+
+  /// Path properties from a node to a host
+  struct PathInfo
+  {
+    uint64_t delay;   ///< sum of propagation delays in ns
+    uint64_t txDelay; ///< sum of per-hop serialization delays of one packet in ns
+    uint64_t bw;      ///< bottleneck bit rate in bps
+
+    PathInfo () : delay (0), txDelay (0), bw (0) {}
+  };
+
+  RouteTable ();
+
+  /**
+   * \brief Drop the current topology and declare the nodes of a new one
+   *
+   * \param isSwitch isSwitch[id] is true for switches (GetNodeType() == 1)
+   */
+  void Reset (const std::vector<bool>& isSwitch);
+
+  /**
+   * \brief Add both directions of a link, Finalize() once all links are added
+   */
+  void AddLink (uint32_t a, uint32_t b, const Interface& ab, const Interface& ba);
+
+  /**
+   * \brief Build the adjacency arrays from the added links
+   */
+  void Finalize ();
+
+  uint32_t GetNNodes () const;
+  bool IsSwitch (uint32_t node) const;
+
+  /**
+   * \return host ids in increasing order
+   */
+  const std::vector<uint32_t>& GetHosts () const;
+
+  /**
+   * \return the interface of a towards b, or 0 if they are not adjacent
+   */
+  Interface* GetInterface (uint32_t a, uint32_t b);
+  const Interface* GetInterface (uint32_t a, uint32_t b) const;
+
+  /**
+   * \brief Neighbours of a node, sorted by id
+   */
+  uint32_t GetNNeighbors (uint32_t node) const;
+  uint32_t GetNeighbor (uint32_t node, uint32_t i) const;
+  const Interface& GetNeighborInterface (uint32_t node, uint32_t i) const;
+
+  /**
+   * \brief Run the BFS from every host over the links that are up
+   *
+   * \param payloadSize packet payload used for the per-hop tx delay
+   */
+  void CalculateRoutes (uint32_t payloadSize);
+
+  /**
+   * \return true if node has a route to host (false for node == host)
+   */
+  bool IsReachable (uint32_t node, uint32_t host) const;
+
+  /**
+   * \brief Next hops of node towards host, in BFS visit order
+   *
+   * \param nexts Output, cleared first; empty if host is unreachable
+   */
+  void GetNextHops (uint32_t node, uint32_t host, std::vector<uint32_t>* nexts) const;
+
+  /**
+   * \return delay, tx delay and bandwidth from node to host along the BFS tree
+   *         of host; all zero if unreachable
+   */
+  PathInfo GetPath (uint32_t node, uint32_t host) const;
+
+  /**
+   * \brief Base RTT (2 * delay + tx delay) of a host pair
+   *
+   * Symmetric: evaluated on the BFS tree of the host with the larger id.
+   */
+  uint64_t GetRtt (uint32_t a, uint32_t b) const;
+
+  /**
+   * \brief BDP (RTT * bottleneck bandwidth) of a host pair in bytes, symmetric as GetRtt()
+   */
+  uint64_t GetBdp (uint32_t a, uint32_t b) const;
+
+  /**
+   * \return largest RTT / BDP over all host pairs, as of the last CalculateRoutes()
+   */
+  uint64_t GetMaxRtt () const;
+  uint64_t GetMaxBdp () const;
+
+  /**
+   * \brief Hash of everything the routes depend on
+   *
+   * Covers the node types, the adjacency with interface index, delay,
+   * bandwidth and up flag of every link direction, and the payload size.
+   * Link error rates are not part of the table, so topologies that only
+   * differ in error rates share the same hash.
+   */
+  uint64_t GetTopologyHash (uint32_t payloadSize) const;
+
+  /**
+   * \brief Write the state of the last CalculateRoutes() to a file
+   *
+   * The file is written next to path and renamed into place, so concurrent
+   * runs never read a partial file.
+   *
+   * \return false if the file could not be written
+   */
+  bool Save (const std::string& path) const;
+
+  /**
+   * \brief Load the state saved by Save() instead of running CalculateRoutes()
+   *
+   * \param path Cache file
+   * \param payloadSize Payload size CalculateRoutes() would be called with
+   * \return false, leaving the routes untouched, if the file is missing,
+   *         malformed or was saved for a different topology
+   */
+  bool Load (const std::string& path, uint32_t payloadSize);
+
+  /**
+   * \return bytes held by the adjacency and the per-host BFS state
+   */
+  uint64_t GetMemoryBytes () const;
+
+private:
+  static const uint16_t UNREACHABLE = 0xffff;
+  static const uint32_t NO_ROUTE = 0xffffffff;
+  static const char CACHE_MAGIC[8]; ///< first bytes of a cache file, including the version
+
+  /**
+   * \brief BFS from one host: stores the switch ranks and levels, and
+   *        updates the max RTT / BDP with the hosts of smaller id
+   */
+  void CalculateRoute (uint32_t hostIndex);
+
+  /**
+   * \return hop distance from node to host, NO_ROUTE if unreachable
+   */
+  uint32_t GetDistance (uint32_t node, uint32_t host) const;
+
+  /**
+   * \brief Ranks [lo, hi) of the nodes expanded at distance d by the BFS of a host
+   */
+  void GetLevel (uint32_t hostIndex, uint32_t d, uint32_t* lo, uint32_t* hi) const;
+
+  /**
+   * \brief Neighbour u is a next hop towards host if it is expanded by the BFS
+   *        of host (host itself or a reached switch) one level closer
+   * \param lo, hi Rank range of that level, from GetLevel()
+   * \param rank Output, BFS visit rank of u
+   */
+  bool IsNextHop (uint32_t u, uint32_t host, uint32_t lo, uint32_t hi, uint32_t* rank) const;
+
+  std::vector<bool> m_isSwitch;
+  std::vector<uint32_t> m_hosts;
+  std::vector<uint32_t> m_index; ///< node id -> index among the hosts or among the switches
+  uint32_t m_nSwitches;
+
+  // links as added, turned into CSR arrays by Finalize()
+  std::vector<uint32_t> m_linkFrom;
+  std::vector<uint32_t> m_linkTo;
+  std::vector<Interface> m_linkIf;
+
+  std::vector<uint32_t> m_adjStart; ///< neighbours of v are [m_adjStart[v], m_adjStart[v + 1])
+  std::vector<uint32_t> m_adjNode;
+  std::vector<Interface> m_adjIf;
+
+  /// [hostIndex * m_nSwitches + switchIndex]: position in the BFS queue (the host is 0)
+  std::vector<uint16_t> m_rank;
+  /// first rank at each distance, the levels of host i are [m_levelStart[i], m_levelStart[i + 1])
+  std::vector<uint32_t> m_levelStart;
+  std::vector<uint16_t> m_levels;
+
+  uint32_t m_payloadSize;
+  uint64_t m_maxRtt;
+  uint64_t m_maxBdp;
+
+  // BFS scratch, indexed by node id
+  std::vector<uint32_t> m_queue;
+  std::vector<uint32_t> m_visitDist;
+  std::vector<uint64_t> m_visitDelay;
+  std::vector<uint64_t> m_visitTxDelay;
+  std::vector<uint64_t> m_visitBw;
+  mutable std::vector<std::pair<uint32_t, uint32_t> > m_hops; ///< (rank, node) of GetNextHops
+};
+
+} // namespace ns3
+
+#endif /* ROUTE_TABLE_H */
@@ -8,10 +8,12 @@
  */
 
 #include "fec-decoder.h"
+#include "fec-header.h"
 #include "fec-xor-engine.h"
 #include "ns3/log.h"
 #include "ns3/object.h"
 #include <algorithm>
+#include <cstring>
 
 NS_LOG_COMPONENT_DEFINE("FecDecoder");
 
@@ -34,18 +36,20 @@ FecDecoder::FecDecoder()
   : m_blockSize(64),
     m_interleavingDepth(8),
     m_recoveredCount(0),
-    m_unrecoverableCount(0)
+    m_unrecoverableCount(0),
+    m_symbolic(false)
 {
   NS_LOG_FUNCTION_NOARGS();
 }
 
-FecDecoder::FecDecoder(uint32_t blockSize, uint32_t interleavingDepth)
+FecDecoder::FecDecoder(uint32_t blockSize, uint32_t interleavingDepth, bool symbolic)
   : m_blockSize(blockSize),
     m_interleavingDepth(interleavingDepth),
     m_recoveredCount(0),
-    m_unrecoverableCount(0)
+    m_unrecoverableCount(0),
+    m_symbolic(symbolic)
 {
-  NS_LOG_FUNCTION(blockSize << interleavingDepth);
+  NS_LOG_FUNCTION(blockSize << interleavingDepth << symbolic);
 
   if (blockSize > MAX_BLOCK_SIZE)
     {
@@ -60,6 +64,25 @@ FecDecoder::FecDecoder(uint32_t blockSize, uint32_t interleavingDepth)
 FecDecoder::~FecDecoder()
 {
   NS_LOG_FUNCTION_NOARGS();
+
+  for (size_t i = 0; i < m_blocks.size(); ++i)
+    {
+      for (size_t u = 0; u < m_blocks[i].unitXor.size(); ++u)
+        {
+          BlockState::UnitXor& unit = m_blocks[i].unitXor[u];
+          if (unit.xorBuf != nullptr)
+            {
+              m_xorEngine.Release(unit.xorBuf, unit.maxLen);
+            }
+        }
+    }
+  for (size_t i = 0; i < m_repairs.size(); ++i)
+    {
+      if (m_repairs[i].inUse && m_repairs[i].payload != nullptr)
+        {
+          m_xorEngine.Release(m_repairs[i].payload, m_repairs[i].payloadLen);
+        }
+    }
 }
 
 void
@@ -109,21 +132,16 @@ FecDecoder::ReceiveDataPacket(Ptr<Packet> packet, uint32_t psn)
           uint32_t packetSize = packet->GetSize();
           if (packetSize > unit.maxLen)
             {
-              unit.maxLen = packetSize;
-              if (unit.xorBuf.size() < packetSize)
-                {
-                  unit.xorBuf.resize(packetSize, 0);
-                }
+              GrowUnitXor(unit, packetSize);
             }
-          if (packetSize > 0)
+          if (packetSize > 0 && !m_symbolic)
             {
-              std::vector<uint8_t> buf(packetSize);
-              packet->CopyData(buf.data(), packetSize);
-              for (uint32_t i = 0; i < packetSize; ++i)
-                {
-                  unit.xorBuf[i] ^= buf[i];
-                }
+              uint8_t* buf = m_xorEngine.Acquire(packetSize);
+              packet->CopyData(buf, packetSize);
+              FecXorEngine::XorBuffers(unit.xorBuf, buf, packetSize);
+              m_xorEngine.Release(buf, packetSize);
             }
+          CheckUnitRepairs(unit);
         }
 
       NS_LOG_DEBUG("Received data packet PSN=" << psn << " (block " << basePSN
@@ -201,23 +219,66 @@ FecDecoder::ReceiveRepairPacket(Ptr<Packet> repairPacket,
     }
 
   // Store repair packet info
-  RepairPacketInfo info;
+  uint32_t id;
+  if (!m_freeRepairs.empty())
+    {
+      id = m_freeRepairs.back();
+      m_freeRepairs.pop_back();
+    }
+  else
+    {
+      id = m_repairs.size();
+      m_repairs.push_back(RepairPacketInfo());
+    }
+  RepairPacketInfo& info = m_repairs[id];
   info.payloadLen = repairPacket->GetSize();
-  info.payload.resize(info.payloadLen);
-  if (info.payloadLen > 0)
+  info.payload = 0;
+  if (!m_symbolic)
     {
-      repairPacket->CopyData(info.payload.data(), info.payloadLen);
+      info.payload = m_xorEngine.Acquire(info.payloadLen);
+      if (info.payloadLen > 0)
+        {
+          repairPacket->CopyData(info.payload, info.payloadLen);
+        }
     }
   info.basePSN = basePSN;
   info.isn = isn;
-  info.recipe = recipe;
+  info.recipe.assign(recipe.begin(), recipe.end());
   info.hasFirst = hasFirst;
   info.hasLast = hasLast;
   info.lastRel = lastRel;
   info.lastLength = lastLength;
-  info.used = false;
-
-  m_repairBuffer.push_back(info);
+  info.seq = m_nextRepairSeq++;
+  info.next = NO_REPAIR;
+  info.inUse = true;
+  info.queued = false;
+  m_nRepairs++;
+
+  // Regular: every recipe PSN is in unit isn of the (aligned) block, as FecEncoder generates them;
+  // only data of that unit can then change the missing count.
+  uint32_t depth = (m_interleavingDepth == 0) ? 1 : m_interleavingDepth;
+  info.regular = (basePSN % m_blockSize == 0) && isn < depth;
+  for (size_t i = 0; i < recipe.size() && info.regular; ++i)
+    {
+      uint32_t relativePsn = recipe[i] - basePSN;
+      info.regular = recipe[i] >= basePSN && relativePsn < m_blockSize &&
+                     relativePsn < MAX_BLOCK_SIZE && relativePsn % depth == isn;
+    }
+  if (info.regular)
+    {
+      BlockState::UnitXor& unit = GetOrCreateBlockState(basePSN).unitXor[isn];
+      info.next = unit.repairs;
+      unit.repairs = id;
+      if (missingCount == 1)
+        {
+          info.queued = true;
+          m_workList.push_back(id);
+        }
+    }
+  else
+    {
+      m_irregularRepairs.push_back(id);
+    }
 
   NS_LOG_DEBUG("Stored repair packet ISN=" << isn << " for block " << basePSN
                                             << " with recipe size " << recipe.size());
@@ -232,34 +293,67 @@ FecDecoder::RecoverLostPackets()
 
   std::vector<Ptr<Packet>> recovered;
 
-  NS_LOG_DEBUG("FEC decoder attempting recovery: repairBuffer=" << m_repairBuffer.size()
-               << " packets, blockStates=" << m_blockStates.size());
+  NS_LOG_DEBUG("FEC decoder attempting recovery: repairBuffer=" << m_nRepairs
+               << " packets, blockStates=" << m_nBlocks);
+
+  // Candidates: the work list plus the irregular repairs that miss exactly one packet.
+  // Repairs without missing packets can never be used again and are recycled here.
+  std::vector<uint32_t> candidates;
+  for (size_t i = 0; i < m_workList.size(); )
+    {
+      uint32_t id = m_workList[i];
+      uint32_t missingPsn = 0;
+      if (CountMissingInRecipe(m_repairs[id].recipe, missingPsn) == 0)
+        {
+          FreeRepair(id); // swaps the last entry into i
+          continue;
+        }
+      candidates.push_back(id);
+      ++i;
+    }
+  for (size_t i = 0; i < m_irregularRepairs.size(); )
+    {
+      uint32_t id = m_irregularRepairs[i];
+      uint32_t missingPsn = 0;
+      uint32_t missingCount = CountMissingInRecipe(m_repairs[id].recipe, missingPsn);
+      if (missingCount == 0)
+        {
+          FreeRepair(id);
+          continue;
+        }
+      if (missingCount == 1)
+        {
+          candidates.push_back(id);
+        }
+      ++i;
+    }
 
-  // Try to recover using each repair packet
-  for (auto it = m_repairBuffer.begin(); it != m_repairBuffer.end(); ++it)
+  // Try in arrival order, as a scan over all buffered repairs would
+  std::sort(candidates.begin(), candidates.end(),
+            [this](uint32_t a, uint32_t b) { return m_repairs[a].seq < m_repairs[b].seq; });
+  for (size_t i = 0; i < candidates.size(); ++i)
     {
-      if (it->used)
+      uint32_t id = candidates[i];
+      if (!m_repairs[id].inUse)
         {
-          NS_LOG_DEBUG("Skipping already-used repair ISN=" << it->isn);
-          continue; // Already used this repair
+          continue;
         }
 
-      NS_LOG_DEBUG("Attempting recovery with repair ISN=" << it->isn);
-      Ptr<Packet> recoveredPacket = AttemptRecoveryWithRepair(*it);
+      NS_LOG_DEBUG("Attempting recovery with repair ISN=" << m_repairs[id].isn);
+      Ptr<Packet> recoveredPacket = AttemptRecoveryWithRepair(m_repairs[id]);
 
       if (recoveredPacket != 0)
         {
           recovered.push_back(recoveredPacket);
-          it->used = true; // Mark as used
           m_recoveredCount++;
 
-          NS_LOG_INFO("Successfully recovered packet using repair ISN=" << it->isn);
+          NS_LOG_INFO("Successfully recovered packet using repair ISN=" << m_repairs[id].isn);
 
-          // 回收已使用/冗余的 repair，避免 m_repairBuffer 长期增长导致内存膨胀。
-          m_repairBuffer.erase(
-            std::remove_if(m_repairBuffer.begin(), m_repairBuffer.end(),
-                           [](const RepairPacketInfo& info) { return info.used; }),
-            m_repairBuffer.end());
+          // 回收已使用的 repair（块完整时已随块一起回收）
+          if (m_repairs[id].inUse)
+            {
+              FreeRepair(id);
+            }
 
           // Recovery may enable more recoveries, so restart loop
           return recovered; // Return immediately to allow caller to process
@@ -268,16 +362,7 @@ FecDecoder::RecoverLostPackets()
 
   if (recovered.empty())
     {
-      NS_LOG_DEBUG("No packets recovered in this attempt (checked " << m_repairBuffer.size() << " repairs)");
-    }
-
-  // 无恢复进展时，也回收“已经无意义”的 repair（missingCount==0 会在 AttemptRecoveryWithRepair 标记 used）。
-  if (!m_repairBuffer.empty())
-    {
-      m_repairBuffer.erase(
-        std::remove_if(m_repairBuffer.begin(), m_repairBuffer.end(),
-                       [](const RepairPacketInfo& info) { return info.used; }),
-        m_repairBuffer.end());
+      NS_LOG_DEBUG("No packets recovered in this attempt (checked " << candidates.size() << " repairs)");
     }
 
   return recovered;
@@ -286,14 +371,14 @@ FecDecoder::RecoverLostPackets()
 bool
 FecDecoder::IsBlockComplete(uint32_t basePSN) const
 {
-  auto it = m_blockStates.find(basePSN);
+  const BlockState* state = FindBlockState(basePSN);
 
-  if (it == m_blockStates.end())
+  if (state == 0)
     {
       return false;
     }
 
-  return it->second.receivedCount >= m_blockSize;
+  return state->receivedCount >= m_blockSize;
 }
 
 bool
@@ -305,12 +390,12 @@ FecDecoder::HasPacket(uint32_t psn) const
     {
       return false;
     }
-  auto it = m_blockStates.find(basePSN);
-  if (it == m_blockStates.end())
+  const BlockState* state = FindBlockState(basePSN);
+  if (state == 0)
     {
       return false;
     }
-  return it->second.receivedBits[relativePsn];
+  return state->receivedBits[relativePsn];
 }
 
 void
@@ -323,27 +408,43 @@ FecDecoder::CleanupOldBlocks(uint32_t threshold)
       m_dropBeforePsn = threshold;
     }
 
-  // Remove block states before threshold
-  for (auto it = m_blockStates.begin(); it != m_blockStates.end(); )
+  // Remove repair packets for old blocks
+  for (size_t i = 0; i < m_irregularRepairs.size(); )
+    {
+      uint32_t id = m_irregularRepairs[i];
+      if (m_repairs[id].basePSN < threshold)
+        {
+          FreeRepair(id); // swaps the last entry into i
+          continue;
+        }
+      ++i;
+    }
+
+  // Remove block states before threshold, with their regular repairs
+  for (size_t i = 0; i < m_blocks.size(); ++i)
     {
-      if (it->first < threshold)
+      BlockState& state = m_blocks[i];
+      if (!state.inUse || state.basePSN >= threshold)
         {
-          it = m_blockStates.erase(it);
+          continue;
         }
-      else
+      for (size_t u = 0; u < state.unitXor.size(); ++u)
         {
-          ++it;
+          BlockState::UnitXor& unit = state.unitXor[u];
+          while (unit.repairs != NO_REPAIR)
+            {
+              FreeRepair(unit.repairs);
+            }
+          if (unit.xorBuf != nullptr)
+            {
+              m_xorEngine.Release(unit.xorBuf, unit.maxLen);
+            }
+          unit = BlockState::UnitXor();
         }
+      state.inUse = false;
+      m_nBlocks--;
     }
 
-  // Remove repair packets for old blocks
-  m_repairBuffer.erase(
-    std::remove_if(m_repairBuffer.begin(), m_repairBuffer.end(),
-                   [threshold](const RepairPacketInfo& info) {
-                     return info.basePSN < threshold;
-                   }),
-    m_repairBuffer.end());
-
   NS_LOG_DEBUG("Cleaned up blocks before PSN " << threshold);
 }
 
@@ -362,19 +463,26 @@ FecDecoder::GetUnrecoverableCount() const
 bool
 FecDecoder::IsIdle() const
 {
-  return m_blockStates.empty() && m_repairBuffer.empty();
+  return m_nBlocks == 0 && m_nRepairs == 0;
 }
 
 size_t
 FecDecoder::GetApproxXorBytes() const
 {
   size_t total = 0;
-  for (const auto& kv : m_blockStates)
+  if (m_symbolic)
+    {
+      return total;
+    }
+  for (const auto& s : m_blocks)
     {
-      const BlockState& s = kv.second;
+      if (!s.inUse)
+        {
+          continue;
+        }
       for (const auto& u : s.unitXor)
         {
-          total += u.xorBuf.size();
+          total += u.maxLen;
         }
     }
   return total;
@@ -390,22 +498,23 @@ FecDecoder::AttemptRecoveryWithRepair(RepairPacketInfo& repairInfo)
   uint32_t missingCount = CountMissingInRecipe(repairInfo.recipe, missingPsn);
 
   // Log recipe analysis
-  std::stringstream recipeStr;
-  recipeStr << "[";
-  for (size_t i = 0; i < repairInfo.recipe.size(); i++) {
-      if (i > 0) recipeStr << ",";
-      recipeStr << repairInfo.recipe[i];
-  }
-  recipeStr << "]";
-  
-  NS_LOG_DEBUG("Analyzing repair ISN=" << repairInfo.isn << " recipe=" << recipeStr.str() 
-               << " missingCount=" << missingCount);
+  if (g_log.IsEnabled(LOG_DEBUG))
+    {
+      std::stringstream recipeStr;
+      recipeStr << "[";
+      for (size_t i = 0; i < repairInfo.recipe.size(); i++) {
+          if (i > 0) recipeStr << ",";
+          recipeStr << repairInfo.recipe[i];
+      }
+      recipeStr << "]";
+
+      NS_LOG_DEBUG("Analyzing repair ISN=" << repairInfo.isn << " recipe=" << recipeStr.str()
+                   << " missingCount=" << missingCount);
+    }
 
   if (missingCount == 0)
     {
       NS_LOG_DEBUG("Repair ISN=" << repairInfo.isn << " - all packets already received, no recovery needed");
-      // 该 repair 再也不会用于恢复，标记为 used 以便回收。
-      repairInfo.used = true;
       return 0;
     }
 
@@ -420,16 +529,30 @@ FecDecoder::AttemptRecoveryWithRepair(RepairPacketInfo& repairInfo)
   NS_LOG_INFO("FEC decoder attempting recovery of PSN=" << missingPsn << " using repair ISN="
                                               << repairInfo.isn);
 
-  BlockState& state = GetOrCreateBlockState(repairInfo.basePSN);
-
+  // Block states only exist for aligned bases. An irregular repair may claim an unaligned
+  // basePSN (e.g. across an (r,c) switch) or miss a PSN outside its block: recover into the
+  // block holding the missing PSN, where HasPacket() looks for it, with the unit of that PSN.
   uint32_t basePSN = repairInfo.basePSN;
+  bool ownBlock = basePSN % m_blockSize == 0 && missingPsn - basePSN < m_blockSize;
+  if (!ownBlock)
+    {
+      basePSN = (missingPsn / m_blockSize) * m_blockSize;
+      if (!CoversUnit(repairInfo.recipe, basePSN, missingPsn))
+        {
+          NS_LOG_DEBUG("Repair ISN=" << repairInfo.isn << " bPSN=" << repairInfo.basePSN
+                                      << " - recipe is not the unit of PSN=" << missingPsn);
+          return 0;
+        }
+    }
+  BlockState& state = GetOrCreateBlockState(basePSN);
+
   uint32_t relativePsn = missingPsn - basePSN;
   uint32_t unitIdx = repairInfo.isn;
   if (m_interleavingDepth == 0)
     {
       unitIdx = 0;
     }
-  else if (unitIdx >= state.unitXor.size())
+  else if (unitIdx >= state.unitXor.size() || !ownBlock)
     {
       unitIdx = relativePsn % m_interleavingDepth;
     }
@@ -445,28 +568,36 @@ FecDecoder::AttemptRecoveryWithRepair(RepairPacketInfo& repairInfo)
       return 0;
     }
 
-  std::vector<uint8_t> recoveredBytes(recLen, 0);
-  for (uint32_t i = 0; i < repairInfo.payloadLen && i < recLen; ++i)
+  uint8_t* recoveredBytes = 0;
+  Ptr<Packet> recoveredPacket;
+  if (m_symbolic)
     {
-      recoveredBytes[i] = repairInfo.payload[i];
+      recoveredPacket = CreateSymbolicPacket(repairInfo.basePSN, missingPsn, recLen);
     }
-  for (uint32_t i = 0; i < unit.xorBuf.size() && i < recLen; ++i)
+  else
     {
-      recoveredBytes[i] ^= unit.xorBuf[i];
+      recoveredBytes = m_xorEngine.Acquire(recLen);
+      uint32_t payloadLen = std::min<uint32_t>(repairInfo.payloadLen, recLen);
+      std::memcpy(recoveredBytes, repairInfo.payload, payloadLen);
+      std::memset(recoveredBytes + payloadLen, 0, recLen - payloadLen);
+      FecXorEngine::XorBuffers(recoveredBytes, unit.xorBuf, std::min(unit.maxLen, recLen));
+      recoveredPacket = Create<Packet>(recoveredBytes, recLen);
     }
 
-  Ptr<Packet> recoveredPacket = Create<Packet>(recoveredBytes.data(), recLen);
-
   if (recoveredPacket == 0)
     {
       NS_LOG_ERROR("XOR recovery failed for PSN=" << missingPsn);
+      if (recoveredBytes != 0)
+        {
+          m_xorEngine.Release(recoveredBytes, recLen);
+        }
       return 0;
     }
 
   // Edge trimming: 若丢失的是消息尾包且尾包长度小于修复得到的 maxLen，则裁剪到准确长度
   if (repairInfo.hasLast)
     {
-      uint32_t rel = missingPsn - basePSN;
+      uint32_t rel = missingPsn - repairInfo.basePSN;
       if (rel == repairInfo.lastRel)
         {
           uint32_t cur = recoveredPacket->GetSize();
@@ -486,6 +617,10 @@ FecDecoder::AttemptRecoveryWithRepair(RepairPacketInfo& repairInfo)
                 << " exceeds MAX_BLOCK_SIZE " << MAX_BLOCK_SIZE
                 << " (missingPsn=" << missingPsn << ", basePSN=" << basePSN
                 << ", blockSize=" << m_blockSize << ")" << std::endl;
+      if (recoveredBytes != 0)
+        {
+          m_xorEngine.Release(recoveredBytes, recLen);
+        }
       return recoveredPacket;
     }
 
@@ -496,17 +631,18 @@ FecDecoder::AttemptRecoveryWithRepair(RepairPacketInfo& repairInfo)
   uint32_t actualLen = recoveredPacket->GetSize();
   if (actualLen > unit.maxLen)
     {
-      unit.maxLen = actualLen;
-      if (unit.xorBuf.size() < actualLen)
-        {
-          unit.xorBuf.resize(actualLen, 0);
-        }
+      GrowUnitXor(unit, actualLen);
     }
-  for (uint32_t i = 0; i < actualLen && i < recoveredBytes.size(); ++i)
+  if (recoveredBytes != 0)
     {
-      unit.xorBuf[i] ^= recoveredBytes[i];
+      FecXorEngine::XorBuffers(unit.xorBuf, recoveredBytes, std::min(actualLen, recLen));
+      m_xorEngine.Release(recoveredBytes, recLen);
     }
 
+  // Other repairs of the recovered packet's unit may now miss one packet fewer
+  uint32_t depth = (m_interleavingDepth == 0) ? 1 : m_interleavingDepth;
+  CheckUnitRepairs(state.unitXor[relativePsn % depth]);
+
   NS_LOG_INFO("Successfully recovered PSN=" << missingPsn << " (block " << basePSN
                                              << " now " << state.receivedCount << "/"
                                              << m_blockSize << ")");
@@ -524,7 +660,6 @@ FecDecoder::CountMissingInRecipe(const std::vector<uint32_t>& recipe,
                                  uint32_t& missingPsn) const
 {
   uint32_t missingCount = 0;
-  std::vector<uint32_t> missingPsns;
 
   for (uint32_t psn : recipe)
     {
@@ -532,17 +667,19 @@ FecDecoder::CountMissingInRecipe(const std::vector<uint32_t>& recipe,
         {
           missingCount++;
           missingPsn = psn;
-          missingPsns.push_back(psn);
         }
     }
 
   // Log missing packet analysis
-  if (missingCount > 0) {
+  if (missingCount > 0 && g_log.IsEnabled(LOG_DEBUG)) {
       std::stringstream missingStr;
       missingStr << "[";
-      for (size_t i = 0; i < missingPsns.size(); i++) {
-          if (i > 0) missingStr << ",";
-          missingStr << missingPsns[i];
+      bool first = true;
+      for (uint32_t psn : recipe) {
+          if (HasPacket(psn)) continue;
+          if (!first) missingStr << ",";
+          missingStr << psn;
+          first = false;
       }
       missingStr << "]";
       NS_LOG_DEBUG("Recipe analysis: " << missingCount << " missing PSNs=" << missingStr.str());
@@ -551,28 +688,226 @@ FecDecoder::CountMissingInRecipe(const std::vector<uint32_t>& recipe,
   return missingCount;
 }
 
+bool
+FecDecoder::CoversUnit(const std::vector<uint32_t>& recipe, uint32_t basePSN, uint32_t missingPsn) const
+{
+  uint32_t depth = (m_interleavingDepth == 0) ? 1 : m_interleavingDepth;
+  uint32_t unitIdx = (missingPsn - basePSN) % depth;
+  for (uint32_t psn : recipe)
+    {
+      uint32_t rel = psn - basePSN;
+      if (psn < basePSN || rel >= m_blockSize || rel % depth != unitIdx)
+        {
+          return false;
+        }
+    }
+  // repair XOR unit XOR is the missing packet only if the unit received nothing else
+  const BlockState* state = FindBlockState(basePSN);
+  uint32_t received = 0;
+  for (uint32_t rel = unitIdx; state != 0 && rel < m_blockSize && rel < MAX_BLOCK_SIZE; rel += depth)
+    {
+      received += state->receivedBits[rel];
+    }
+  return received + 1 == recipe.size();
+}
+
+FecDecoder::BlockState*
+FecDecoder::FindBlockState(uint32_t basePSN)
+{
+  return const_cast<BlockState*>(static_cast<const FecDecoder*>(this)->FindBlockState(basePSN));
+}
+
+const FecDecoder::BlockState*
+FecDecoder::FindBlockState(uint32_t basePSN) const
+{
+  if (m_blocks.empty())
+    {
+      return 0;
+    }
+  const BlockState& state = m_blocks[(basePSN / m_blockSize) % m_blocks.size()];
+  if (!state.inUse || state.basePSN != basePSN)
+    {
+      return 0;
+    }
+  return &state;
+}
+
 FecDecoder::BlockState&
 FecDecoder::GetOrCreateBlockState(uint32_t basePSN)
 {
-  auto it = m_blockStates.find(basePSN);
+  NS_ASSERT_MSG(basePSN % m_blockSize == 0, "Block state for unaligned bPSN " << basePSN);
+  BlockState* found = FindBlockState(basePSN);
 
-  if (it != m_blockStates.end())
+  if (found != 0)
     {
-      return it->second;
+      return *found;
     }
 
-  // Create new block state
-  BlockState newState;
-  newState.basePSN = basePSN;
-  newState.receivedBits.reset();
-  newState.receivedCount = 0;
-  newState.unitXor.resize(m_interleavingDepth == 0 ? 1 : m_interleavingDepth);
+  if (m_blocks.empty())
+    {
+      m_blocks.resize(8);
+    }
+
+  uint32_t index = basePSN / m_blockSize;
+  if (m_blocks[index % m_blocks.size()].inUse)
+    {
+      // Slot taken by another live block: double the ring until every block has its own slot
+      size_t size = m_blocks.size();
+      bool fits = false;
+      while (!fits)
+        {
+          size *= 2;
+          std::vector<bool> taken(size, false);
+          taken[index % size] = true;
+          fits = true;
+          for (size_t i = 0; i < m_blocks.size() && fits; ++i)
+            {
+              if (m_blocks[i].inUse)
+                {
+                  size_t slot = (m_blocks[i].basePSN / m_blockSize) % size;
+                  fits = !taken[slot];
+                  taken[slot] = true;
+                }
+            }
+        }
+      std::vector<BlockState> ring(size);
+      for (size_t i = 0; i < m_blocks.size(); ++i)
+        {
+          if (m_blocks[i].inUse)
+            {
+              std::swap(ring[(m_blocks[i].basePSN / m_blockSize) % size], m_blocks[i]);
+            }
+        }
+      m_blocks.swap(ring);
+      NS_LOG_DEBUG("Block state ring grown to " << size << " slots");
+    }
 
-  m_blockStates[basePSN] = newState;
+  // Create new block state (units of a recycled slot are already reset)
+  BlockState& state = m_blocks[index % m_blocks.size()];
+  state.basePSN = basePSN;
+  state.inUse = true;
+  state.receivedBits.reset();
+  state.receivedCount = 0;
+  state.unitXor.resize(m_interleavingDepth == 0 ? 1 : m_interleavingDepth);
+  m_nBlocks++;
 
   NS_LOG_DEBUG("Created new block state for bPSN=" << basePSN);
 
-  return m_blockStates[basePSN];
+  return state;
+}
+
+Ptr<Packet>
+FecDecoder::CreateSymbolicPacket(uint32_t basePSN, uint32_t psn, uint32_t len) const
+{
+  // What the XOR yields for [FecHeader][zero payload] data packets: the data
+  // header of the missing packet followed by zeros up to the unit's max length
+  FecHeader fecHdr;
+  fecHdr.SetType(FecHeader::FEC_DATA);
+  fecHdr.SetBlockSize(m_blockSize);
+  fecHdr.SetInterleavingDepth(m_interleavingDepth);
+  fecHdr.SetBasePSN(basePSN);
+  fecHdr.SetPSN(psn);
+  if (len < fecHdr.GetSerializedSize())
+    {
+      return Create<Packet>(len);
+    }
+  Ptr<Packet> packet = Create<Packet>(len - fecHdr.GetSerializedSize());
+  packet->AddHeader(fecHdr);
+  return packet;
+}
+
+void
+FecDecoder::GrowUnitXor(BlockState::UnitXor& unit, uint32_t len)
+{
+  if (m_symbolic)
+    {
+      unit.maxLen = len;
+      return;
+    }
+  uint8_t* xorBuf = m_xorEngine.Acquire(len);
+  if (unit.xorBuf != nullptr)
+    {
+      std::memcpy(xorBuf, unit.xorBuf, unit.maxLen);
+      m_xorEngine.Release(unit.xorBuf, unit.maxLen);
+    }
+  std::memset(xorBuf + unit.maxLen, 0, len - unit.maxLen);
+  unit.xorBuf = xorBuf;
+  unit.maxLen = len;
+}
+
+void
+FecDecoder::CheckUnitRepairs(BlockState::UnitXor& unit)
+{
+  uint32_t id = unit.repairs;
+  while (id != NO_REPAIR)
+    {
+      RepairPacketInfo& info = m_repairs[id];
+      uint32_t next = info.next;
+      uint32_t missingPsn = 0;
+      uint32_t missingCount = CountMissingInRecipe(info.recipe, missingPsn);
+      if (missingCount == 0)
+        {
+          // 该 repair 再也不会用于恢复，直接回收。
+          FreeRepair(id);
+        }
+      else if (missingCount == 1 && !info.queued)
+        {
+          info.queued = true;
+          m_workList.push_back(id);
+        }
+      id = next;
+    }
+}
+
+void
+FecDecoder::FreeRepair(uint32_t id)
+{
+  RepairPacketInfo& info = m_repairs[id];
+  if (info.regular)
+    {
+      BlockState* state = FindBlockState(info.basePSN);
+      if (state != 0)
+        {
+          uint32_t* link = &state->unitXor[info.isn].repairs;
+          while (*link != NO_REPAIR && *link != id)
+            {
+              link = &m_repairs[*link].next;
+            }
+          if (*link == id)
+            {
+              *link = info.next;
+            }
+        }
+    }
+  else
+    {
+      std::vector<uint32_t>::iterator it =
+          std::find(m_irregularRepairs.begin(), m_irregularRepairs.end(), id);
+      if (it != m_irregularRepairs.end())
+        {
+          *it = m_irregularRepairs.back();
+          m_irregularRepairs.pop_back();
+        }
+    }
+  if (info.queued)
+    {
+      std::vector<uint32_t>::iterator it = std::find(m_workList.begin(), m_workList.end(), id);
+      if (it != m_workList.end())
+        {
+          *it = m_workList.back();
+          m_workList.pop_back();
+        }
+    }
+  if (info.payload != 0)
+    {
+      m_xorEngine.Release(info.payload, info.payloadLen);
+    }
+  info.payload = 0;
+  info.next = NO_REPAIR;
+  info.inUse = false;
+  info.queued = false;
+  m_freeRepairs.push_back(id);
+  m_nRepairs--;
 }
 
 } // namespace ns3
@@ -11,12 +11,12 @@
 #define FEC_DECODER_H
 
 #include <vector>
-#include <map>
 #include <bitset>
 #include <cstdint>
 #include "ns3/object.h"
 #include "ns3/packet.h"
 #include "ns3/ptr.h"
+#include "fec-xor-engine.h"
 
 namespace ns3 {
 
@@ -25,9 +25,10 @@ namespace ns3 {
  * \brief LoWAR FEC decoder with reordering buffer and recovery
  *
  * This class implements the LoWAR FEC decoding algorithm. It maintains:
- * - Reordering buffer for received data packets
- * - Bitmap tracking received/missing packets
- * - Repair packet buffer for recovery attempts
+ * - Bitmap tracking received/missing packets and per-unit XOR of the
+ *   received packets, in a ring of block states indexed by PSN
+ * - Repair packet buffer for recovery attempts, indexed by (bPSN, ISN)
+ * - Work list of the repairs that miss exactly one packet
  *
  * Recovery algorithm:
  * 1. Track received data packets via bitmap
@@ -36,6 +37,15 @@ namespace ns3 {
  *    - XOR all received packets in recipe with repair packet
  *    - Result is the missing packet
  * 4. Iteratively attempt recovery as new packets/repairs arrive
+ *
+ * A data packet only re-checks the repairs of its own (block, unit), so the
+ * work per packet does not grow with the number of buffered repairs.
+ *
+ * In symbolic mode no payload is copied or XORed: units only track their
+ * max length, and a recovered packet is rebuilt as the data FecHeader of the
+ * missing PSN followed by zeros. Recovery decisions and packet lengths are
+ * the same as with the XOR, whose result is that very packet when the data
+ * payloads are all zero, as in the simulated RDMA traffic.
  */
 
 class FecDecoder : public Object
@@ -61,8 +71,9 @@ public:
    * \brief Constructor
    * \param blockSize Number of packets per coding block (r parameter)
    * \param interleavingDepth Number of interleaving layers (c parameter)
+   * \param symbolic Track recipes, lengths and bitmaps only, without XORing payloads
    */
-  FecDecoder(uint32_t blockSize, uint32_t interleavingDepth);
+  FecDecoder(uint32_t blockSize, uint32_t interleavingDepth, bool symbolic = false);
 
   /**
    * \brief Destructor
@@ -159,17 +170,32 @@ public:
   bool IsIdle() const;
 
   // 轻量观测接口：用于大规模实验定位内存增长来源（不会返回或持有数据包对象）。
-  size_t GetBlockStateCount() const { return m_blockStates.size(); }
-  size_t GetRepairBufferCount() const { return m_repairBuffer.size(); }
+  // GetBlockStateCount 为存活块数；块状态环的槽位只增不减，其占用看 GetBlockSlotCount
+  size_t GetBlockStateCount() const { return m_nBlocks; }
+  size_t GetBlockSlotCount() const { return m_blocks.size(); }
+  size_t GetRepairBufferCount() const { return m_nRepairs; }
   size_t GetApproxXorBytes() const;
 
+  /**
+   * \brief Whether payloads are XORed or only tracked symbolically
+   */
+  bool IsSymbolic() const { return m_symbolic; }
+
 private:
+  static const uint32_t NO_REPAIR = 0xffffffff;
+
   /**
    * \brief Repair packet information
+   *
+   * Stored in the m_repairs slab. A regular repair (every recipe PSN is in
+   * unit isn of block basePSN, as produced by FecEncoder) is linked into the
+   * repair list of that unit, so that data arriving for the unit only
+   * re-checks the repairs it can affect. Other repairs are kept in
+   * m_irregularRepairs and re-checked on every recovery attempt.
    */
   struct RepairPacketInfo
   {
-    std::vector<uint8_t> payload; ///< Repair payload bytes (without FEC header)
+    uint8_t* payload;             ///< Repair payload bytes (without FEC header), pooled; 0 in symbolic mode
     uint32_t payloadLen;          ///< Payload length in bytes
     uint32_t basePSN;             ///< Base PSN of coding block
     uint16_t isn;                 ///< Interleaving sequence number
@@ -178,21 +204,27 @@ private:
     bool hasLast;                 ///< Whether this block contains message last packet
     uint16_t lastRel;             ///< Relative index of message last packet within block
     uint16_t lastLength;          ///< Byte length of message last packet ([FecHeader][Payload])
-    bool used;                    ///< Whether this repair was used for recovery
+    uint64_t seq;                 ///< Arrival order, recoveries are attempted in this order
+    uint32_t next;                ///< Next repair of the same unit, NO_REPAIR at the end
+    bool inUse;                   ///< Slab slot holds a buffered repair
+    bool regular;                 ///< Linked into its unit's repair list
+    bool queued;                  ///< On m_workList
   };
 
   /**
-   * \brief Coding block state
+   * \brief Coding block state, one slot of the m_blocks ring
    */
   struct BlockState
   {
     uint32_t basePSN;                          ///< Base PSN of this block
+    bool inUse;                                ///< Slot holds a live block
     std::bitset<MAX_BLOCK_SIZE> receivedBits;  ///< Bitmap of received packets
     uint32_t receivedCount;                    ///< Number of received packets
     struct UnitXor
     {
-      std::vector<uint8_t> xorBuf;
+      uint8_t* xorBuf{nullptr};                ///< maxLen bytes, pooled; unused in symbolic mode
       uint32_t maxLen{0};
+      uint32_t repairs{NO_REPAIR};             ///< Head of the regular repairs of this unit
     };
     std::vector<UnitXor> unitXor;              ///< size = m_interleavingDepth
   };
@@ -215,33 +247,81 @@ private:
   uint32_t CountMissingInRecipe(const std::vector<uint32_t>& recipe,
                                 uint32_t& missingPsn) const;
 
+  /**
+   * \brief Whether recipe is the unit of missingPsn in block basePSN, i.e. the
+   *        missing packet plus every packet received in that unit
+   *
+   * Only then does XORing the repair with the unit XOR give the missing packet.
+   * Duplicate PSNs in the recipe are not expected.
+   */
+  bool CoversUnit(const std::vector<uint32_t>& recipe, uint32_t basePSN, uint32_t missingPsn) const;
+
   /**
    * \brief Get block state for a given base PSN
    *
-   * Creates new state if doesn't exist.
+   * Creates new state if doesn't exist. May grow the ring, which invalidates
+   * references to other block states.
    *
-   * \param basePSN Base PSN of the block
+   * \param basePSN Base PSN of the block, a multiple of the block size
    * \return Reference to block state
    */
   BlockState& GetOrCreateBlockState(uint32_t basePSN);
 
+  /**
+   * \return block state for a given base PSN, or 0 if there is none
+   */
+  BlockState* FindBlockState(uint32_t basePSN);
+  const BlockState* FindBlockState(uint32_t basePSN) const;
+
+  /**
+   * \brief Symbolic recovery result: data FecHeader of psn, zero-padded to len bytes
+   */
+  Ptr<Packet> CreateSymbolicPacket(uint32_t basePSN, uint32_t psn, uint32_t len) const;
+
+  /**
+   * \brief Grow XOR buffer of a unit to len bytes, zero-filling the new bytes
+   */
+  void GrowUnitXor(BlockState::UnitXor& unit, uint32_t len);
+
+  /**
+   * \brief Re-check the regular repairs of a unit after one of its packets
+   *        arrived: drop the complete ones, queue those missing one packet
+   */
+  void CheckUnitRepairs(BlockState::UnitXor& unit);
+
+  /**
+   * \brief Unlink a repair from its unit list / the irregular list and the
+   *        work list, and return its slot and payload to the pools
+   */
+  void FreeRepair(uint32_t id);
+
   uint32_t m_blockSize;             ///< r: Coding block size
   uint32_t m_interleavingDepth;     ///< c: Number of interleaving layers
   // 丢弃 PSN 小于该阈值的 data/repair（用于在清理旧块后忽略迟到的 repair，避免旧块状态被重新创建）
   uint32_t m_dropBeforePsn{0};
 
   /**
-   * \brief Block state tracking: bPSN → BlockState
+   * \brief Block states, block basePSN lives in slot (basePSN / r) % size;
+   *        the ring doubles when two live blocks collide
    */
-  std::map<uint32_t, BlockState> m_blockStates;
+  std::vector<BlockState> m_blocks;
+  uint32_t m_nBlocks{0};
 
   /**
-   * \brief Repair packet buffer
+   * \brief Repair packet buffer (slab, free slots in m_freeRepairs)
    */
-  std::vector<RepairPacketInfo> m_repairBuffer;
+  std::vector<RepairPacketInfo> m_repairs;
+  std::vector<uint32_t> m_freeRepairs;
+  std::vector<uint32_t> m_irregularRepairs;
+  std::vector<uint32_t> m_workList; ///< regular repairs missing exactly one packet
+  uint32_t m_nRepairs{0};
+  uint64_t m_nextRepairSeq{0};
 
   uint32_t m_recoveredCount;        ///< Total packets recovered
   uint32_t m_unrecoverableCount;    ///< Total unrecoverable packets
+  bool m_symbolic;                  ///< Symbolic mode: no payload XOR
+
+  FecXorEngine m_xorEngine;         ///< pool of the unit XOR, repair payload and recovery buffers
 };
 
 } // namespace ns3
@@ -40,7 +40,8 @@ FecEncoder::FecEncoder()
     m_hasFirst(false),
     m_hasLast(false),
     m_lastRel(0),
-    m_lastLength(0)
+    m_lastLength(0),
+    m_symbolic(false)
 {
   NS_LOG_FUNCTION_NOARGS();
 
@@ -48,7 +49,7 @@ FecEncoder::FecEncoder()
   m_units.resize(m_interleavingDepth);
 }
 
-FecEncoder::FecEncoder(uint32_t blockSize, uint32_t interleavingDepth)
+FecEncoder::FecEncoder(uint32_t blockSize, uint32_t interleavingDepth, bool symbolic)
   : m_blockSize(blockSize),
     m_interleavingDepth(interleavingDepth),
     m_currentBlockBase(0),
@@ -56,9 +57,10 @@ FecEncoder::FecEncoder(uint32_t blockSize, uint32_t interleavingDepth)
     m_hasFirst(false),
     m_hasLast(false),
     m_lastRel(0),
-    m_lastLength(0)
+    m_lastLength(0),
+    m_symbolic(symbolic)
 {
-  NS_LOG_FUNCTION(blockSize << interleavingDepth);
+  NS_LOG_FUNCTION(blockSize << interleavingDepth << symbolic);
 
   // 边界检查：确保 blockSize 不超过上限
   if (blockSize > MAX_BLOCK_SIZE)
@@ -139,21 +141,53 @@ FecEncoder::GenerateRepairPackets(bool allowIncomplete)
 {
   NS_LOG_FUNCTION(allowIncomplete);
 
+  FecRepairBlock block;
+  CollectRepairs(allowIncomplete, false, &block);
+
   std::vector<Ptr<Packet>> repairPackets;
+  for (uint32_t i = 0; i < block.GetRepairCount(); ++i)
+    {
+      repairPackets.push_back(block.CreateRepairPacket(i));
+    }
+  return repairPackets;
+}
+
+FecRepairBlock
+FecEncoder::TakeRepairBlock(bool allowIncomplete)
+{
+  NS_LOG_FUNCTION(allowIncomplete);
+
+  FecRepairBlock block;
+  CollectRepairs(allowIncomplete, true, &block);
+  return block;
+}
 
+void
+FecEncoder::CollectRepairs(bool allowIncomplete, bool take, FecRepairBlock* block)
+{
   if (!allowIncomplete && !IsBlockComplete())
     {
       NS_LOG_WARN("GenerateRepairPackets called on incomplete block ("
                   << m_packetsInBlock << "/" << m_blockSize << ")");
-      return repairPackets;
+      return;
     }
   if (allowIncomplete && m_packetsInBlock == 0)
     {
-      return repairPackets;
+      return;
     }
 
   NS_LOG_DEBUG("Generating repair packets for block bPSN=" << m_currentBlockBase);
 
+  FecHeader& fecHdr = block->m_header;
+  fecHdr.SetType(FecHeader::FEC_REPAIR);
+  fecHdr.SetBlockSize(m_blockSize);
+  fecHdr.SetInterleavingDepth(m_interleavingDepth);
+  fecHdr.SetBasePSN(m_currentBlockBase);
+  fecHdr.SetHasFirst(m_hasFirst);
+  fecHdr.SetHasLast(m_hasLast);
+  fecHdr.SetLastRel(m_lastRel);
+  fecHdr.SetLastLength(m_lastLength);
+
   // 每个 coding unit 最多生成一个 repair 包
   for (uint32_t isn = 0; isn < m_units.size(); ++isn)
     {
@@ -165,35 +199,27 @@ FecEncoder::GenerateRepairPackets(bool allowIncomplete)
           continue;
         }
 
-      // Create repair packet from XOR buffer
-      Ptr<Packet> repairPacket = Create<Packet>(unit.xorBuffer.data(),
-                                                unit.maxPacketSize);
-
-      // Add FEC header
-      FecHeader fecHdr;
-      fecHdr.SetType(FecHeader::FEC_REPAIR);
-      fecHdr.SetBlockSize(m_blockSize);
-      fecHdr.SetInterleavingDepth(m_interleavingDepth);
-      fecHdr.SetBasePSN(m_currentBlockBase);
-      fecHdr.SetISN(isn);
-      fecHdr.SetHasFirst(m_hasFirst);
-      fecHdr.SetHasLast(m_hasLast);
-      fecHdr.SetLastRel(m_lastRel);
-      fecHdr.SetLastLength(m_lastLength);
-      fecHdr.SetRecipe(unit.recipe);
-
-      repairPacket->AddHeader(fecHdr);
-
-      repairPackets.push_back(repairPacket);
+      block->m_repairs.push_back(FecRepairBlock::Repair());
+      FecRepairBlock::Repair& repair = block->m_repairs.back();
+      repair.isn = isn;
+      repair.payloadSize = unit.maxPacketSize;
+      if (take)
+        {
+          repair.recipe.swap(unit.recipe);
+          repair.xorBuffer.swap(unit.xorBuffer);
+        }
+      else
+        {
+          repair.recipe = unit.recipe;
+          repair.xorBuffer = unit.xorBuffer;
+        }
 
       NS_LOG_DEBUG("Generated repair packet ISN=" << isn
-                                                   << " recipe_size=" << unit.recipe.size());
+                                                   << " recipe_size=" << repair.recipe.size());
     }
 
-  NS_LOG_INFO("Generated " << repairPackets.size() << " repair packets for block bPSN="
+  NS_LOG_INFO("Generated " << block->m_repairs.size() << " repair packets for block bPSN="
                            << m_currentBlockBase);
-
-  return repairPackets;
 }
 
 void
@@ -255,35 +281,72 @@ FecEncoder::AddPacketToCodingUnit(CodingUnit& unit, Ptr<Packet> packet, uint32_t
       unit.maxPacketSize = packetSize;
 
       // Resize XOR buffer if needed
-      if (unit.xorBuffer.size() < packetSize)
+      if (!m_symbolic && unit.xorBuffer.size() < packetSize)
         {
           unit.xorBuffer.resize(packetSize, 0);
         }
     }
 
-  // Copy packet data to temporary buffer
-  uint8_t* packetBuffer = new uint8_t[packetSize];
-  packet->CopyData(packetBuffer, packetSize);
-
-  // XOR packet into coding unit buffer
-  for (uint32_t i = 0; i < packetSize; ++i)
+  // XOR packet into coding unit buffer (xorBuffer already covers packetSize)
+  if (!m_symbolic)
     {
-      // Ensure buffer is large enough
-      if (i >= unit.xorBuffer.size())
-        {
-          unit.xorBuffer.push_back(packetBuffer[i]);
-        }
-      else
-        {
-          unit.xorBuffer[i] ^= packetBuffer[i];
-        }
+      uint8_t* packetBuffer = m_xorEngine.Acquire(packetSize);
+      packet->CopyData(packetBuffer, packetSize);
+      FecXorEngine::XorBuffers(unit.xorBuffer.data(), packetBuffer, packetSize);
+      m_xorEngine.Release(packetBuffer, packetSize);
     }
 
-  delete[] packetBuffer;
-
   // Add PSN to recipe
   unit.recipe.push_back(psn);
 }
 
 
+FecRepairBlock::FecRepairBlock()
+{
+}
+
+uint32_t
+FecRepairBlock::GetRepairSize(uint32_t i) const
+{
+  // m_header has no recipe yet: add its 4 bytes per PSN
+  const Repair& repair = m_repairs[i];
+  return m_header.GetSerializedSize() + 4 * repair.recipe.size() + repair.payloadSize;
+}
+
+Ptr<Packet>
+FecRepairBlock::CreateRepairPacket(uint32_t i) const
+{
+  const Repair& repair = m_repairs[i];
+
+  // Create repair packet from XOR buffer (symbolic: zero bytes of the same size)
+  Ptr<Packet> repairPacket = repair.xorBuffer.empty()
+                                 ? Create<Packet>(repair.payloadSize)
+                                 : Create<Packet>(repair.xorBuffer.data(), repair.payloadSize);
+
+  // Add FEC header
+  FecHeader fecHdr = m_header;
+  fecHdr.SetISN(repair.isn);
+  fecHdr.SetRecipe(repair.recipe);
+  repairPacket->AddHeader(fecHdr);
+
+  return repairPacket;
+}
+
+void
+FecRepairBlock::Truncate(uint32_t count)
+{
+  if (count < m_repairs.size())
+    {
+      m_repairs.resize(count);
+    }
+}
+
+void
+FecRepairBlock::Release(uint32_t i)
+{
+  Repair& repair = m_repairs[i];
+  std::vector<uint8_t>().swap(repair.xorBuffer);
+  std::vector<uint32_t>().swap(repair.recipe);
+}
+
 } // namespace ns3
@@ -14,9 +14,71 @@
 #include "ns3/object.h"
 #include "ns3/packet.h"
 #include "ns3/ptr.h"
+#include "fec-header.h"
+#include "fec-xor-engine.h"
 
 namespace ns3 {
 
+/**
+ * \ingroup point-to-point
+ * \brief Repair packets of one coding block, built on demand
+ *
+ * Holds the block's repair header fields and, per repair, its ISN, recipe
+ * and XOR payload, taken over from the encoder's coding units. Repairs can
+ * then be queued as (block, index) and only the ones actually sent are
+ * turned into packets.
+ */
+class FecRepairBlock
+{
+public:
+  FecRepairBlock();
+
+  /**
+   * \return Number of repairs in this block
+   */
+  uint32_t GetRepairCount() const { return m_repairs.size(); }
+
+  /**
+   * \param i Repair index, < GetRepairCount()
+   * \return Size of repair i as CreateRepairPacket builds it ([FecHeader][Payload])
+   */
+  uint32_t GetRepairSize(uint32_t i) const;
+
+  /**
+   * \brief Build repair packet i, with its FEC header
+   *
+   * \param i Repair index, < GetRepairCount()
+   * \return The repair packet
+   */
+  Ptr<Packet> CreateRepairPacket(uint32_t i) const;
+
+  /**
+   * \brief Keep only the first count repairs
+   */
+  void Truncate(uint32_t count);
+
+  /**
+   * \brief Free the payload and recipe of repair i, which will not be sent
+   *
+   * Repair i must not be sized or built afterwards; the other repairs are unaffected.
+   */
+  void Release(uint32_t i);
+
+private:
+  friend class FecEncoder;
+
+  struct Repair
+  {
+    uint16_t isn;                   ///< Interleaving sequence number
+    std::vector<uint32_t> recipe;   ///< PSNs XORed in this repair
+    std::vector<uint8_t> xorBuffer; ///< XOR of the recipe packets, empty in symbolic mode
+    uint32_t payloadSize;           ///< Payload size (max packet size of the unit)
+  };
+
+  FecHeader m_header;               ///< Block fields of the repair headers (no ISN / recipe)
+  std::vector<Repair> m_repairs;
+};
+
 /**
  * \ingroup point-to-point
  * \brief LoWAR FEC encoder with layered interleaving
@@ -34,6 +96,11 @@ namespace ns3 {
  * 2. When block is complete (r packets), generate c repair packets
  * 3. Each repair layer uses different interleaving index for burst tolerance
  * 4. Reset block and continue with next bPSN
+ *
+ * In symbolic mode only recipes and packet lengths are tracked: no payload
+ * is copied or XORed, and repair packets carry zero bytes of the size the
+ * XOR would have. Simulated payloads are all zero, so the receiver (a
+ * symbolic FecDecoder) recovers the same packets either way.
  */
 
 class FecEncoder : public Object
@@ -59,8 +126,9 @@ public:
    * \brief Constructor
    * \param blockSize Number of packets per coding block (r parameter)
    * \param interleavingDepth Number of interleaving layers (c parameter)
+   * \param symbolic Track recipes and lengths only, without XORing payloads
    */
-  FecEncoder(uint32_t blockSize, uint32_t interleavingDepth);
+  FecEncoder(uint32_t blockSize, uint32_t interleavingDepth, bool symbolic = false);
 
   /**
    * \brief Destructor
@@ -98,6 +166,18 @@ public:
    */
   std::vector<Ptr<Packet>> GenerateRepairPackets(bool allowIncomplete = false);
 
+  /**
+   * \brief 取出当前块的 repair（不立即构造数据包）
+   *
+   * Same repairs as GenerateRepairPackets(), but the coding units are moved
+   * into the returned block instead of being copied into packets; call
+   * ResetBlock() afterwards.
+   *
+   * \param allowIncomplete 是否允许对未满 r 的尾块生成 repair
+   * \return The block's repairs, empty if there are none
+   */
+  FecRepairBlock TakeRepairBlock(bool allowIncomplete = false);
+
   /**
    * \brief Reset encoder state for next coding block
    *
@@ -131,6 +211,11 @@ public:
    */
   void MarkHasLast(uint16_t lastRel, uint16_t lastLength);
 
+  /**
+   * \brief Whether payloads are XORed or only tracked symbolically
+   */
+  bool IsSymbolic() const { return m_symbolic; }
+
 private:
   /**
    * \brief 编码单元
@@ -139,7 +224,7 @@ private:
    */
   struct CodingUnit
   {
-    std::vector<uint8_t> xorBuffer;  ///< XOR accumulation buffer
+    std::vector<uint8_t> xorBuffer;  ///< XOR accumulation buffer (empty in symbolic mode)
     std::vector<uint32_t> recipe;     ///< PSNs of packets in this bucket
     uint32_t maxPacketSize;           ///< Maximum packet size in bucket
   };
@@ -153,6 +238,15 @@ private:
    */
   void AddPacketToCodingUnit(CodingUnit& unit, Ptr<Packet> packet, uint32_t psn);
 
+  /**
+   * \brief Fill block with the repairs of the current block
+   *
+   * \param allowIncomplete Allow a block of less than r packets
+   * \param take Move the coding units into block instead of copying them
+   * \param block Output
+   */
+  void CollectRepairs(bool allowIncomplete, bool take, FecRepairBlock* block);
+
   bool m_hasFirst;
   bool m_hasLast;
   uint16_t m_lastRel;
@@ -169,6 +263,9 @@ private:
    */
   std::vector<CodingUnit> m_units;
 
+  bool m_symbolic;                  ///< Symbolic mode: no payload XOR
+  FecXorEngine m_xorEngine;         ///< scratch buffers for AddPacketToCodingUnit
+
 };
 
 } // namespace ns3
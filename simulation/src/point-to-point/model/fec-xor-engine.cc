@@ -17,6 +17,21 @@ NS_LOG_COMPONENT_DEFINE("FecXorEngine");
 
 namespace ns3 {
 
+FecXorEngine::FecXorEngine()
+{
+}
+
+FecXorEngine::~FecXorEngine()
+{
+  for (size_t c = 0; c < m_pool.size(); ++c)
+    {
+      for (size_t i = 0; i < m_pool[c].size(); ++i)
+        {
+          delete[] m_pool[c][i];
+        }
+    }
+}
+
 Ptr<Packet>
 FecXorEngine::XorPackets(const std::vector<Ptr<Packet>>& packets)
 {
@@ -33,11 +48,12 @@ FecXorEngine::XorPackets(const std::vector<Ptr<Packet>>& packets)
 
   NS_LOG_DEBUG("XORing " << packets.size() << " packets, max size: " << maxSize);
 
-  // Create result buffer initialized to zero
-  uint8_t* resultBuffer = new uint8_t[maxSize];
-  std::memset(resultBuffer, 0, maxSize);
+  FecXorEngine& engine = GetThreadEngine();
+  uint8_t* resultBuffer = engine.Acquire(maxSize);
+  uint8_t* packetBuffer = engine.Acquire(maxSize);
 
-  // XOR all packets into result buffer
+  // The first packet is copied straight into the result, zero-padded to maxSize
+  bool first = true;
   for (std::vector<Ptr<Packet>>::const_iterator it = packets.begin();
        it != packets.end(); ++it)
     {
@@ -48,21 +64,27 @@ FecXorEngine::XorPackets(const std::vector<Ptr<Packet>>& packets)
         }
 
       uint32_t packetSize = (*it)->GetSize();
+      if (first)
+        {
+          (*it)->CopyData(resultBuffer, packetSize);
+          std::memset(resultBuffer + packetSize, 0, maxSize - packetSize);
+          first = false;
+          continue;
+        }
 
-      // Copy packet data to temporary buffer
-      uint8_t* packetBuffer = new uint8_t[packetSize];
       (*it)->CopyData(packetBuffer, packetSize);
-
-      // XOR with result buffer
       XorBuffers(resultBuffer, packetBuffer, packetSize);
-
-      delete[] packetBuffer;
+    }
+  if (first)
+    {
+      std::memset(resultBuffer, 0, maxSize);
     }
 
   // Create repair packet from result buffer
   Ptr<Packet> repairPacket = Create<Packet>(resultBuffer, maxSize);
 
-  delete[] resultBuffer;
+  engine.Release(packetBuffer, maxSize);
+  engine.Release(resultBuffer, maxSize);
 
   NS_LOG_DEBUG("Generated repair packet of size: " << repairPacket->GetSize());
 
@@ -85,7 +107,9 @@ FecXorEngine::RecoverPacket(const std::vector<Ptr<Packet>>& receivedPackets,
   uint32_t repairSize = repairPacket->GetSize();
 
   // Create result buffer from repair packet
-  uint8_t* resultBuffer = new uint8_t[repairSize];
+  FecXorEngine& engine = GetThreadEngine();
+  uint8_t* resultBuffer = engine.Acquire(repairSize);
+  uint8_t* packetBuffer = engine.Acquire(repairSize);
   repairPacket->CopyData(resultBuffer, repairSize);
 
   // XOR all received packets (except the missing one) with repair packet
@@ -103,22 +127,16 @@ FecXorEngine::RecoverPacket(const std::vector<Ptr<Packet>>& receivedPackets,
           continue;
         }
 
-      uint32_t packetSize = receivedPackets[i]->GetSize();
-
-      // Copy packet data to temporary buffer
-      uint8_t* packetBuffer = new uint8_t[packetSize];
-      receivedPackets[i]->CopyData(packetBuffer, packetSize);
-
-      // XOR with result buffer
-      XorBuffers(resultBuffer, packetBuffer, std::min(packetSize, repairSize));
-
-      delete[] packetBuffer;
+      // Bytes beyond the repair packet do not contribute to the result
+      uint32_t len = receivedPackets[i]->CopyData(packetBuffer, repairSize);
+      XorBuffers(resultBuffer, packetBuffer, len);
     }
 
   // Create recovered packet from result buffer
   Ptr<Packet> recoveredPacket = Create<Packet>(resultBuffer, repairSize);
 
-  delete[] resultBuffer;
+  engine.Release(packetBuffer, repairSize);
+  engine.Release(resultBuffer, repairSize);
 
   NS_LOG_DEBUG("Recovered packet of size: " << recoveredPacket->GetSize());
 
@@ -192,11 +210,62 @@ FecXorEngine::PadPacket(Ptr<Packet> packet, uint32_t targetSize)
 void
 FecXorEngine::XorBuffers(uint8_t* dst, const uint8_t* src, size_t len)
 {
-  // Byte-wise XOR operation
-  for (size_t i = 0; i < len; ++i)
+  // 64-bit words; memcpy keeps unaligned buffers legal and compiles to plain loads/stores
+  size_t words = len / sizeof(uint64_t);
+  for (size_t i = 0; i < words; ++i)
+    {
+      uint64_t a, b;
+      std::memcpy(&a, dst + i * sizeof(uint64_t), sizeof(uint64_t));
+      std::memcpy(&b, src + i * sizeof(uint64_t), sizeof(uint64_t));
+      a ^= b;
+      std::memcpy(dst + i * sizeof(uint64_t), &a, sizeof(uint64_t));
+    }
+  for (size_t i = words * sizeof(uint64_t); i < len; ++i)
     {
       dst[i] ^= src[i];
     }
 }
 
+uint32_t
+FecXorEngine::GetSizeClass(uint32_t size)
+{
+  uint32_t c = 0;
+  while ((static_cast<uint64_t>(64) << c) < size)
+    {
+      ++c;
+    }
+  return c;
+}
+
+FecXorEngine&
+FecXorEngine::GetThreadEngine()
+{
+  static thread_local FecXorEngine engine;
+  return engine;
+}
+
+uint8_t*
+FecXorEngine::Acquire(uint32_t size)
+{
+  uint32_t c = GetSizeClass(size);
+  if (c < m_pool.size() && !m_pool[c].empty())
+    {
+      uint64_t* buffer = m_pool[c].back();
+      m_pool[c].pop_back();
+      return reinterpret_cast<uint8_t*>(buffer);
+    }
+  return reinterpret_cast<uint8_t*>(new uint64_t[(64u << c) / sizeof(uint64_t)]);
+}
+
+void
+FecXorEngine::Release(uint8_t* buffer, uint32_t size)
+{
+  uint32_t c = GetSizeClass(size);
+  if (c >= m_pool.size())
+    {
+      m_pool.resize(c + 1);
+    }
+  m_pool[c].push_back(reinterpret_cast<uint64_t*>(buffer));
+}
+
 } // namespace ns3
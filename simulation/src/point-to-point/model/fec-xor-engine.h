@@ -21,23 +21,30 @@ namespace ns3 {
  * \brief XOR encoding/decoding engine for FEC
  *
  * This class provides the core XOR operations for Forward Error Correction.
- * It implements byte-wise XOR for generating repair packets and recovering
+ * It implements word-wide XOR for generating repair packets and recovering
  * lost packets from repair packets.
  *
  * Key operations:
  * - XorPackets: Combine multiple packets via XOR to create a repair packet
  * - RecoverPacket: Use repair packet to recover a single missing packet
- * - XorBuffers: Low-level byte-wise XOR operation
+ * - XorBuffers: Low-level XOR of two buffers, 64 bits at a time
+ *
+ * Packet bytes are XORed in scratch buffers taken from a per-engine pool of
+ * power-of-two size classes, so once the pool is warm no XOR operation
+ * allocates on the heap. The pool is not shared: use one engine per thread.
+ * The static XorPackets / RecoverPacket draw from a per-thread engine.
  */
 
 class FecXorEngine
 {
 public:
+  FecXorEngine();
+  ~FecXorEngine();
   /**
    * \brief XOR multiple packets to create a repair packet
    *
-   * This function performs byte-wise XOR of all input packets to generate
-   * a repair packet. All packets are expected to be padded to the same size
+   * This function XORs all input packets, 64 bits at a time (see
+   * XorBuffers), to generate a repair packet. All packets are expected to be padded to the same size
    * (the maximum size among them).
    *
    * \param packets Vector of packets to XOR
@@ -82,18 +89,50 @@ public:
    */
   static Ptr<Packet> PadPacket(Ptr<Packet> packet, uint32_t targetSize);
 
-private:
   /**
-   * \brief Perform byte-wise XOR on two buffers
+   * \brief Perform XOR on two buffers
    *
    * Result is stored in dst buffer.
    * Formula: dst[i] = dst[i] ⊕ src[i] for all i
    *
+   * Works on 64-bit words (the loop is auto-vectorized), the remaining
+   * len % 8 bytes byte by byte. Buffers need not be aligned.
+   *
    * \param dst Destination buffer (input/output)
    * \param src Source buffer (input only)
    * \param len Length in bytes
    */
   static void XorBuffers(uint8_t* dst, const uint8_t* src, size_t len);
+
+  /**
+   * \brief Take a scratch buffer of at least size bytes from the pool
+   *
+   * The buffer is 8-byte aligned and its content is undefined.
+   * Return it with Release() and the same size.
+   */
+  uint8_t* Acquire(uint32_t size);
+
+  /**
+   * \brief Return a buffer obtained from Acquire(size) to the pool
+   */
+  void Release(uint8_t* buffer, uint32_t size);
+
+private:
+  FecXorEngine(const FecXorEngine&);
+  FecXorEngine& operator=(const FecXorEngine&);
+
+  /**
+   * \return size class of a buffer: 64 << class bytes hold size
+   */
+  static uint32_t GetSizeClass(uint32_t size);
+
+  /**
+   * \return the engine whose pool backs XorPackets / RecoverPacket on this thread
+   */
+  static FecXorEngine& GetThreadEngine();
+
+  /// free buffers of each size class
+  std::vector<std::vector<uint64_t*>> m_pool;
 };
 
 } // namespace ns3
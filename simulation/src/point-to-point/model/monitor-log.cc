@@ -0,0 +1,715 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * Copyright (c) 2024 NUS
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ */
+
+#include "monitor-log.h"
+#include "ns3/abort.h"
+#include "ns3/assert.h"
+#include "ns3/log.h"
+#include <algorithm>
+#include <cerrno>
+#include <cstdlib>
+#include <cstring>
+#include <fcntl.h>
+#include <iostream>
+#include <sstream>
+#include <sys/uio.h>
+#include <unistd.h>
+#ifdef HAVE_ZSTD
+#include <zstd.h>
+#endif
+#ifdef HAVE_ZLIB
+#include <zlib.h>
+#endif
+
+NS_LOG_COMPONENT_DEFINE("MonitorLog");
+
+namespace ns3 {
+
+size_t MonitorLog::s_bufferBytes = MonitorLog::DEFAULT_BUFFER_BYTES;
+MonitorLog::Backpressure MonitorLog::s_backpressure = MonitorLog::BLOCK;
+MonitorLog::Compression MonitorLog::s_compression = MonitorLog::NONE;
+std::vector<MonitorLog*> MonitorLog::s_open;
+std::mutex MonitorLog::s_mutex;
+std::mutex MonitorLog::s_drainMutex;
+std::condition_variable MonitorLog::s_cv;
+std::thread MonitorLog::s_writer;
+bool MonitorLog::s_stopWriter = false;
+
+const size_t MonitorLog::DEFAULT_BUFFER_BYTES;
+const size_t MonitorLog::MIN_BUFFER_BYTES;
+const size_t MonitorLog::MAX_BUFFER_BYTES;
+const size_t MonitorLog::MIN_WRITE_BYTES;
+const uint32_t MonitorLog::MAX_DELAY_MS;
+const size_t MonitorLog::MIN_FRAME_BYTES;
+const uint32_t MonitorLog::MAX_FRAME_DELAY_MS;
+const uint32_t MonitorLog::WRITER_PERIOD_MS;
+const size_t MonitorLog::MAX_TEXT_FIELD;
+
+namespace {
+
+/**
+ * Write the decimal representation of v to out, return the number of chars
+ */
+inline size_t
+FormatUnsigned(char* out, uint64_t v)
+{
+  char tmp[20];
+  size_t n = 0;
+  do
+    {
+      tmp[n++] = static_cast<char>('0' + v % 10);
+      v /= 10;
+    }
+  while (v != 0);
+  for (size_t i = 0; i < n; ++i)
+    {
+      out[i] = tmp[n - 1 - i];
+    }
+  return n;
+}
+
+inline void
+PutLe32(char* out, uint32_t v)
+{
+  for (uint32_t b = 0; b < 4; ++b)
+    {
+      out[b] = static_cast<char>(v >> (8 * b));
+    }
+}
+
+// zstd skippable frame carrying the sizes of the following frame
+const uint32_t ZSTD_INDEX_MAGIC = 0x184D2A5E;
+const size_t ZSTD_INDEX_BYTES = 16;
+// gzip member header: 10 fixed bytes, XLEN, one 12-byte 'XD' subfield
+const size_t GZIP_HEADER_BYTES = 24;
+const size_t GZIP_TRAILER_BYTES = 8;
+// fast levels: the single writer thread serves every stream
+const int ZSTD_LEVEL = 3;
+const int GZIP_LEVEL = 1;
+
+} // anonymous namespace
+
+bool
+MonitorLog::ParseFormat(const std::string& name, Format* format)
+{
+  if (name == "text")
+    {
+      *format = TEXT;
+      return true;
+    }
+  if (name == "binary")
+    {
+      *format = BINARY;
+      return true;
+    }
+  return false;
+}
+
+bool
+MonitorLog::ParseBackpressure(const std::string& name, Backpressure* policy)
+{
+  if (name == "block")
+    {
+      *policy = BLOCK;
+      return true;
+    }
+  if (name == "drop")
+    {
+      *policy = DROP;
+      return true;
+    }
+  return false;
+}
+
+bool
+MonitorLog::ParseCompression(const std::string& name, Compression* compression)
+{
+  if (name == "none")
+    {
+      *compression = NONE;
+      return true;
+    }
+  if (name == "zstd")
+    {
+      *compression = ZSTD;
+      return true;
+    }
+  if (name == "gzip")
+    {
+      *compression = GZIP;
+      return true;
+    }
+  return false;
+}
+
+MonitorLog::Compression
+MonitorLog::SetCompression(Compression compression)
+{
+#ifndef HAVE_ZSTD
+  if (compression == ZSTD)
+    {
+      std::cerr << "MonitorLog: built without libzstd, falling back to gzip" << std::endl;
+      compression = GZIP;
+    }
+#endif
+#ifndef HAVE_ZLIB
+  if (compression == GZIP)
+    {
+      std::cerr << "MonitorLog: built without zlib, writing uncompressed logs" << std::endl;
+      compression = NONE;
+    }
+#endif
+  s_compression = compression;
+  return compression;
+}
+
+void
+MonitorLog::SetBufferBytes(size_t bytes)
+{
+  s_bufferBytes = bytes;
+}
+
+void
+MonitorLog::SetBackpressure(Backpressure policy)
+{
+  s_backpressure = policy;
+}
+
+MonitorLog::MonitorLog(const std::string& path, const std::string& stream,
+                       const std::string& fields, char delimiter, Format format)
+  : m_path(path),
+    m_stream(stream),
+    m_delimiter(delimiter),
+    m_format(format),
+    m_recordSize(0),
+    m_fd(-1),
+    m_headerWritten(false),
+    m_mask(0),
+    m_head(0),
+    m_tail(0),
+    m_flushRequested(false),
+    m_lastWrite(std::chrono::steady_clock::now()),
+    m_dropped(0),
+    m_compression(s_compression),
+    m_codec(0)
+{
+  NS_LOG_FUNCTION(this << path << stream << fields);
+
+  std::istringstream iss(fields);
+  std::string token;
+  while (iss >> token)
+    {
+      // name:<i|u><bytes>
+      size_t colon = token.rfind(':');
+      NS_ABORT_MSG_IF(colon == std::string::npos || colon + 3 != token.size(),
+                      "MonitorLog: bad field spec '" << token << "' in stream " << stream);
+      Field f;
+      f.name = token.substr(0, colon);
+      char kind = token[colon + 1];
+      f.size = static_cast<uint8_t>(token[colon + 2] - '0');
+      NS_ABORT_MSG_IF((kind != 'i' && kind != 'u') ||
+                          (f.size != 1 && f.size != 2 && f.size != 4 && f.size != 8),
+                      "MonitorLog: bad field type '" << token << "' in stream " << stream);
+      f.isSigned = (kind == 'i');
+      m_recordSize += f.size;
+      m_fields.push_back(f);
+    }
+  NS_ABORT_MSG_IF(m_fields.empty(), "MonitorLog: stream " << stream << " has no fields");
+  m_record.resize(std::max<size_t>(m_recordSize, m_fields.size() * MAX_TEXT_FIELD + 1));
+
+  if (m_compression == ZSTD)
+    {
+      m_path += ".zst";
+    }
+  else if (m_compression == GZIP)
+    {
+      m_path += ".gz";
+    }
+  m_fd = open(m_path.c_str(), O_WRONLY | O_CREAT | O_TRUNC, 0644);
+  if (m_fd < 0)
+    {
+      NS_LOG_WARN("MonitorLog: cannot open " << m_path << ": " << std::strerror(errno));
+      return;
+    }
+  size_t capacity = MIN_BUFFER_BYTES;
+  while (capacity < std::min(s_bufferBytes, MAX_BUFFER_BYTES))
+    {
+      capacity <<= 1;
+    }
+  m_ring.resize(capacity);
+  m_mask = capacity - 1;
+
+  std::lock_guard<std::mutex> lock(s_mutex);
+  if (!s_writer.joinable())
+    {
+      static bool s_atexit = false;
+      if (!s_atexit)
+        {
+          // last resort for exit() paths that skip Simulator::Destroy
+          s_atexit = true;
+          std::atexit(&MonitorLog::CloseAll);
+        }
+      s_stopWriter = false;
+      s_writer = std::thread(&MonitorLog::WriterLoop);
+    }
+  s_open.push_back(this);
+}
+
+MonitorLog::~MonitorLog()
+{
+  Close();
+}
+
+bool
+MonitorLog::IsOpen() const
+{
+  return m_fd >= 0;
+}
+
+const std::string&
+MonitorLog::GetPath() const
+{
+  return m_path;
+}
+
+uint32_t
+MonitorLog::GetNFields() const
+{
+  return static_cast<uint32_t>(m_fields.size());
+}
+
+uint32_t
+MonitorLog::GetRecordSize() const
+{
+  return m_recordSize;
+}
+
+uint64_t
+MonitorLog::GetDroppedRecords() const
+{
+  return m_dropped;
+}
+
+void
+MonitorLog::SetMeta(const std::string& key, const std::string& value)
+{
+  NS_ASSERT_MSG(!m_headerWritten, "MonitorLog: header of " << m_stream << " already written");
+  m_meta.push_back(std::make_pair(key, value));
+}
+
+void
+MonitorLog::WriteHeader()
+{
+  m_headerWritten = true;
+  std::ostringstream oss;
+  if (m_format == BINARY)
+    {
+      oss << "#XDCBIN1 stream=" << m_stream << " record_bytes=" << m_recordSize << " fields=";
+      for (size_t i = 0; i < m_fields.size(); ++i)
+        {
+          oss << (i ? "," : "") << m_fields[i].name << ":<" << (m_fields[i].isSigned ? 'i' : 'u')
+              << static_cast<uint32_t>(m_fields[i].size);
+        }
+    }
+  else if (!m_meta.empty())
+    {
+      oss << "#";
+    }
+  else
+    {
+      return;
+    }
+  for (size_t i = 0; i < m_meta.size(); ++i)
+    {
+      oss << ' ' << m_meta[i].first << '=' << m_meta[i].second;
+    }
+  std::string line = oss.str();
+  if (m_format == BINARY)
+    {
+      // records start at an 8-byte aligned offset
+      line.append((8 - (line.size() + 1) % 8) % 8, ' ');
+    }
+  line.push_back('\n');
+  Push(line.data(), line.size(), true);
+}
+
+void
+MonitorLog::Push(const char* data, size_t len, bool force)
+{
+  uint64_t capacity = m_mask + 1;
+  NS_ABORT_MSG_IF(len > capacity, "MonitorLog: record larger than the ring of " << m_stream);
+  uint64_t head = m_head.load(std::memory_order_relaxed);
+  uint64_t pending = head - m_tail.load(std::memory_order_acquire);
+  if (pending + len > capacity)
+    {
+      m_flushRequested.store(true, std::memory_order_relaxed);
+      WakeWriter();
+      if (s_backpressure == DROP && !force)
+        {
+          m_dropped++;
+          return;
+        }
+      while (pending + len > capacity)
+        {
+          std::this_thread::yield();
+          pending = head - m_tail.load(std::memory_order_acquire);
+        }
+    }
+
+  size_t pos = head & m_mask;
+  size_t first = std::min<size_t>(len, capacity - pos);
+  std::memcpy(&m_ring[pos], data, first);
+  std::memcpy(&m_ring[0], data + first, len - first);
+  m_head.store(head + len, std::memory_order_release);
+
+  // wake the writer early when a quarter of the ring fills up
+  uint64_t quarter = capacity / 4;
+  if (pending < quarter && pending + len >= quarter)
+    {
+      WakeWriter();
+    }
+}
+
+void
+MonitorLog::Append(const uint64_t* values, uint32_t n)
+{
+  NS_ASSERT_MSG(n == m_fields.size(), "MonitorLog: stream " << m_stream << " expects "
+                                                             << m_fields.size() << " fields, got " << n);
+  if (m_fd < 0)
+    {
+      return;
+    }
+  if (!m_headerWritten)
+    {
+      WriteHeader();
+    }
+
+  char* out = &m_record[0];
+  for (uint32_t i = 0; i < n; ++i)
+    {
+      const Field& f = m_fields[i];
+      uint64_t v = values[i];
+      uint32_t bits = f.size * 8;
+      if (bits < 64)
+        {
+          // truncate to the field width, sign-extending signed fields, so both formats agree
+          v &= (uint64_t(1) << bits) - 1;
+          if (f.isSigned && (v >> (bits - 1)))
+            {
+              v |= ~uint64_t(0) << bits;
+            }
+        }
+      if (m_format == BINARY)
+        {
+          for (uint32_t b = 0; b < f.size; ++b)
+            {
+              *out++ = static_cast<char>(v >> (8 * b));
+            }
+        }
+      else
+        {
+          if (i)
+            {
+              *out++ = m_delimiter;
+            }
+          if (f.isSigned && static_cast<int64_t>(v) < 0)
+            {
+              *out++ = '-';
+              v = ~v + 1;
+            }
+          out += FormatUnsigned(out, v);
+        }
+    }
+  if (m_format == TEXT)
+    {
+      *out++ = '\n';
+    }
+  Push(&m_record[0], out - &m_record[0], false);
+}
+
+void
+MonitorLog::Flush()
+{
+  m_flushRequested.store(true, std::memory_order_release);
+  WakeWriter();
+}
+
+void
+MonitorLog::Drain(bool force)
+{
+  // taken before head is read, so a request made after new records were pushed is never cleared
+  // without writing them; Flush() and a full ring set it again if this pass returns early
+  bool flushRequested = m_flushRequested.exchange(false, std::memory_order_acquire);
+  uint64_t tail = m_tail.load(std::memory_order_relaxed);
+  uint64_t head = m_head.load(std::memory_order_acquire);
+  if (head == tail)
+    {
+      return;
+    }
+  std::chrono::steady_clock::time_point now = std::chrono::steady_clock::now();
+  // compressed streams batch more per frame: small frames compress poorly
+  bool compressed = m_compression != NONE;
+  size_t batch = std::min<size_t>(compressed ? MIN_FRAME_BYTES : MIN_WRITE_BYTES, m_ring.size() / 4);
+  uint32_t maxDelayMs = compressed ? MAX_FRAME_DELAY_MS : MAX_DELAY_MS;
+  if (!force && head - tail < batch && !flushRequested &&
+      now - m_lastWrite < std::chrono::milliseconds(maxDelayMs))
+    {
+      return;
+    }
+  m_lastWrite = now;
+
+  if (compressed)
+    {
+      // records are pushed whole, so [tail, head) always ends on a record boundary
+      if (!WriteFrame(tail, head))
+        {
+          NS_LOG_WARN("MonitorLog: dropping a frame of " << (head - tail) << " bytes of " << m_path);
+        }
+      m_tail.store(head, std::memory_order_release);
+      return;
+    }
+
+  while (tail != head)
+    {
+      // the pending bytes are at most two contiguous pieces of the ring
+      size_t pos = tail & m_mask;
+      size_t len = head - tail;
+      size_t first = std::min<size_t>(len, m_ring.size() - pos);
+      struct iovec iov[2];
+      iov[0].iov_base = &m_ring[pos];
+      iov[0].iov_len = first;
+      iov[1].iov_base = &m_ring[0];
+      iov[1].iov_len = len - first;
+      ssize_t w = writev(m_fd, iov, len > first ? 2 : 1);
+      if (w < 0)
+        {
+          if (errno == EINTR)
+            {
+              continue;
+            }
+          // give up on the pending bytes rather than blocking the producer forever
+          NS_LOG_WARN("MonitorLog: write to " << m_path << " failed: " << std::strerror(errno));
+          tail = head;
+          break;
+        }
+      tail += static_cast<uint64_t>(w);
+    }
+  m_tail.store(tail, std::memory_order_release);
+}
+
+bool
+MonitorLog::WriteAll(const char* data, size_t len)
+{
+  while (len > 0)
+    {
+      ssize_t w = write(m_fd, data, len);
+      if (w < 0)
+        {
+          if (errno == EINTR)
+            {
+              continue;
+            }
+          NS_LOG_WARN("MonitorLog: write to " << m_path << " failed: " << std::strerror(errno));
+          return false;
+        }
+      data += w;
+      len -= static_cast<size_t>(w);
+    }
+  return true;
+}
+
+bool
+MonitorLog::WriteFrame(uint64_t tail, uint64_t head)
+{
+  size_t len = head - tail;
+  size_t pos = tail & m_mask;
+  size_t first = std::min<size_t>(len, m_ring.size() - pos);
+  m_frameIn.resize(len);
+  std::memcpy(&m_frameIn[0], &m_ring[pos], first);
+  std::memcpy(&m_frameIn[first], &m_ring[0], len - first);
+
+#ifdef HAVE_ZSTD
+  if (m_compression == ZSTD)
+    {
+      if (m_codec == 0)
+        {
+          m_codec = ZSTD_createCCtx();
+          ZSTD_CCtx_setParameter(static_cast<ZSTD_CCtx*>(m_codec), ZSTD_c_compressionLevel, ZSTD_LEVEL);
+        }
+      size_t bound = ZSTD_compressBound(len);
+      m_frameOut.resize(ZSTD_INDEX_BYTES + bound);
+      // ZSTD_compress2 records the content size in the frame header
+      size_t n = ZSTD_compress2(static_cast<ZSTD_CCtx*>(m_codec), &m_frameOut[ZSTD_INDEX_BYTES], bound,
+                                &m_frameIn[0], len);
+      if (ZSTD_isError(n))
+        {
+          NS_LOG_WARN("MonitorLog: zstd error on " << m_path << ": " << ZSTD_getErrorName(n));
+          return false;
+        }
+      PutLe32(&m_frameOut[0], ZSTD_INDEX_MAGIC);
+      PutLe32(&m_frameOut[4], 8);
+      PutLe32(&m_frameOut[8], static_cast<uint32_t>(n));
+      PutLe32(&m_frameOut[12], static_cast<uint32_t>(len));
+      return WriteAll(&m_frameOut[0], ZSTD_INDEX_BYTES + n);
+    }
+#endif
+#ifdef HAVE_ZLIB
+  if (m_compression == GZIP)
+    {
+      z_stream* zs = static_cast<z_stream*>(m_codec);
+      if (zs == 0)
+        {
+          zs = new z_stream();
+          // raw deflate: the gzip header and trailer are written here to carry the frame sizes
+          if (deflateInit2(zs, GZIP_LEVEL, Z_DEFLATED, -15, 8, Z_DEFAULT_STRATEGY) != Z_OK)
+            {
+              delete zs;
+              return false;
+            }
+          m_codec = zs;
+        }
+      else
+        {
+          deflateReset(zs);
+        }
+      size_t bound = deflateBound(zs, len);
+      m_frameOut.resize(GZIP_HEADER_BYTES + bound + GZIP_TRAILER_BYTES);
+      zs->next_in = reinterpret_cast<Bytef*>(&m_frameIn[0]);
+      zs->avail_in = static_cast<uInt>(len);
+      zs->next_out = reinterpret_cast<Bytef*>(&m_frameOut[GZIP_HEADER_BYTES]);
+      zs->avail_out = static_cast<uInt>(bound);
+      if (deflate(zs, Z_FINISH) != Z_STREAM_END)
+        {
+          NS_LOG_WARN("MonitorLog: deflate error on " << m_path);
+          return false;
+        }
+      size_t n = bound - zs->avail_out;
+      size_t member = GZIP_HEADER_BYTES + n + GZIP_TRAILER_BYTES;
+      // ID1 ID2 CM=deflate FLG=FEXTRA MTIME=0 XFL=0 OS=unknown, XLEN=12, 'X' 'D' LEN=8
+      static const unsigned char header[16] = {0x1f, 0x8b, 8, 4, 0, 0, 0, 0, 0, 0xff,
+                                               12, 0, 'X', 'D', 8, 0};
+      std::memcpy(&m_frameOut[0], header, sizeof(header));
+      PutLe32(&m_frameOut[16], static_cast<uint32_t>(member));
+      PutLe32(&m_frameOut[20], static_cast<uint32_t>(len));
+      uLong crc = crc32(0L, reinterpret_cast<const Bytef*>(&m_frameIn[0]), static_cast<uInt>(len));
+      PutLe32(&m_frameOut[GZIP_HEADER_BYTES + n], static_cast<uint32_t>(crc));
+      PutLe32(&m_frameOut[GZIP_HEADER_BYTES + n + 4], static_cast<uint32_t>(len));
+      return WriteAll(&m_frameOut[0], member);
+    }
+#endif
+  return WriteAll(&m_frameIn[0], len);
+}
+
+void
+MonitorLog::Close()
+{
+  if (m_fd < 0)
+    {
+      return;
+    }
+  // an empty binary stream still gets its header, so readers can tell the layout
+  if (!m_headerWritten)
+    {
+      WriteHeader();
+    }
+
+  bool stopWriter = false;
+  {
+    // once unregistered, the writer no longer touches this stream
+    std::lock_guard<std::mutex> lock(s_mutex);
+    s_open.erase(std::remove(s_open.begin(), s_open.end(), this), s_open.end());
+    if (s_open.empty() && s_writer.joinable())
+      {
+        s_stopWriter = true;
+        stopWriter = true;
+      }
+  }
+  if (stopWriter)
+    {
+      s_cv.notify_all();
+      s_writer.join();
+    }
+  else
+    {
+      // wait out a drain pass that took its snapshot before this stream was unregistered
+      std::lock_guard<std::mutex> drainLock(s_drainMutex);
+    }
+
+  Drain(true);
+  close(m_fd);
+  m_fd = -1;
+#ifdef HAVE_ZSTD
+  if (m_compression == ZSTD && m_codec != 0)
+    {
+      ZSTD_freeCCtx(static_cast<ZSTD_CCtx*>(m_codec));
+    }
+#endif
+#ifdef HAVE_ZLIB
+  if (m_compression == GZIP && m_codec != 0)
+    {
+      deflateEnd(static_cast<z_stream*>(m_codec));
+      delete static_cast<z_stream*>(m_codec);
+    }
+#endif
+  m_codec = 0;
+  std::vector<char>().swap(m_frameIn);
+  std::vector<char>().swap(m_frameOut);
+  if (m_dropped > 0)
+    {
+      std::cerr << "MonitorLog: " << m_stream << " dropped " << m_dropped
+                << " records (ring buffer full)" << std::endl;
+    }
+}
+
+void
+MonitorLog::CloseAll()
+{
+  std::vector<MonitorLog*> streams;
+  {
+    std::lock_guard<std::mutex> lock(s_mutex);
+    streams = s_open;
+  }
+  for (size_t i = 0; i < streams.size(); ++i)
+    {
+      streams[i]->Close();
+    }
+}
+
+void
+MonitorLog::WakeWriter()
+{
+  s_cv.notify_one();
+}
+
+void
+MonitorLog::WriterLoop()
+{
+  std::vector<MonitorLog*> streams;
+  std::unique_lock<std::mutex> lock(s_mutex);
+  while (!s_stopWriter)
+    {
+      // drain outside s_mutex so opening and closing streams never waits on disk or the codec;
+      // s_drainMutex is taken before s_mutex is released, so Close() can wait for this pass
+      streams = s_open;
+      std::unique_lock<std::mutex> drainLock(s_drainMutex);
+      lock.unlock();
+      for (size_t i = 0; i < streams.size(); ++i)
+        {
+          streams[i]->Drain(false);
+        }
+      drainLock.unlock();
+      lock.lock();
+      if (!s_stopWriter)
+        {
+          s_cv.wait_for(lock, std::chrono::milliseconds(WRITER_PERIOD_MS));
+        }
+    }
+}
+
+} // namespace ns3
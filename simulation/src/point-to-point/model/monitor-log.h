@@ -0,0 +1,312 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * Copyright (c) 2024 NUS
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ */
+
+#ifndef MONITOR_LOG_H
+#define MONITOR_LOG_H
+
+#include <stdint.h>
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <vector>
+
+namespace ns3 {
+
+/**
+ * \ingroup point-to-point
+ * \brief Record-oriented writer for simulator monitor streams
+ *
+ * Every monitor stream (FCT, PFC, drop, RTO, FEC debug, uplink, CNP, conn)
+ * is a sequence of fixed-layout integer records. The layout is declared once
+ * as a field spec such as "time_ns:i8 node:u4 type:u1", using NumPy type
+ * codes (i/u followed by the width in bytes).
+ *
+ * Two output formats are supported:
+ * - TEXT: one line per record, decimal fields joined by the stream
+ *   delimiter (the historical fprintf format)
+ * - BINARY: a self-describing header line followed by packed little-endian
+ *   records of GetRecordSize() bytes each
+ *
+ * The binary header is a single ASCII line
+ *
+ *   #XDCBIN1 stream=fct record_bytes=36 fields=src_id:<u4,... [key=value ...]
+ *
+ * padded with spaces so that the records start at an 8-byte aligned offset,
+ * which lets readers map the file directly as a NumPy structured array.
+ *
+ * Writes are asynchronous: Write() formats the record on the simulation
+ * thread into a per-stream single-producer/single-consumer ring buffer, and
+ * one background writer thread shared by all streams drains the rings with
+ * large write() calls. Memory is bounded by the ring size; when a ring is
+ * full the producer either waits for the writer (BLOCK) or discards the
+ * record and counts it (DROP). Close() / CloseAll() drain everything that
+ * is still buffered, so they must run before the process exits (cross_dc
+ * schedules CloseAll() at Simulator::Destroy).
+ *
+ * Streams can be compressed (zstd, or gzip when libzstd is not available)
+ * by the writer thread. The file name gets a ".zst" / ".gz" suffix and the
+ * content is a sequence of independent frames, each holding whole records
+ * of the text or binary stream, so any frame can be decompressed on its own:
+ * - zstd: every frame is preceded by a skippable frame (magic 0x184D2A5E,
+ *   8-byte payload) holding the compressed and uncompressed frame sizes
+ * - gzip: every frame is a gzip member whose extra field ('X','D', 8 bytes)
+ *   holds the member size and the uncompressed size, as in BGZF
+ * Standard zstd / gzip tools decompress the whole file; readers can walk
+ * the frame sizes to split the file into ranges (see analysis/log_parser.py).
+ */
+class MonitorLog
+{
+public:
+  enum Format
+  {
+    TEXT = 0,
+    BINARY = 1
+  };
+
+  /// Compression of the output file, applied by the writer thread
+  enum Compression
+  {
+    NONE = 0,
+    ZSTD = 1,
+    GZIP = 2
+  };
+
+  /// What Write() does when the ring buffer of a stream is full
+  enum Backpressure
+  {
+    BLOCK = 0, ///< wait until the writer thread frees space (lossless)
+    DROP = 1   ///< discard the record and count it
+  };
+
+  /**
+   * \brief Parse an OUTPUT_FORMAT value ("text" or "binary")
+   *
+   * \param name Format name
+   * \param format Output parameter
+   * \return false if the name is unknown
+   */
+  static bool ParseFormat(const std::string& name, Format* format);
+
+  /**
+   * \brief Parse a backpressure policy name ("block" or "drop")
+   *
+   * \param name Policy name
+   * \param policy Output parameter
+   * \return false if the name is unknown
+   */
+  static bool ParseBackpressure(const std::string& name, Backpressure* policy);
+
+  /**
+   * \brief Parse a compression name ("none", "zstd" or "gzip")
+   *
+   * \param name Compression name
+   * \param compression Output parameter
+   * \return false if the name is unknown
+   */
+  static bool ParseCompression(const std::string& name, Compression* compression);
+
+  /**
+   * \brief Set the compression of streams opened afterwards
+   *
+   * Falls back from ZSTD to GZIP, and from GZIP to NONE, when the library
+   * was not found at configure time.
+   *
+   * \param compression Requested compression
+   * \return the compression actually used
+   */
+  static Compression SetCompression(Compression compression);
+
+  /**
+   * \brief Set the ring buffer size of streams opened afterwards
+   *
+   * \param bytes Ring size, rounded up to a power of two (at least 64 KiB)
+   */
+  static void SetBufferBytes(size_t bytes);
+
+  /**
+   * \brief Set the policy applied when a ring buffer is full
+   */
+  static void SetBackpressure(Backpressure policy);
+
+  /**
+   * \brief Open a monitor stream
+   *
+   * \param path Output file path (truncated); compressed streams append ".zst" / ".gz"
+   * \param stream Stream name stored in the binary header
+   * \param fields Field spec, e.g. "time_ns:i8 node:u4"
+   * \param delimiter Field delimiter of the text format
+   * \param format Output format
+   */
+  MonitorLog(const std::string& path, const std::string& stream,
+             const std::string& fields, char delimiter, Format format);
+  ~MonitorLog();
+
+  /**
+   * \return true if the output file was opened successfully
+   */
+  bool IsOpen() const;
+
+  /**
+   * \return path of the output file, including the compression suffix
+   */
+  const std::string& GetPath() const;
+
+  /**
+   * \return number of fields per record
+   */
+  uint32_t GetNFields() const;
+
+  /**
+   * \return size of one binary record in bytes
+   */
+  uint32_t GetRecordSize() const;
+
+  /**
+   * \return number of records discarded because the ring buffer was full
+   */
+  uint64_t GetDroppedRecords() const;
+
+  /**
+   * \brief Attach a key=value pair to the stream header
+   *
+   * Must be called before the first record is written. In text mode the
+   * pairs are written as a leading "# key=value ..." comment line, which is
+   * only emitted if at least one pair was set.
+   */
+  void SetMeta(const std::string& key, const std::string& value);
+
+  /**
+   * \brief Append one record; the number of values must match the field spec
+   *
+   * Values are converted to 64 bits and truncated to the field width, so
+   * signed fields keep their two's complement representation.
+   */
+  template <typename... Args>
+  void Write(Args... values)
+  {
+    const uint64_t v[] = {static_cast<uint64_t>(values)...};
+    Append(v, sizeof...(Args));
+  }
+
+  /**
+   * \brief Append one record from an array of GetNFields() values
+   */
+  void Append(const uint64_t* values, uint32_t n);
+
+  /**
+   * \brief Ask the writer thread to write out buffered records soon
+   *
+   * Does not wait; records are otherwise written once enough bytes are
+   * pending or after at most MAX_DELAY_MS.
+   */
+  void Flush();
+
+  /**
+   * \brief Write out all buffered records and close the file
+   *
+   * Further writes are ignored. Reports dropped records on stderr.
+   */
+  void Close();
+
+  /**
+   * \brief Close every stream that is still open
+   *
+   * Called once at the end of the simulation so no buffered record is lost.
+   */
+  static void CloseAll();
+
+private:
+  struct Field
+  {
+    std::string name;
+    uint8_t size;
+    bool isSigned;
+  };
+
+  void WriteHeader();
+
+  /**
+   * \brief Copy one record into the ring buffer (simulation thread)
+   * \param force never drop, wait for space even under the DROP policy
+   */
+  void Push(const char* data, size_t len, bool force);
+
+  /**
+   * \brief Write pending bytes to the file (writer thread, or Close)
+   * \param force write even if only a few bytes are pending
+   */
+  void Drain(bool force);
+
+  /**
+   * \brief Compress the ring bytes [tail, head) into one frame and write it
+   * \return false if the frame could not be written
+   */
+  bool WriteFrame(uint64_t tail, uint64_t head);
+
+  /**
+   * \brief write() all of len bytes, retrying on EINTR and short writes
+   */
+  bool WriteAll(const char* data, size_t len);
+
+  static void WakeWriter();
+  static void WriterLoop();
+
+  static const size_t DEFAULT_BUFFER_BYTES = 4 << 20;
+  static const size_t MIN_BUFFER_BYTES = 64 << 10;
+  static const size_t MAX_BUFFER_BYTES = 1 << 30; ///< frame sizes are stored as 32 bits
+  static const size_t MIN_WRITE_BYTES = 256 << 10; ///< batch size of background writes
+  static const uint32_t MAX_DELAY_MS = 100;        ///< max age of buffered records
+  static const size_t MIN_FRAME_BYTES = 1 << 20;   ///< batch size of compressed frames
+  static const uint32_t MAX_FRAME_DELAY_MS = 1000; ///< max age of records in compressed streams
+  static const uint32_t WRITER_PERIOD_MS = 10;
+  static const size_t MAX_TEXT_FIELD = 21; ///< "-9223372036854775808" plus delimiter
+
+  std::string m_path;
+  std::string m_stream;
+  std::vector<Field> m_fields;
+  std::vector<std::pair<std::string, std::string> > m_meta;
+  char m_delimiter;
+  Format m_format;
+  uint32_t m_recordSize;
+  int m_fd;
+  bool m_headerWritten;
+  std::vector<char> m_record; ///< formatting scratch for one record
+
+  // SPSC ring: the simulation thread advances m_head, the writer m_tail
+  std::vector<char> m_ring;
+  uint64_t m_mask;
+  std::atomic<uint64_t> m_head;
+  std::atomic<uint64_t> m_tail;
+  std::atomic<bool> m_flushRequested;
+  std::chrono::steady_clock::time_point m_lastWrite;
+  uint64_t m_dropped;
+
+  // compression state, only touched by the writer (or by Close once unregistered)
+  Compression m_compression;
+  std::vector<char> m_frameIn;  ///< contiguous copy of the ring bytes of one frame
+  std::vector<char> m_frameOut; ///< compressed frame including its size prefix
+  void* m_codec;                ///< ZSTD_CCtx* or z_stream*
+
+  static size_t s_bufferBytes;
+  static Compression s_compression;
+  static Backpressure s_backpressure;
+  static std::vector<MonitorLog*> s_open; ///< streams drained by the writer, guarded by s_mutex
+  static std::mutex s_mutex;
+  static std::mutex s_drainMutex; ///< held by the writer while it drains its snapshot of s_open
+  static std::condition_variable s_cv;
+  static std::thread s_writer;
+  static bool s_stopWriter;
+};
+
+} // namespace ns3
+
+#endif /* MONITOR_LOG_H */
@@ -844,6 +844,7 @@ QbbNetDevice::GetFecInternalStats() const
         if (f.decoder)
         {
             s.totalDecoderBlocks += f.decoder->GetBlockStateCount();
+            s.totalDecoderBlockSlots += f.decoder->GetBlockSlotCount();
             s.totalDecoderRepairs += f.decoder->GetRepairBufferCount();
             s.totalDecoderXorBytes += f.decoder->GetApproxXorBytes();
         }
@@ -1019,7 +1020,7 @@ QbbNetDevice::FecTransmit(Ptr<Packet> packet)
     {
         flow.cfgBlockSize = m_fecBlockSize;
         flow.cfgInterleavingDepth = m_fecInterleavingDepth;
-        flow.encoder = Ptr<FecEncoder>(new FecEncoder(flow.cfgBlockSize, flow.cfgInterleavingDepth));
+        flow.encoder = Ptr<FecEncoder>(new FecEncoder(flow.cfgBlockSize, flow.cfgInterleavingDepth, m_fecSymbolic));
         flow.txNextPsn = 0;
         flow.txHasBlockHeader = false;
         flow.rxBlockHeaders.clear();
@@ -1039,7 +1040,7 @@ QbbNetDevice::FecTransmit(Ptr<Packet> packet)
             flow.cfgInterleavingDepth = itPending->second.interleavingDepth;
             m_fecPendingCfgs.erase(itPending);
 
-            flow.encoder = Ptr<FecEncoder>(new FecEncoder(flow.cfgBlockSize, flow.cfgInterleavingDepth));
+            flow.encoder = Ptr<FecEncoder>(new FecEncoder(flow.cfgBlockSize, flow.cfgInterleavingDepth, m_fecSymbolic));
             flow.txHasBlockHeader = false;
             flow.rxBlockHeaders.clear();
 
@@ -1121,15 +1122,16 @@ QbbNetDevice::FecTransmit(Ptr<Packet> packet)
         NS_LOG_INFO("FEC: Coding block complete at PSN " << flow.txNextPsn - 1
                   << ", generating repair packets");
 
-        // Generate repair packets
-        std::vector<Ptr<Packet>> repairPackets = flow.encoder->GenerateRepairPackets(false);
-        if (m_fecMaxRepairsPerBlock > 0 && repairPackets.size() > m_fecMaxRepairsPerBlock)
+        // Generate repair packets (built when the pacer sends them)
+        FecRepairBlock repairs = flow.encoder->TakeRepairBlock(false);
+        if (m_fecMaxRepairsPerBlock > 0)
         {
-            repairPackets.resize(m_fecMaxRepairsPerBlock);
+            repairs.Truncate(m_fecMaxRepairsPerBlock);
         }
-        m_fecRepairPackets += repairPackets.size();
+        const uint32_t nRepairs = repairs.GetRepairCount();
+        m_fecRepairPackets += nRepairs;
 
-        NS_LOG_INFO("FEC: Generated " << repairPackets.size() << " repair packets");
+        NS_LOG_INFO("FEC: Generated " << nRepairs << " repair packets");
         
         // Removed: FEC block complete event (event_type=0) - using debug callback only
         // if (!m_fecEventCallback.IsNull()) {
@@ -1139,14 +1141,14 @@ QbbNetDevice::FecTransmit(Ptr<Packet> packet)
         // Send repair packets
         if (flow.txHasBlockHeader)
         {
-            SendRepairPackets(repairPackets, flow.txBlockHeader);
+            SendRepairPackets(std::move(repairs), flow.txBlockHeader);
         }
 
         // Reset encoder for next block
         flow.encoder->ResetBlock();
         flow.txHasBlockHeader = false;
 
-        NS_LOG_DEBUG("Generated and sent " << repairPackets.size() << " repair packets");
+        NS_LOG_DEBUG("Generated and sent " << nRepairs << " repair packets");
     }
 
     // 尾块 flush：消息结束但编码块未满 r 时，仍生成 repair 包（LoWAR message-aware coding）
@@ -1167,27 +1169,28 @@ QbbNetDevice::FecTransmit(Ptr<Packet> packet)
             }
             else
             {
-                std::vector<Ptr<Packet>> tailRepairs = flow.encoder->GenerateRepairPackets(true);
-                if (m_fecMaxRepairsPerBlock > 0 && tailRepairs.size() > m_fecMaxRepairsPerBlock)
+                FecRepairBlock tailRepairs = flow.encoder->TakeRepairBlock(true);
+                if (m_fecMaxRepairsPerBlock > 0)
                 {
-                    tailRepairs.resize(m_fecMaxRepairsPerBlock);
+                    tailRepairs.Truncate(m_fecMaxRepairsPerBlock);
                 }
+                const uint32_t nTailRepairs = tailRepairs.GetRepairCount();
 
-                if (!tailRepairs.empty() && flow.txHasBlockHeader)
+                if (nTailRepairs > 0 && flow.txHasBlockHeader)
                 {
-                    m_fecRepairPackets += tailRepairs.size();
-                    SendRepairPackets(tailRepairs, flow.txBlockHeader);
+                    m_fecRepairPackets += nTailRepairs;
+                    SendRepairPackets(std::move(tailRepairs), flow.txBlockHeader);
                 }
 
                 if (!m_fecDebugCallback.IsNull())
                 {
-                    m_fecDebugCallback(m_node->GetId(), 4, flowHash, basePSN, tailDataCnt, tailRepairs.size());
+                    m_fecDebugCallback(m_node->GetId(), 4, flowHash, basePSN, tailDataCnt, nTailRepairs);
                 }
             }
         }
 
         // 下一条消息从 0 开始，避免跨消息编码/解码状态污染
-        flow.encoder = Ptr<FecEncoder>(new FecEncoder(flow.cfgBlockSize, flow.cfgInterleavingDepth));
+        flow.encoder = Ptr<FecEncoder>(new FecEncoder(flow.cfgBlockSize, flow.cfgInterleavingDepth, m_fecSymbolic));
         flow.txNextPsn = 0;
         flow.txHasBlockHeader = false;
         flow.rxBlockHeaders.clear();
@@ -1272,7 +1275,7 @@ QbbNetDevice::FecReceive(Ptr<Packet> packet, const CustomHeader& ch)
         flow.cfgInterleavingDepth = fecHeader.GetInterleavingDepth();
         if (flow.cfgBlockSize == 0) flow.cfgBlockSize = m_fecBlockSize;
         if (flow.cfgInterleavingDepth == 0) flow.cfgInterleavingDepth = m_fecInterleavingDepth;
-        flow.decoder = Ptr<FecDecoder>(new FecDecoder(flow.cfgBlockSize, flow.cfgInterleavingDepth));
+        flow.decoder = Ptr<FecDecoder>(new FecDecoder(flow.cfgBlockSize, flow.cfgInterleavingDepth, m_fecSymbolic));
         flow.txNextPsn = 0;
         flow.txHasBlockHeader = false;
         flow.rxBlockHeaders.clear();
@@ -1309,7 +1312,7 @@ QbbNetDevice::FecReceive(Ptr<Packet> packet, const CustomHeader& ch)
             if (flow.cfgBlockSize == 0) flow.cfgBlockSize = m_fecBlockSize;
             if (flow.cfgInterleavingDepth == 0) flow.cfgInterleavingDepth = m_fecInterleavingDepth;
 
-            flow.decoder = Ptr<FecDecoder>(new FecDecoder(flow.cfgBlockSize, flow.cfgInterleavingDepth));
+            flow.decoder = Ptr<FecDecoder>(new FecDecoder(flow.cfgBlockSize, flow.cfgInterleavingDepth, m_fecSymbolic));
             flow.txNextPsn = 0;
             flow.txHasBlockHeader = false;
             flow.rxBlockHeaders.clear();
@@ -1423,7 +1426,7 @@ QbbNetDevice::FecReceive(Ptr<Packet> packet, const CustomHeader& ch)
             if (flow.cfgBlockSize == 0) flow.cfgBlockSize = m_fecBlockSize;
             if (flow.cfgInterleavingDepth == 0) flow.cfgInterleavingDepth = m_fecInterleavingDepth;
 
-            flow.decoder = Ptr<FecDecoder>(new FecDecoder(flow.cfgBlockSize, flow.cfgInterleavingDepth));
+            flow.decoder = Ptr<FecDecoder>(new FecDecoder(flow.cfgBlockSize, flow.cfgInterleavingDepth, m_fecSymbolic));
             flow.txNextPsn = 0;
             flow.txHasBlockHeader = false;
             flow.rxBlockHeaders.clear();
@@ -1698,15 +1701,21 @@ QbbNetDevice::FecDrainRepairQueue()
     while (!m_fecPendingRepairs.empty())
     {
         const FecPendingRepair& pr = m_fecPendingRepairs.front();
-        const uint32_t bytes = (pr.bytes != 0) ? pr.bytes : static_cast<uint32_t>(pr.packet->GetSize());
+        const uint32_t bytes = pr.bytes;
 
         if (m_fecRepairPacingEnabled && m_fecRepairTokenBytes < bytes)
         {
             break;
         }
 
-        m_rdmaEQ->EnqueueRepairQ(pr.packet, pr.pg);
-        m_traceEnqueue(pr.packet, pr.pg);
+        // 放行时才构造 repair 包：[CustomHeader][FecHeader][Payload]
+        Ptr<Packet> repairPkt = pr.batch->repairs.CreateRepairPacket(pr.index);
+        repairPkt->AddHeader(pr.batch->ch);
+        // 构造后即释放该 repair 的 XOR 缓冲：驻留的 payload 只属于 pending 描述符，
+        // 因而受 m_fecPendingRepairBytes <= m_fecRepairMaxBacklogBytes 约束（上限为 0 时不受限）
+        pr.batch->repairs.Release(pr.index);
+        m_rdmaEQ->EnqueueRepairQ(repairPkt, pr.pg);
+        m_traceEnqueue(repairPkt, pr.pg);
 
         if (m_fecRepairPacingEnabled)
         {
@@ -1731,9 +1740,7 @@ QbbNetDevice::FecDrainRepairQueue()
         uint64_t waitNs = 1000ull;  // 默认 1us
         if (m_fecRepairPacingEnabled && m_fecRepairRateBps > 0)
         {
-            const uint32_t needBytes = (m_fecPendingRepairs.front().bytes != 0)
-                                           ? m_fecPendingRepairs.front().bytes
-                                           : static_cast<uint32_t>(m_fecPendingRepairs.front().packet->GetSize());
+            const uint32_t needBytes = m_fecPendingRepairs.front().bytes;
             const uint64_t deficit = (needBytes > m_fecRepairTokenBytes) ? (needBytes - m_fecRepairTokenBytes) : 0;
             if (deficit > 0)
             {
@@ -1752,80 +1759,74 @@ QbbNetDevice::FecDrainRepairQueue()
 }
 
 void
-QbbNetDevice::SendRepairPackets(const std::vector<Ptr<Packet>>& repairPackets, const CustomHeader& baseHeader)
+QbbNetDevice::SendRepairPackets(FecRepairBlock repairs, const CustomHeader& baseHeader)
 {
-    NS_LOG_FUNCTION(this << repairPackets.size());
+    NS_LOG_FUNCTION(this << repairs.GetRepairCount());
 
     NS_LOG_DEBUG("FEC: Using saved header - sip=" << baseHeader.sip
               << " dip=" << baseHeader.dip);
 
-    size_t maxToSend = repairPackets.size();
-    if (m_fecMaxRepairsPerBlock > 0 && maxToSend > m_fecMaxRepairsPerBlock)
+    if (m_fecMaxRepairsPerBlock > 0)
     {
-        maxToSend = m_fecMaxRepairsPerBlock;
+        repairs.Truncate(m_fecMaxRepairsPerBlock);
     }
 
-    for (size_t i = 0; i < maxToSend; ++i)
-    {
-        Ptr<Packet> repairPkt = repairPackets[i]->Copy();
-
-        NS_LOG_DEBUG("FEC: Repair packet " << i << " size before CustomHeader: "
-                  << repairPkt->GetSize());
-
-        // Create CustomHeader for repair packet using saved header from first data packet
-        // This ensures repair packets have the correct source/destination IP for routing
-        CustomHeader ch = baseHeader;  // Copy the saved header
-
-        // Mark this as a repair packet by setting l3Prot to a special value
-        ch.l3Prot = 0xFB;  // Use 0xFB to indicate FEC repair packet (0xFD is used by NACK)
+    // Create CustomHeader for repair packets using saved header from first data packet
+    // This ensures repair packets have the correct source/destination IP for routing
+    Ptr<FecRepairBatch> batch = Create<FecRepairBatch>();
+    batch->repairs = std::move(repairs);
+    batch->ch = baseHeader;  // Copy the saved header
 
-        NS_LOG_DEBUG("FEC: Created CustomHeader with l3Prot=0x"
-                  << std::hex << (uint32_t)ch.l3Prot << std::dec);
+    // Mark this as a repair packet by setting l3Prot to a special value
+    batch->ch.l3Prot = 0xFB;  // Use 0xFB to indicate FEC repair packet (0xFD is used by NACK)
+    const CustomHeader& ch = batch->ch;
 
-        // Add CustomHeader to repair packet so switches can route it
-        repairPkt->AddHeader(ch);
-
-        NS_LOG_DEBUG("FEC: Repair packet " << i << " after adding CustomHeader: size="
-                  << repairPkt->GetSize()
-                  << " sip=" << ch.sip << " dip=" << ch.dip);
+    NS_LOG_DEBUG("FEC: Created CustomHeader with l3Prot=0x"
+              << std::hex << (uint32_t)ch.l3Prot << std::dec);
 
+    const uint32_t chBytes = ch.GetSerializedSize();
+    for (uint32_t i = 0; i < batch->repairs.GetRepairCount(); ++i)
+    {
         // Enqueue repair packet for transmission
         // Repair packets MUST respect PFC pause classes; do not enqueue into ackQ (qIndex=0),
         // otherwise they can bypass PAUSE and cause queue/MMU/memory blow-up in large runs.
         if (m_node->GetNodeType() == 0)  // server
         {
             uint32_t pg = (ch.udp.pg < RdmaEgressQueue::qCnt) ? ch.udp.pg : 0;
-            const uint32_t bytes = static_cast<uint32_t>(repairPkt->GetSize());
+            const uint32_t bytes = batch->repairs.GetRepairSize(i) + chBytes;
 
-            // repair 是 best-effort：超过 backlog 就直接丢弃，交给 RDMA 重传/超时接管
+            // repair 是 best-effort：超过 backlog 就直接丢弃，交给 RDMA 重传/超时接管；
+            // 构造数据包供 QbbDrop 追踪后立即释放其 XOR 缓冲，不随 batch 驻留到最后一个 repair 发出
             if (m_fecRepairMaxBacklogBytes > 0 &&
                 (m_fecPendingRepairBytes + bytes) > m_fecRepairMaxBacklogBytes)
             {
                 m_fecRepairDropped++;
+                Ptr<Packet> repairPkt = batch->repairs.CreateRepairPacket(i);
+                repairPkt->AddHeader(ch);
                 m_traceDrop(repairPkt, pg);
+                batch->repairs.Release(i);
                 continue;
             }
 
             FecPendingRepair pr;
-            pr.packet = repairPkt;
+            pr.batch = batch;
+            pr.index = i;
             pr.pg = pg;
             pr.bytes = bytes;
             m_fecPendingRepairs.push_back(pr);
             m_fecPendingRepairBytes += bytes;
-            
-            // Removed: repair packet sent event (event_type=1) - using debug callback only
-            // if (!m_fecEventCallback.IsNull()) {
-            //     FecHeader fh;
-            //     Ptr<Packet> copy = repairPkt->Copy();
-            //     CustomHeader tempCh(CustomHeader::L2_Header | CustomHeader::L3_Header | CustomHeader::L4_Header);
-            //     copy->RemoveHeader(tempCh);
-            //     copy->PeekHeader(fh);
-            //     m_fecEventCallback(m_node->GetId(), 1, fh.GetBasePSN(), fh.GetISN(), repairPkt->GetSize());
-            // }
         }
         else  // switch
         {
-            SwitchSend(0, repairPkt, ch);
+            // Add CustomHeader to repair packet so switches can route it
+            Ptr<Packet> repairPkt = batch->repairs.CreateRepairPacket(i);
+            repairPkt->AddHeader(ch);
+
+            NS_LOG_DEBUG("FEC: Repair packet " << i << " after adding CustomHeader: size="
+                      << repairPkt->GetSize()
+                      << " sip=" << ch.sip << " dip=" << ch.dip);
+
+            SwitchSend(0, repairPkt, batch->ch);
         }
     }
 
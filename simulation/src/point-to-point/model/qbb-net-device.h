@@ -205,7 +205,7 @@ public:
   // FEC transmission and reception methods
   void FecTransmit(Ptr<Packet> packet);
   void FecReceive(Ptr<Packet> packet, const CustomHeader& ch);  // Added CustomHeader parameter
-  void SendRepairPackets(const std::vector<Ptr<Packet>>& repairPackets, const CustomHeader& baseHeader);
+  void SendRepairPackets(FecRepairBlock repairs, const CustomHeader& baseHeader);
   void SendNegotiatePacket(const CustomHeader& rxCh, uint32_t newR, uint32_t newC, uint16_t negOp);
   void FecDrainRepairQueue();
 
@@ -214,6 +214,7 @@ public:
   uint32_t m_fecInterleavingDepth;      ///< FEC interleaving depth (c parameter)
   uint32_t m_fecTailFlushMinPkts{8};    ///< 尾块 flush 的最小数据包数（小于该值则不发 repair，减少短流开销）
   uint32_t m_fecMaxRepairsPerBlock{0};  ///< 每块最多发送 repair 数（0 表示不限制，默认按 c）
+  bool m_fecSymbolic{false};            ///< 符号化编解码：只跟踪 recipe/长度/bitmap，不做 payload XOR
 
   // FEC repair 发送节流（LoWAR 风格 best-effort：拥塞时降级为少发/不发，交给重传）
   bool m_fecRepairPacingEnabled{true};
@@ -226,11 +227,21 @@ public:
   bool m_fecRepairZeroRateWarned{false};    ///< pacing 速率为 0 的告警去重（避免刷屏/忙等）
   EventId m_fecRepairDrainEvent;
 
+  // 一个编码块的 repair 及其 CustomHeader，由该块的所有 pending 描述符共享
+  struct FecRepairBatch : public SimpleRefCount<FecRepairBatch>
+  {
+    FecRepairBlock repairs;
+    CustomHeader ch;                    ///< 块首包的 CustomHeader，l3Prot=0xFB
+  };
+
+  // pending repair 只保存描述符，出队（pacing 放行）时才构造数据包并释放其 XOR payload；
+  // 因 backlog 被丢弃的 repair 只为 QbbDrop 追踪构造一次，随即释放
   struct FecPendingRepair
   {
-    Ptr<Packet> packet;
+    Ptr<FecRepairBatch> batch;
+    uint32_t index{0};                  ///< repair 在 batch->repairs 中的下标
     uint32_t pg{0};
-    uint32_t bytes{0};
+    uint32_t bytes{0};                  ///< 构造后的包长（含 CustomHeader）
   };
   std::deque<FecPendingRepair> m_fecPendingRepairs;
   uint64_t m_fecPendingRepairBytes{0};
@@ -320,6 +331,7 @@ public:
   void SetFecParameters(uint32_t blockSize, uint32_t interleavingDepth);
   void SetFecTailFlushMinPkts(uint32_t v) { m_fecTailFlushMinPkts = v; }
   void SetFecMaxRepairsPerBlock(uint32_t v) { m_fecMaxRepairsPerBlock = v; }
+  void SetFecSymbolic(bool v) { m_fecSymbolic = v; }
   void SetFecRepairPacing(bool enabled, double rateRatio, uint64_t maxBacklogBytes, uint64_t burstBytes)
   {
     m_fecRepairPacingEnabled = enabled;
@@ -351,6 +363,7 @@ public:
     uint64_t flowCount{0};
     uint64_t totalRxBlockHeaders{0};
     uint64_t totalDecoderBlocks{0};
+    uint64_t totalDecoderBlockSlots{0};
     uint64_t totalDecoderRepairs{0};
     uint64_t totalDecoderXorBytes{0};
     uint64_t pendingRepairCount{0};
@@ -24,6 +24,8 @@
 #include "ns3/packet.h"
 #include "ns3/log.h"
 
+#include <cstring>
+
 using namespace ns3;
 
 NS_LOG_COMPONENT_DEFINE("FecTest");
@@ -165,9 +167,16 @@ void
 FecXorEngineTest::DoRun(void)
 {
     // Create test packets with known data
-    Ptr<Packet> p1 = Create<Packet>(100);
-    Ptr<Packet> p2 = Create<Packet>(100);
-    Ptr<Packet> p3 = Create<Packet>(100);
+    uint8_t data[3][100];
+    for (int i = 0; i < 100; i++)
+    {
+        data[0][i] = i;
+        data[1][i] = 3 * i + 7;
+        data[2][i] = 255 - i;
+    }
+    Ptr<Packet> p1 = Create<Packet>(data[0], 100);
+    Ptr<Packet> p2 = Create<Packet>(data[1], 100);
+    Ptr<Packet> p3 = Create<Packet>(data[2], 100);
 
     std::vector<Ptr<Packet>> packets;
     packets.push_back(p1);
@@ -184,9 +193,10 @@ FecXorEngineTest::DoRun(void)
     // Test recovery - recover p2 from p1, p3, and repair
     std::vector<Ptr<Packet>> availablePackets;
     availablePackets.push_back(p1);
+    availablePackets.push_back(0); // p2 is missing
     availablePackets.push_back(p3);
 
-    Ptr<Packet> recoveredP2 = xorEngine.RecoverPacket(repairPacket, availablePackets);
+    Ptr<Packet> recoveredP2 = xorEngine.RecoverPacket(availablePackets, repairPacket, 1);
 
     NS_TEST_ASSERT_MSG_NE(recoveredP2, 0, "Packet recovery failed");
     NS_TEST_ASSERT_MSG_EQ(recoveredP2->GetSize(), p2->GetSize(), "Recovered packet size mismatch");
@@ -211,6 +221,82 @@ FecXorEngineTest::DoRun(void)
     NS_LOG_INFO("FEC XOR Engine test passed");
 }
 
+/**
+ * \brief Word-wide XOR matches byte-wise XOR for unaligned buffers,
+ *        odd lengths and packets of different sizes
+ */
+class FecXorEngineWordTest : public TestCase
+{
+public:
+    FecXorEngineWordTest();
+    virtual ~FecXorEngineWordTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+FecXorEngineWordTest::FecXorEngineWordTest()
+    : TestCase("FEC XOR Engine word-wide XOR and buffer pool")
+{
+}
+
+FecXorEngineWordTest::~FecXorEngineWordTest()
+{
+}
+
+void
+FecXorEngineWordTest::DoRun(void)
+{
+    uint8_t a[77], b[77], ref[77];
+    for (uint32_t i = 0; i < sizeof(a); ++i)
+    {
+        a[i] = ref[i] = (uint8_t)(i * 37 + 1);
+        b[i] = (uint8_t)(i * 91 + 5);
+    }
+    // start at an odd offset so that no word is aligned
+    FecXorEngine::XorBuffers(a + 1, b + 3, 73);
+    for (uint32_t i = 0; i < 73; ++i)
+    {
+        ref[i + 1] ^= b[i + 3];
+    }
+    bool identical = true;
+    for (uint32_t i = 0; i < sizeof(a); ++i)
+    {
+        identical = identical && a[i] == ref[i];
+    }
+    NS_TEST_ASSERT_MSG_EQ(identical, true, "Word-wide XOR differs from byte-wise XOR");
+
+    // packets of different sizes, the repair is zero-padded to the largest one
+    std::vector<uint32_t> sizes{13, 1500, 64, 1, 1499, 700};
+    std::vector<Ptr<Packet>> packets;
+    std::vector<uint8_t> expected(1500, 0);
+    for (uint32_t n = 0; n < sizes.size(); ++n)
+    {
+        std::vector<uint8_t> data(sizes[n]);
+        for (uint32_t i = 0; i < sizes[n]; ++i)
+        {
+            data[i] = (uint8_t)(i * (n + 3) + n);
+            expected[i] ^= data[i];
+        }
+        packets.push_back(Create<Packet>(data.data(), sizes[n]));
+    }
+    for (uint32_t round = 0; round < 3; ++round)
+    {
+        // later rounds run on buffers recycled by the pool
+        Ptr<Packet> repair = FecXorEngine::XorPackets(packets);
+        NS_TEST_ASSERT_MSG_EQ(repair->GetSize(), 1500, "Repair packet size mismatch");
+        std::vector<uint8_t> out(1500);
+        repair->CopyData(out.data(), 1500);
+        NS_TEST_ASSERT_MSG_EQ((out == expected), true, "Repair data mismatch in round " << round);
+
+        Ptr<Packet> recovered = FecXorEngine::RecoverPacket(packets, repair, 1);
+        std::vector<uint8_t> orig(1500), rec(1500);
+        packets[1]->CopyData(orig.data(), 1500);
+        recovered->CopyData(rec.data(), 1500);
+        NS_TEST_ASSERT_MSG_EQ((rec == orig), true, "Recovered data mismatch in round " << round);
+    }
+}
+
 /**
  * \brief FEC Encoder Test Case
  */
@@ -326,6 +412,79 @@ FecEncoderTailFlushTest::DoRun(void)
     NS_TEST_ASSERT_MSG_EQ((repairs.size() <= interleavingDepth), true, "Repair count should be <= c");
 }
 
+/**
+ * \brief Repairs taken as a FecRepairBlock are the packets GenerateRepairPackets
+ *        builds, and their sizes are known before they are built
+ */
+class FecRepairBlockTest : public TestCase
+{
+public:
+    FecRepairBlockTest();
+    virtual ~FecRepairBlockTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+FecRepairBlockTest::FecRepairBlockTest()
+    : TestCase("FEC repair block builds repairs on demand")
+{
+}
+
+FecRepairBlockTest::~FecRepairBlockTest()
+{
+}
+
+void
+FecRepairBlockTest::DoRun(void)
+{
+    uint32_t blockSize = 8;
+    uint32_t interleavingDepth = 4;
+    Ptr<FecEncoder> encoder = Ptr<FecEncoder>(new FecEncoder(blockSize, interleavingDepth));
+
+    // A 6-packet tail block: units 0 and 1 hold two packets, 2 and 3 one
+    for (uint32_t psn = 0; psn < 6; psn++)
+    {
+        uint8_t data[128];
+        for (uint32_t i = 0; i < sizeof(data); i++)
+        {
+            data[i] = (uint8_t)(psn * 31 + i);
+        }
+        encoder->EncodePacket(Create<Packet>(data, 64 + psn * 10), psn);
+    }
+    encoder->MarkHasLast(5, 114);
+
+    std::vector<Ptr<Packet>> expected = encoder->GenerateRepairPackets(true);
+    FecRepairBlock block = encoder->TakeRepairBlock(true);
+    NS_TEST_ASSERT_MSG_EQ(block.GetRepairCount(), expected.size(), "Repair count mismatch");
+    for (uint32_t i = 0; i < block.GetRepairCount() && i < expected.size(); i++)
+    {
+        uint32_t size = expected[i]->GetSize();
+        NS_TEST_ASSERT_MSG_EQ(block.GetRepairSize(i), size, "Repair size known before building");
+        Ptr<Packet> repair = block.CreateRepairPacket(i);
+        NS_TEST_ASSERT_MSG_EQ(repair->GetSize(), size, "Repair size mismatch");
+        std::vector<uint8_t> a(size), b(size);
+        expected[i]->CopyData(a.data(), size);
+        repair->CopyData(b.data(), size);
+        NS_TEST_ASSERT_MSG_EQ((a == b), true, "Repair " << i << " bytes differ");
+    }
+
+    // The coding units were moved into the block
+    NS_TEST_ASSERT_MSG_EQ(encoder->GenerateRepairPackets(true).size(), 0, "Units should be taken");
+    block.Truncate(2);
+    NS_TEST_ASSERT_MSG_EQ(block.GetRepairCount(), 2, "Truncate should keep 2 repairs");
+
+    // Releasing a dropped repair leaves the others intact
+    block.Release(0);
+    uint32_t size = expected[1]->GetSize();
+    Ptr<Packet> repair = block.CreateRepairPacket(1);
+    NS_TEST_ASSERT_MSG_EQ(repair->GetSize(), size, "Repair 1 size changed by Release(0)");
+    std::vector<uint8_t> a(size), b(size);
+    expected[1]->CopyData(a.data(), size);
+    repair->CopyData(b.data(), size);
+    NS_TEST_ASSERT_MSG_EQ((a == b), true, "Repair 1 bytes changed by Release(0)");
+}
+
 /**
  * \brief FEC Decoder Test Case
  */
@@ -446,6 +605,300 @@ FecDecoderEdgeTrimTest::DoRun(void)
     NS_TEST_ASSERT_MSG_EQ(recovered[0]->GetSize(), 50, "Recovered tail packet should be trimmed to 50 bytes");
 }
 
+/**
+ * \brief FEC Decoder with many blocks in flight
+ *
+ * Repairs of 12 blocks (more than the initial block state ring holds) arrive
+ * before their data, the data newest block first. Every lost packet is
+ * recovered with its original bytes, in repair arrival order.
+ */
+class FecDecoderManyBlocksTest : public TestCase
+{
+public:
+    FecDecoderManyBlocksTest();
+    virtual ~FecDecoderManyBlocksTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+FecDecoderManyBlocksTest::FecDecoderManyBlocksTest()
+    : TestCase("FEC Decoder recovers across many outstanding blocks")
+{
+}
+
+FecDecoderManyBlocksTest::~FecDecoderManyBlocksTest()
+{
+}
+
+void
+FecDecoderManyBlocksTest::DoRun(void)
+{
+    const uint32_t blockSize = 8, interleavingDepth = 2, nBlocks = 12;
+    Ptr<FecDecoder> decoder = Ptr<FecDecoder>(new FecDecoder(blockSize, interleavingDepth));
+    FecXorEngine xorEngine;
+
+    std::vector<Ptr<Packet>> packets;
+    for (uint32_t psn = 0; psn < blockSize * nBlocks; psn++)
+    {
+        uint8_t data[64];
+        for (uint32_t i = 0; i < sizeof(data); i++)
+        {
+            data[i] = (uint8_t)(psn * 7 + i);
+        }
+        packets.push_back(Create<Packet>(data, sizeof(data)));
+    }
+
+    // packet 3 of every block is lost, unit 1 carries it
+    for (uint32_t b = 0; b < nBlocks; b++)
+    {
+        uint32_t base = b * blockSize;
+        for (uint32_t isn = 0; isn < interleavingDepth; isn++)
+        {
+            std::vector<Ptr<Packet>> unit;
+            std::vector<uint32_t> recipe;
+            for (uint32_t rel = isn; rel < blockSize; rel += interleavingDepth)
+            {
+                unit.push_back(packets[base + rel]);
+                recipe.push_back(base + rel);
+            }
+            decoder->ReceiveRepairPacket(xorEngine.XorPackets(unit), base, isn, recipe,
+                                         b == 0, false, 0, 0);
+        }
+    }
+    for (uint32_t psn = packets.size(); psn-- > 0;)
+    {
+        if (psn % blockSize != 3)
+        {
+            decoder->ReceiveDataPacket(packets[psn], psn);
+        }
+    }
+    NS_TEST_ASSERT_MSG_EQ(decoder->GetBlockStateCount(), nBlocks, "One block state per block");
+    NS_TEST_ASSERT_MSG_EQ((decoder->GetBlockSlotCount() >= nBlocks), true,
+                          "Fewer ring slots than live blocks");
+
+    std::vector<Ptr<Packet>> recovered;
+    while (true)
+    {
+        std::vector<Ptr<Packet>> r = decoder->RecoverLostPackets();
+        if (r.empty())
+        {
+            break;
+        }
+        recovered.insert(recovered.end(), r.begin(), r.end());
+    }
+    NS_TEST_ASSERT_MSG_EQ(recovered.size(), nBlocks, "Should recover one packet per block");
+    NS_TEST_ASSERT_MSG_EQ(decoder->GetRecoveredCount(), nBlocks, "Recovered count mismatch");
+    for (uint32_t i = 0; i < recovered.size(); i++)
+    {
+        uint32_t psn = i * blockSize + 3;
+        uint8_t expected[64], got[64];
+        packets[psn]->CopyData(expected, sizeof(expected));
+        NS_TEST_ASSERT_MSG_EQ(recovered[i]->GetSize(), 64, "Recovered size mismatch");
+        recovered[i]->CopyData(got, sizeof(got));
+        NS_TEST_ASSERT_MSG_EQ(memcmp(expected, got, sizeof(got)), 0,
+                              "Recovered packet " << i << " is not PSN " << psn);
+    }
+    // every block is complete, so nothing is left buffered; the ring keeps its slots
+    NS_TEST_ASSERT_MSG_EQ(decoder->IsIdle(), true, "Decoder should be idle");
+    NS_TEST_ASSERT_MSG_EQ(decoder->GetBlockStateCount(), 0, "No live block state");
+    NS_TEST_ASSERT_MSG_EQ((decoder->GetBlockSlotCount() >= nBlocks), true,
+                          "Ring slots should be kept");
+}
+
+/**
+ * \brief FEC Decoder with repairs of unaligned blocks
+ *
+ * After an (r,c) switch a repair can claim a bPSN that is not a multiple of
+ * the decoder's block size while the aligned block holding it is live. The
+ * repair recovers into that block when its recipe is the unit of the missing
+ * PSN there, and is left unused when the unit XOR cannot cancel the recipe.
+ */
+class FecDecoderUnalignedRepairTest : public TestCase
+{
+public:
+    FecDecoderUnalignedRepairTest();
+    virtual ~FecDecoderUnalignedRepairTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+FecDecoderUnalignedRepairTest::FecDecoderUnalignedRepairTest()
+    : TestCase("FEC Decoder handles repairs of unaligned blocks")
+{
+}
+
+FecDecoderUnalignedRepairTest::~FecDecoderUnalignedRepairTest()
+{
+}
+
+void
+FecDecoderUnalignedRepairTest::DoRun(void)
+{
+    const uint32_t blockSize = 4, interleavingDepth = 1;
+    Ptr<FecDecoder> decoder = Ptr<FecDecoder>(new FecDecoder(blockSize, interleavingDepth));
+    FecXorEngine xorEngine;
+
+    std::vector<Ptr<Packet>> packets;
+    for (uint32_t psn = 0; psn < 2 * blockSize; psn++)
+    {
+        uint8_t data[64];
+        for (uint32_t i = 0; i < sizeof(data); i++)
+        {
+            data[i] = (uint8_t)(psn * 13 + i);
+        }
+        packets.push_back(Create<Packet>(data, sizeof(data)));
+    }
+
+    // block 0 is live with PSN 3; a (2,1) repair of bPSN 2 covers {2, 3}
+    decoder->ReceiveDataPacket(packets[3], 3);
+    std::vector<Ptr<Packet>> unit{packets[2], packets[3]};
+    decoder->ReceiveRepairPacket(xorEngine.XorPackets(unit), 2, 0, std::vector<uint32_t>{2, 3},
+                                 false, false, 0, 0);
+    NS_TEST_ASSERT_MSG_EQ(decoder->GetBlockStateCount(), 1, "No block state for the unaligned bPSN");
+
+    std::vector<Ptr<Packet>> recovered = decoder->RecoverLostPackets();
+    NS_TEST_ASSERT_MSG_EQ(recovered.size(), 1, "Should recover PSN 2");
+    uint8_t expected[64], got[64];
+    packets[2]->CopyData(expected, sizeof(expected));
+    NS_TEST_ASSERT_MSG_EQ(recovered[0]->GetSize(), 64, "Recovered size mismatch");
+    recovered[0]->CopyData(got, sizeof(got));
+    NS_TEST_ASSERT_MSG_EQ(memcmp(expected, got, sizeof(got)), 0, "Recovered packet is not PSN 2");
+    NS_TEST_ASSERT_MSG_EQ(decoder->HasPacket(2), true, "PSN 2 should be available in block 0");
+
+    // block 4 also received PSNs 4 and 5, which the {6, 7} repair does not cancel
+    decoder->ReceiveDataPacket(packets[4], 4);
+    decoder->ReceiveDataPacket(packets[5], 5);
+    decoder->ReceiveDataPacket(packets[7], 7);
+    unit = {packets[6], packets[7]};
+    decoder->ReceiveRepairPacket(xorEngine.XorPackets(unit), 6, 0, std::vector<uint32_t>{6, 7},
+                                 false, false, 0, 0);
+    NS_TEST_ASSERT_MSG_EQ(decoder->RecoverLostPackets().size(), 0, "Should not recover PSN 6");
+    NS_TEST_ASSERT_MSG_EQ(decoder->HasPacket(6), false, "PSN 6 is still missing");
+    NS_TEST_ASSERT_MSG_EQ(decoder->GetRecoveredCount(), 1, "Recovered count mismatch");
+}
+
+/**
+ * \brief Symbolic FEC matches the byte-wise XOR
+ *
+ * The same loss trace over [FecHeader][zero payload] packets, as FecTransmit
+ * encodes them, goes through a byte-wise and a symbolic encoder / decoder
+ * pair: the repair sizes and the recovered packets, including a trimmed
+ * message tail, are identical, and unrecoverable losses stay unrecovered.
+ */
+class FecSymbolicTest : public TestCase
+{
+public:
+    FecSymbolicTest();
+    virtual ~FecSymbolicTest();
+
+private:
+    virtual void DoRun(void);
+    void Run(bool symbolic, std::vector<uint32_t>* repairSizes, std::vector<Ptr<Packet>>* recovered);
+};
+
+FecSymbolicTest::FecSymbolicTest()
+    : TestCase("FEC symbolic mode recovers like the XOR")
+{
+}
+
+FecSymbolicTest::~FecSymbolicTest()
+{
+}
+
+void
+FecSymbolicTest::Run(bool symbolic, std::vector<uint32_t>* repairSizes,
+                     std::vector<Ptr<Packet>>* recovered)
+{
+    // LoWAR(8, 4), a full block then a 6-packet tail block ending the message
+    const uint32_t blockSize = 8, interleavingDepth = 4, nPackets = 14, tailLen = 40;
+    Ptr<FecEncoder> encoder = Ptr<FecEncoder>(new FecEncoder(blockSize, interleavingDepth, symbolic));
+    Ptr<FecDecoder> decoder = Ptr<FecDecoder>(new FecDecoder(blockSize, interleavingDepth, symbolic));
+    NS_TEST_ASSERT_MSG_EQ(decoder->IsSymbolic(), symbolic, "Decoder mode mismatch");
+
+    std::vector<Ptr<Packet>> packets, repairs;
+    for (uint32_t psn = 0; psn < nPackets; psn++)
+    {
+        FecHeader header;
+        header.SetType(FecHeader::FEC_DATA);
+        header.SetBlockSize(blockSize);
+        header.SetInterleavingDepth(interleavingDepth);
+        header.SetBasePSN(psn / blockSize * blockSize);
+        header.SetPSN(psn);
+        Ptr<Packet> packet = Create<Packet>(psn == nPackets - 1 ? tailLen : 100);
+        packet->AddHeader(header);
+        packets.push_back(packet);
+
+        encoder->EncodePacket(packet, psn);
+        if (psn == nPackets - 1)
+        {
+            encoder->MarkHasLast(psn % blockSize, packet->GetSize());
+        }
+        if (encoder->IsBlockComplete() || psn == nPackets - 1)
+        {
+            std::vector<Ptr<Packet>> blockRepairs = encoder->GenerateRepairPackets(true);
+            repairs.insert(repairs.end(), blockRepairs.begin(), blockRepairs.end());
+            encoder->ResetBlock();
+        }
+    }
+
+    // 2 and 6 share unit 2 and cannot be recovered; 5 and the tail 13 can
+    for (uint32_t psn = 0; psn < nPackets; psn++)
+    {
+        if (psn != 2 && psn != 5 && psn != 6 && psn != 13)
+        {
+            decoder->ReceiveDataPacket(packets[psn], psn);
+        }
+    }
+    for (size_t i = 0; i < repairs.size(); i++)
+    {
+        repairSizes->push_back(repairs[i]->GetSize());
+        FecHeader header;
+        Ptr<Packet> payload = repairs[i]->Copy();
+        payload->RemoveHeader(header);
+        decoder->ReceiveRepairPacket(payload, header.GetBasePSN(), header.GetISN(), header.GetRecipe(),
+                                     header.GetHasFirst(), header.GetHasLast(),
+                                     header.GetLastRel(), header.GetLastLength());
+        std::vector<Ptr<Packet>> batch = decoder->RecoverLostPackets();
+        recovered->insert(recovered->end(), batch.begin(), batch.end());
+    }
+
+    NS_TEST_ASSERT_MSG_EQ(recovered->size(), 2, "Should recover PSN 5 and 13");
+    NS_TEST_ASSERT_MSG_EQ((decoder->HasPacket(2) || decoder->HasPacket(6)), false,
+                          "Two losses in one unit are unrecoverable");
+    const uint32_t expectedPsn[] = {5, 13};
+    for (size_t i = 0; i < recovered->size() && i < 2; i++)
+    {
+        FecHeader header;
+        (*recovered)[i]->PeekHeader(header);
+        NS_TEST_ASSERT_MSG_EQ(header.GetPSN(), expectedPsn[i], "Recovered wrong PSN");
+        NS_TEST_ASSERT_MSG_EQ((*recovered)[i]->GetSize(), packets[expectedPsn[i]]->GetSize(),
+                              "Recovered size mismatch");
+    }
+}
+
+void
+FecSymbolicTest::DoRun(void)
+{
+    std::vector<uint32_t> xorSizes, symbolicSizes;
+    std::vector<Ptr<Packet>> xorRecovered, symbolicRecovered;
+    Run(false, &xorSizes, &xorRecovered);
+    Run(true, &symbolicSizes, &symbolicRecovered);
+
+    NS_TEST_ASSERT_MSG_EQ((xorSizes == symbolicSizes), true, "Repair sizes differ");
+    NS_TEST_ASSERT_MSG_EQ(xorRecovered.size(), symbolicRecovered.size(), "Recovered counts differ");
+    for (size_t i = 0; i < xorRecovered.size() && i < symbolicRecovered.size(); i++)
+    {
+        uint32_t size = xorRecovered[i]->GetSize();
+        NS_TEST_ASSERT_MSG_EQ(symbolicRecovered[i]->GetSize(), size, "Recovered sizes differ");
+        std::vector<uint8_t> a(size), b(size);
+        xorRecovered[i]->CopyData(a.data(), size);
+        symbolicRecovered[i]->CopyData(b.data(), size);
+        NS_TEST_ASSERT_MSG_EQ((a == b), true, "Recovered bytes differ for packet " << i);
+    }
+}
+
 /**
  * \brief FEC End-to-End Test Case
  */
@@ -555,10 +1008,15 @@ FecTestSuite::FecTestSuite()
 {
     AddTestCase(new FecHeaderTest, TestCase::QUICK);
     AddTestCase(new FecXorEngineTest, TestCase::QUICK);
+    AddTestCase(new FecXorEngineWordTest, TestCase::QUICK);
     AddTestCase(new FecEncoderTest, TestCase::QUICK);
     AddTestCase(new FecEncoderTailFlushTest, TestCase::QUICK);
+    AddTestCase(new FecRepairBlockTest, TestCase::QUICK);
     AddTestCase(new FecDecoderTest, TestCase::QUICK);
     AddTestCase(new FecDecoderEdgeTrimTest, TestCase::QUICK);
+    AddTestCase(new FecDecoderManyBlocksTest, TestCase::QUICK);
+    AddTestCase(new FecDecoderUnalignedRepairTest, TestCase::QUICK);
+    AddTestCase(new FecSymbolicTest, TestCase::QUICK);
     AddTestCase(new FecEndToEndTest, TestCase::QUICK);
 }
 
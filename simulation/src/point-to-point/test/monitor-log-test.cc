@@ -0,0 +1,355 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * Copyright (c) 2024 NUS
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+#include "ns3/test.h"
+#include "ns3/monitor-log.h"
+#include "ns3/log.h"
+
+#include <chrono>
+#include <fstream>
+#include <sstream>
+#include <string>
+#include <thread>
+
+using namespace ns3;
+
+NS_LOG_COMPONENT_DEFINE("MonitorLogTest");
+
+static std::string
+ReadFile(const std::string& path)
+{
+    std::ifstream in(path.c_str(), std::ios::binary);
+    std::ostringstream oss;
+    oss << in.rdbuf();
+    return oss.str();
+}
+
+static const char* kTestFields = "time_ns:i8 type:i1 node:u4 sport:u2";
+
+/**
+ * \brief Text format keeps the historical fprintf layout
+ */
+class MonitorLogTextTest : public TestCase
+{
+public:
+    MonitorLogTextTest();
+    virtual ~MonitorLogTextTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+MonitorLogTextTest::MonitorLogTextTest()
+    : TestCase("MonitorLog text records")
+{
+}
+
+MonitorLogTextTest::~MonitorLogTextTest()
+{
+}
+
+void
+MonitorLogTextTest::DoRun(void)
+{
+    std::string path = CreateTempDirFilename("monitor-log-text.txt");
+    MonitorLog log(path, "drop", kTestFields, ' ', MonitorLog::TEXT);
+    NS_TEST_ASSERT_MSG_EQ(log.IsOpen(), true, "Cannot open " << path);
+    log.Write(2000000123, -1, 52u, 10000);
+    log.Write(0, 2, 4294967295u, 65535);
+    log.Close();
+
+    NS_TEST_ASSERT_MSG_EQ(ReadFile(path), "2000000123 -1 52 10000\n0 2 4294967295 65535\n",
+                          "Text records mismatch");
+
+    // header metadata becomes a leading comment line
+    MonitorLog meta(path, "drop", kTestFields, ',', MonitorLog::TEXT);
+    meta.SetMeta("sample_rate", "1/256");
+    meta.Write(1, 0, 3u, 4);
+    meta.Close();
+    NS_TEST_ASSERT_MSG_EQ(ReadFile(path), "# sample_rate=1/256\n1,0,3,4\n", "Text header mismatch");
+}
+
+/**
+ * \brief Binary format: aligned self-describing header and packed little-endian records
+ */
+class MonitorLogBinaryTest : public TestCase
+{
+public:
+    MonitorLogBinaryTest();
+    virtual ~MonitorLogBinaryTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+MonitorLogBinaryTest::MonitorLogBinaryTest()
+    : TestCase("MonitorLog binary records")
+{
+}
+
+MonitorLogBinaryTest::~MonitorLogBinaryTest()
+{
+}
+
+void
+MonitorLogBinaryTest::DoRun(void)
+{
+    std::string path = CreateTempDirFilename("monitor-log-binary.bin");
+    MonitorLog log(path, "drop", kTestFields, ' ', MonitorLog::BINARY);
+    NS_TEST_ASSERT_MSG_EQ(log.GetRecordSize(), 15, "Record size mismatch");
+    log.Write(0x0102030405060708ll, -1, 0xA0B0C0D0u, 0x1234);
+    log.Close();
+
+    std::string data = ReadFile(path);
+    size_t headerLen = data.find('\n') + 1;
+    NS_TEST_ASSERT_MSG_EQ(headerLen % 8, 0, "Records are not 8-byte aligned");
+    NS_TEST_ASSERT_MSG_EQ(data.compare(0, 48, "#XDCBIN1 stream=drop record_bytes=15 fields=time"), 0,
+                          "Header prefix mismatch");
+    NS_TEST_ASSERT_MSG_NE(data.find("fields=time_ns:<i8,type:<i1,node:<u4,sport:<u2"),
+                          std::string::npos, "Header field list mismatch");
+    NS_TEST_ASSERT_MSG_EQ(data.size(), headerLen + 15, "File size mismatch");
+
+    const unsigned char expected[15] = {0x08, 0x07, 0x06, 0x05, 0x04, 0x03, 0x02, 0x01,
+                                        0xFF, 0xD0, 0xC0, 0xB0, 0xA0, 0x34, 0x12};
+    for (uint32_t i = 0; i < 15; ++i)
+    {
+        NS_TEST_ASSERT_MSG_EQ((unsigned char)data[headerLen + i], expected[i],
+                              "Record byte " << i << " mismatch");
+    }
+}
+
+/**
+ * \brief Records written faster than a small ring drains are neither lost nor reordered
+ */
+class MonitorLogAsyncTest : public TestCase
+{
+public:
+    MonitorLogAsyncTest();
+    virtual ~MonitorLogAsyncTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+MonitorLogAsyncTest::MonitorLogAsyncTest()
+    : TestCase("MonitorLog background writer with a full ring")
+{
+}
+
+MonitorLogAsyncTest::~MonitorLogAsyncTest()
+{
+}
+
+void
+MonitorLogAsyncTest::DoRun(void)
+{
+    std::string path = CreateTempDirFilename("monitor-log-async.txt");
+    const uint32_t nRecords = 200000;
+    MonitorLog::SetBufferBytes(0);  // smallest ring (64 KiB), forces the producer to wait
+    MonitorLog::SetBackpressure(MonitorLog::BLOCK);
+    MonitorLog log(path, "async", "seq:u4", ' ', MonitorLog::TEXT);
+    MonitorLog::SetBufferBytes(4 << 20);
+    for (uint32_t i = 0; i < nRecords; ++i)
+    {
+        log.Write(i);
+    }
+    log.Close();
+    NS_TEST_ASSERT_MSG_EQ(log.GetDroppedRecords(), 0, "BLOCK policy must not drop records");
+
+    std::ifstream in(path.c_str());
+    uint32_t expected = 0;
+    uint32_t v;
+    while (in >> v)
+    {
+        NS_TEST_ASSERT_MSG_EQ(v, expected, "Record out of order");
+        expected++;
+    }
+    NS_TEST_ASSERT_MSG_EQ(expected, nRecords, "Records lost");
+}
+
+/**
+ * \brief The writer honours Flush() on open streams, and streams closed
+ *        while it is draining others are written completely
+ */
+class MonitorLogFlushTest : public TestCase
+{
+public:
+    MonitorLogFlushTest();
+    virtual ~MonitorLogFlushTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+MonitorLogFlushTest::MonitorLogFlushTest()
+    : TestCase("MonitorLog flush and close with a running writer")
+{
+}
+
+MonitorLogFlushTest::~MonitorLogFlushTest()
+{
+}
+
+void
+MonitorLogFlushTest::DoRun(void)
+{
+    // keeps the writer thread alive across the short-lived streams
+    MonitorLog busy(CreateTempDirFilename("monitor-log-busy.txt"), "busy", "seq:u4", ' ',
+                    MonitorLog::TEXT);
+    for (uint32_t round = 0; round < 50; ++round)
+    {
+        std::ostringstream name;
+        name << "monitor-log-flush-" << round << ".txt";
+        std::string path = CreateTempDirFilename(name.str());
+        MonitorLog log(path, "flush", "seq:u4", ' ', MonitorLog::TEXT);
+        std::string expected;
+        for (uint32_t i = 0; i < 10; ++i)
+        {
+            log.Write(round * 10 + i);
+            busy.Write(i);
+            std::ostringstream line;
+            line << round * 10 + i << "\n";
+            expected += line.str();
+        }
+        log.Flush();
+        // the stream stays open, so only the writer thread can get the records out
+        bool flushed = false;
+        for (uint32_t wait = 0; wait < 1000 && !flushed; ++wait)
+        {
+            std::this_thread::sleep_for(std::chrono::milliseconds(1));
+            flushed = ReadFile(path) == expected;
+        }
+        NS_TEST_ASSERT_MSG_EQ(flushed, true, "Flushed records not written in round " << round);
+
+        log.Write(round * 10 + 10);
+        log.Close();
+        std::ostringstream last;
+        last << round * 10 + 10 << "\n";
+        NS_TEST_ASSERT_MSG_EQ(ReadFile(path), expected + last.str(),
+                              "Records lost on close in round " << round);
+    }
+}
+
+/**
+ * \brief Compressed streams are a chain of self-describing frames of whole records
+ */
+class MonitorLogCompressionTest : public TestCase
+{
+public:
+    MonitorLogCompressionTest();
+    virtual ~MonitorLogCompressionTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+MonitorLogCompressionTest::MonitorLogCompressionTest()
+    : TestCase("MonitorLog compressed frames")
+{
+}
+
+MonitorLogCompressionTest::~MonitorLogCompressionTest()
+{
+}
+
+static uint32_t
+GetLe32(const std::string& data, size_t pos)
+{
+    uint32_t v = 0;
+    for (uint32_t b = 0; b < 4; ++b)
+    {
+        v |= uint32_t((unsigned char)data[pos + b]) << (8 * b);
+    }
+    return v;
+}
+
+void
+MonitorLogCompressionTest::DoRun(void)
+{
+    const MonitorLog::Compression kinds[2] = {MonitorLog::ZSTD, MonitorLog::GZIP};
+    for (uint32_t k = 0; k < 2; ++k)
+    {
+        MonitorLog::Compression used = MonitorLog::SetCompression(kinds[k]);
+        MonitorLog::SetBufferBytes(0); // 64 KiB ring, so the records span several frames
+        MonitorLog log(CreateTempDirFilename("monitor-log-compressed.txt"), "seq", "seq:u4", ' ',
+                       MonitorLog::TEXT);
+        MonitorLog::SetBufferBytes(4 << 20);
+        MonitorLog::SetCompression(MonitorLog::NONE);
+        if (used == MonitorLog::NONE)
+        {
+            continue; // built without zstd and zlib
+        }
+        uint64_t rawBytes = 0;
+        for (uint32_t i = 0; i < 100000; ++i)
+        {
+            log.Write(i);
+            rawBytes += std::to_string(i).size() + 1;
+        }
+        log.Close();
+
+        // walk the frame sizes: they must tile the file and add up to the text size
+        std::string data = ReadFile(log.GetPath());
+        size_t pos = 0;
+        uint64_t total = 0;
+        uint32_t frames = 0;
+        while (pos < data.size())
+        {
+            uint32_t frameBytes;
+            if (used == MonitorLog::ZSTD)
+            {
+                NS_TEST_ASSERT_MSG_EQ(GetLe32(data, pos), 0x184D2A5Eu, "Missing skippable frame");
+                frameBytes = 16 + GetLe32(data, pos + 8);
+                total += GetLe32(data, pos + 12);
+            }
+            else
+            {
+                NS_TEST_ASSERT_MSG_EQ(data.compare(pos, 4, "\x1f\x8b\x08\x04"), 0, "Bad gzip member");
+                NS_TEST_ASSERT_MSG_EQ(data.compare(pos + 12, 2, "XD"), 0, "Missing size subfield");
+                frameBytes = GetLe32(data, pos + 16);
+                total += GetLe32(data, pos + 20);
+            }
+            NS_TEST_ASSERT_MSG_GT(frameBytes, 0u, "Empty frame");
+            pos += frameBytes;
+            frames++;
+        }
+        NS_TEST_ASSERT_MSG_EQ(pos, data.size(), "Frames do not tile the file");
+        NS_TEST_ASSERT_MSG_EQ(total, rawBytes, "Uncompressed sizes mismatch");
+        NS_TEST_ASSERT_MSG_GT(frames, 1, "Expected several frames");
+    }
+}
+
+/**
+ * \brief MonitorLog Test Suite
+ */
+class MonitorLogTestSuite : public TestSuite
+{
+public:
+    MonitorLogTestSuite();
+};
+
+MonitorLogTestSuite::MonitorLogTestSuite()
+    : TestSuite("monitor-log", UNIT)
+{
+    AddTestCase(new MonitorLogTextTest, TestCase::QUICK);
+    AddTestCase(new MonitorLogBinaryTest, TestCase::QUICK);
+    AddTestCase(new MonitorLogAsyncTest, TestCase::QUICK);
+    AddTestCase(new MonitorLogFlushTest, TestCase::QUICK);
+    AddTestCase(new MonitorLogCompressionTest, TestCase::QUICK);
+}
+
+static MonitorLogTestSuite monitorLogTestSuite;
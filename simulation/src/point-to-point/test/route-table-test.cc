@@ -0,0 +1,324 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * Copyright (c) 2024 NUS
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+#include "ns3/test.h"
+#include "ns3/route-table.h"
+#include "ns3/log.h"
+
+#include <algorithm>
+#include <map>
+#include <string>
+#include <vector>
+
+using namespace ns3;
+
+NS_LOG_COMPONENT_DEFINE("RouteTableTest");
+
+static const uint32_t kPayload = 1000;
+
+/**
+ * \brief Two-DC k=4 fat-tree laid out like tools/topology_gen/cross_dc_topology_gen.py
+ *        (oversubscription 2, one DCI per DC); returns the node types
+ */
+static std::vector<bool>
+BuildCrossDc(RouteTable* routes)
+{
+    const uint32_t k = 4, nDc = 2;
+    const uint32_t half = k / 2, nTor = k * half, nAgg = k * half, nCore = half * half;
+    const uint32_t nServer = nTor * half * 2;
+    const uint32_t perDc = nServer + nTor + nAgg + nCore + 1;
+    std::vector<bool> isSwitch(perDc * nDc, true);
+    std::vector<std::pair<uint32_t, uint32_t>> links;
+    for (uint32_t dc = 0; dc < nDc; ++dc)
+    {
+        uint32_t base = dc * perDc, tor = base + nServer, agg = tor + nTor, core = agg + nAgg;
+        for (uint32_t s = 0; s < nServer; ++s)
+        {
+            isSwitch[base + s] = false;
+            links.push_back(std::make_pair(base + s, tor + s / (half * 2)));
+        }
+        for (uint32_t t = 0; t < nTor; ++t)
+        {
+            for (uint32_t a = 0; a < half; ++a)
+            {
+                links.push_back(std::make_pair(tor + t, agg + t / half * half + a));
+            }
+        }
+        for (uint32_t a = 0; a < nAgg; ++a)
+        {
+            for (uint32_t c = 0; c < half; ++c)
+            {
+                links.push_back(std::make_pair(agg + a, core + a % half * half + c));
+            }
+        }
+        for (uint32_t c = 0; c < nCore; ++c)
+        {
+            links.push_back(std::make_pair(core + c, core + nCore));
+        }
+    }
+    routes->Reset(isSwitch);
+    for (uint32_t i = 0; i < links.size(); ++i)
+    {
+        RouteTable::Interface ab, ba;
+        ab.idx = i + 1;
+        ba.idx = i + 1;
+        ab.up = ba.up = true;
+        ab.delay = ba.delay = 1000;
+        ab.bw = ba.bw = 100000000000lu;
+        routes->AddLink(links[i].first, links[i].second, ab, ba);
+    }
+    RouteTable::Interface ab, ba;
+    ab.idx = ba.idx = 1000;
+    ab.up = ba.up = true;
+    ab.delay = ba.delay = 400000;
+    ab.bw = ba.bw = 400000000000lu;
+    routes->AddLink(perDc - 1, 2 * perDc - 1, ab, ba);
+    routes->Finalize();
+    return isSwitch;
+}
+
+/**
+ * \brief The former map-based per-host BFS of cross_dc.cc, on node ids
+ */
+struct ReferenceRoutes
+{
+    std::map<uint32_t, std::map<uint32_t, std::vector<uint32_t>>> nextHop;
+    std::map<uint32_t, std::map<uint32_t, uint64_t>> delay, txDelay, bw;
+
+    void Calculate(const RouteTable& routes, const std::vector<bool>& isSwitch)
+    {
+        for (uint32_t host = 0; host < isSwitch.size(); ++host)
+        {
+            if (isSwitch[host])
+            {
+                continue;
+            }
+            std::vector<uint32_t> q(1, host);
+            std::map<uint32_t, int> dis;
+            dis[host] = 0;
+            delay[host][host] = txDelay[host][host] = 0;
+            bw[host][host] = 0xfffffffffffffffflu;
+            for (uint32_t i = 0; i < q.size(); ++i)
+            {
+                uint32_t now = q[i];
+                int d = dis[now];
+                for (uint32_t j = 0; j < routes.GetNNeighbors(now); ++j)
+                {
+                    const RouteTable::Interface& itf = routes.GetNeighborInterface(now, j);
+                    if (!itf.up)
+                    {
+                        continue;
+                    }
+                    uint32_t next = routes.GetNeighbor(now, j);
+                    if (dis.find(next) == dis.end())
+                    {
+                        dis[next] = d + 1;
+                        delay[next][host] = delay[now][host] + itf.delay;
+                        txDelay[next][host] = txDelay[now][host] + kPayload * 1000000000lu * 8 / itf.bw;
+                        bw[next][host] = std::min(bw[now][host], itf.bw);
+                        if (isSwitch[next])
+                        {
+                            q.push_back(next);
+                        }
+                    }
+                    if (d + 1 == dis[next])
+                    {
+                        nextHop[next][host].push_back(now);
+                    }
+                }
+            }
+        }
+    }
+};
+
+/**
+ * \brief Next hops, pair metrics and max RTT / BDP match the map-based BFS,
+ *        also after a link goes down
+ */
+class RouteTableCompareTest : public TestCase
+{
+public:
+    RouteTableCompareTest();
+    virtual ~RouteTableCompareTest();
+
+private:
+    virtual void DoRun(void);
+    void Compare(const RouteTable& routes, const std::vector<bool>& isSwitch);
+};
+
+RouteTableCompareTest::RouteTableCompareTest()
+    : TestCase("RouteTable matches the per-host BFS")
+{
+}
+
+RouteTableCompareTest::~RouteTableCompareTest()
+{
+}
+
+void
+RouteTableCompareTest::Compare(const RouteTable& routes, const std::vector<bool>& isSwitch)
+{
+    ReferenceRoutes ref;
+    ref.Calculate(routes, isSwitch);
+    const std::vector<uint32_t>& hosts = routes.GetHosts();
+    std::vector<uint32_t> nexts;
+    for (uint32_t v = 0; v < routes.GetNNodes(); ++v)
+    {
+        for (uint32_t h : hosts)
+        {
+            routes.GetNextHops(v, h, &nexts);
+            NS_TEST_ASSERT_MSG_EQ((nexts == ref.nextHop[v][h]), true,
+                                  "Next hops of " << v << " towards " << h << " mismatch");
+            NS_TEST_ASSERT_MSG_EQ(routes.IsReachable(v, h), !nexts.empty(), "Reachability mismatch");
+            RouteTable::PathInfo path = routes.GetPath(v, h);
+            NS_TEST_ASSERT_MSG_EQ(path.delay, ref.delay[v][h], "Delay mismatch");
+            NS_TEST_ASSERT_MSG_EQ(path.txDelay, ref.txDelay[v][h], "Tx delay mismatch");
+            if (v != h)
+            {
+                NS_TEST_ASSERT_MSG_EQ(path.bw, ref.bw[v][h], "Bandwidth mismatch");
+            }
+        }
+    }
+    uint64_t maxRtt = 0, maxBdp = 0;
+    for (uint32_t i = 0; i < hosts.size(); ++i)
+    {
+        for (uint32_t j = i + 1; j < hosts.size(); ++j)
+        {
+            uint32_t a = hosts[i], b = hosts[j];
+            uint64_t rtt = ref.delay[a][b] * 2 + ref.txDelay[a][b];
+            uint64_t bdp = rtt * ref.bw[a][b] / 1000000000 / 8;
+            NS_TEST_ASSERT_MSG_EQ(routes.GetRtt(a, b), rtt, "RTT mismatch");
+            NS_TEST_ASSERT_MSG_EQ(routes.GetRtt(b, a), rtt, "RTT is not symmetric");
+            NS_TEST_ASSERT_MSG_EQ(routes.GetBdp(b, a), bdp, "BDP mismatch");
+            maxRtt = std::max(maxRtt, rtt);
+            maxBdp = std::max(maxBdp, bdp);
+        }
+    }
+    NS_TEST_ASSERT_MSG_EQ(routes.GetMaxRtt(), maxRtt, "Max RTT mismatch");
+    NS_TEST_ASSERT_MSG_EQ(routes.GetMaxBdp(), maxBdp, "Max BDP mismatch");
+}
+
+void
+RouteTableCompareTest::DoRun(void)
+{
+    RouteTable routes;
+    std::vector<bool> isSwitch = BuildCrossDc(&routes);
+    routes.CalculateRoutes(kPayload);
+    NS_TEST_ASSERT_MSG_EQ(routes.GetInterface(0, 1), 0, "Hosts 0 and 1 are not adjacent");
+    Compare(routes, isSwitch);
+
+    // take down an uplink of the first ToR, as TakeDownLink does
+    uint32_t tor = routes.GetHosts().size() / 2;
+    uint32_t agg = routes.GetNeighbor(tor, routes.GetNNeighbors(tor) - 1);
+    routes.GetInterface(tor, agg)->up = false;
+    routes.GetInterface(agg, tor)->up = false;
+    routes.CalculateRoutes(kPayload);
+    Compare(routes, isSwitch);
+
+    // cut host 0 off: flows from or to it must be rejected, not routed
+    uint32_t host = routes.GetHosts()[0];
+    uint32_t hostTor = routes.GetNeighbor(host, 0);
+    routes.GetInterface(host, hostTor)->up = false;
+    routes.GetInterface(hostTor, host)->up = false;
+    routes.CalculateRoutes(kPayload);
+    for (uint32_t h : routes.GetHosts())
+    {
+        NS_TEST_ASSERT_MSG_EQ(routes.IsReachable(host, h), false, "Isolated host reaches " << h);
+        NS_TEST_ASSERT_MSG_EQ(routes.IsReachable(h, host), false, h << " reaches the isolated host");
+    }
+    uint32_t other = routes.GetHosts()[1];
+    NS_TEST_ASSERT_MSG_EQ(routes.IsReachable(other, routes.GetHosts().back()), true,
+                          "Other hosts stay reachable");
+}
+
+/**
+ * \brief Routes loaded from the cache equal the computed ones; the cache is
+ *        rejected for a different topology or payload size
+ */
+class RouteTableCacheTest : public TestCase
+{
+public:
+    RouteTableCacheTest();
+    virtual ~RouteTableCacheTest();
+
+private:
+    virtual void DoRun(void);
+};
+
+RouteTableCacheTest::RouteTableCacheTest()
+    : TestCase("RouteTable cache round trip")
+{
+}
+
+RouteTableCacheTest::~RouteTableCacheTest()
+{
+}
+
+void
+RouteTableCacheTest::DoRun(void)
+{
+    std::string path = CreateTempDirFilename("route-table-cache.bin");
+    RouteTable computed;
+    BuildCrossDc(&computed);
+    computed.CalculateRoutes(kPayload);
+    NS_TEST_ASSERT_MSG_EQ(computed.Save(path), true, "Cannot write " << path);
+
+    RouteTable loaded;
+    BuildCrossDc(&loaded);
+    NS_TEST_ASSERT_MSG_EQ(loaded.Load(path, kPayload + 1), false, "Loaded for another payload size");
+    NS_TEST_ASSERT_MSG_EQ(loaded.Load(path, kPayload), true, "Cannot load " << path);
+    NS_TEST_ASSERT_MSG_EQ(loaded.GetMaxRtt(), computed.GetMaxRtt(), "Max RTT mismatch");
+    NS_TEST_ASSERT_MSG_EQ(loaded.GetMaxBdp(), computed.GetMaxBdp(), "Max BDP mismatch");
+    std::vector<uint32_t> a, b;
+    for (uint32_t v = 0; v < loaded.GetNNodes(); ++v)
+    {
+        for (uint32_t h : loaded.GetHosts())
+        {
+            loaded.GetNextHops(v, h, &a);
+            computed.GetNextHops(v, h, &b);
+            NS_TEST_ASSERT_MSG_EQ((a == b), true, "Next hops of " << v << " towards " << h << " mismatch");
+            NS_TEST_ASSERT_MSG_EQ(loaded.GetPath(v, h).delay, computed.GetPath(v, h).delay, "Delay mismatch");
+        }
+    }
+
+    // any link property the routes depend on changes the key
+    RouteTable slower;
+    BuildCrossDc(&slower);
+    slower.GetInterface(0, slower.GetNeighbor(0, 0))->delay++;
+    NS_TEST_ASSERT_MSG_NE(slower.GetTopologyHash(kPayload), computed.GetTopologyHash(kPayload),
+                          "Hash ignores link delays");
+    NS_TEST_ASSERT_MSG_EQ(slower.Load(path, kPayload), false, "Loaded for another topology");
+}
+
+/**
+ * \brief RouteTable Test Suite
+ */
+class RouteTableTestSuite : public TestSuite
+{
+public:
+    RouteTableTestSuite();
+};
+
+RouteTableTestSuite::RouteTableTestSuite()
+    : TestSuite("route-table", UNIT)
+{
+    AddTestCase(new RouteTableCompareTest, TestCase::QUICK);
+    AddTestCase(new RouteTableCacheTest, TestCase::QUICK);
+}
+
+static RouteTableTestSuite routeTableTestSuite;